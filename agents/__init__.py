@@ -5,16 +5,37 @@ Contains all AI agents for the Imtehaan EdTech Platform
 
 __version__ = "1.0.0"
 
-from .ai_tutor_agent import (
-    AITutorAgent, TutorRequest, TutorResponse,
-    LessonRequest, LessonResponse
-)
-from .answer_grading_agent import (
-    AnswerGradingAgent, GradingResult, GradingCriteria
-)
-from .mock_exam_grading_agent import (
-    MockExamGradingAgent, ExamReport, QuestionGrade
-)
+import importlib
+
+# Agents are imported on first attribute access (PEP 562), so importing
+# one submodule (e.g. agents.services.concept_service) does not pull in
+# LangChain, OpenAI and every other agent
+_EXPORTS = {
+    # AI Tutor Agent
+    'AITutorAgent': 'ai_tutor_agent',
+    'TutorRequest': 'ai_tutor_agent',
+    'TutorResponse': 'ai_tutor_agent',
+    'LessonRequest': 'ai_tutor_agent',
+    'LessonResponse': 'ai_tutor_agent',
+    # Answer Grading Agent
+    'AnswerGradingAgent': 'answer_grading_agent',
+    'GradingResult': 'answer_grading_agent',
+    'GradingCriteria': 'answer_grading_agent',
+    # Mock Exam Grading Agent
+    'MockExamGradingAgent': 'mock_exam_grading_agent',
+    'ExamReport': 'mock_exam_grading_agent',
+    'QuestionGrade': 'mock_exam_grading_agent',
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     # AI Tutor Agent
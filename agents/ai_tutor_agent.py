@@ -27,11 +27,13 @@ from agents.services.student_service import StudentService
 
 # Import cache
 try:
-    from cache import cache_get, cache_set, cache_delete
+    from cache import cache_get, cache_set, cache_delete, cache_get_or_load
 except ImportError:
     def cache_get(key): return None
     def cache_set(key, value, ttl=3600): return False
     def cache_delete(key): return False
+    def cache_get_or_load(key, loader, ttl=3600, negative_ttl=30):
+        return loader()
 
 # Optional LangChain support
 try:
@@ -165,12 +167,14 @@ class AITutorAgent:
             supabase_client=supabase_client,
             concept_agent=self.concept_agent,
             cache_get=cache_get,
-            cache_set=cache_set
+            cache_set=cache_set,
+            cache_get_or_load=cache_get_or_load
         )
         self.concept_service = ConceptService(
             concept_agent=self.concept_agent,
             cache_get=cache_get,
-            cache_set=cache_set
+            cache_set=cache_set,
+            cache_get_or_load=cache_get_or_load
         )
         self.history_service = HistoryService(
             supabase_client=supabase_client,
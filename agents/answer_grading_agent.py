@@ -10,7 +10,8 @@ import json
 import asyncio
 import hashlib
 import time
-from typing import Dict, List, Any
+from contextlib import nullcontext
+from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
@@ -27,6 +28,28 @@ except ImportError:
     def cache_get(key): return None
     def cache_set(key, value, ttl=3600): return False
 
+# Write-behind outbox for Supabase writes (optional)
+try:
+    from outbox import get_outbox
+except ImportError:
+    get_outbox = None
+
+# Latency histograms for /metrics (optional)
+try:
+    from metrics import timed, GRADING_STAGE_SECONDS, LLM_CALL_SECONDS
+except ImportError:
+    GRADING_STAGE_SECONDS = LLM_CALL_SECONDS = None
+
+    def timed(metric, **labels): return nullcontext(labels)
+
+
+def _observe_stage(stage: str, seconds: float, status: str = "ok"):
+    """Record an answer grading stage in grading_stage_duration_seconds."""
+    if GRADING_STAGE_SECONDS is not None:
+        GRADING_STAGE_SECONDS.observe(
+            seconds, pipeline="answer", stage=stage, status=status
+        )
+
 
 # Configure logging with detailed format
 logging.basicConfig(
@@ -139,12 +162,47 @@ class SupabaseRepository:
                     "no Supabase credentials found"
                 )
 
+    def _enqueue(
+        self,
+        table: str,
+        rows,
+        op: str = "insert",
+        key_columns=None,
+        on_conflict: Optional[str] = None
+    ):
+        """
+        Hand rows to the write-behind outbox, or write them directly if
+        the outbox is unavailable.
+        """
+        if get_outbox is not None:
+            return get_outbox().enqueue(
+                table, rows, op=op, key_columns=key_columns,
+                on_conflict=on_conflict
+            )
+        query = self.client.table(table)
+        if op != "upsert":
+            query = query.insert(rows)
+        elif on_conflict:
+            query = query.upsert(rows, on_conflict=on_conflict)
+        else:
+            query = query.upsert(rows)
+        query.execute()
+        return True
+
+    def _pending_row(self, table: str, **match):
+        """Newest queued, not yet written row matching the values."""
+        if get_outbox is None:
+            return None
+        return get_outbox().pending_row(table, **match)
+
     def log_question_attempt(self, **data):
         """
-        Insert a row into question_attempts if Supabase is enabled.
+        Queue a row for question_attempts if Supabase is enabled.
 
         Handles JSONB arrays (primary_concept_ids, secondary_concept_ids)
         automatically via Supabase client.
+
+        Returns True once queued, or None if Supabase is disabled.
         """
         if not self.enabled:
             return None
@@ -176,44 +234,12 @@ class SupabaseRepository:
                     f"     secondary_concept_ids: "
                     f"{data.get('secondary_concept_ids')}"
                 )
-            result = (
-                self.client.table("question_attempts")
-                .insert(data)
-                .execute()
-            )
-
-            if DEBUG_MODE and result.data:
-                logger.info("=" * 80)
-                logger.info(
-                    "✅ [SUPABASE] Entry created in question_attempts:"
-                )
-                created_entry = result.data[0]
-                entry_id = created_entry.get('attempt_id', 'N/A')
-                logger.info(f"   Entry ID: {entry_id}")
-                logger.info(f"   user_id: {created_entry.get('user_id')}")
-                q_id = created_entry.get('question_id')
-                logger.info(f"   question_id: {q_id}")
-                logger.info(f"   topic_id: {created_entry.get('topic_id')}")
-                logger.info(
-                    f"   raw_score: {created_entry.get('raw_score')}"
-                )
+            self._enqueue("question_attempts", data)
+            if DEBUG_MODE:
                 logger.info(
-                    f"   percentage: {created_entry.get('percentage')}"
+                    "✅ [SUPABASE] question_attempts entry queued"
                 )
-                logger.info(f"   grade: {created_entry.get('grade')}")
-                reasoning = created_entry.get('reasoning_category')
-                logger.info(f"   reasoning_category: {reasoning}")
-                misconception = created_entry.get('has_misconception')
-                logger.info(f"   has_misconception: {misconception}")
-                primary = created_entry.get('primary_concept_ids')
-                logger.info(f"   primary_concept_ids: {primary}")
-                secondary = created_entry.get('secondary_concept_ids')
-                logger.info(f"   secondary_concept_ids: {secondary}")
-                created = created_entry.get('created_at', 'N/A')
-                logger.info(f"   created_at: {created}")
-                logger.info("=" * 80)
-
-            return result
+            return True
         except Exception as e:
             logger.error(f"Error logging question attempt: {e}")
             return None
@@ -267,14 +293,20 @@ class SupabaseRepository:
                     f"   Query: SELECT * WHERE user_id={user_id} "
                     f"AND concept_id={concept_id}"
                 )
-            res = (
-                self.client.table("user_mastery")
-                .select("*")
-                .eq("user_id", user_id)
-                .eq("concept_id", concept_id)
-                .execute()
+            # A queued, not yet written row is newer than Supabase's
+            row = self._pending_row(
+                "user_mastery", user_id=user_id, concept_id=concept_id
             )
-            current = res.data[0]["mastery"] if res.data else 50
+            if row is None:
+                res = (
+                    self.client.table("user_mastery")
+                    .select("*")
+                    .eq("user_id", user_id)
+                    .eq("concept_id", concept_id)
+                    .execute()
+                )
+                row = res.data[0] if res.data else None
+            current = row["mastery"] if row else 50
             new_mastery = max(0, min(100, current + delta))
 
             if DEBUG_MODE:
@@ -286,72 +318,28 @@ class SupabaseRepository:
                 logger.info(f"   New Mastery: {new_mastery:.2f}")
                 logger.info(f"   Clamped: {new_mastery != current + delta}")
 
-            if res.data:
-                if DEBUG_MODE:
-                    logger.info(
-                        "📝 [SUPABASE] Updating table: user_mastery"
-                    )
-                    logger.info(
-                        f"   Data: {{user_id: {user_id}, "
-                        f"concept_id: {concept_id}, "
-                        f"mastery: {new_mastery:.2f}}}"
-                    )
-                result = (
-                    self.client.table("user_mastery")
-                    .update({"mastery": new_mastery})
-                    .eq("user_id", user_id)
-                    .eq("concept_id", concept_id)
-                    .execute()
+            # One upsert on the (user_id, concept_id) unique key for new and
+            # existing rows alike: a second update made while the first
+            # row's insert is still being written cannot add a duplicate
+            entry = {
+                "user_id": user_id,
+                "concept_id": concept_id,
+                "mastery": new_mastery
+            }
+            if DEBUG_MODE:
+                logger.info(
+                    "📝 [SUPABASE] Queueing upsert into table: user_mastery"
                 )
-                if DEBUG_MODE and result.data:
-                    updated_entry = result.data[0]
-                    logger.info("   ✅ Entry updated:")
-                    m_id = updated_entry.get('mastery_id', 'N/A')
-                    logger.info(f"      mastery_id: {m_id}")
-                    logger.info(
-                        f"      user_id: {updated_entry.get('user_id')}"
-                    )
-                    logger.info(
-                        f"      concept_id: "
-                        f"{updated_entry.get('concept_id')}"
-                    )
-                    logger.info(
-                        f"      mastery: {updated_entry.get('mastery')}"
-                    )
-            else:
-                if DEBUG_MODE:
-                    logger.info(
-                        "📝 [SUPABASE] Inserting into table: user_mastery"
-                    )
-                    logger.info(
-                        f"   Data: {{user_id: {user_id}, "
-                        f"concept_id: {concept_id}, "
-                        f"mastery: {new_mastery:.2f}}}"
-                    )
-                result = (
-                    self.client.table("user_mastery")
-                    .insert({
-                        "user_id": user_id,
-                        "concept_id": concept_id,
-                        "mastery": new_mastery
-                    })
-                    .execute()
+                logger.info(
+                    f"   Data: {{user_id: {user_id}, "
+                    f"concept_id: {concept_id}, "
+                    f"mastery: {new_mastery:.2f}}}"
                 )
-                if DEBUG_MODE and result.data:
-                    created_entry = result.data[0]
-                    logger.info("   ✅ Entry created:")
-                    m_id = created_entry.get('mastery_id', 'N/A')
-                    logger.info(f"      mastery_id: {m_id}")
-                    logger.info(
-                        f"      user_id: {created_entry.get('user_id')}"
-                    )
-                    logger.info(
-                        f"      concept_id: "
-                        f"{created_entry.get('concept_id')}"
-                    )
-                    logger.info(
-                        f"      mastery: {created_entry.get('mastery')}"
-                    )
+            self._enqueue(
+                "user_mastery", entry, op="upsert",
+                key_columns=("user_id", "concept_id"),
+                on_conflict="user_id,concept_id"
+            )
             return new_mastery
         except Exception as e:
             logger.error(
@@ -363,19 +351,15 @@ class SupabaseRepository:
     def log_trend(
         self, user_id: str, concept_id: str, new_score: float
     ):
-        """Insert a mastery trend log entry."""
+        """Queue a mastery trend log entry."""
         if not self.enabled:
             return None
         try:
-            return (
-                self.client.table("user_trends")
-                .insert({
-                    "user_id": user_id,
-                    "concept_id": concept_id,
-                    "mastery": new_score
-                })
-                .execute()
-            )
+            return self._enqueue("user_trends", {
+                "user_id": user_id,
+                "concept_id": concept_id,
+                "mastery": new_score
+            })
         except Exception as e:
             logger.error(
                 f"Error logging trend for user {user_id}, "
@@ -386,13 +370,14 @@ class SupabaseRepository:
     def batch_log_trends(
         self, trends: List[Dict[str, Any]]
     ):
-        """Batch insert multiple trend entries."""
+        """Queue a batch insert of multiple trend entries."""
         if not self.enabled or not trends:
             return None
         try:
             if DEBUG_MODE:
                 logger.info(
-                    "📝 [SUPABASE] Batch inserting into table: user_trends"
+                    "📝 [SUPABASE] Queueing batch insert into table: "
+                    "user_trends"
                 )
                 logger.info(f"   Records: {len(trends)}")
                 for i, trend in enumerate(trends[:5]):  # Show first 5
@@ -409,38 +394,7 @@ class SupabaseRepository:
                     )
                 if len(trends) > 5:
                     logger.info(f"   ... and {len(trends) - 5} more records")
-            result = (
-                self.client.table("user_trends")
-                .insert(trends)
-                .execute()
-            )
-
-            if DEBUG_MODE and result.data:
-                logger.info("=" * 80)
-                count = len(result.data)
-                logger.info(
-                    f"✅ [SUPABASE] Created {count} entries in "
-                    f"user_trends:"
-                )
-                for i, entry in enumerate(result.data[:10], 1):
-                    t_id = entry.get('trend_id', 'N/A')
-                    u_id = entry.get('user_id')
-                    c_id = entry.get('concept_id')
-                    mastery = entry.get('mastery')
-                    created = entry.get('created_at', 'N/A')
-                    logger.info(
-                        f"   [{i}] trend_id: {t_id}, "
-                        f"user_id: {u_id}, "
-                        f"concept_id: {c_id}, "
-                        f"mastery: {mastery}, "
-                        f"created_at: {created}"
-                    )
-                if len(result.data) > 10:
-                    remaining = len(result.data) - 10
-                    logger.info(f"   ... and {remaining} more entries")
-                logger.info("=" * 80)
-
-            return result
+            return self._enqueue("user_trends", trends)
         except Exception as e:
             logger.error(f"Error batch logging trends: {e}")
             return None
@@ -448,13 +402,13 @@ class SupabaseRepository:
     def batch_update_weaknesses(
         self, weaknesses: List[Dict[str, Any]]
     ):
-        """Batch upsert multiple weakness entries."""
+        """Queue a batch upsert of multiple weakness entries."""
         if not self.enabled or not weaknesses:
             return None
         try:
             if DEBUG_MODE:
                 logger.info(
-                    "📝 [SUPABASE] Batch upserting into table: "
+                    "📝 [SUPABASE] Queueing batch upsert into table: "
                     "user_weaknesses"
                 )
                 logger.info(f"   Records: {len(weaknesses)}")
@@ -468,38 +422,10 @@ class SupabaseRepository:
                     logger.info(
                         f"   ... and {len(weaknesses) - 5} more records"
                     )
-            result = (
-                self.client.table("user_weaknesses")
-                .upsert(weaknesses)
-                .execute()
+            return self._enqueue(
+                "user_weaknesses", weaknesses, op="upsert",
+                key_columns=("user_id", "concept_id")
             )
-
-            if DEBUG_MODE and result.data:
-                logger.info("=" * 80)
-                count = len(result.data)
-                logger.info(
-                    f"✅ [SUPABASE] Created/Updated {count} entries in "
-                    f"user_weaknesses:"
-                )
-                for i, entry in enumerate(result.data[:10], 1):
-                    w_id = entry.get('weakness_id', 'N/A')
-                    u_id = entry.get('user_id')
-                    c_id = entry.get('concept_id')
-                    is_weak = entry.get('is_weak')
-                    updated = entry.get('updated_at', 'N/A')
-                    logger.info(
-                        f"   [{i}] weakness_id: {w_id}, "
-                        f"user_id: {u_id}, "
-                        f"concept_id: {c_id}, "
-                        f"is_weak: {is_weak}, "
-                        f"updated_at: {updated}"
-                    )
-                if len(result.data) > 10:
-                    remaining = len(result.data) - 10
-                    logger.info(f"   ... and {remaining} more entries")
-                logger.info("=" * 80)
-
-            return result
         except Exception as e:
             logger.error(f"Error batch updating weaknesses: {e}")
             return None
@@ -516,14 +442,13 @@ class SupabaseRepository:
             return None
         try:
             is_weak = new_mastery < 40 or has_misconception
-            return (
-                self.client.table("user_weaknesses")
-                .upsert({
+            return self._enqueue(
+                "user_weaknesses", {
                     "user_id": user_id,
                     "concept_id": concept_id,
                     "is_weak": is_weak
-                })
-                .execute()
+                },
+                op="upsert", key_columns=("user_id", "concept_id")
             )
         except Exception as e:
             logger.error(
@@ -752,7 +677,8 @@ class ConceptDetector:
             f'{{"primary": ["id1"], "secondary": ["id2"]}}\n'
             f"Q: {q_short}\nA: {a_short}"
         )
-        out = self.llm.invoke(prompt).content
+        with timed(LLM_CALL_SECONDS, operation="detect_concepts"):
+            out = self.llm.invoke(prompt).content
 
         try:
             data = json.loads(out)
@@ -830,7 +756,8 @@ class ReasoningClassifier:
             f'high_confusion|misconception>"}}\n'
             f"Q: {q_short}\nModel: {m_short}\nAnswer: {a_short}"
         )
-        out = self.llm.invoke(prompt).content
+        with timed(LLM_CALL_SECONDS, operation="classify_reasoning"):
+            out = self.llm.invoke(prompt).content
         try:
             category = json.loads(out)["category"]
             elapsed = time.time() - start_time
@@ -898,7 +825,8 @@ class MisconceptionDetector:
             f'{{"misconception": <true|false>}}\n'
             f"Q: {q_short}\nA: {a_short}"
         )
-        out = self.llm.invoke(prompt).content
+        with timed(LLM_CALL_SECONDS, operation="detect_misconception"):
+            out = self.llm.invoke(prompt).content
         try:
             has_misconception = bool(json.loads(out)["misconception"])
             elapsed = time.time() - start_time
@@ -1258,6 +1186,7 @@ You are ONLY grading. Do not generate a full model answer."""
                 question_id=question_id,
             )
             rag_elapsed = time.time() - rag_start
+            _observe_stage("rag", rag_elapsed)
             rag_question = bundle["question"]
             rag_model_answer = bundle["model_answer"]
             lesson_context = bundle["lesson_context"]
@@ -1483,8 +1412,10 @@ You are ONLY grading. Do not generate a full model answer."""
                 # message. ChatOpenAI.invoke() should handle
                 # [SystemMessage, HumanMessage] correctly and send both to
                 # OpenAI API
-                result = self.llm.invoke(messages)
+                with timed(LLM_CALL_SECONDS, operation="grade_answer"):
+                    result = self.llm.invoke(messages)
             except Exception as e:
+                _observe_stage("llm", time.time() - llm_start, "error")
                 if DEBUG_MODE:
                     logger.error(
                         "❌ [LLM] Error invoking LLM with messages: {}".format(
@@ -1499,6 +1430,7 @@ You are ONLY grading. Do not generate a full model answer."""
                     )
                 raise
             llm_elapsed = time.time() - llm_start
+            _observe_stage("llm", llm_elapsed)
 
             if DEBUG_MODE:
                 logger.info(f"✅ [LLM] Response received in {llm_elapsed:.2f}s")
@@ -1523,6 +1455,7 @@ You are ONLY grading. Do not generate a full model answer."""
                     required_keys = ['overall_score', 'percentage', 'grade']
                     if all(key in parsed_data for key in required_keys):
                         parse_elapsed = time.time() - parse_start
+                        _observe_stage("parse", parse_elapsed)
                         if DEBUG_MODE:
                             logger.info(
                                 f"✅ [PARSING] Direct JSON parsing successful "
@@ -1623,6 +1556,7 @@ You are ONLY grading. Do not generate a full model answer."""
                                 )
 
                         total_elapsed = time.time() - total_start
+                        _observe_stage("total", total_elapsed)
                         if DEBUG_MODE:
                             logger.info("=" * 80)
                             logger.info(
@@ -1639,6 +1573,7 @@ You are ONLY grading. Do not generate a full model answer."""
                         return grading_result
             except (json.JSONDecodeError, KeyError, ValueError) as e:
                 parse_elapsed = time.time() - parse_start
+                _observe_stage("parse", parse_elapsed, "fallback")
                 if DEBUG_MODE:
                     logger.warning(
                         f"⚠️  [PARSING] Direct JSON parsing failed in "
@@ -1698,6 +1633,7 @@ You are ONLY grading. Do not generate a full model answer."""
                         logger.info("✅ [LOGGING] Question attempt logged")
 
             total_elapsed = time.time() - total_start
+            _observe_stage("total", total_elapsed)
             if DEBUG_MODE:
                 logger.info("=" * 80)
                 logger.info(
@@ -1714,6 +1650,7 @@ You are ONLY grading. Do not generate a full model answer."""
 
         except Exception as e:
             total_elapsed = time.time() - total_start
+            _observe_stage("total", total_elapsed, "error")
             if DEBUG_MODE:
                 logger.error("=" * 80)
                 logger.error(
@@ -1940,6 +1877,7 @@ You are ONLY grading. Do not generate a full model answer."""
                     logger.warning(f"Batch weakness update failed: {e}")
 
         mastery_elapsed = time.time() - mastery_start
+        _observe_stage("mastery", mastery_elapsed)
         if DEBUG_MODE:
             logger.info("=" * 80)
             logger.info(
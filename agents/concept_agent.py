@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional
 from openai import OpenAI
 import logging
 import hashlib
+from contextlib import nullcontext
 
 # Import cache
 try:
@@ -18,6 +19,14 @@ except ImportError:
     def cache_set(key, value, ttl=3600): return False
     def _hash_string(text): return hashlib.md5(text.encode()).hexdigest()[:12]
 
+# Embedding call latency (optional)
+try:
+    from metrics import timed, LLM_CALL_SECONDS
+except ImportError:
+    LLM_CALL_SECONDS = None
+
+    def timed(metric, **labels): return nullcontext(labels)
+
 logger = logging.getLogger(__name__)
 
 
@@ -51,14 +60,18 @@ class ConceptAgent:
         Generate an embedding vector for a text string.
         Returns a list of floats compatible with Supabase pgvector.
         """
-        try:
-            resp = self._embed_client.embeddings.create(
-                model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
-                input=text
-            )
-            return resp.data[0].embedding
-        except Exception:
-            return None
+        with timed(LLM_CALL_SECONDS, operation="embedding") as call:
+            try:
+                resp = self._embed_client.embeddings.create(
+                    model=os.getenv(
+                        "EMBEDDING_MODEL", "text-embedding-3-small"
+                    ),
+                    input=text
+                )
+                return resp.data[0].embedding
+            except Exception:
+                call["status"] = "error"
+                return None
 
     def retrieve_concepts(
         self,
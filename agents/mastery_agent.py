@@ -4,16 +4,64 @@ Mastery Agent - Handles student reasoning classification and mastery updates
 """
 
 from typing import Any, Dict, List, Optional
+from contextlib import nullcontext
 from openai import OpenAI
 import logging
 import hashlib
+import threading
+import time
 
 # Import cache
 try:
-    from cache import cache_get, cache_set
+    from cache import cache_get, cache_set, bump_mastery_generation
+    from cache_keys import reasoning_classify_key
 except ImportError:
     def cache_get(key): return None
     def cache_set(key, value, ttl=3600): return False
+    def bump_mastery_generation(user_id): return None
+
+    def reasoning_classify_key(message):
+        message_hash = hashlib.md5(message.encode()).hexdigest()[:16]
+        return f"reasoning_classify:{message_hash}"
+
+# Write-behind outbox for Supabase writes (optional)
+try:
+    from outbox import get_outbox
+except ImportError:
+    get_outbox = None
+
+# Shared OpenAI circuit breaker (optional)
+try:
+    from circuit_breaker import get_breaker
+    openai_breaker = get_breaker("openai")
+except ImportError:
+    openai_breaker = None
+
+# Latency histograms for /metrics (optional)
+try:
+    from metrics import timed, LLM_CALL_SECONDS
+except ImportError:
+    LLM_CALL_SECONDS = None
+
+    def timed(metric, **labels): return nullcontext(labels)
+
+# Local reasoning classifier; the LLM is only asked when it is unsure
+# (optional)
+try:
+    from reasoning_classifier import (
+        classifier as reasoning_classifier, REASONING_LOCAL_ENABLED
+    )
+except ImportError:
+    reasoning_classifier = None
+    REASONING_LOCAL_ENABLED = False
+
+# Request deadline and adaptive timeouts (optional)
+try:
+    from deadline import timeout_for, latency as dependency_latency
+except ImportError:
+    dependency_latency = None
+
+    def timeout_for(dependency, default): return default
 
 logger = logging.getLogger(__name__)
 
@@ -40,27 +88,61 @@ class MasteryAgent:
         """
         self.api_key = api_key
         self.supabase = supabase_client
+        # Created on first use and reused for every classification
+        self._client = None
+        self._client_lock = threading.Lock()
 
     def classify_reasoning(self, message_text: str) -> str:
         """
         Classify a student's message as 'good', 'neutral', or 'confused'
         based on reasoning quality.
-        Uses direct OpenAI API with gpt-4o-mini for low-cost classification.
+
+        The local reasoning classifier labels the message in-process; the
+        LLM (gpt-4o-mini) is only asked when its confidence is low. Without
+        the local classifier every message goes to the LLM.
+        """
+        if reasoning_classifier is not None and REASONING_LOCAL_ENABLED:
+            return reasoning_classifier.classify(
+                message_text, self._llm_label
+            )
+        return self._llm_label(message_text) or "neutral"
+
+    def _openai_client(self) -> OpenAI:
+        """Shared OpenAI client for classification calls."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = OpenAI(api_key=self.api_key, timeout=15.0)
+            return self._client
+
+    def _llm_label(self, message_text: str) -> Optional[str]:
+        """
+        LLM reasoning label for a message.
         OPTIMIZED: Added caching to avoid repeated LLM calls for same message.
+
+        Returns:
+            'good', 'neutral' or 'confused', or None if the LLM could not
+            be asked (no API key, open circuit, timeout or error)
         """
         if not self.api_key:
-            return "neutral"
+            return None
 
         # Check cache first (5 minute TTL - reasoning can change over time)
-        message_hash = hashlib.md5(message_text.encode()).hexdigest()[:16]
-        cache_key = f"reasoning_classify:{message_hash}"
+        cache_key = reasoning_classify_key(message_text)
         cached = cache_get(cache_key)
         if cached is not None:
             return cached
 
+        # OpenAI is failing: skip the call instead of waiting 15s
+        if openai_breaker and not openai_breaker.allow_request():
+            return None
+
+        # Up to 15 seconds, less when the request deadline is near
+        wait = timeout_for("llm:classify_reasoning", 15)
+        if wait <= 0:
+            return None
+
         try:
-            import threading
-            client = OpenAI(api_key=self.api_key, timeout=15.0)
+            client = self._openai_client()
 
             # Add timeout protection for OpenAI API call (15 seconds)
             result_container = {
@@ -113,18 +195,25 @@ class MasteryAgent:
                         "confused"
                     )
 
-                    resp = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": system_prompt
-                            },
-                            {"role": "user", "content": message_text[:200]}
-                        ],
-                        max_tokens=10,  # Increased to allow for reasoning
-                        temperature=0
-                    )
+                    with timed(
+                        LLM_CALL_SECONDS, operation="classify_reasoning"
+                    ):
+                        resp = client.chat.completions.create(
+                            model="gpt-4o-mini",
+                            messages=[
+                                {
+                                    "role": "system",
+                                    "content": system_prompt
+                                },
+                                {
+                                    "role": "user",
+                                    "content": message_text[:200]
+                                }
+                            ],
+                            # Increased to allow for reasoning
+                            max_tokens=10,
+                            temperature=0
+                        )
                     result_container["value"] = resp
                     result_container["completed"] = True
                 except Exception as e:
@@ -134,22 +223,34 @@ class MasteryAgent:
             classify_thread = threading.Thread(
                 target=invoke_classification, daemon=True
             )
+            started = time.perf_counter()
             classify_thread.start()
-            classify_thread.join(timeout=15)
+            classify_thread.join(timeout=wait)
+            if dependency_latency is not None and (
+                not result_container["completed"]
+                or not result_container["error"]
+            ):
+                dependency_latency.observe(
+                    "llm:classify_reasoning", time.perf_counter() - started
+                )
 
             if not result_container["completed"]:
-                logger.warning(
-                    "Reasoning classification timed out, using 'neutral'"
-                )
-                return "neutral"
+                if openai_breaker:
+                    openai_breaker.record_failure()
+                logger.warning("Reasoning classification timed out")
+                return None
 
             if result_container["error"]:
+                if openai_breaker:
+                    openai_breaker.record_failure()
                 logger.warning(
                     f"Reasoning classification error: "
-                    f"{result_container['error']}, using 'neutral'"
+                    f"{result_container['error']}"
                 )
-                return "neutral"
+                return None
 
+            if openai_breaker:
+                openai_breaker.record_success()
             resp = result_container["value"]
             label = resp.choices[0].message.content.strip().lower()
             if label not in ["good", "neutral", "confused"]:
@@ -161,7 +262,7 @@ class MasteryAgent:
 
         except Exception as e:
             logger.warning(f"Reasoning classification failed: {e}")
-            return "neutral"
+            return None
 
     def label_to_delta(self, label: str) -> int:
         """
@@ -196,7 +297,7 @@ class MasteryAgent:
         1. Fetch existing mastery rows for these concept IDs.
         2. If no row exists → assume baseline mastery = 50.
         3. Apply delta and clamp between 0–100.
-        4. Write updated mastery to Supabase.
+        4. Queue updated mastery for Supabase (via the outbox).
         5. For negative updates, create/update weakness entries.
         6. Update trends lightly (increase or decrease trend_score).
         """
@@ -261,6 +362,17 @@ class MasteryAgent:
         except Exception:
             existing = {}
 
+        # Mastery queued in the outbox but not written yet is newer than
+        # what Supabase returned
+        if get_outbox is not None:
+            outbox = get_outbox()
+            for cid in concept_ids:
+                pending = outbox.pending_row(
+                    "student_mastery", user_id=user_id, concept_id=cid
+                )
+                if pending is not None:
+                    existing[cid] = pending
+
         rows_to_upsert = []
         weakness_rows = []
         trend_rows = []
@@ -299,45 +411,53 @@ class MasteryAgent:
                 "trend_score": delta  # simple additive trend
             })
 
-        # Write mastery rows with timeout protection
-        try:
-            def upsert_mastery_func():
-                return (
-                    self.supabase.table("student_mastery")
-                    .upsert(rows_to_upsert)
-                    .execute()
-                )
-            safe_supabase_query(
-                upsert_mastery_func, timeout=5, default_return=None
+        # Queue the writes; readiness cached before the mastery rows land
+        # is invalidated once they do
+        self._write(
+            "student_mastery", rows_to_upsert, op="upsert",
+            key_columns=("user_id", "concept_id"),
+            on_written=lambda: bump_mastery_generation(user_id)
+        )
+        if weakness_rows:
+            self._write(
+                "student_weaknesses", weakness_rows, op="upsert",
+                key_columns=("user_id", "concept_id")
             )
-        except Exception:
-            pass
+        self._write(
+            "student_trends", trend_rows, op="upsert",
+            key_columns=("user_id", "concept_id")
+        )
 
-        # Insert weakness rows with timeout protection
-        if len(weakness_rows) > 0:
-            try:
-                def insert_weakness_func():
-                    return (
-                        self.supabase.table("student_weaknesses")
-                        .insert(weakness_rows)
-                        .execute()
-                    )
-                safe_supabase_query(
-                    insert_weakness_func, timeout=5, default_return=None
-                )
-            except Exception:
-                pass
+    def _write(
+        self,
+        table: str,
+        rows: List[Dict],
+        op: str = "insert",
+        key_columns=None,
+        on_written=None
+    ) -> None:
+        """
+        Write rows through the outbox, or directly if it is unavailable.
 
-        # Update trends with timeout protection
-        try:
-            def upsert_trends_func():
-                return (
-                    self.supabase.table("student_trends")
-                    .upsert(trend_rows)
-                    .execute()
-                )
-            safe_supabase_query(
-                upsert_trends_func, timeout=5, default_return=None
+        Args:
+            table: Table name
+            rows: Rows to insert or upsert
+            op: "insert" or "upsert"
+            key_columns: Columns identifying a row (see Outbox.enqueue)
+            on_written: Called once the rows are written
+        """
+        if get_outbox is not None:
+            get_outbox().enqueue(
+                table, rows, op=op, key_columns=key_columns,
+                on_written=on_written
             )
-        except Exception:
-            pass
+            return
+        try:
+            query = self.supabase.table(table)
+            query = query.upsert(rows) if op == "upsert" else \
+                query.insert(rows)
+            query.execute()
+        except Exception as e:
+            logger.warning(f"[WARNING] {table} write failed: {e}")
+        if on_written is not None:
+            on_written()
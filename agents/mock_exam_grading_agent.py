@@ -18,6 +18,7 @@ from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from pydantic import BaseModel, Field, field_validator, model_validator
 import logging
 from collections import defaultdict
+from contextlib import nullcontext
 from functools import wraps
 
 # LangGraph imports
@@ -31,9 +32,9 @@ except ImportError:
 
 # FastAPI imports
 try:
-    from fastapi import FastAPI, HTTPException, Request, Depends
+    from fastapi import FastAPI, Header, HTTPException, Request, Depends
     from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.responses import JSONResponse
+    from fastapi.responses import JSONResponse, Response
     FASTAPI_AVAILABLE = True
 except ImportError:
     FASTAPI_AVAILABLE = False
@@ -41,6 +42,34 @@ except ImportError:
     Depends = None
     JSONResponse = None
 
+# Cache invalidation for readiness (optional)
+try:
+    from cache import bump_mastery_generation
+except ImportError:
+    def bump_mastery_generation(user_id): return None
+
+# Duplicate job submissions share one job (optional)
+try:
+    from idempotency import store as idempotency_store, IdempotencyConflict
+    IDEMPOTENCY_AVAILABLE = True
+except ImportError:
+    IDEMPOTENCY_AVAILABLE = False
+
+# Prometheus metrics registry (optional)
+try:
+    from metrics import (
+        timed, render_metrics, wants_prometheus, PROMETHEUS_CONTENT_TYPE,
+        GRADING_STAGE_SECONDS, LLM_CALL_SECONDS, SUPABASE_CALL_SECONDS,
+        MOCK_EXAM_EVENTS
+    )
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+    GRADING_STAGE_SECONDS = LLM_CALL_SECONDS = None
+    SUPABASE_CALL_SECONDS = MOCK_EXAM_EVENTS = None
+
+    def timed(metric, **labels): return nullcontext(labels)
+
 # Load environment variables
 load_dotenv("config.env")
 
@@ -65,11 +94,13 @@ _metrics = {
 
 
 def log_metric(metric_name: str, value: int = 1):
-    """Log a metric."""
+    """Log a metric (also counted as mock_exam_events_total)."""
     if metric_name in _metrics:
         _metrics[metric_name] += value
     else:
         _metrics[metric_name] = value
+    if MOCK_EXAM_EVENTS is not None:
+        MOCK_EXAM_EVENTS.inc(value, event=metric_name)
 
 
 def get_metrics() -> Dict:
@@ -90,7 +121,10 @@ def retry_supabase_operation(
             last_exception = None
             for attempt in range(max_retries):
                 try:
-                    return await func(*args, **kwargs)
+                    with timed(
+                        SUPABASE_CALL_SECONDS, operation=func.__name__
+                    ):
+                        return await func(*args, **kwargs)
                 except Exception as e:
                     last_exception = e
                     if attempt < max_retries - 1:
@@ -115,7 +149,10 @@ def retry_supabase_operation(
             last_exception = None
             for attempt in range(max_retries):
                 try:
-                    return func(*args, **kwargs)
+                    with timed(
+                        SUPABASE_CALL_SECONDS, operation=func.__name__
+                    ):
+                        return func(*args, **kwargs)
                 except Exception as e:
                     last_exception = e
                     if attempt < max_retries - 1:
@@ -271,7 +308,8 @@ class MockExamGradingAgent:
 
         try:
             # Generate embedding for question
-            embedding = self.embeddings.embed_query(question_text)
+            with timed(LLM_CALL_SECONDS, operation="embedding"):
+                embedding = self.embeddings.embed_query(question_text)
 
             # Use Supabase RPC for pgvector similarity search
             # Uses concept_embeddings table (correct source of vectors)
@@ -421,6 +459,9 @@ class MockExamGradingAgent:
                     .execute()
                 )
 
+            # Invalidate cached readiness for this user
+            bump_mastery_generation(user_id)
+
             logger.debug(
                 f"Mastery updated: user={user_id}, concept={concept_id}, "
                 f"old={current_mastery:.2f}, new={new_mastery:.2f}"
@@ -669,7 +710,8 @@ Return your response in this JSON format:
 }}
 """
 
-            response = self.llm.invoke(grading_prompt)
+            with timed(LLM_CALL_SECONDS, operation="mock_exam_grade"):
+                response = self.llm.invoke(grading_prompt)
 
             # Parse the response
             try:
@@ -939,6 +981,17 @@ def set_agent_instance(agent: MockExamGradingAgent):
     _agent_instance = agent
 
 
+def _timed_stage(node):
+    """Record a graph node's duration in grading_stage_duration_seconds."""
+    @wraps(node)
+    def wrapper(state: MockExamState) -> Dict:
+        with timed(
+            GRADING_STAGE_SECONDS, pipeline="mock_exam", stage=node.__name__
+        ):
+            return node(state)
+    return wrapper
+
+
 def load_exam(state: MockExamState) -> Dict:
     """Node: Load and validate exam data."""
     request_id = state.get("request_id", "unknown")
@@ -1511,13 +1564,14 @@ async def run_mock_exam_graph(
 
     # Build graph
     graph = StateGraph(MockExamState)
-    graph.add_node("load_exam", load_exam)
-    graph.add_node("grade_questions", grade_questions)
-    graph.add_node("aggregate_results", aggregate_results)
+    graph.add_node("load_exam", _timed_stage(load_exam))
+    graph.add_node("grade_questions", _timed_stage(grade_questions))
+    graph.add_node("aggregate_results", _timed_stage(aggregate_results))
     graph.add_node(
-        "compute_mastery_and_readiness", compute_mastery_and_readiness
+        "compute_mastery_and_readiness",
+        _timed_stage(compute_mastery_and_readiness)
     )
-    graph.add_node("persist_results", persist_results)
+    graph.add_node("persist_results", _timed_stage(persist_results))
 
     graph.set_entry_point("load_exam")
     graph.add_edge("load_exam", "grade_questions")
@@ -1693,6 +1747,7 @@ if FASTAPI_AVAILABLE:
     async def rate_limit_middleware(request: Request, call_next):
         """Simple rate limiting based on IP address."""
         if request.url.path.startswith("/health") or \
+           request.url.path.startswith("/metrics") or \
            request.url.path.startswith("/docs") or \
            request.url.path.startswith("/redoc") or \
            request.url.path.startswith("/openapi.json"):
@@ -1964,16 +2019,39 @@ if FASTAPI_AVAILABLE:
         },
     )
     async def start_mock_exam(
-        request: MockStartRequest, http_request: Request
+        request: MockStartRequest,
+        http_request: Request,
+        idempotency_key: Optional[str] = Header(None)
     ):
         """
         Start a mock exam grading job.
 
         The grading process runs asynchronously. Use the returned job_id
         to check status via GET /api/v1/mock/status/{job_id}.
+        Resubmitting the same exam (same Idempotency-Key header, or the
+        same user and answers within a few seconds) returns the existing
+        job instead of grading it again.
         """
         request_id = http_request.state.request_id
 
+        async def create():
+            return create_job(request, request_id).model_dump()
+
+        if not IDEMPOTENCY_AVAILABLE:
+            return await create()
+        try:
+            # Jobs live in this worker's JOB_STORE, so only replay here
+            return await idempotency_store.run(
+                "mock_start", request.user_id, request.model_dump(),
+                create, header_key=idempotency_key, shared=False
+            )
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    def create_job(
+        request: MockStartRequest, request_id: str
+    ) -> MockStartResponse:
+        """Create a pending job and start grading it in the background."""
         try:
             job_id = str(uuid4())
             JOB_STORE[job_id] = {
@@ -2104,10 +2182,21 @@ if FASTAPI_AVAILABLE:
     @app.get(
         "/metrics",
         summary="Service Metrics",
-        description="Get service metrics and statistics.",
+        description=(
+            "Get service metrics and statistics. Returns Prometheus text "
+            "for ?format=prometheus or a Prometheus Accept header."
+        ),
     )
-    async def get_service_metrics():
+    async def get_service_metrics(
+        request: Request, format: Optional[str] = None
+    ):
         """Get service metrics."""
+        if METRICS_AVAILABLE and wants_prometheus(
+            request.headers.get("accept"), format
+        ):
+            return Response(
+                render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE
+            )
         return {
             "metrics": get_metrics(),
             "job_store_size": len(JOB_STORE),
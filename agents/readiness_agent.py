@@ -10,12 +10,18 @@ import random
 
 # Import cache
 try:
-    from cache import cache_get, cache_set, _hash_string
+    from cache import cache_get, cache_set, get_mastery_generation
+    from cache_keys import readiness_key
 except ImportError:
     # Fallback if cache not available
     def cache_get(key): return None
     def cache_set(key, value, ttl=3600): return False
-    def _hash_string(text): return hashlib.md5(text.encode()).hexdigest()[:12]
+    def get_mastery_generation(user_id): return 0
+
+    def readiness_key(user_id, concept_ids, generation=0):
+        ids = ":".join(sorted({str(cid) for cid in concept_ids}))
+        ids_hash = hashlib.md5(ids.encode()).hexdigest()[:12]
+        return f"readiness:{user_id}:g{generation}:{ids_hash}"
 
 logger = logging.getLogger(__name__)
 
@@ -89,15 +95,14 @@ class ReadinessAgent:
                 "min_mastery": None
             }
 
-        # Check cache first (optimized caching)
-        concept_ids_sorted = sorted(concept_ids)
-        concept_ids_hash = _hash_string(":".join(concept_ids_sorted))
-        cache_key = f"readiness:{user_id}:{concept_ids_hash}"
+        # Check cache first. The key embeds the user's mastery generation,
+        # so any mastery write invalidates it without guessing keys.
+        cache_key = readiness_key(
+            user_id, concept_ids, get_mastery_generation(user_id)
+        )
         cached = cache_get(cache_key)
         if cached is not None:
-            logger.info(
-                f"Cache hit for readiness:{user_id}:{concept_ids_hash}"
-            )
+            logger.info(f"Cache hit for {cache_key}")
             return cached
 
         # Fetch mastery rows for these concept IDs
@@ -7,10 +7,14 @@ Wraps ConceptAgent internally.
 import hashlib
 import logging
 import os
+import random
 from typing import Optional, List, Dict
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on concepts loaded per topic when caching the full pool
+TOPIC_CONCEPT_POOL_LIMIT = 200
+
 
 class ConceptService:
     """
@@ -18,7 +22,10 @@ class ConceptService:
     Wraps ConceptAgent internally.
     """
 
-    def __init__(self, concept_agent, cache_get=None, cache_set=None):
+    def __init__(
+        self, concept_agent, cache_get=None, cache_set=None,
+        cache_get_or_load=None
+    ):
         """
         Initialize ConceptService.
 
@@ -26,10 +33,12 @@ class ConceptService:
             concept_agent: ConceptAgent instance to wrap
             cache_get: Optional cache get function
             cache_set: Optional cache set function
+            cache_get_or_load: Optional single-flight cache loader function
         """
         self.concept_agent = concept_agent
         self.cache_get = cache_get
         self.cache_set = cache_set
+        self.cache_get_or_load = cache_get_or_load
         self.logger = logging.getLogger(__name__)
 
     def generate_embedding(self, text: str) -> Optional[List[float]]:
@@ -73,18 +82,30 @@ class ConceptService:
         if not self.concept_agent:
             return []
 
+        message_hash = hashlib.md5(
+            message_text.encode()
+        ).hexdigest()[:8]
+        subject_key = subject_id or "all"
+        topic_key = topic_id or "all"
+        similarity_key = f"{min_similarity}" if min_similarity else "none"
+        cache_key = (
+            f"concept_rag:{subject_key}:{topic_key}:"
+            f"{similarity_key}:{k}:{message_hash}"
+        )
+
+        def load():
+            return self.concept_agent.retrieve_concepts(
+                message_text, subject_id, topic_id, k, min_similarity
+            )
+
+        # Single-flight load; empty results are cached briefly too
+        if self.cache_get_or_load:
+            return self.cache_get_or_load(
+                cache_key, load, ttl=60, negative_ttl=30
+            )
+
         # Check cache first
         if self.cache_get:
-            message_hash = hashlib.md5(
-                message_text.encode()
-            ).hexdigest()[:8]
-            subject_key = subject_id or "all"
-            topic_key = topic_id or "all"
-            similarity_key = f"{min_similarity}" if min_similarity else "none"
-            cache_key = (
-                f"concept_rag:{subject_key}:{topic_key}:"
-                f"{similarity_key}:{k}:{message_hash}"
-            )
             cached = self.cache_get(cache_key)
             if cached is not None:
                 if os.getenv("DEBUG", "0") == "1":
@@ -92,22 +113,10 @@ class ConceptService:
                 return cached
 
         # Fetch from ConceptAgent
-        concepts = self.concept_agent.retrieve_concepts(
-            message_text, subject_id, topic_id, k, min_similarity
-        )
+        concepts = load()
 
         # Cache the result (60 seconds TTL for RAG)
         if self.cache_set and concepts:
-            message_hash = hashlib.md5(
-                message_text.encode()
-            ).hexdigest()[:8]
-            subject_key = subject_id or "all"
-            topic_key = topic_id or "all"
-            similarity_key = f"{min_similarity}" if min_similarity else "none"
-            cache_key = (
-                f"concept_rag:{subject_key}:{topic_key}:"
-                f"{similarity_key}:{k}:{message_hash}"
-            )
             self.cache_set(cache_key, concepts, ttl=60)
 
         return concepts
@@ -162,10 +171,27 @@ class ConceptService:
         if not self.concept_agent:
             return []
 
-        # Delegate to ConceptAgent
-        return self.concept_agent.fetch_concepts_by_topic(
-            topic_id, limit, random_order
-        )
+        if not self.cache_get_or_load:
+            # Delegate to ConceptAgent
+            return self.concept_agent.fetch_concepts_by_topic(
+                topic_id, limit, random_order
+            )
+
+        # Cache the whole ordered pool once per topic and sample from it
+        # locally, so random_order requests are served from cache too.
+        # Topics with no concepts are cached as empty for a short time.
+        pool = self.cache_get_or_load(
+            f"topic_concepts:{topic_id}",
+            lambda: self.concept_agent.fetch_concepts_by_topic(
+                topic_id, TOPIC_CONCEPT_POOL_LIMIT, False
+            ),
+            ttl=3600,
+            negative_ttl=60
+        ) or []
+
+        if random_order:
+            return random.sample(pool, min(limit, len(pool)))
+        return pool[:limit]
 
     def fetch_concept_details(
         self, concept_ids: List[str]
@@ -18,7 +18,8 @@ class LessonService:
     """
 
     def __init__(
-        self, supabase_client, concept_agent, cache_get=None, cache_set=None
+        self, supabase_client, concept_agent, cache_get=None, cache_set=None,
+        cache_get_or_load=None
     ):
         """
         Initialize LessonService.
@@ -28,11 +29,13 @@ class LessonService:
             concept_agent: ConceptAgent instance for embedding generation
             cache_get: Optional cache get function
             cache_set: Optional cache set function
+            cache_get_or_load: Optional single-flight cache loader function
         """
         self.supabase = supabase_client
         self.concept_agent = concept_agent
         self.cache_get = cache_get
         self.cache_set = cache_set
+        self.cache_get_or_load = cache_get_or_load
         self.logger = logging.getLogger(__name__)
 
     def get_lesson_id_from_topic(self, topic_id: str) -> str:
@@ -99,7 +102,8 @@ class LessonService:
     def fetch_lesson_content(self, topic_id: str) -> Optional[str]:
         """
         Fetch full lesson content for a given topic_id.
-        Uses caching (1 day TTL).
+        Uses caching (5 minute TTL). When a single-flight loader is
+        available, concurrent misses for the same topic share one query.
 
         Args:
             topic_id: Topic ID to fetch lessons for
@@ -107,112 +111,151 @@ class LessonService:
         Returns:
             Concatenated lesson content or None
         """
+        cache_key = f"lesson_text:{topic_id}"
+
+        if self.cache_get_or_load:
+            try:
+                return self.cache_get_or_load(
+                    cache_key,
+                    lambda: self._load_lesson_content(topic_id),
+                    ttl=300
+                )
+            except Exception as e:
+                self.logger.error(f"Error fetching lesson content: {e}")
+                return None
+
         # Check cache first
         if self.cache_get:
-            cache_key = f"lesson_text:{topic_id}"
             cached = self.cache_get(cache_key)
             if cached is not None:
                 if os.getenv("DEBUG", "0") == "1":
                     self.logger.info(f"Cache hit for lesson_text:{topic_id}")
                 return cached
 
+        try:
+            lesson_text = self._load_lesson_content(topic_id)
+        except Exception as e:
+            self.logger.error(f"Error fetching lesson content: {e}")
+            return None
+
+        # Cache for 300 seconds (5 minutes)
+        if self.cache_set and lesson_text is not None:
+            self.cache_set(cache_key, lesson_text, ttl=300)
+
+        return lesson_text
+
+    def load_lesson_content(self, topic_id: str) -> Optional[str]:
+        """
+        Fetch lesson content without caching, for callers that cache it
+        themselves (topic bundles).
+
+        Args:
+            topic_id: Topic ID to fetch lessons for
+
+        Returns:
+            Concatenated lesson content or None
+
+        Raises:
+            TimeoutError: If the query timed out or failed
+        """
+        return self._load_lesson_content(topic_id)
+
+    def _load_lesson_content(self, topic_id: str) -> Optional[str]:
+        """
+        Query Supabase for the lesson content of a topic (no caching).
+
+        Raises:
+            TimeoutError: If the query timed out or failed, so that the
+                failure is not cached
+        """
         if not self.supabase:
             return None
 
+        # Import timeout wrapper (with fallback if not available)
         try:
-            # Import timeout wrapper (with fallback if not available)
-            try:
-                from langgraph_tutor import safe_supabase_query
-            except ImportError:
-                # Fallback: define inline if import fails
-                import threading
-
-                def safe_supabase_query(
-                    query_func, timeout=10, default_return=None
-                ):
-                    if timeout <= 0:
-                        try:
-                            return query_func()
-                        except Exception:
-                            return default_return
-
-                    result_container = {
-                        "value": None,
-                        "error": None,
-                        "completed": False
-                    }
-
-                    def execute_query():
-                        try:
-                            result_container["value"] = query_func()
-                            result_container["completed"] = True
-                        except Exception as e:
-                            result_container["error"] = e
-                            result_container["completed"] = True
-
-                    query_thread = threading.Thread(
-                        target=execute_query, daemon=True
-                    )
-                    query_thread.start()
-                    query_thread.join(timeout=timeout)
-                    if (not result_container["completed"] or
-                            result_container["error"]):
-                        return default_return
-                    return result_container["value"]
-
-            # Wrap query with timeout (10 seconds)
-            def query_func():
-                return (
-                    self.supabase.table("lessons")
-                    .select("content")
-                    .eq("topic_id", topic_id)
-                    .execute()
-                )
+            from langgraph_tutor import safe_supabase_query
+        except ImportError:
+            # Fallback: define inline if import fails
+            import threading
 
-            res = safe_supabase_query(
+            def safe_supabase_query(
                 query_func, timeout=10, default_return=None
-            )
+            ):
+                if timeout <= 0:
+                    try:
+                        return query_func()
+                    except Exception:
+                        return default_return
 
-            if res is None:
-                self.logger.error(
-                    f"[LESSON FETCH] Query timeout or error for "
-                    f"topic_id: {topic_id}"
-                )
-                self.logger.error(
-                    "[LESSON FETCH] Supabase client status: "
-                    f"{'Connected' if self.supabase else 'Not connected'}"
-                )
+                result_container = {
+                    "value": None,
+                    "error": None,
+                    "completed": False
+                }
 
-                return None
+                def execute_query():
+                    try:
+                        result_container["value"] = query_func()
+                        result_container["completed"] = True
+                    except Exception as e:
+                        result_container["error"] = e
+                        result_container["completed"] = True
 
-            rows = res.data or []
+                query_thread = threading.Thread(
+                    target=execute_query, daemon=True
+                )
+                query_thread.start()
+                query_thread.join(timeout=timeout)
+                if (not result_container["completed"] or
+                        result_container["error"]):
+                    return default_return
+                return result_container["value"]
+
+        # Wrap query with timeout (10 seconds)
+        def query_func():
+            return (
+                self.supabase.table("lessons")
+                .select("content")
+                .eq("topic_id", topic_id)
+                .execute()
+            )
 
-            contents = [
-                row.get("content", "")
-                for row in rows
-                if row.get("content")
-            ]
+        res = safe_supabase_query(
+            query_func, timeout=10, default_return=None
+        )
 
-            lesson_text = (
-                "\n\n".join(contents)
-                if contents else "No lesson content available."
+        if res is None:
+            self.logger.error(
+                f"[LESSON FETCH] Query timeout or error for "
+                f"topic_id: {topic_id}"
+            )
+            self.logger.error(
+                "[LESSON FETCH] Supabase client status: "
+                f"{'Connected' if self.supabase else 'Not connected'}"
+            )
+            raise TimeoutError(
+                f"Lesson query failed for topic_id: {topic_id}"
             )
 
-            # Cache for 300 seconds (5 minutes)
-            if self.cache_set:
-                cache_key = f"lesson_text:{topic_id}"
-                self.cache_set(cache_key, lesson_text, ttl=300)
+        rows = res.data or []
 
-            if os.getenv("DEBUG", "0") == "1":
-                self.logger.info(
-                    f"Fetched lesson content for topic_id: {topic_id} "
-                    f"({len(rows)} lesson(s))"
-                )
-            return lesson_text
+        contents = [
+            row.get("content", "")
+            for row in rows
+            if row.get("content")
+        ]
 
-        except Exception as e:
-            self.logger.error(f"Error fetching lesson content: {e}")
-            return None
+        lesson_text = (
+            "\n\n".join(contents)
+            if contents else "No lesson content available."
+        )
+
+        if os.getenv("DEBUG", "0") == "1":
+            self.logger.info(
+                f"Fetched lesson content for topic_id: {topic_id} "
+                f"({len(rows)} lesson(s))"
+            )
+        return lesson_text
 
     def generate_lesson_embeddings(
         self, lesson_id: str, lesson_content: str
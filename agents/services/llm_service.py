@@ -6,10 +6,269 @@ LLM Service - Handles Large Language Model operations
 import json
 import logging
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Iterator, List, Optional
+
+# Shared OpenAI circuit breaker (optional)
+try:
+    from circuit_breaker import get_breaker
+    openai_breaker = get_breaker("openai")
+except ImportError:
+    openai_breaker = None
+
+# Tokenizer-based counts (optional)
+try:
+    from token_budget import count_tokens
+except ImportError:
+    def count_tokens(text: str) -> int:
+        return len(text) // 4 if text else 0
+
+# LLM call latency and token counters (optional)
+try:
+    from metrics import LLM_CALL_SECONDS, LLM_TOKENS
+except ImportError:
+    LLM_CALL_SECONDS = LLM_TOKENS = None
+
+# Request deadline and adaptive timeouts (optional)
+try:
+    from deadline import timeout_for, latency as dependency_latency
+except ImportError:
+    dependency_latency = None
+
+    def timeout_for(dependency, default): return default
 
 logger = logging.getLogger(__name__)
 
+# Reply prompt layout. The system message is identical for every request
+# and the per-request sections follow in one user message, ordered from
+# most to least shared (topic lesson, passages, concepts, conversation,
+# question), so OpenAI's automatic prompt caching can reuse the longest
+# possible prefix: the instructions for every reply, plus the lesson for
+# every student of the same topic. Keep anything request-specific out of
+# REPLY_SYSTEM_PROMPT.
+REPLY_SYSTEM_PROMPT = """\
+You are an expert Business Studies AI tutor helping a student learn \
+Business Studies concepts.
+
+CRITICAL RESTRICTION: You MUST ONLY answer questions about Business \
+Studies topics. This includes:
+- Business organizations (sole traders, partnerships, etc.)
+- Business finance and accounting
+- Marketing and market research
+- Human resources and management
+- Operations and production
+- Business strategy and planning
+- Economics and business environment
+- Business ethics and social responsibility
+- International business
+- Entrepreneurship
+
+If the student asks about topics OUTSIDE of Business Studies (e.g., \
+mathematics, science, history, literature, programming, etc.), you MUST \
+politely decline and redirect them to Business Studies topics.
+
+The user message gives the topic, the lesson content, the most relevant \
+lesson passages, key concepts, the recent conversation, the student's \
+question, the requested explanation style and the student's learning \
+level.
+
+EXPLANATION FORMAT (style requested by the student):
+- If "simple": Give a very short, beginner-friendly explanation.
+- If "detailed": Give a long, deep explanation with layered reasoning.
+- If "steps": Break the solution into clear numbered steps.
+- If "table": Present the core explanation using a clean Markdown table.
+- If "diagram": Provide an ASCII diagram or conceptual sketch.
+- If "comparison": Present a comparison chart of key differences.
+- If "visual_prompt": Instead of explaining, output a prompt suitable for \
+an image generation model (no more than 2-3 sentences).
+- If "default": Use your best judgment.
+Make sure the format is consistent with the requested style.
+
+YOUR TASK:
+1. FIRST: Check if the question is about Business Studies. If not, \
+politely decline and suggest asking about Business Studies topics instead.
+2. Answer clearly and accurately using Business Studies terminology and \
+concepts.
+3. Use the lesson content and related concepts when relevant.
+4. Match the student's learning level.
+5. Provide examples where useful.
+6. Encourage the student to ask follow-up questions about Business \
+Studies.
+"""
+
+REASONING_LABELS = ("good", "neutral", "confused")
+
+# System prompt for replies that also label the student's reasoning in
+# the same call (generate_labelled_reply); static like REPLY_SYSTEM_PROMPT
+LABELLED_REPLY_SYSTEM_PROMPT = REPLY_SYSTEM_PROMPT + """
+REASONING LABEL:
+Also classify the student's latest message as exactly one of:
+- "good": shows clear understanding, correct reasoning or terminology, \
+makes accurate comparisons or asks an analytical or evaluative question.
+- "neutral": a standard or basic question, a simple factual statement or \
+a request for clarification, with no misunderstanding or deeper insight.
+- "confused": shows a misunderstanding, wrong definitions, incorrect \
+reasoning, contradictions or mixes up unrelated concepts.
+Put your reply to the student in "reply" and the label in \
+"reasoning_label".
+"""
+
+# Structured output of generate_labelled_reply (OpenAI json_schema)
+LABELLED_REPLY_SCHEMA = {
+    "title": "TutorReply",
+    "description": "Tutor reply and the student's reasoning label",
+    "type": "object",
+    "properties": {
+        "reply": {"type": "string"},
+        "reasoning_label": {
+            "type": "string", "enum": list(REASONING_LABELS)
+        },
+    },
+    "required": ["reply", "reasoning_label"],
+    "additionalProperties": False,
+}
+
+REPLY_CONTEXT_TEMPLATE = """\
+TOPIC: {topic}
+
+================================
+LESSON CONTENT
+================================
+{lesson_content}
+
+================================
+MOST RELEVANT LESSON PASSAGES
+================================
+{lesson_passages}
+
+================================
+KEY CONCEPTS
+================================
+{concepts}
+
+================================
+RECENT CONVERSATION
+================================
+{history}
+
+================================
+STUDENT QUESTION
+================================
+{message}
+
+EXPLANATION STYLE: {explanation_style}
+LEARNING LEVEL: {learning_level}
+"""
+
+LESSON_SYSTEM_PROMPT = """\
+Create a comprehensive lesson on the topic with the learning objectives \
+and difficulty level given by the user.
+
+Provide:
+1. Lesson content (detailed explanation)
+2. Key points (bullet points)
+3. Practice questions (3-5 questions)
+4. Estimated duration in minutes
+
+Format as JSON:
+{
+    "lesson_content": "...",
+    "key_points": ["...", "..."],
+    "practice_questions": ["...", "..."],
+    "estimated_duration": 30
+}
+"""
+
+LESSON_REQUEST_TEMPLATE = """\
+Topic: {topic}
+Learning objectives: {learning_objectives}
+Difficulty level: {difficulty_level}
+"""
+
+
+def _no_usage() -> Dict:
+    """token_usage for a reply that made no LLM call."""
+    return {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "cached_tokens": 0
+    }
+
+
+def token_usage_from(message) -> Dict:
+    """
+    token_usage of a LangChain AI message or the last stream chunk.
+
+    Args:
+        message: AIMessage / AIMessageChunk
+
+    Returns:
+        Dict with prompt_tokens, completion_tokens, total_tokens and
+        cached_tokens (prompt tokens served from OpenAI's prompt cache)
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if isinstance(usage, dict) and usage:
+        details = usage.get("input_token_details") or {}
+        return {
+            "prompt_tokens": usage.get("input_tokens", 0),
+            "completion_tokens": usage.get("output_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "cached_tokens": details.get("cache_read") or 0
+        }
+    metadata = getattr(message, "response_metadata", None)
+    if isinstance(metadata, dict) and metadata.get("token_usage"):
+        usage = metadata["token_usage"]
+        details = usage.get("prompt_tokens_details") or {}
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "cached_tokens": details.get("cached_tokens") or 0
+        }
+    return _no_usage()
+
+
+def _record_usage(operation: str, usage: Dict):
+    """Add a call's token_usage to llm_tokens_total."""
+    if LLM_TOKENS is None:
+        return
+    cached = usage.get("cached_tokens", 0)
+    LLM_TOKENS.inc(
+        usage.get("prompt_tokens", 0) - cached,
+        operation=operation, kind="prompt"
+    )
+    LLM_TOKENS.inc(cached, operation=operation, kind="cached_prompt")
+    LLM_TOKENS.inc(
+        usage.get("completion_tokens", 0),
+        operation=operation, kind="completion"
+    )
+
+
+def _parse_labelled_reply(result: Dict) -> Dict:
+    """
+    Reply fields of a with_structured_output(include_raw=True) result.
+
+    Falls back to decoding the raw message when LangChain could not
+    parse it.
+
+    Raises:
+        ValueError: No reply text in the result
+    """
+    parsed = result.get("parsed")
+    if not isinstance(parsed, dict):
+        raw = getattr(result.get("raw"), "content", "") or ""
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            parsed = None
+    if not isinstance(parsed, dict) or not parsed.get("reply"):
+        raise ValueError(
+            f"Structured reply had no reply text: "
+            f"{result.get('parsing_error')}"
+        )
+    return parsed
+
 
 class LLMService:
     """
@@ -27,6 +286,8 @@ class LLMService:
         self.llm = llm
         self.langchain_available = langchain_available
         self.logger = logging.getLogger(__name__)
+        # Structured-output runnable, built on first labelled reply
+        self._labelled_llm = None
         # Initialize OpenAI client for direct API calls (e.g., summarization)
         try:
             import os
@@ -73,10 +334,14 @@ class LLMService:
                 token_usage_dict: {
                     "prompt_tokens": int,
                     "completion_tokens": int,
-                    "total_tokens": int
+                    "total_tokens": int,
+                    "cached_tokens": int  # prompt tokens from the cache
                 }
         """
         if self.langchain_available and self.llm:
+            if openai_breaker and not openai_breaker.allow_request():
+                # OpenAI is failing: answer immediately with the safe reply
+                return (self.fallback_reply(message, topic), _no_usage())
             try:
                 return self._generate_with_langchain(
                     message,
@@ -94,20 +359,12 @@ class LLMService:
                 fallback_response = self._generate_fallback_response(
                     message, topic
                 )
-                return (fallback_response, {
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0
-                })
+                return (fallback_response, _no_usage())
         else:
             fallback_response = self._generate_fallback_response(
                 message, topic
             )
-            return (fallback_response, {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0
-            })
+            return (fallback_response, _no_usage())
 
     def _generate_with_langchain(
         self,
@@ -123,163 +380,283 @@ class LLMService:
         student_profile: Optional[Dict] = None
     ) -> str:
         """Generate response using LangChain and gpt-4o-mini"""
+        messages = self._build_reply_messages(
+            message,
+            topic,
+            learning_level,
+            conversation_history,
+            lesson_content,
+            concept_rows,
+            explanation_style,
+            lesson_chunks,
+            condensed_history,
+            student_profile
+        )
 
-        # Use condensed history if provided, otherwise build from full history
-        if condensed_history:
-            history_text = condensed_history
-        else:
-            # Build history text from full conversation
-            history_text = ""
-            for m in conversation_history:
-                history_text += f"{m['role']}: {m['content']}\n"
-
-        # Build concept summaries (OPTIMIZED: only names, no descriptions)
-        concept_summaries = ""
-        if concept_rows:
-            # Only include concept names for speed (descriptions add tokens)
-            names = [
-                c.get("name", "") for c in concept_rows[:5] if c.get("name")
-            ]
-            concept_summaries = ", ".join(names) if names else ""
-
-        # OPTIMIZED: Skip student profile to reduce prompt size
-        # Use default learning level from parameter instead
-        profile_context = ""
-
-        # Build lesson chunks text
-        lesson_chunks_text = ""
-        if lesson_chunks:
-            lesson_chunks_text = "\n\n".join([
-                chunk.get("chunk_text", "")
-                for chunk in lesson_chunks
-                if chunk.get("chunk_text")
-            ])
-
-        # Create structured RAG prompt with Business Studies restriction
-        prompt = f"""
-        You are an expert Business Studies AI tutor helping a student
-        learn Business Studies concepts related to {topic}.
-
-        CRITICAL RESTRICTION: You MUST ONLY answer questions about
-        Business Studies topics. This includes:
-        - Business organizations (sole traders, partnerships, etc.)
-        - Business finance and accounting
-        - Marketing and market research
-        - Human resources and management
-        - Operations and production
-        - Business strategy and planning
-        - Economics and business environment
-        - Business ethics and social responsibility
-        - International business
-        - Entrepreneurship
-
-        If the student asks about topics OUTSIDE of Business Studies
-        (e.g., mathematics, science, history, literature, programming,
-        etc.), you MUST politely decline and redirect them to Business
-        Studies topics.
-        
-        {profile_context}
-        ================================
-        LESSON CONTENT
-        ================================
-        {lesson_content or "No lesson content was provided."}
-
-        ================================
-        MOST RELEVANT LESSON PASSAGES
-        ================================
-        {lesson_chunks_text or "No specific lesson passages found."}
-
-        ================================
-        KEY CONCEPTS (Supabase/pgvector search)
-        ================================
-        {concept_summaries or "No related concepts found."}
-
-        ================================
-        RECENT CONVERSATION (Supabase memory)
-        ================================
-        {history_text or "No prior messages."}
-
-        ================================
-        STUDENT QUESTION
-        ================================
-        {message}
-
-        ================================
-        EXPLANATION FORMAT (Style Requested)
-        ================================
-        The student requested this explanation style: {explanation_style}
-
-        Follow these rules:
-        - If "simple": Give a very short, beginner-friendly explanation.
-        - If "detailed": Give a long, deep explanation with layered reasoning.
-        - If "steps": Break the solution into clear numbered steps.
-        - If "table": Present the core explanation using a clean Markdown
-          table.
-        - If "diagram": Provide an ASCII diagram or conceptual sketch.
-        - If "comparison": Present a comparison chart of key differences.
-        - If "visual_prompt": Instead of explaining, output a prompt suitable
-          for an image generation model (no more than 2–3 sentences).
-        - If "default": Use your best judgment.
-
-        Make sure the format is consistent with the requested style.
-
-        ================================
-        YOUR TASK
-        ================================
-        1. FIRST: Check if the question is about Business Studies.
-           If not, politely decline and suggest asking about Business
-           Studies topics instead.
-        2. Answer clearly and accurately using Business Studies
-           terminology and concepts.
-        3. Use the lesson content and related concepts when relevant.
-        4. Match the student's learning level: {learning_level}.
-        5. Provide examples where useful.
-        6. Encourage the student to ask follow-up questions about
-           Business Studies.
+        response = self._invoke_with_timeout(
+            self.llm, messages, "generate_reply"
+        )
+        token_usage = token_usage_from(response)
+        _record_usage("generate_reply", token_usage)
+        return (response.content, token_usage)
+
+    def _invoke_with_timeout(
+        self, runnable, messages: List[tuple], operation: str,
+        timeout: float = 30
+    ):
         """
+        Invoke a LangChain runnable with timeout protection, reporting the
+        outcome to the circuit breaker and llm_call_duration_seconds.
 
-        # Add timeout protection for LLM invoke (30 seconds)
+        The timeout is shortened to the operation's adaptive timeout and
+        the time left before the request deadline.
+
+        Raises:
+            TimeoutError: No result after timeout seconds, or no time left
+        """
         import threading
+        timeout = timeout_for(f"llm:{operation}", timeout)
+        if timeout <= 0:
+            raise TimeoutError(
+                f"No time left before the request deadline for {operation}"
+            )
         result_container = {"value": None, "error": None, "completed": False}
-        
+
         def invoke_llm():
             try:
-                result_container["value"] = self.llm.invoke(prompt)
+                result_container["value"] = runnable.invoke(messages)
                 result_container["completed"] = True
             except Exception as e:
                 result_container["error"] = e
                 result_container["completed"] = True
-        
+
         invoke_thread = threading.Thread(target=invoke_llm, daemon=True)
+        started = time.perf_counter()
         invoke_thread.start()
-        invoke_thread.join(timeout=30)
-        
+        invoke_thread.join(timeout=timeout)
+
         if not result_container["completed"]:
-            raise TimeoutError("LLM invoke timed out after 30 seconds")
-        
+            self._record_llm_outcome(
+                failed=True, operation=operation, started=started,
+                timed_out=True
+            )
+            raise TimeoutError(
+                f"LLM invoke timed out after {timeout:.3g} seconds"
+            )
+
         if result_container["error"]:
+            self._record_llm_outcome(
+                failed=True, operation=operation, started=started
+            )
             raise result_container["error"]
-        
-        response = result_container["value"]
 
-        # Extract token usage from response metadata
-        token_usage = {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0
-        }
+        self._record_llm_outcome(
+            failed=False, operation=operation, started=started
+        )
+        return result_container["value"]
 
-        if hasattr(response, 'response_metadata'):
-            metadata = response.response_metadata
-            if metadata and 'token_usage' in metadata:
-                usage = metadata['token_usage']
-                token_usage = {
-                    "prompt_tokens": usage.get('prompt_tokens', 0),
-                    "completion_tokens": usage.get('completion_tokens', 0),
-                    "total_tokens": usage.get('total_tokens', 0)
-                }
+    def generate_labelled_reply(
+        self,
+        message: str,
+        topic: str,
+        learning_level: str,
+        conversation_history: List[Dict],
+        lesson_content: Optional[str] = None,
+        concept_rows: Optional[List[Dict]] = None,
+        explanation_style: str = "default",
+        lesson_chunks: Optional[List[Dict]] = None,
+        condensed_history: Optional[str] = None,
+        student_profile: Optional[Dict] = None
+    ) -> tuple:
+        """
+        Generate the tutor reply and the student's reasoning label in one
+        structured-output call. Takes the same arguments as
+        generate_reply.
 
-        return (response.content, token_usage)
+        Returns:
+            tuple: (response_text, reasoning_label, token_usage_dict)
+                reasoning_label is 'good', 'neutral' or 'confused', or
+                None when no label came back (fallback reply, or an
+                invalid label)
+        """
+        if not (self.langchain_available and self.llm):
+            return (
+                self._generate_fallback_response(message, topic), None,
+                _no_usage()
+            )
+        if openai_breaker and not openai_breaker.allow_request():
+            return (self.fallback_reply(message, topic), None, _no_usage())
+
+        messages = self._build_reply_messages(
+            message,
+            topic,
+            learning_level,
+            conversation_history,
+            lesson_content,
+            concept_rows,
+            explanation_style,
+            lesson_chunks,
+            condensed_history,
+            student_profile
+        )
+        messages[0] = ("system", LABELLED_REPLY_SYSTEM_PROMPT)
+        try:
+            if self._labelled_llm is None:
+                self._labelled_llm = self.llm.with_structured_output(
+                    LABELLED_REPLY_SCHEMA, method="json_schema",
+                    include_raw=True, strict=True
+                )
+            result = self._invoke_with_timeout(
+                self._labelled_llm, messages, "generate_labelled_reply"
+            )
+            token_usage = token_usage_from(result.get("raw"))
+            _record_usage("generate_labelled_reply", token_usage)
+            parsed = _parse_labelled_reply(result)
+        except Exception as e:
+            self.logger.error(f"Error generating labelled reply: {e}")
+            return (
+                self._generate_fallback_response(message, topic), None,
+                _no_usage()
+            )
+
+        label = parsed.get("reasoning_label")
+        if label not in REASONING_LABELS:
+            label = None
+        return (parsed["reply"], label, token_usage)
+
+    def _build_reply_messages(
+        self,
+        message: str,
+        topic: str,
+        learning_level: str,
+        conversation_history: List[Dict],
+        lesson_content: Optional[str] = None,
+        concept_rows: Optional[List[Dict]] = None,
+        explanation_style: str = "default",
+        lesson_chunks: Optional[List[Dict]] = None,
+        condensed_history: Optional[str] = None,
+        student_profile: Optional[Dict] = None
+    ) -> List[tuple]:
+        """
+        Build the tutor reply messages (shared by invoke and stream).
+
+        Returns:
+            [("system", REPLY_SYSTEM_PROMPT), ("human", context)], with
+            the per-request context filled into REPLY_CONTEXT_TEMPLATE
+        """
+        # Use condensed history if provided, otherwise build from full history
+        if condensed_history:
+            history_text = condensed_history
+        else:
+            history_text = "".join(
+                f"{m['role']}: {m['content']}\n"
+                for m in conversation_history
+            )
+
+        # Concept names only (descriptions add tokens)
+        names = [
+            c.get("name", "") for c in (concept_rows or [])[:5]
+            if c.get("name")
+        ]
+
+        # The student profile is not sent; learning_level covers it
+        lesson_passages = "\n\n".join(
+            chunk.get("chunk_text", "")
+            for chunk in (lesson_chunks or [])
+            if chunk.get("chunk_text")
+        )
+
+        context = REPLY_CONTEXT_TEMPLATE.format(
+            topic=topic,
+            lesson_content=(
+                lesson_content or "No lesson content was provided."
+            ),
+            lesson_passages=(
+                lesson_passages or "No specific lesson passages found."
+            ),
+            concepts=", ".join(names) or "No related concepts found.",
+            history=history_text or "No prior messages.",
+            message=message,
+            explanation_style=explanation_style,
+            learning_level=learning_level
+        )
+        return [("system", REPLY_SYSTEM_PROMPT), ("human", context)]
+
+    def stream_reply(
+        self,
+        message: str,
+        topic: str,
+        learning_level: str,
+        conversation_history: List[Dict],
+        lesson_content: Optional[str] = None,
+        concept_rows: Optional[List[Dict]] = None,
+        explanation_style: str = "default",
+        lesson_chunks: Optional[List[Dict]] = None,
+        condensed_history: Optional[str] = None,
+        student_profile: Optional[Dict] = None,
+        token_usage: Optional[Dict] = None
+    ) -> Iterator[str]:
+        """
+        Stream the AI tutor reply as text chunks.
+
+        Takes the same arguments as generate_reply. When LangChain is
+        unavailable, the OpenAI circuit is open or the stream fails before
+        the first chunk, the fallback reply is yielded as a single chunk.
+
+        Args:
+            token_usage: Optional dict filled with prompt_tokens,
+                completion_tokens, total_tokens and cached_tokens once
+                the stream ends
+
+        Yields:
+            str: Reply text chunks in order
+        """
+        if not (self.langchain_available and self.llm):
+            yield self._generate_fallback_response(message, topic)
+            return
+        if openai_breaker and not openai_breaker.allow_request():
+            yield self.fallback_reply(message, topic)
+            return
+
+        messages = self._build_reply_messages(
+            message,
+            topic,
+            learning_level,
+            conversation_history,
+            lesson_content,
+            concept_rows,
+            explanation_style,
+            lesson_chunks,
+            condensed_history,
+            student_profile
+        )
+
+        sent_any = False
+        usage = None
+        started = time.perf_counter()
+        try:
+            for chunk in self.llm.stream(messages, stream_usage=True):
+                if getattr(chunk, "usage_metadata", None):
+                    usage = token_usage_from(chunk)
+                    if token_usage is not None:
+                        token_usage.update(usage)
+                if chunk.content:
+                    sent_any = True
+                    yield chunk.content
+        except Exception as e:
+            self._record_llm_outcome(
+                failed=True, operation="stream_reply", started=started
+            )
+            self.logger.error(f"Error streaming reply: {e}")
+            if not sent_any:
+                yield self._generate_fallback_response(message, topic)
+            return
+
+        self._record_llm_outcome(
+            failed=False, operation="stream_reply", started=started
+        )
+        if usage:
+            _record_usage("stream_reply", usage)
 
     def trim_context(
         self,
@@ -300,17 +677,13 @@ class LLMService:
         Returns:
             tuple: (trimmed_history, trimmed_lesson_text, trimmed_chunks)
         """
-        # Estimate tokens (rough: 1 token ≈ 4 characters)
-        def estimate_tokens(text: str) -> int:
-            return len(text) // 4 if text else 0
-
         # Calculate current token usage
         history_tokens = sum(
-            estimate_tokens(msg.get("content", "")) for msg in history
+            count_tokens(msg.get("content", "")) for msg in history
         )
-        lesson_tokens = estimate_tokens(lesson_text or "")
+        lesson_tokens = count_tokens(lesson_text or "")
         chunks_tokens = sum(
-            estimate_tokens(chunk.get("chunk_text", ""))
+            count_tokens(chunk.get("chunk_text", ""))
             for chunk in (chunks or [])
         )
 
@@ -329,7 +702,7 @@ class LLMService:
         current_tokens = 0
         # Iterate in reverse to keep newest messages
         for msg in reversed(history):
-            msg_tokens = estimate_tokens(msg.get("content", ""))
+            msg_tokens = count_tokens(msg.get("content", ""))
             if current_tokens + msg_tokens <= available_for_history:
                 trimmed_history.insert(0, msg)
                 current_tokens += msg_tokens
@@ -347,6 +720,38 @@ class LLMService:
 
         return trimmed_history, lesson_text, chunks
 
+    def _record_llm_outcome(
+        self,
+        failed: bool,
+        operation: Optional[str] = None,
+        started: Optional[float] = None,
+        timed_out: bool = False
+    ):
+        """
+        Report an OpenAI call result to the shared circuit breaker and,
+        given operation and started (time.perf_counter()), its latency to
+        llm_call_duration_seconds and the adaptive timeouts.
+        """
+        if operation and started:
+            elapsed = time.perf_counter() - started
+            if LLM_CALL_SECONDS is not None:
+                status = "timeout" if timed_out else (
+                    "error" if failed else "ok"
+                )
+                LLM_CALL_SECONDS.observe(
+                    elapsed, operation=operation, status=status
+                )
+            # Timed-out calls count at their timeout, so a timeout that
+            # is too short grows back
+            if dependency_latency is not None and (timed_out or not failed):
+                dependency_latency.observe(f"llm:{operation}", elapsed)
+        if not openai_breaker:
+            return
+        if failed:
+            openai_breaker.record_failure()
+        else:
+            openai_breaker.record_success()
+
     def fallback_reply(self, message: str, topic: str) -> str:
         """
         Generate a safe fallback response when LLM generation fails.
@@ -429,6 +834,10 @@ class LLMService:
             LessonResponse object
         """
         if self.langchain_available and self.llm:
+            if openai_breaker and not openai_breaker.allow_request():
+                return self._generate_fallback_lesson(
+                    topic, learning_objectives, difficulty_level
+                )
             try:
                 return self._generate_lesson_with_langchain(
                     topic, learning_objectives, difficulty_level
@@ -450,27 +859,14 @@ class LLMService:
     ):
         """Generate structured lesson using LangChain"""
 
-        prompt = f"""
-        Create a comprehensive lesson on {topic} with the following
-        learning objectives:
-        {', '.join(learning_objectives)}
-
-        Difficulty level: {difficulty_level}
-
-        Provide:
-        1. Lesson content (detailed explanation)
-        2. Key points (bullet points)
-        3. Practice questions (3-5 questions)
-        4. Estimated duration in minutes
-
-        Format as JSON:
-        {{
-            "lesson_content": "...",
-            "key_points": ["...", "..."],
-            "practice_questions": ["...", "..."],
-            "estimated_duration": 30
-        }}
-        """
+        messages = [
+            ("system", LESSON_SYSTEM_PROMPT),
+            ("human", LESSON_REQUEST_TEMPLATE.format(
+                topic=topic,
+                learning_objectives=", ".join(learning_objectives),
+                difficulty_level=difficulty_level
+            ))
+        ]
 
         # Add timeout protection for LLM invoke (30 seconds)
         import threading
@@ -478,22 +874,33 @@ class LLMService:
         
         def invoke_llm():
             try:
-                result_container["value"] = self.llm.invoke(prompt)
+                result_container["value"] = self.llm.invoke(messages)
                 result_container["completed"] = True
             except Exception as e:
                 result_container["error"] = e
                 result_container["completed"] = True
         
         invoke_thread = threading.Thread(target=invoke_llm, daemon=True)
+        started = time.perf_counter()
         invoke_thread.start()
         invoke_thread.join(timeout=30)
         
         if not result_container["completed"]:
+            self._record_llm_outcome(
+                failed=True, operation="generate_lesson", started=started,
+                timed_out=True
+            )
             raise TimeoutError("LLM invoke timed out after 30 seconds")
         
         if result_container["error"]:
+            self._record_llm_outcome(
+                failed=True, operation="generate_lesson", started=started
+            )
             raise result_container["error"]
         
+        self._record_llm_outcome(
+            failed=False, operation="generate_lesson", started=started
+        )
         response = result_container["value"]
 
         try:
@@ -546,9 +953,17 @@ class LLMService:
             # Fallback: return original text if OpenAI client unavailable
             return history_text
 
+        if openai_breaker and not openai_breaker.allow_request():
+            return history_text
+
+        # Up to 15 seconds, less when the request deadline is near
+        wait = timeout_for("llm:summarize_history", 15)
+        if wait <= 0:
+            return history_text
+
         try:
             import threading
-            # Add timeout protection for OpenAI API call (15 seconds)
+            # Add timeout protection for OpenAI API call
             result_container = {
                 "value": None, "error": None, "completed": False
             }
@@ -587,25 +1002,104 @@ class LLMService:
             summarize_thread = threading.Thread(
                 target=invoke_summarize, daemon=True
             )
+            started = time.perf_counter()
             summarize_thread.start()
-            summarize_thread.join(timeout=15)
+            summarize_thread.join(timeout=wait)
 
             if not result_container["completed"]:
+                self._record_llm_outcome(
+                    failed=True, operation="summarize_history",
+                    started=started, timed_out=True
+                )
                 self.logger.warning(
                     "History summarization timed out, using original text"
                 )
                 return history_text
 
             if result_container["error"]:
+                self._record_llm_outcome(
+                    failed=True, operation="summarize_history",
+                    started=started
+                )
                 self.logger.warning(
                     f"History summarization error: "
                     f"{result_container['error']}, using original text"
                 )
                 return history_text
 
+            self._record_llm_outcome(
+                failed=False, operation="summarize_history", started=started
+            )
             response = result_container["value"]
             return response.choices[0].message.content.strip()
         except Exception as e:
             self.logger.error(f"Error summarizing history: {e}")
             # Fallback: return original text
             return history_text
+
+    def update_summary(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict]
+    ) -> Optional[str]:
+        """
+        Fold new messages into a running conversation summary.
+
+        Called off the request path (see rolling_summary), so the call is
+        made directly with the client timeout rather than a watchdog
+        thread.
+
+        Args:
+            previous_summary: Summary of the earlier messages (or None)
+            messages: Messages not covered yet, oldest first
+
+        Returns:
+            str: Updated summary (3-4 sentences), or None on failure
+        """
+        if not self.openai_client:
+            return None
+        if openai_breaker and not openai_breaker.allow_request():
+            return None
+
+        new_messages = "\n".join(
+            f"{m.get('role')}: {m.get('content')}" for m in messages
+        )
+        started = time.perf_counter()
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "You maintain a running summary of a tutoring "
+                            "conversation. Update the summary with the new "
+                            "messages in 3-4 concise sentences. Focus on "
+                            "key questions asked, topics discussed and "
+                            "what the student found difficult."
+                        )
+                    },
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Current summary:\n"
+                            f"{previous_summary or 'None yet.'}\n\n"
+                            f"New messages:\n{new_messages}"
+                        )
+                    }
+                ],
+                temperature=0,
+                max_tokens=150,
+                timeout=15.0
+            )
+        except Exception as e:
+            self._record_llm_outcome(
+                failed=True, operation="update_summary", started=started
+            )
+            self.logger.warning(f"Summary update failed: {e}")
+            return None
+
+        self._record_llm_outcome(
+            failed=False, operation="update_summary", started=started
+        )
+        return response.choices[0].message.content.strip() or None
@@ -6,6 +6,11 @@ Message Service - Handles message logging operations
 import logging
 from typing import Optional, List
 
+try:
+    from outbox import get_outbox
+except ImportError:
+    get_outbox = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,7 +42,7 @@ class MessageService:
         concept_ids: Optional[List[str]] = None
     ):
         """
-        Store a single tutor or student message in Supabase.
+        Queue a single tutor or student message for Supabase.
         Invalidates history cache for this conversation.
 
         Args:
@@ -60,62 +65,29 @@ class MessageService:
             "concept_ids": concept_ids or [],
         }
 
-        try:
-            # Add timeout protection for Supabase insert
+        # Queued for a batched insert; the outbox spools it to disk so it
+        # survives a restart
+        cache_key = f"history:{conversation_id}"
+        if get_outbox is not None:
+            get_outbox().enqueue(
+                "tutor_messages", payload,
+                on_written=lambda: self._invalidate_history(cache_key)
+            )
+        else:
             try:
-                from langgraph_tutor import safe_supabase_query
-            except ImportError:
-                # Fallback if import fails
-                import threading
-
-                def safe_supabase_query(
-                    query_func, timeout=3, default_return=None
-                ):
-                    if timeout <= 0:
-                        try:
-                            return query_func()
-                        except Exception:
-                            return default_return
-                    result_container = {
-                        "value": None, "error": None, "completed": False
-                    }
-
-                    def execute_query():
-                        try:
-                            result_container["value"] = query_func()
-                            result_container["completed"] = True
-                        except Exception as e:
-                            result_container["error"] = e
-                            result_container["completed"] = True
-                    query_thread = threading.Thread(
-                        target=execute_query, daemon=True
-                    )
-                    query_thread.start()
-                    query_thread.join(timeout=timeout)
-                    if (not result_container["completed"] or
-                            result_container["error"]):
-                        return default_return
-                    return result_container["value"]
+                self.supabase.table("tutor_messages").insert(
+                    payload
+                ).execute()
+            except Exception as e:
+                self.logger.warning(f"[WARNING] Message log failed: {e}")
 
-            def insert_func():
-                return (
-                    self.supabase.table("tutor_messages")
-                    .insert(payload)
-                    .execute()
-                )
+        # Invalidate history cache now and again once the row has landed,
+        # so a reload in between is not cached without this message
+        self._invalidate_history(cache_key)
 
-            # Use async write pattern - don't block on message logging
-            # This is already called via async_write in langgraph_tutor
-            # But add timeout protection just in case
-            safe_supabase_query(insert_func, timeout=10, default_return=None)
-
-            # Invalidate history cache when new message is added
-            cache_key = f"history:{conversation_id}"
-            if self.cache_delete:
-                try:
-                    self.cache_delete(cache_key)
-                except Exception:
-                    pass
-        except Exception:
-            # Fail silently (logging can be added later)
-            pass
+    def _invalidate_history(self, cache_key: str):
+        if self.cache_delete:
+            try:
+                self.cache_delete(cache_key)
+            except Exception:
+                pass
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Application container: the process-wide clients, agents and graphs.
+
+Nothing is built at import time. Each component is created on first use
+(thread-safe, exactly once) and its heavy imports (supabase, LangChain /
+OpenAI, LangGraph, the grading agents) happen inside its factory. This
+keeps `import unified_backend` / `import langgraph_tutor` cheap, and since
+construction happens after a pre-fork server has forked, every worker
+opens its own connections (the container is also reset in forked
+children, so a client created before the fork is never shared).
+
+Usage:
+    from app_container import container
+    container.supabase_client
+    container.service("llm")
+
+LazyProxy exposes a component under a module-level name (e.g.
+langgraph_tutor.lesson_service) without building it at import.
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Build every component in the background when the server starts
+APP_WARM_ON_STARTUP = os.getenv(
+    "APP_WARM_ON_STARTUP", "true"
+).lower() == "true"
+
+
+def _create_supabase_client():
+    """Supabase client for the tutor and backend (anon key preferred)."""
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_ANON_KEY") or os.getenv(
+        "SUPABASE_SERVICE_ROLE_KEY"
+    )
+    if not url or not key:
+        logger.info(
+            "[WARNING] Supabase credentials not found - "
+            "running without Supabase features"
+        )
+        return None
+    try:
+        from supabase import create_client
+    except ImportError:
+        logger.error(
+            "[ERROR] Supabase Python client not installed - "
+            "install with: pip install supabase"
+        )
+        return None
+    try:
+        client = create_client(url, key)
+        # Enable HTTP keep-alive for better performance
+        if hasattr(client, 'postgrest') and hasattr(
+            client.postgrest, 'session'
+        ):
+            client.postgrest.session.keep_alive = True
+        return client
+    except Exception as e:
+        logger.error(f"[ERROR] Error initializing Supabase client: {e}")
+        return None
+
+
+class AppContainer:
+    """
+    Lazily built, process-wide application components.
+    """
+
+    # Components built by warm(), in dependency order
+    WARM_ORDER = ("supabase_client", "tutor_agent", "services", "tutor_app")
+
+    def __init__(self):
+        """Initialize an empty AppContainer."""
+        self._lock = threading.RLock()
+        self._instances: Dict[str, Any] = {}
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "supabase_client": _create_supabase_client,
+            "tutor_agent": self._create_tutor_agent,
+            "services": lambda: self.tutor_agent.build_services(),
+        }
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register (or replace) the factory for a component.
+
+        Args:
+            name: Component name
+            factory: Zero-argument callable building the component
+        """
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """
+        Return a component, building it on first use.
+
+        Args:
+            name: Component name
+
+        Returns:
+            The component (may be None if its dependency is missing)
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                factory = self._factories.get(name)
+                if factory is None:
+                    raise KeyError(f"Unknown component: {name}")
+                self._instances[name] = factory()
+            return self._instances[name]
+
+    def set(self, name: str, instance: Any):
+        """Provide a ready-made component (e.g. a test double)."""
+        with self._lock:
+            self._instances[name] = instance
+
+    def built(self) -> List[str]:
+        """Names of the components built so far."""
+        with self._lock:
+            return list(self._instances)
+
+    def reset(self):
+        """Forget every built component; they are rebuilt on next use."""
+        with self._lock:
+            self._instances.clear()
+
+    def warm(self, names=None) -> List[str]:
+        """
+        Build components ahead of the first request.
+
+        Args:
+            names: Components to build (default: every registered
+                component, WARM_ORDER first)
+
+        Returns:
+            Names of components whose construction failed
+        """
+        if names is None:
+            with self._lock:
+                registered = list(self._factories)
+            names = [n for n in self.WARM_ORDER if n in registered] + [
+                n for n in registered if n not in self.WARM_ORDER
+            ]
+        failed = []
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"[ERROR] Could not build {name}: {e}")
+                failed.append(name)
+        return failed
+
+    # Shortcuts for the components every caller needs
+
+    @property
+    def supabase_client(self):
+        return self.get("supabase_client")
+
+    @property
+    def tutor_agent(self):
+        return self.get("tutor_agent")
+
+    def service(self, name: str):
+        """One of AITutorAgent.build_services() (e.g. "llm")."""
+        return self.get("services")[name]
+
+    def _create_tutor_agent(self):
+        # Imports LangChain/OpenAI and every tutor agent
+        from agents.ai_tutor_agent import AITutorAgent
+        return AITutorAgent(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            supabase_client=self.supabase_client
+        )
+
+
+class LazyProxy:
+    """
+    Stand-in for a container component under a module-level name.
+
+    Attribute access and truthiness resolve the component on first use.
+    Attributes set on the proxy itself (e.g. by unittest.mock.patch)
+    shadow the component's.
+    """
+
+    def __init__(self, resolve: Callable[[], Any], name: str = ""):
+        self._resolve = resolve
+        self._name = name
+
+    def __getattr__(self, attr):
+        if attr in ("_resolve", "_name"):
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+    def __getitem__(self, key):
+        return self._resolve()[key]
+
+    def __bool__(self):
+        return bool(self._resolve())
+
+    def __repr__(self):
+        return f"<LazyProxy {self._name}>"
+
+
+container = AppContainer()
+
+# Connections must not be shared across a fork
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=container.reset)
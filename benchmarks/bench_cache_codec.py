@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark cache value encoding: legacy json.dumps text vs cache_codec.
+
+Uses payloads shaped like the tutor's cached values (a lesson body and a
+list of concept rows) and reports stored size and encode/decode time per
+call.
+
+Usage:
+    python benchmarks/bench_cache_codec.py [iterations]
+"""
+
+import os
+import sys
+import json
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cache_codec  # noqa: E402
+from cache_codec import (  # noqa: E402
+    CacheCodec,
+    SERIALIZER_JSON,
+    SERIALIZER_MSGPACK,
+)
+
+PARAGRAPH = (
+    "Price elasticity of demand measures how responsive the quantity "
+    "demanded is to a change in price. When demand is elastic, a small "
+    "price change leads to a proportionally larger change in quantity. "
+)
+
+PAYLOADS = {
+    "lesson (~12 KB)": "\n\n".join(
+        f"Section {i}. " + PARAGRAPH * 3 for i in range(20)
+    ),
+    "concepts (10 rows)": [
+        {
+            "concept_id": 100 + i,
+            "name": f"Elasticity concept {i}",
+            "description": PARAGRAPH,
+            "explanation": PARAGRAPH * 4,
+            "example": "If price rises 10% and quantity falls 20%, PED = -2.",
+            "topic_id": 11,
+            "similarity": 0.42 + i / 100,
+        }
+        for i in range(10)
+    ],
+    "readiness (small)": {
+        "readiness_score": 0.63,
+        "average_mastery": 58.5,
+        "min_mastery": 20,
+        "is_ready": False,
+    },
+}
+
+
+def _legacy_encode(value):
+    return json.dumps(value).encode("utf-8")
+
+
+def _legacy_decode(data):
+    return json.loads(data)
+
+
+def _time_per_call(func, arg, iterations):
+    seconds = timeit.timeit(lambda: func(arg), number=iterations)
+    return seconds / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    variants = [("json text (legacy)", _legacy_encode, _legacy_decode)]
+    json_zstd = CacheCodec(serializer=SERIALIZER_JSON)
+    variants.append(("json + zstd", json_zstd.encode, json_zstd.decode))
+    if cache_codec.msgpack is not None:
+        packed = CacheCodec(serializer=SERIALIZER_MSGPACK)
+        variants.append(("msgpack + zstd", packed.encode, packed.decode))
+    else:
+        print("msgpack not installed; skipping msgpack variant")
+
+    print(f"{iterations} iterations, compress threshold "
+          f"{cache_codec.CACHE_COMPRESS_THRESHOLD} B, "
+          f"zstd level {cache_codec.CACHE_ZSTD_LEVEL}")
+    print(f"{'payload':<20} {'codec':<20} {'bytes':>8} "
+          f"{'encode us':>10} {'decode us':>10}")
+    for name, payload in PAYLOADS.items():
+        for label, enc, dec in variants:
+            data = enc(payload)
+            assert dec(data) == payload
+            print(
+                f"{name:<20} {label:<20} {len(data):>8} "
+                f"{_time_per_call(enc, payload, iterations):>10.1f} "
+                f"{_time_per_call(dec, data, iterations):>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
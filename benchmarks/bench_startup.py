@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time of the backend entry points.
+
+Each module is imported in a fresh interpreter under `python -X importtime`.
+The script reports the module's cumulative import time, the slowest
+imports below it, and any heavy dependency that was imported even though
+the application container should defer it to first use. It exits with
+status 1 if a module is over budget or imports a deferred dependency, so
+it can run in CI.
+
+Usage:
+    python benchmarks/bench_startup.py [budget_ms] [runs]
+
+budget_ms defaults to STARTUP_BUDGET_MS (1000); the median of runs (3)
+is compared against it.
+"""
+
+import os
+import re
+import sys
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("langgraph_tutor", "unified_backend")
+
+# Built on first use by app_container; importing them at startup is a bug
+DEFERRED = (
+    "langchain_openai",
+    "openai",
+    "supabase",
+    "langgraph.graph",
+    "agents.ai_tutor_agent",
+    "answer_grading_agent",
+    "mock_exam_grading_agent",
+)
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _import_profile(module):
+    """Return [(cumulative_us, depth, name)] for one cold import."""
+    env = dict(os.environ)
+    # unified_backend refuses to start without a key; it is never used
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"import {module} failed:\n{proc.stderr[-2000:]}"
+        )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            rows.append((int(cumulative), len(indent), name))
+    return rows
+
+
+def main():
+    budget_ms = float(
+        sys.argv[1] if len(sys.argv) > 1
+        else os.getenv("STARTUP_BUDGET_MS", "1000")
+    )
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    failed = False
+
+    for module in MODULES:
+        timings, profile = [], []
+        for _ in range(runs):
+            profile = _import_profile(module)
+            total = next(c for c, _, n in profile if n == module)
+            timings.append(total / 1000.0)
+        median = statistics.median(timings)
+        over = median > budget_ms
+        status = "OVER BUDGET" if over else "ok"
+        print(f"{module}: {median:.0f} ms (budget {budget_ms:.0f} ms) "
+              f"{status}")
+
+        print("  slowest top-level imports:")
+        top = sorted(
+            (r for r in profile if r[1] == 3),
+            reverse=True
+        )[:8]
+        for cumulative, _, name in top:
+            print(f"    {cumulative / 1000.0:8.1f} ms  {name}")
+
+        imported = {name for _, _, name in profile}
+        eager = [name for name in DEFERRED if name in imported]
+        if eager:
+            print(f"  imported at startup (should be lazy): "
+                  f"{', '.join(eager)}")
+        failed = failed or over or bool(eager)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
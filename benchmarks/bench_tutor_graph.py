@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tutor graph wiring: the old linear chain vs the DAG.
+
+Every node is replaced by a stub that sleeps for a typical latency of the
+real node (Supabase round-trips, the reasoning classifier and the reply
+LLM call), so the numbers show only what the wiring costs or saves.
+
+Usage:
+    python benchmarks/bench_tutor_graph.py [runs] [scale]
+
+scale multiplies every stub latency (default 0.1, i.e. 10x faster than
+production so the benchmark finishes quickly).
+"""
+
+import os
+import sys
+import time
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langgraph.graph import END  # noqa: E402
+
+import langgraph_tutor  # noqa: E402
+from langgraph_tutor import (  # noqa: E402
+    TUTOR_EDGES,
+    TUTOR_NODES,
+    build_tutor_graph,
+)
+
+# Typical node latencies in ms with a cold cache
+LATENCY_MS = {
+    "LogUserMessage": 1,
+    "ValidateInput": 1,
+    # One MGET for the bundle and the shown-concept bitset
+    "FetchTopicBundle": 3,
+    "FetchLesson": 120,
+    "RetrieveHistory": 90,
+    "SummarizeHistory": 2,
+    "FetchConcepts": 250,
+    "ClassifyReasoning": 450,
+    "GenerateLLMResponse": 1800,
+    "UpdateMastery": 2,
+    "ComputeReadiness": 150,
+    "ComputeLearningPath": 110,
+}
+# Nodes added to the graph without an entry above
+DEFAULT_LATENCY_MS = 1
+
+# The wiring before the DAG: every node after the previous one
+LINEAR_EDGES = tuple(
+    (a.__name__, b.__name__) for a, b in zip(TUTOR_NODES, TUTOR_NODES[1:])
+) + ((TUTOR_NODES[-1].__name__, END),)
+
+
+def _stub_nodes(scale):
+    nodes = []
+    for fn in TUTOR_NODES:
+        latency = LATENCY_MS.get(fn.__name__, DEFAULT_LATENCY_MS)
+
+        def node(state, delay=latency * scale / 1000.0):
+            time.sleep(delay)
+            return {}
+        node.__name__ = fn.__name__
+        nodes.append(node)
+    return tuple(nodes)
+
+
+def _run(app, runs):
+    state = {"user_id": "bench", "topic": "11", "concept_rows": []}
+    app.invoke(dict(state))  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app.invoke(dict(state))
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    # Stubs never touch Supabase; keep timed_node from tracing them
+    langgraph_tutor.DEBUG_MODE = False
+    nodes = _stub_nodes(scale)
+    serial_ms = sum(LATENCY_MS.values()) * scale
+
+    print(f"{runs} runs, latency scale {scale}, "
+          f"sum of node latencies {serial_ms:.0f} ms")
+    print(f"{'wiring':<10} {'median ms':>10} {'p95 ms':>10}")
+    for label, edges in (("linear", LINEAR_EDGES), ("dag", TUTOR_EDGES)):
+        timings = sorted(_run(build_tutor_graph(nodes, edges), runs))
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{label:<10} {statistics.median(timings):>10.1f} "
+              f"{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,44 @@
 #!/usr/bin/env python3
 """
 Caching layer for AI Tutor system.
-Supports Redis if available, falls back to in-memory dict.
+Supports Redis if available, falls back to a bounded in-memory LRU cache.
+Per-prefix hit/miss/latency counters are kept in cache_stats.
 """
 
 import os
 import json
-import hashlib
-from typing import Any, Optional
-from datetime import datetime, timedelta
+import time
+import asyncio
+import inspect
+import heapq
+import threading
+from uuid import uuid4
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
 import logging
 
+from cache_codec import encode as _encode, decode as _decode
+from cache_keys import mastery_generation_key, stable_hash
+from cache_stats import CacheStats, stats
+from circuit_breaker import get_breaker
+
 logger = logging.getLogger(__name__)
 
+# Seconds before a Redis connect/read counts as a failure
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5"))
+
 # Try to import Redis
 redis_client = None
 try:
     import redis
     redis_url = os.getenv("REDIS_URL")
     if redis_url:
-        redis_client = redis.from_url(redis_url)
+        redis_client = redis.from_url(
+            redis_url,
+            socket_timeout=CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=CACHE_REDIS_TIMEOUT
+        )
         logger.info("[OK] Redis client initialized")  # noqa: E501
     else:
         logger.info("[INFO] Redis URL not found, using in-memory cache")
@@ -30,9 +49,244 @@ except Exception as e:
         f"[WARNING] Redis connection failed: {e}, using in-memory cache"
     )
 
+# Async client for event-loop code; created lazily (see _get_async_redis)
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+# In-memory cache limits (per worker process)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Minimum seconds between expiry sweeps
+CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", "1.0"))
+# Mastery generation counters outlive every readiness entry keyed on them
+MASTERY_GENERATION_TTL = int(
+    os.getenv("MASTERY_GENERATION_TTL", str(7 * 24 * 3600))
+)
+# Connection pool size for the shared redis.asyncio client
+CACHE_ASYNC_MAX_CONNECTIONS = int(
+    os.getenv("CACHE_ASYNC_MAX_CONNECTIONS", "50")
+)
+# Cross-worker loader lease (ms) and how often waiters re-check the cache
+CACHE_LOCK_LEASE_MS = int(os.getenv("CACHE_LOCK_LEASE_MS", "10000"))
+CACHE_LOCK_POLL_INTERVAL = float(
+    os.getenv("CACHE_LOCK_POLL_INTERVAL", "0.05")
+)
+
+
+class MemoryCache:
+    """
+    Bounded in-process cache with LRU eviction and TTL expiry.
+
+    Values are stored in their JSON-encoded form so that the byte budget is
+    exact and callers get a fresh copy on every read (same semantics as
+    Redis). All operations are O(1):
+      - entries live in an OrderedDict kept in LRU order
+      - expiry times are bucketed into one-second slots, and a sweep
+        drops whole slots once they are in the past (a heap of slot
+        numbers is only touched when a slot is created). The sweep runs at
+        most once per sweep_interval, piggybacked on normal cache calls,
+        so no background thread is needed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        sweep_interval: float = CACHE_SWEEP_INTERVAL,
+        stats: Optional[CacheStats] = None
+    ):
+        """
+        Initialize MemoryCache.
+
+        Args:
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total size of encoded values in bytes
+            sweep_interval: Minimum seconds between expiry sweeps
+            stats: Optional CacheStats that receives per-prefix set,
+                eviction and expiration counts
+        """
+        self.stats = stats
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # key -> (encoded_value, expires_at, size)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # expiry slot (int seconds) -> set of keys expiring in that slot
+        self._expiry_slots: dict = {}
+        # min-heap of slot numbers, so the sweep finds due slots directly
+        self._slot_heap: list = []
+        self._bytes = 0
+        self._next_sweep = 0.0
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of encoded values currently held."""
+        return self._bytes
+
+    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
+        """
+        Store a JSON-serializable value with a TTL in seconds.
+
+        Returns:
+            bool: False if the value is larger than the whole byte budget
+                (any previous value of key is dropped)
+        """
+        encoded = json.dumps(value)
+        size = len(encoded)
+        if size > self.max_bytes:
+            with self._lock:
+                self._remove(key)
+            return False
+
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (encoded, expires_at, size)
+            slot = int(expires_at)
+            if slot not in self._expiry_slots:
+                self._expiry_slots[slot] = set()
+                heapq.heappush(self._slot_heap, slot)
+            self._expiry_slots[slot].add(key)
+            self._bytes += size
+            if self.stats:
+                self.stats.set(key, size)
+            self._maybe_sweep()
+            self._evict()
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value, or None if missing or expired.
+        A hit moves the entry to the most-recently-used position.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            encoded, expires_at, _ = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                if self.stats:
+                    self.stats.expiration(key)
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(encoded)
+
+    def incr(self, key: str, amount: int = 1, ttl: int = 3600) -> int:
+        """
+        Atomically add amount to an integer entry (missing counts as 0)
+        and reset its TTL.
+
+        Returns:
+            int: The new value
+        """
+        with self._lock:
+            value = (self.get(key) or 0) + amount
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: str) -> bool:
+        """Remove a key. Returns True if it was present."""
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._expiry_slots.clear()
+            self._slot_heap.clear()
+            self._bytes = 0
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Drop all entries whose expiry slot is in the past.
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.monotonic() if now is None else now
+        current_slot = int(now)
+        removed = 0
+        with self._lock:
+            while self._slot_heap and self._slot_heap[0] < current_slot:
+                slot = heapq.heappop(self._slot_heap)
+                # Slots emptied by delete/overwrite are already gone
+                for key in self._expiry_slots.pop(slot, ()):
+                    entry = self._entries.pop(key, None)
+                    if entry is not None:
+                        self._bytes -= entry[2]
+                        removed += 1
+                        if self.stats:
+                            self.stats.expiration(key)
+            self._next_sweep = now + self.sweep_interval
+        self.expirations += removed
+        return removed
+
+    def _maybe_sweep(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+    def _evict(self):
+        """Evict least-recently-used entries until within limits."""
+        while self._entries and (
+            len(self._entries) > self.max_entries or
+            self._bytes > self.max_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            if self.stats:
+                self.stats.eviction(key)
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        _, expires_at, size = entry
+        self._bytes -= size
+        slot = self._expiry_slots.get(int(expires_at))
+        if slot is not None:
+            slot.discard(key)
+            if not slot:
+                del self._expiry_slots[int(expires_at)]
+        return True
+
+
 # In-memory fallback cache
-_memory_cache: dict = {}
-_cache_timestamps: dict = {}
+_memory_cache = MemoryCache(stats=stats)
+
+# While open, Redis is skipped and every call goes to the memory cache
+redis_breaker = get_breaker("redis")
+
+
+def _redis_ok() -> bool:
+    """True if Redis is configured and its circuit breaker allows a call."""
+    return bool(redis_client) and redis_breaker.allow_request()
+
+
+@contextmanager
+def _redis_call(operation: str):
+    """Time a Redis call and report its outcome to the breaker."""
+    with stats.timed(operation):
+        try:
+            yield
+        except Exception:
+            redis_breaker.record_failure()
+            raise
+    redis_breaker.record_success()
 
 
 def cache_set(key: str, value: Any, ttl: int = 3600) -> bool:
@@ -41,7 +295,8 @@ def cache_set(key: str, value: Any, ttl: int = 3600) -> bool:
 
     Args:
         key: Cache key
-        value: Value to cache (must be JSON-serializable)
+        value: Value to cache (must be JSON-serializable); stored in Redis
+            via cache_codec (msgpack, zstd-compressed when large)
         ttl: Time to live in seconds (default: 3600)
 
     Returns:
@@ -49,21 +304,19 @@ def cache_set(key: str, value: Any, ttl: int = 3600) -> bool:
     """
     try:
         # Try Redis first
-        if redis_client:
+        if _redis_ok():
             try:
-                redis_client.setex(
-                    key,
-                    ttl,
-                    json.dumps(value)
-                )
+                encoded = _encode(value)
+                with _redis_call("setex"):
+                    redis_client.setex(key, ttl, encoded)
+                stats.set(key, len(encoded))
                 return True
             except Exception as e:
+                stats.error(key)
                 logger.warning(f"Redis set failed: {e}, using memory cache")
 
         # Fallback to in-memory cache
-        _memory_cache[key] = value
-        _cache_timestamps[key] = datetime.now() + timedelta(seconds=ttl)
-        return True
+        return _memory_cache.set(key, value, ttl)
 
     except Exception as e:
         logger.error(f"Cache set error: {e}")
@@ -78,32 +331,39 @@ def cache_get(key: str) -> Optional[Any]:
         key: Cache key
 
     Returns:
-        Cached value or None if not found/expired
+        Cached value or None if not found/expired (an empty result
+        cached by cache_get_or_load is returned as that empty value)
+    """
+    return _unwrap(_cache_get(key, record=True))
+
+
+def _cache_get(key: str, record: bool) -> Optional[Any]:
+    """
+    cache_get() body. Internal re-checks (single-flight waiters) pass
+    record=False so one logical lookup counts as one hit or miss.
     """
     try:
         # Try Redis first
-        if redis_client:
+        if _redis_ok():
             try:
-                cached = redis_client.get(key)
+                with _redis_call("get"):
+                    cached = redis_client.get(key)
                 if cached:
-                    return json.loads(cached)
+                    if record:
+                        stats.hit(key, len(cached))
+                    return _decode(cached)
             except Exception as e:
+                stats.error(key)
                 logger.warning(f"Redis get failed: {e}, using memory cache")
 
         # Fallback to in-memory cache
-        if key in _memory_cache:
-            # Check if expired
-            if key in _cache_timestamps:
-                if datetime.now() < _cache_timestamps[key]:
-                    return _memory_cache[key]
-                else:
-                    # Expired, remove it
-                    del _memory_cache[key]
-                    del _cache_timestamps[key]
+        value = _memory_cache.get(key)
+        if record:
+            if value is None:
+                stats.miss(key)
             else:
-                return _memory_cache[key]
-
-        return None
+                stats.hit(key)
+        return value
 
     except Exception as e:
         logger.error(f"Cache get error: {e}")
@@ -121,16 +381,144 @@ def cache_delete(key: str) -> bool:
         bool: True if successful
     """
     try:
-        if redis_client:
+        if _redis_ok():
+            try:
+                with _redis_call("delete"):
+                    redis_client.delete(key)
+            except Exception:
+                stats.error(key)
+
+        _memory_cache.delete(key)
+        stats.delete(key)
+
+        return True
+
+    except Exception:
+        return False
+
+
+def cache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Get several values in one round-trip (Redis MGET).
+
+    Args:
+        keys: Cache keys
+
+    Returns:
+        Dict of key -> value for the keys that were found; missing or
+        expired keys are left out (empty results cached by
+        cache_get_or_load are returned as their empty value)
+    """
+    return _unwrap_many(_cache_get_many(keys))
+
+
+def _cache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """cache_get_many() body, returning negative entries as stored."""
+    keys = list(dict.fromkeys(keys))
+    found: Dict[str, Any] = {}
+    if not keys:
+        return found
+    try:
+        if _redis_ok():
+            try:
+                with _redis_call("mget"):
+                    values = redis_client.mget(keys)
+                for key, cached in zip(keys, values):
+                    if cached:
+                        stats.hit(key, len(cached))
+                        found[key] = _decode(cached)
+            except Exception as e:
+                for key in keys:
+                    stats.error(key)
+                logger.warning(f"Redis mget failed: {e}, using memory cache")
+
+        # Fallback to in-memory cache for anything Redis did not return
+        for key in keys:
+            if key not in found:
+                value = _memory_cache.get(key)
+                if value is None:
+                    stats.miss(key)
+                else:
+                    stats.hit(key)
+                    found[key] = value
+        return found
+
+    except Exception as e:
+        logger.error(f"Cache get_many error: {e}")
+        return found
+
+
+def cache_set_many(items: Dict[str, Any], ttl: int = 3600) -> bool:
+    """
+    Set several values with the same TTL in one round-trip (pipeline).
+
+    Args:
+        items: Dict of cache key -> value (must be JSON-serializable)
+        ttl: Time to live in seconds (default: 3600)
+
+    Returns:
+        bool: True if every value was stored
+    """
+    if not items:
+        return True
+    try:
+        if _redis_ok():
+            try:
+                encoded = {
+                    key: _encode(value) for key, value in items.items()
+                }
+                pipe = redis_client.pipeline(transaction=False)
+                for key, data in encoded.items():
+                    pipe.setex(key, ttl, data)
+                with _redis_call("pipeline_setex"):
+                    pipe.execute()
+                for key, data in encoded.items():
+                    stats.set(key, len(data))
+                return True
+            except Exception as e:
+                for key in items:
+                    stats.error(key)
+                logger.warning(
+                    f"Redis pipeline set failed: {e}, using memory cache"
+                )
+
+        # Fallback to in-memory cache
+        results = [
+            _memory_cache.set(key, value, ttl)
+            for key, value in items.items()
+        ]
+        return all(results)
+
+    except Exception as e:
+        logger.error(f"Cache set_many error: {e}")
+        return False
+
+
+def cache_delete_many(keys: Iterable[str]) -> bool:
+    """
+    Delete several values in one round-trip.
+
+    Args:
+        keys: Cache keys
+
+    Returns:
+        bool: True if successful
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return True
+    try:
+        if _redis_ok():
             try:
-                redis_client.delete(key)
+                with _redis_call("delete"):
+                    redis_client.delete(*keys)
             except Exception:
-                pass
+                for key in keys:
+                    stats.error(key)
 
-        if key in _memory_cache:
-            del _memory_cache[key]
-        if key in _cache_timestamps:
-            del _cache_timestamps[key]
+        for key in keys:
+            _memory_cache.delete(key)
+            stats.delete(key)
 
         return True
 
@@ -138,6 +526,666 @@ def cache_delete(key: str) -> bool:
         return False
 
 
+def cache_incr(key: str, amount: int = 1, ttl: int = 3600) -> Optional[int]:
+    """
+    Atomically increment an integer counter and reset its TTL.
+
+    Args:
+        key: Cache key
+        amount: Amount to add (default: 1)
+        ttl: Time to live in seconds (default: 3600)
+
+    Returns:
+        The new value, or None on error
+    """
+    try:
+        if _redis_ok():
+            try:
+                pipe = redis_client.pipeline(transaction=True)
+                pipe.incrby(key, amount)
+                pipe.expire(key, ttl)
+                with _redis_call("incr"):
+                    value, _ = pipe.execute()
+                stats.set(key)
+                return int(value)
+            except Exception as e:
+                stats.error(key)
+                logger.warning(f"Redis incr failed: {e}, using memory cache")
+
+        return _memory_cache.incr(key, amount, ttl)
+
+    except Exception as e:
+        logger.error(f"Cache incr error: {e}")
+        return None
+
+
+def get_mastery_generation(user_id: str) -> int:
+    """
+    Current mastery generation for a user (0 if never bumped).
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        int: Generation to embed in readiness cache keys
+    """
+    value = cache_get(mastery_generation_key(user_id))
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def bump_mastery_generation(user_id: str) -> Optional[int]:
+    """
+    Invalidate every cached readiness entry for a user.
+
+    Call after any write to the user's mastery scores.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        The new generation, or None on error
+    """
+    if not user_id:
+        return None
+    return cache_incr(
+        mastery_generation_key(user_id), ttl=MASTERY_GENERATION_TTL
+    )
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Snapshot of cache counters for this worker process.
+
+    Returns:
+        Dict with the backend in use, memory cache size, per-prefix
+        counters (hits, misses, hit_rate, sets, bytes, evictions, ...) and
+        Redis latency histograms
+    """
+    snapshot = stats.snapshot()
+    snapshot["backend"] = "redis" if redis_client else "memory"
+    snapshot["memory_cache"] = {
+        "entries": len(_memory_cache),
+        "bytes": _memory_cache.size_bytes,
+        "max_entries": _memory_cache.max_entries,
+        "max_bytes": _memory_cache.max_bytes,
+        "evictions": _memory_cache.evictions,
+        "expirations": _memory_cache.expirations,
+    }
+    return snapshot
+
+
+def reset_cache_stats():
+    """Clear the per-prefix counters (memory cache totals are kept)."""
+    stats.reset()
+
+
+# Wrapper stored for empty loader results (negative cache entries)
+_NEGATIVE_KEY = "__cache_empty__"
+
+# Compare-and-delete so a worker only releases the lease it still owns
+_RELEASE_LOCK_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then "
+    "return redis.call('del', KEYS[1]) else return 0 end"
+)
+
+# Per-key in-process locks: key -> [lock, number of threads using it]
+_inflight_locks: dict = {}
+_inflight_guard = threading.Lock()
+
+
+def _is_empty(value: Any) -> bool:
+    """Return True for results worth caching only briefly."""
+    if value is None:
+        return True
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+def _unwrap(cached: Any) -> Any:
+    """Turn a negative cache entry back into the empty value it stands for."""
+    if (isinstance(cached, dict) and len(cached) == 1 and
+            _NEGATIVE_KEY in cached):
+        return cached[_NEGATIVE_KEY]
+    return cached
+
+
+def _unwrap_many(found: Dict[str, Any]) -> Dict[str, Any]:
+    """_unwrap() every value; a cached None counts as not found."""
+    values = {key: _unwrap(cached) for key, cached in found.items()}
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def _acquire_key_lock(key: str) -> threading.Lock:
+    with _inflight_guard:
+        slot = _inflight_locks.get(key)
+        if slot is None:
+            slot = [threading.Lock(), 0]
+            _inflight_locks[key] = slot
+        slot[1] += 1
+    return slot[0]
+
+
+def _release_key_lock(key: str):
+    with _inflight_guard:
+        slot = _inflight_locks.get(key)
+        if slot is not None:
+            slot[1] -= 1
+            if slot[1] <= 0:
+                del _inflight_locks[key]
+
+
+def _acquire_redis_lease(key: str) -> Optional[str]:
+    """
+    Try to take the cross-worker loader lease for a key.
+
+    Returns:
+        The lease token if acquired (or Redis is unavailable, so the caller
+        should load), None if another worker already holds the lease.
+    """
+    token = uuid4().hex
+    if not _redis_ok():
+        return token
+    try:
+        with _redis_call("set_nx"):
+            acquired = redis_client.set(
+                f"lock:{key}", token, nx=True, px=CACHE_LOCK_LEASE_MS
+            )
+        return token if acquired else None
+    except Exception as e:
+        logger.warning(f"Redis lock failed: {e}, loading without lease")
+        return token
+
+
+def _release_redis_lease(key: str, token: str):
+    if not _redis_ok():
+        return
+    try:
+        with _redis_call("eval"):
+            redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        logger.warning(f"Redis lock release failed: {e}")
+
+
+def _wait_for_other_worker(key: str) -> Optional[Any]:
+    """Poll the cache while another worker holds the lease for key."""
+    deadline = time.monotonic() + CACHE_LOCK_LEASE_MS / 1000.0
+    while time.monotonic() < deadline:
+        time.sleep(CACHE_LOCK_POLL_INTERVAL)
+        cached = _cache_get(key, record=False)
+        if cached is not None:
+            return cached
+    return None
+
+
+def cache_get_or_load(
+    key: str,
+    loader: Callable[[], Any],
+    ttl: int = 3600,
+    negative_ttl: int = 30
+) -> Any:
+    """
+    Get a value from cache, calling loader on a miss.
+
+    Concurrent misses for the same key are collapsed into one loader call:
+    threads in this process wait on a per-key lock, and other workers wait
+    on a Redis lease (lock:{key}) while polling the cache. Empty results
+    (None, [], {}, "") are cached for negative_ttl seconds so a topic with
+    no rows does not hit the database on every message.
+
+    Exceptions raised by loader propagate and nothing is cached.
+
+    Args:
+        key: Cache key
+        loader: Zero-argument function that produces the value
+        ttl: Time to live in seconds for non-empty values
+        negative_ttl: Time to live in seconds for empty values
+            (0 disables negative caching)
+
+    Returns:
+        Cached or freshly loaded value
+    """
+    # Read the stored entry, so a cached empty None is still a hit
+    cached = _cache_get(key, record=True)
+    if cached is not None:
+        return _unwrap(cached)
+
+    lock = _acquire_key_lock(key)
+    try:
+        with lock:
+            # Another thread may have loaded it while we waited
+            cached = _cache_get(key, record=False)
+            if cached is not None:
+                return _unwrap(cached)
+
+            token = _acquire_redis_lease(key)
+            if token is None:
+                cached = _wait_for_other_worker(key)
+                if cached is not None:
+                    return _unwrap(cached)
+                # Lease holder died or is too slow; load it ourselves
+                token = _acquire_redis_lease(key) or uuid4().hex
+
+            try:
+                value = loader()
+                if _is_empty(value):
+                    if negative_ttl > 0:
+                        cache_set(key, {_NEGATIVE_KEY: value}, negative_ttl)
+                else:
+                    cache_set(key, value, ttl)
+                return value
+            finally:
+                _release_redis_lease(key, token)
+    finally:
+        _release_key_lock(key)
+
+
+# ---------------------------------------------------------------------
+# Async API (for code running on the event loop)
+#
+# Same semantics as the functions above: Redis first, bounded in-memory
+# fallback, same codec and counters. The memory cache is in-process and
+# O(1), so it is called directly without leaving the loop.
+# ---------------------------------------------------------------------
+
+_async_client = None
+_async_client_loop = None
+# key -> Future for loads in progress on this worker's event loop
+_async_inflight: Dict[str, "asyncio.Future"] = {}
+# close() tasks of clients replaced after a loop change
+_closing_clients: set = set()
+
+
+def _get_async_redis():
+    """
+    Return the shared redis.asyncio client for the running loop.
+
+    Returns None when Redis is not configured or its breaker is open, so
+    callers use the memory cache exactly like the sync API does. The
+    client (and its connection pool) is created on first use and rebuilt
+    if the loop changes; the previous client is closed, not leaked.
+    """
+    global _async_client, _async_client_loop
+    if redis_asyncio is None or not _redis_ok():
+        return None
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        if _async_client is not None:
+            _close_previous_client(_async_client, _async_client_loop)
+        _async_client = redis_asyncio.from_url(
+            os.getenv("REDIS_URL"),
+            max_connections=CACHE_ASYNC_MAX_CONNECTIONS,
+            socket_timeout=CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=CACHE_REDIS_TIMEOUT
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def _close_client(client) -> None:
+    try:
+        close = getattr(client, "aclose", None) or client.close
+        await close()
+    except Exception as e:
+        logger.warning(f"Async Redis close failed: {e}")
+
+
+def _close_previous_client(client, loop) -> None:
+    """
+    Close a client built for another event loop.
+
+    Its connections belong to that loop, so the close runs there while
+    the loop is alive; otherwise it is attempted on the running loop.
+    """
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_close_client(client), loop)
+        return
+    task = asyncio.get_running_loop().create_task(_close_client(client))
+    _closing_clients.add(task)
+    task.add_done_callback(_closing_clients.discard)
+
+
+async def acache_close():
+    """Close the shared async Redis client (call on app shutdown)."""
+    global _async_client, _async_client_loop
+    client, _async_client, _async_client_loop = _async_client, None, None
+    if client is None:
+        return
+    await _close_client(client)
+
+
+async def acache_set(key: str, value: Any, ttl: int = 3600) -> bool:
+    """
+    Async cache_set().
+
+    Args:
+        key: Cache key
+        value: Value to cache (must be JSON-serializable)
+        ttl: Time to live in seconds (default: 3600)
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        client = _get_async_redis()
+        if client:
+            try:
+                encoded = _encode(value)
+                with _redis_call("setex"):
+                    await client.setex(key, ttl, encoded)
+                stats.set(key, len(encoded))
+                return True
+            except Exception as e:
+                stats.error(key)
+                logger.warning(f"Redis set failed: {e}, using memory cache")
+
+        return _memory_cache.set(key, value, ttl)
+
+    except Exception as e:
+        logger.error(f"Cache set error: {e}")
+        return False
+
+
+async def acache_get(key: str) -> Optional[Any]:
+    """
+    Async cache_get().
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Cached value or None if not found/expired (an empty result
+        cached by acache_get_or_load is returned as that empty value)
+    """
+    return _unwrap(await _acache_get(key, record=True))
+
+
+async def _acache_get(key: str, record: bool) -> Optional[Any]:
+    try:
+        client = _get_async_redis()
+        if client:
+            try:
+                with _redis_call("get"):
+                    cached = await client.get(key)
+                if cached:
+                    if record:
+                        stats.hit(key, len(cached))
+                    return _decode(cached)
+            except Exception as e:
+                stats.error(key)
+                logger.warning(f"Redis get failed: {e}, using memory cache")
+
+        value = _memory_cache.get(key)
+        if record:
+            if value is None:
+                stats.miss(key)
+            else:
+                stats.hit(key)
+        return value
+
+    except Exception as e:
+        logger.error(f"Cache get error: {e}")
+        return None
+
+
+async def acache_delete(key: str) -> bool:
+    """
+    Async cache_delete().
+
+    Args:
+        key: Cache key
+
+    Returns:
+        bool: True if successful
+    """
+    return await acache_delete_many([key])
+
+
+async def acache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Async cache_get_many() (one MGET).
+
+    Args:
+        keys: Cache keys
+
+    Returns:
+        Dict of key -> value for the keys that were found
+    """
+    return _unwrap_many(await _acache_get_many(keys))
+
+
+async def _acache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    keys = list(dict.fromkeys(keys))
+    found: Dict[str, Any] = {}
+    if not keys:
+        return found
+    try:
+        client = _get_async_redis()
+        if client:
+            try:
+                with _redis_call("mget"):
+                    values = await client.mget(keys)
+                for key, cached in zip(keys, values):
+                    if cached:
+                        stats.hit(key, len(cached))
+                        found[key] = _decode(cached)
+            except Exception as e:
+                for key in keys:
+                    stats.error(key)
+                logger.warning(f"Redis mget failed: {e}, using memory cache")
+
+        for key in keys:
+            if key not in found:
+                value = _memory_cache.get(key)
+                if value is None:
+                    stats.miss(key)
+                else:
+                    stats.hit(key)
+                    found[key] = value
+        return found
+
+    except Exception as e:
+        logger.error(f"Cache get_many error: {e}")
+        return found
+
+
+async def acache_set_many(items: Dict[str, Any], ttl: int = 3600) -> bool:
+    """
+    Async cache_set_many() (one pipeline).
+
+    Args:
+        items: Dict of cache key -> value (must be JSON-serializable)
+        ttl: Time to live in seconds (default: 3600)
+
+    Returns:
+        bool: True if every value was stored
+    """
+    if not items:
+        return True
+    try:
+        client = _get_async_redis()
+        if client:
+            try:
+                encoded = {
+                    key: _encode(value) for key, value in items.items()
+                }
+                pipe = client.pipeline(transaction=False)
+                for key, data in encoded.items():
+                    pipe.setex(key, ttl, data)
+                with _redis_call("pipeline_setex"):
+                    await pipe.execute()
+                for key, data in encoded.items():
+                    stats.set(key, len(data))
+                return True
+            except Exception as e:
+                for key in items:
+                    stats.error(key)
+                logger.warning(
+                    f"Redis pipeline set failed: {e}, using memory cache"
+                )
+
+        results = [
+            _memory_cache.set(key, value, ttl)
+            for key, value in items.items()
+        ]
+        return all(results)
+
+    except Exception as e:
+        logger.error(f"Cache set_many error: {e}")
+        return False
+
+
+async def acache_delete_many(keys: Iterable[str]) -> bool:
+    """
+    Async cache_delete_many() (one DEL).
+
+    Args:
+        keys: Cache keys
+
+    Returns:
+        bool: True if successful
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return True
+    try:
+        client = _get_async_redis()
+        if client:
+            try:
+                with _redis_call("delete"):
+                    await client.delete(*keys)
+            except Exception:
+                for key in keys:
+                    stats.error(key)
+
+        for key in keys:
+            _memory_cache.delete(key)
+            stats.delete(key)
+
+        return True
+
+    except Exception:
+        return False
+
+
+async def _aacquire_redis_lease(key: str) -> Optional[str]:
+    token = uuid4().hex
+    client = _get_async_redis()
+    if not client:
+        return token
+    try:
+        with _redis_call("set_nx"):
+            acquired = await client.set(
+                f"lock:{key}", token, nx=True, px=CACHE_LOCK_LEASE_MS
+            )
+        return token if acquired else None
+    except Exception as e:
+        logger.warning(f"Redis lock failed: {e}, loading without lease")
+        return token
+
+
+async def _arelease_redis_lease(key: str, token: str):
+    client = _get_async_redis()
+    if not client:
+        return
+    try:
+        with _redis_call("eval"):
+            await client.eval(
+                _RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token
+            )
+    except Exception as e:
+        logger.warning(f"Redis lock release failed: {e}")
+
+
+async def _await_other_worker(key: str) -> Optional[Any]:
+    deadline = time.monotonic() + CACHE_LOCK_LEASE_MS / 1000.0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CACHE_LOCK_POLL_INTERVAL)
+        cached = await _acache_get(key, record=False)
+        if cached is not None:
+            return cached
+    return None
+
+
+async def acache_get_or_load(
+    key: str,
+    loader: Callable[[], Union[Any, Awaitable[Any]]],
+    ttl: int = 3600,
+    negative_ttl: int = 30
+) -> Any:
+    """
+    Async cache_get_or_load().
+
+    Concurrent misses on this worker's event loop await one shared load;
+    other workers are coordinated through the same Redis lease as the sync
+    API. Empty results are cached for negative_ttl seconds, and loader
+    exceptions propagate to every waiter without caching anything.
+
+    Args:
+        key: Cache key
+        loader: Zero-argument function or coroutine function
+        ttl: Time to live in seconds for non-empty values
+        negative_ttl: Time to live in seconds for empty values
+            (0 disables negative caching)
+
+    Returns:
+        Cached or freshly loaded value
+    """
+    # Read the stored entry, so a cached empty None is still a hit
+    cached = await _acache_get(key, record=True)
+    if cached is not None:
+        return _unwrap(cached)
+
+    # The load runs in its own task, so a cancelled caller (the first
+    # one included) never cancels it for the others awaiting it
+    inflight = _async_inflight.get(key)
+    if inflight is None:
+        inflight = asyncio.ensure_future(
+            _aload(key, loader, ttl, negative_ttl)
+        )
+        _async_inflight[key] = inflight
+        inflight.add_done_callback(
+            lambda task: _forget_inflight(_async_inflight, key, task)
+        )
+    return await asyncio.shield(inflight)
+
+
+def _forget_inflight(inflight: Dict, key: str, task: "asyncio.Future"):
+    """Drop a finished load; its result now lives in the cache."""
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        # Mark retrieved so an unawaited failure is not logged by asyncio
+        task.exception()
+
+
+async def _aload(key, loader, ttl, negative_ttl):
+    token = await _aacquire_redis_lease(key)
+    if token is None:
+        cached = await _await_other_worker(key)
+        if cached is not None:
+            return _unwrap(cached)
+        # Lease holder died or is too slow; load it ourselves
+        token = await _aacquire_redis_lease(key) or uuid4().hex
+
+    try:
+        value = loader()
+        if inspect.isawaitable(value):
+            value = await value
+        if _is_empty(value):
+            if negative_ttl > 0:
+                await acache_set(key, {_NEGATIVE_KEY: value}, negative_ttl)
+        else:
+            await acache_set(key, value, ttl)
+        return value
+    finally:
+        await _arelease_redis_lease(key, token)
+
+
 def _hash_string(text: str) -> str:
     """Generate a short hash for cache keys."""
-    return hashlib.md5(text.encode()).hexdigest()[:12]
+    return stable_hash(text)
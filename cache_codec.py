@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Value codecs for the Redis cache tier.
+
+Encoded values start with a two-byte header:
+
+    byte 0: format version (FORMAT_VERSION)
+    byte 1: flags - low nibble is the serializer id, FLAG_ZSTD marks a
+            zstd-compressed body
+
+Values written before the codec existed are plain JSON text, which never
+starts with a control byte, so decode() still reads them. This lets
+workers be upgraded one at a time against a shared Redis.
+"""
+
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT_VERSION = 1
+FLAG_ZSTD = 0x10
+SERIALIZER_MASK = 0x0F
+
+SERIALIZER_JSON = 0
+SERIALIZER_MSGPACK = 1
+
+# Serializer for new writes: "msgpack" (default when installed) or "json"
+CACHE_CODEC = os.getenv("CACHE_CODEC", "msgpack").lower()
+# Bodies at least this many bytes are zstd-compressed (0 disables)
+CACHE_COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))
+CACHE_ZSTD_LEVEL = int(os.getenv("CACHE_ZSTD_LEVEL", "3"))
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+# serializer id -> (dumps, loads)
+SERIALIZERS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]
+SERIALIZERS = {SERIALIZER_JSON: (_json_dumps, _json_loads)}
+if msgpack is not None:
+    SERIALIZERS[SERIALIZER_MSGPACK] = (_msgpack_dumps, _msgpack_loads)
+
+# zstd (de)compressor objects must not be shared between threads
+_zstd_local = threading.local()
+
+
+def _compressor():
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = zstandard.ZstdCompressor(level=CACHE_ZSTD_LEVEL)
+        _zstd_local.compressor = compressor
+    return compressor
+
+
+def _decompressor():
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = zstandard.ZstdDecompressor()
+        _zstd_local.decompressor = decompressor
+    return decompressor
+
+
+class CacheCodec:
+    """
+    Serializes cache values to bytes, compressing large bodies with zstd.
+    """
+
+    def __init__(
+        self,
+        serializer: int = SERIALIZER_JSON,
+        compress_threshold: int = CACHE_COMPRESS_THRESHOLD
+    ):
+        """
+        Initialize CacheCodec.
+
+        Args:
+            serializer: Serializer id used for new writes
+            compress_threshold: Minimum body size in bytes to compress
+                (0 disables compression)
+        """
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        self.serializer = serializer
+        self.compress_threshold = compress_threshold
+
+    def encode(self, value: Any) -> bytes:
+        """
+        Encode a value for storage.
+
+        Args:
+            value: JSON-compatible value
+
+        Returns:
+            Header followed by the (possibly compressed) body
+        """
+        dumps, _ = SERIALIZERS[self.serializer]
+        body = dumps(value)
+        flags = self.serializer
+        if (
+            zstandard is not None
+            and self.compress_threshold > 0
+            and len(body) >= self.compress_threshold
+        ):
+            compressed = _compressor().compress(body)
+            # Short or high-entropy bodies can grow; keep whichever is smaller
+            if len(compressed) < len(body):
+                body = compressed
+                flags |= FLAG_ZSTD
+        return bytes((FORMAT_VERSION, flags)) + body
+
+    def decode(self, data: Any) -> Any:
+        """
+        Decode a stored value.
+
+        Args:
+            data: Bytes written by encode(), or legacy JSON text
+
+        Returns:
+            Decoded value
+
+        Raises:
+            ValueError: If the header names an unknown version or serializer
+        """
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data or data[0] >= 0x20:
+            # Legacy entry written as plain json.dumps text
+            return json.loads(data)
+        if data[0] != FORMAT_VERSION or len(data) < 2:
+            raise ValueError(f"Unknown cache format version: {data[0]}")
+
+        flags = data[1]
+        serializer = SERIALIZERS.get(flags & SERIALIZER_MASK)
+        if serializer is None:
+            raise ValueError(
+                f"Unknown cache serializer: {flags & SERIALIZER_MASK}"
+            )
+        body = data[2:]
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise ValueError("zstd-compressed entry but zstandard missing")
+            body = _decompressor().decompress(body)
+        return serializer[1](body)
+
+
+def _default_serializer() -> int:
+    if CACHE_CODEC == "msgpack" and msgpack is not None:
+        return SERIALIZER_MSGPACK
+    if CACHE_CODEC not in ("json", "msgpack"):
+        logger.warning(
+            f"[WARNING] Unknown CACHE_CODEC '{CACHE_CODEC}', using json"
+        )
+    return SERIALIZER_JSON
+
+
+default_codec = CacheCodec(serializer=_default_serializer())
+
+
+def encode(value: Any) -> bytes:
+    """Encode a value with the default codec."""
+    return default_codec.encode(value)
+
+
+def decode(data: Any) -> Any:
+    """Decode a value written by any codec version (or legacy JSON)."""
+    return default_codec.decode(data)
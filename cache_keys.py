@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Cache key builders for the AI Tutor system.
+
+All tutor cache keys are built here so every worker and restart produces
+the same key for the same inputs. Hashes are md5 of a canonical string;
+never use Python's hash(), which is salted per process.
+
+Readiness entries embed the user's mastery generation. Any mastery write
+bumps the generation (see cache.bump_mastery_generation), which orphans
+every readiness entry for that user in O(1); the old entries simply age
+out with their TTL.
+"""
+
+import hashlib
+from typing import Any, Iterable
+
+
+def stable_hash(text: str, length: int = 12) -> str:
+    """
+    Hash text into a short, process-independent key fragment.
+
+    Args:
+        text: Text to hash
+        length: Number of hex characters to keep (max 32)
+
+    Returns:
+        Hex digest prefix
+    """
+    return hashlib.md5(text.encode("utf-8")).hexdigest()[:length]
+
+
+def concept_ids_hash(concept_ids: Iterable[Any]) -> str:
+    """
+    Hash a set of concept IDs independent of order and int/str type.
+
+    Args:
+        concept_ids: Concept IDs
+
+    Returns:
+        Hex digest prefix
+    """
+    canonical = sorted({str(cid) for cid in concept_ids})
+    return stable_hash(":".join(canonical))
+
+
+def lesson_key(topic_id: Any) -> str:
+    """Lesson text for a topic (FetchLesson)."""
+    return f"lesson:{topic_id}"
+
+
+def concept_search_key(subject_id: Any, message: str) -> str:
+    """Embedding-search concept rows for a message (FetchConcepts)."""
+    return f"concepts:{subject_id}:{stable_hash(message, 32)}"
+
+
+def all_concepts_ordered_key(topic_id: Any) -> str:
+    """Topic concepts sorted by concept_id (ComputeLearningPath)."""
+    return f"all_concepts_ordered:{topic_id}"
+
+
+def shown_concepts_key(user_id: str, topic_id: Any) -> str:
+    """Concept IDs already recommended to a user for a topic."""
+    return f"shown_concepts:{user_id}:{topic_id}"
+
+
+def shown_concepts_bits_key(user_id: str, topic_id: Any) -> str:
+    """Bitset of the topic bundle's path concepts shown to a user."""
+    return f"shown_concepts_bits:{user_id}:{topic_id}"
+
+
+def topic_bundle_key(topic_id: Any, schema: int) -> str:
+    """Lesson, concept pool and subject of a topic (topic_bundle)."""
+    return f"topic_bundle:v{schema}:{topic_id}"
+
+
+def history_key(conversation_id: str) -> str:
+    """Conversation history rows."""
+    return f"history:{conversation_id}"
+
+
+def conversation_key(conversation_id: str) -> str:
+    """Redis list of a conversation's recent messages (ConversationStore)."""
+    return f"conversation:{conversation_id}"
+
+
+def conversation_meta_key(conversation_id: str) -> str:
+    """Redis hash with a conversation's message total and summary."""
+    return f"conversation_meta:{conversation_id}"
+
+
+def reasoning_classify_key(message: str) -> str:
+    """Reasoning label for a student message."""
+    return f"reasoning_classify:{stable_hash(message, 16)}"
+
+
+def semantic_answer_key(topic_id: Any, style: str, question: str) -> str:
+    """Tutor answer to a normalized question (SemanticAnswerCache)."""
+    return f"semantic_answer:{topic_id}:{style}:{stable_hash(question, 32)}"
+
+
+def idempotency_key(scope: str, user_id: str, token: str) -> str:
+    """Completed response for an idempotent request (IdempotencyStore)."""
+    return f"idempotency:{scope}:{user_id}:{token}"
+
+
+def mastery_generation_key(user_id: str) -> str:
+    """Counter bumped on every mastery write for a user."""
+    return f"mastery_gen:{user_id}"
+
+
+def readiness_key(
+    user_id: str,
+    concept_ids: Iterable[Any],
+    generation: int = 0
+) -> str:
+    """
+    Readiness result for a user and set of concepts.
+
+    Args:
+        user_id: User ID
+        concept_ids: Concept IDs the readiness was computed for
+        generation: User's current mastery generation
+
+    Returns:
+        Cache key
+    """
+    return (
+        f"readiness:{user_id}:g{generation}:{concept_ids_hash(concept_ids)}"
+    )
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Per-key-prefix cache counters for the AI Tutor caching layer.
+
+Keys are grouped by the text before the first ':' (lesson, concepts,
+readiness, reasoning_classify, ...). For each prefix we count hits,
+misses, sets, deletes, evictions, expirations and serialized bytes.
+Redis call latency is kept per operation as a fixed-bucket histogram.
+
+Counters are per worker process and reset on restart.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+# Upper bounds (ms) of the Redis latency histogram buckets; the last
+# bucket counts everything slower
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+_COUNTERS = (
+    "hits", "misses", "sets", "deletes", "evictions", "expirations",
+    "bytes_read", "bytes_written", "errors",
+)
+
+
+def key_prefix(key: str) -> str:
+    """Return the counter group for a cache key."""
+    return key.split(":", 1)[0]
+
+
+def _new_counters() -> Dict[str, int]:
+    return dict.fromkeys(_COUNTERS, 0)
+
+
+class CacheStats:
+    """
+    Thread-safe cache counters grouped by key prefix.
+    """
+
+    def __init__(self):
+        """Initialize CacheStats with empty counters."""
+        self._lock = threading.Lock()
+        self._prefixes: Dict[str, Dict[str, int]] = defaultdict(
+            _new_counters
+        )
+        # operation -> {"buckets": [...], "count": n, "sum_ms": total}
+        self._latency: Dict[str, Dict] = {}
+
+    def _add(self, key: str, counter: str, amount: int = 1):
+        with self._lock:
+            self._prefixes[key_prefix(key)][counter] += amount
+
+    def hit(self, key: str, nbytes: int = 0):
+        """Record a cache hit (nbytes read from Redis, if any)."""
+        with self._lock:
+            counters = self._prefixes[key_prefix(key)]
+            counters["hits"] += 1
+            counters["bytes_read"] += nbytes
+
+    def miss(self, key: str):
+        """Record a cache miss."""
+        self._add(key, "misses")
+
+    def set(self, key: str, nbytes: int = 0):
+        """Record a write of nbytes serialized bytes."""
+        with self._lock:
+            counters = self._prefixes[key_prefix(key)]
+            counters["sets"] += 1
+            counters["bytes_written"] += nbytes
+
+    def delete(self, key: str):
+        """Record a delete."""
+        self._add(key, "deletes")
+
+    def eviction(self, key: str):
+        """Record an LRU eviction from the memory cache."""
+        self._add(key, "evictions")
+
+    def expiration(self, key: str):
+        """Record a TTL expiry in the memory cache."""
+        self._add(key, "expirations")
+
+    def error(self, key: str):
+        """Record a failed Redis call for a key."""
+        self._add(key, "errors")
+
+    def observe_latency(self, operation: str, seconds: float):
+        """
+        Add one Redis call duration to the histogram for an operation.
+
+        Args:
+            operation: Redis operation name (get, mget, setex, ...)
+            seconds: Duration in seconds
+        """
+        elapsed_ms = seconds * 1000.0
+        index = bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            histogram = self._latency.get(operation)
+            if histogram is None:
+                histogram = {
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    "count": 0,
+                    "sum_ms": 0.0,
+                }
+                self._latency[operation] = histogram
+            histogram["buckets"][index] += 1
+            histogram["count"] += 1
+            histogram["sum_ms"] += elapsed_ms
+
+    @contextmanager
+    def timed(self, operation: str):
+        """Context manager that records the duration of a Redis call."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_latency(operation, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict:
+        """
+        Return a JSON-serializable copy of all counters.
+
+        Returns:
+            Dict with "prefixes" (counters plus hit_rate per prefix) and
+            "redis_latency_ms" (histogram per operation)
+        """
+        with self._lock:
+            prefixes = {}
+            for prefix, counters in sorted(self._prefixes.items()):
+                row = dict(counters)
+                lookups = row["hits"] + row["misses"]
+                row["hit_rate"] = (
+                    round(row["hits"] / lookups, 4) if lookups else None
+                )
+                prefixes[prefix] = row
+
+            latency = {}
+            for operation, histogram in sorted(self._latency.items()):
+                bounds = [str(b) for b in LATENCY_BUCKETS_MS] + ["+Inf"]
+                count = histogram["count"]
+                latency[operation] = {
+                    "count": count,
+                    "avg_ms": (
+                        round(histogram["sum_ms"] / count, 3)
+                        if count else None
+                    ),
+                    "sum_ms": histogram["sum_ms"],
+                    "buckets": dict(zip(bounds, histogram["buckets"])),
+                }
+        return {"prefixes": prefixes, "redis_latency_ms": latency}
+
+    def reset(self):
+        """Clear all counters."""
+        with self._lock:
+            self._prefixes.clear()
+            self._latency.clear()
+
+
+# Process-wide counters used by cache.py
+stats = CacheStats()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Cache warm-up for the AI Tutor.
+
+Pre-populates the cache with the per-topic data the tutor graph reads on
+every first request for a topic, so a fresh deploy or a flushed Redis
+does not send the first students of the day to Supabase:
+
+    lesson:{topic}                 lesson text (FetchLesson)
+    lesson_text:{topic}            lesson text (LessonService)
+    topic_concepts:{topic}         ordered concept pool (ConceptService)
+    all_concepts_ordered:{topic}   first concepts by id (ComputeLearningPath)
+    topic_bundle:v{schema}:{topic} lesson, concepts and subject in one entry
+                                   (FetchTopicBundle)
+    lesson_context:{question}      question context (answer grading)
+
+Topics are either the most talked-about ones in tutor_messages over the
+last few days, or every row in the topics table. Topics load on a bounded
+thread pool and are written with one pipelined cache_set_many per TTL.
+
+Usage:
+    python cache_warmup.py [--all | --top N] [--days D] [--concurrency C]
+                           [--no-questions] [--topics 1,2,3]
+"""
+
+import os
+import time
+import logging
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cache_keys
+from cache import cache_set_many
+from cache_codec import encode
+from topic_bundle import build_bundle, TOPIC_BUNDLE_SCHEMA, TOPIC_BUNDLE_TTL
+
+try:
+    from agents.services.concept_service import TOPIC_CONCEPT_POOL_LIMIT
+except ImportError:
+    TOPIC_CONCEPT_POOL_LIMIT = 200
+
+logger = logging.getLogger(__name__)
+
+# Defaults (also used by the unified_backend startup hook)
+CACHE_WARMUP_TOP = int(os.getenv("CACHE_WARMUP_TOP", "50"))
+CACHE_WARMUP_DAYS = int(os.getenv("CACHE_WARMUP_DAYS", "7"))
+CACHE_WARMUP_CONCURRENCY = int(os.getenv("CACHE_WARMUP_CONCURRENCY", "8"))
+# Rows of tutor_messages scanned to rank topics by popularity
+CACHE_WARMUP_MESSAGE_SCAN = int(
+    os.getenv("CACHE_WARMUP_MESSAGE_SCAN", "5000")
+)
+
+# TTLs match the ones used by the readers of each key
+LESSON_TTL = 3600
+LESSON_TEXT_TTL = 300
+TOPIC_CONCEPTS_TTL = 3600
+ALL_CONCEPTS_ORDERED_TTL = 86400
+LESSON_CONTEXT_TTL = 3600
+# ComputeLearningPath rotates through this many concepts per topic
+LEARNING_PATH_CONCEPTS = 10
+
+Entry = Tuple[str, Any, int]
+
+
+def _topic_id(value: Any) -> Any:
+    """Normalize a topic value (tutor_messages.topic is TEXT)."""
+    text = str(value).strip()
+    return int(text) if text.isdigit() else text
+
+
+def popular_topics(
+    supabase_client,
+    limit: int = CACHE_WARMUP_TOP,
+    days: int = CACHE_WARMUP_DAYS
+) -> List[Any]:
+    """
+    Rank topics by tutor messages sent in the last few days.
+
+    Args:
+        supabase_client: Supabase client instance
+        limit: Maximum number of topics to return
+        days: How far back to look
+
+    Returns:
+        Topic IDs, most messaged first
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    res = (
+        supabase_client.table("tutor_messages")
+        .select("topic")
+        .gte("created_at", since)
+        .order("created_at", desc=True)
+        .limit(CACHE_WARMUP_MESSAGE_SCAN)
+        .execute()
+    )
+    counts = Counter(
+        _topic_id(row["topic"]) for row in (res.data or [])
+        if row.get("topic") not in (None, "")
+    )
+    return [topic for topic, _ in counts.most_common(limit)]
+
+
+def all_topics(supabase_client) -> List[Any]:
+    """
+    Return every topic ID in the topics table.
+
+    Args:
+        supabase_client: Supabase client instance
+
+    Returns:
+        Topic IDs
+    """
+    res = supabase_client.table("topics").select("topic_id").execute()
+    return [
+        row["topic_id"] for row in (res.data or [])
+        if row.get("topic_id") is not None
+    ]
+
+
+def _topic_entries(topic_id: Any, lesson_service, concept_service
+                   ) -> List[Entry]:
+    """Load the cache entries for one topic."""
+    entries: List[Entry] = []
+
+    lesson_text = lesson_service.fetch_lesson_content(str(topic_id))
+    if lesson_text:
+        entries.append(
+            (cache_keys.lesson_key(topic_id), lesson_text, LESSON_TTL)
+        )
+        entries.append(
+            (f"lesson_text:{topic_id}", lesson_text, LESSON_TEXT_TTL)
+        )
+
+    pool = concept_service.fetch_concepts_by_topic(
+        str(topic_id), TOPIC_CONCEPT_POOL_LIMIT, False
+    ) or []
+    if pool:
+        entries.append(
+            (f"topic_concepts:{topic_id}", pool, TOPIC_CONCEPTS_TTL)
+        )
+        ordered = sorted(
+            pool[:LEARNING_PATH_CONCEPTS],
+            key=lambda c: c.get("concept_id", 0)
+        )
+        entries.append((
+            cache_keys.all_concepts_ordered_key(topic_id), ordered,
+            ALL_CONCEPTS_ORDERED_TTL
+        ))
+        # Without the lesson the bundle is built on first use instead
+        if lesson_text:
+            bundle = build_bundle(
+                topic_id, lesson_text, pool,
+                lesson_service.get_subject_id_from_topic(topic_id)
+            )
+            entries.append((
+                cache_keys.topic_bundle_key(topic_id, TOPIC_BUNDLE_SCHEMA),
+                bundle, TOPIC_BUNDLE_TTL
+            ))
+    return entries
+
+
+def _question_entries(supabase_client, topic_ids: List[Any]
+                      ) -> List[Entry]:
+    """Load lesson_context entries for every question of the topics."""
+    res = (
+        supabase_client.table("business_activity_questions")
+        .select("question_id, context")
+        .in_("topic_id", topic_ids)
+        .execute()
+    )
+    return [
+        (f"lesson_context:{row['question_id']}", row["context"],
+         LESSON_CONTEXT_TTL)
+        for row in (res.data or [])
+        if row.get("question_id") is not None and row.get("context")
+    ]
+
+
+def _write(entries: Iterable[Entry]) -> Tuple[int, int]:
+    """Write entries grouped by TTL; return (entries, encoded bytes)."""
+    by_ttl: Dict[int, Dict[str, Any]] = defaultdict(dict)
+    nbytes = 0
+    for key, value, ttl in entries:
+        by_ttl[ttl][key] = value
+        nbytes += len(encode(value))
+    for ttl, items in by_ttl.items():
+        cache_set_many(items, ttl=ttl)
+    return sum(len(items) for items in by_ttl.values()), nbytes
+
+
+def warm_cache(
+    supabase_client,
+    lesson_service,
+    concept_service,
+    topic_ids: Optional[List[Any]] = None,
+    include_all: bool = False,
+    top: int = CACHE_WARMUP_TOP,
+    days: int = CACHE_WARMUP_DAYS,
+    concurrency: int = CACHE_WARMUP_CONCURRENCY,
+    include_questions: bool = True
+) -> Dict[str, Any]:
+    """
+    Load hot topic data from Supabase and write it into the cache.
+
+    A topic that fails to load is skipped and reported; it does not stop
+    the others.
+
+    Args:
+        supabase_client: Supabase client instance
+        lesson_service: LessonService used to load lesson text
+        concept_service: ConceptService used to load topic concepts
+        topic_ids: Explicit topics to warm (skips enumeration)
+        include_all: Warm every topic instead of the most popular
+        top: Number of popular topics to warm
+        days: Popularity window in days
+        concurrency: Maximum topics loaded at the same time
+        include_questions: Also warm question contexts for the topics
+
+    Returns:
+        Dict with topics, entries, bytes, seconds and failed_topics
+    """
+    start = time.perf_counter()
+    if topic_ids is None:
+        if include_all:
+            topic_ids = all_topics(supabase_client)
+        else:
+            topic_ids = popular_topics(supabase_client, top, days)
+
+    entries: List[Entry] = []
+    failed: List[Any] = []
+
+    def load(topic_id):
+        try:
+            return topic_id, _topic_entries(
+                topic_id, lesson_service, concept_service
+            )
+        except Exception as e:
+            logger.warning(
+                f"[WARNING] Cache warm-up failed for topic {topic_id}: {e}"
+            )
+            return topic_id, None
+
+    if topic_ids:
+        workers = max(1, min(concurrency, len(topic_ids)))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="cache-warmup"
+        ) as pool:
+            for topic_id, topic_entries in pool.map(load, topic_ids):
+                if topic_entries is None:
+                    failed.append(topic_id)
+                else:
+                    entries.extend(topic_entries)
+
+        if include_questions:
+            try:
+                entries.extend(_question_entries(supabase_client, topic_ids))
+            except Exception as e:
+                logger.warning(
+                    f"[WARNING] Cache warm-up skipped question contexts: {e}"
+                )
+
+    written, nbytes = _write(entries)
+    return {
+        "topics": len(topic_ids or []),
+        "entries": written,
+        "bytes": nbytes,
+        "seconds": round(time.perf_counter() - start, 3),
+        "failed_topics": failed,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Pre-populate the AI Tutor cache with hot topics."
+    )
+    which = parser.add_mutually_exclusive_group()
+    which.add_argument("--all", action="store_true",
+                       help="warm every topic in the topics table")
+    which.add_argument("--top", type=int, default=CACHE_WARMUP_TOP,
+                       help="number of most-messaged topics to warm")
+    which.add_argument("--topics",
+                       help="comma-separated topic IDs to warm")
+    parser.add_argument("--days", type=int, default=CACHE_WARMUP_DAYS,
+                        help="popularity window in days")
+    parser.add_argument("--concurrency", type=int,
+                        default=CACHE_WARMUP_CONCURRENCY,
+                        help="topics loaded at the same time")
+    parser.add_argument("--no-questions", action="store_true",
+                        help="skip question contexts")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv("config.env")
+
+    from supabase import create_client
+    from agents.ai_tutor_agent import AITutorAgent
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv(
+        "SUPABASE_ANON_KEY"
+    )
+    if not supabase_url or not supabase_key:
+        print("[ERROR] SUPABASE_URL and a Supabase key are required")
+        return 1
+    supabase_client = create_client(supabase_url, supabase_key)
+    services = AITutorAgent(
+        supabase_client=supabase_client
+    ).build_services()
+
+    topic_ids = None
+    if args.topics:
+        topic_ids = [_topic_id(t) for t in args.topics.split(",") if t]
+
+    report = warm_cache(
+        supabase_client,
+        services["lesson"],
+        services["concepts"],
+        topic_ids=topic_ids,
+        include_all=args.all,
+        top=args.top,
+        days=args.days,
+        concurrency=args.concurrency,
+        include_questions=not args.no_questions,
+    )
+    print(
+        f"[OK] Warmed {report['entries']} cache entries for "
+        f"{report['topics']} topics ({report['bytes']} bytes) in "
+        f"{report['seconds']:.2f}s"
+    )
+    if report["failed_topics"]:
+        print(f"[WARNING] Failed topics: {report['failed_topics']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Circuit breakers for external dependencies (Redis, Supabase, OpenAI).
+
+A breaker watches the error rate of calls to one dependency over a
+sliding time window:
+
+    closed     - calls go through; failures are counted
+    open       - error rate crossed the threshold; calls are refused so
+                 callers use their fallback immediately instead of waiting
+                 out timeouts
+    half_open  - after open_seconds one probe call is let through; success
+                 closes the breaker, failure opens it again
+
+Callers ask allow_request() before the call and report the outcome with
+record_success() / record_failure(), or use call() to do all three.
+Breakers are per worker process and shared by name via get_breaker().
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Defaults for every breaker (override per breaker in get_breaker)
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+
+
+class CircuitOpenError(Exception):
+    """Raised by CircuitBreaker.call() when the breaker refuses a call."""
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker with closed/open/half-open states.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS
+    ):
+        """
+        Initialize CircuitBreaker.
+
+        Args:
+            name: Dependency name (shown in /health)
+            failure_rate: Error rate (0-1) in the window that opens it
+            window_seconds: Length of the sliding window in seconds
+            min_calls: Calls needed in the window before it can open
+            open_seconds: Seconds to stay open before probing
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        # (timestamp, failed) for calls inside the window
+        self._calls: deque = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Current state (open past open_seconds reads as half_open)."""
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Return True if a call may go to the dependency now.
+
+        In half_open only one probe is allowed at a time; a probe that never
+        reports back is replaced after open_seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._refresh_state(now)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and (
+                self._probe_started is None or
+                now - self._probe_started >= self.open_seconds
+            ):
+                self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Report a successful call."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                # A call that started before the breaker opened; only a
+                # half-open probe may close it
+                return
+            if self._state == HALF_OPEN:
+                logger.info(f"[OK] Circuit '{self.name}' closed")
+                self._state = CLOSED
+                self._reset_window()
+            self._add(now, failed=False)
+
+    def record_failure(self):
+        """Report a failed call (error or timeout)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            if self._state == OPEN:
+                return
+            self._add(now, failed=True)
+            calls = len(self._calls)
+            if (calls >= self.min_calls and
+                    self._failures / calls >= self.failure_rate):
+                self._open(now)
+
+    def call(
+        self,
+        func: Callable[..., Any],
+        *args,
+        fallback: Optional[Callable[[], Any]] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run func through the breaker.
+
+        Args:
+            func: Function calling the dependency
+            fallback: Optional zero-argument function used when the breaker
+                is open or func raises
+
+        Returns:
+            func's result, or fallback's result
+
+        Raises:
+            CircuitOpenError: If open and no fallback was given
+            Exception: Whatever func raised, if no fallback was given
+        """
+        if not self.allow_request():
+            if fallback is not None:
+                return fallback()
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            if fallback is not None:
+                return fallback()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state for health checks."""
+        now = time.monotonic()
+        with self._lock:
+            self._refresh_state(now)
+            self._trim(now)
+            calls = len(self._calls)
+            return {
+                "state": self._state,
+                "calls_in_window": calls,
+                "failures_in_window": self._failures,
+                "error_rate": (
+                    round(self._failures / calls, 3) if calls else 0.0
+                ),
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_in_seconds": (
+                    round(max(0.0, self._opened_at + self.open_seconds
+                              - now), 1)
+                    if self._state == OPEN else 0.0
+                ),
+            }
+
+    def reset(self):
+        """Force the breaker closed and clear its window."""
+        with self._lock:
+            self._state = CLOSED
+            self._reset_window()
+
+    def _open(self, now: float):
+        if self._state != OPEN:
+            logger.warning(
+                f"[WARNING] Circuit '{self.name}' opened; using fallbacks "
+                f"for {self.open_seconds:.0f}s"
+            )
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self.times_opened += 1
+        self._reset_window()
+
+    def _refresh_state(self, now: float):
+        if (self._state == OPEN and
+                now - self._opened_at >= self.open_seconds):
+            self._state = HALF_OPEN
+            self._probe_started = None
+
+    def _add(self, now: float, failed: bool):
+        self._calls.append((now, failed))
+        if failed:
+            self._failures += 1
+        self._trim(now)
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            _, failed = self._calls.popleft()
+            if failed:
+                self._failures -= 1
+
+    def _reset_window(self):
+        self._calls.clear()
+        self._failures = 0
+        self._probe_started = None
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """
+    Return the process-wide breaker for a dependency, creating it on first
+    use (kwargs are only applied then).
+
+    Args:
+        name: Dependency name, e.g. "redis", "supabase", "openai"
+
+    Returns:
+        CircuitBreaker
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **kwargs)
+            _breakers[name] = breaker
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker, keyed by name."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
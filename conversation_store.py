@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Recent conversation history shared by every worker.
+
+Two tiers:
+    1. an in-process LRU (OrderedDict) of fixed-length deques, bounded to
+       CONVERSATION_STORE_MAX_CONVERSATIONS conversations of
+       CONVERSATION_STORE_MAX_MESSAGES messages each
+    2. optionally, a Redis list per conversation (the cache's Redis
+       client); every turn is RPUSHed and LTRIMmed to the same length in
+       one pipeline, so any worker sees the latest turns
+
+With Redis configured, each read or append is one round trip returning at
+most the (small) message limit, and the local copy mirrors the list;
+without Redis, or while the shared "redis" circuit breaker is open, the
+local tier answers on its own. tutor_messages is only read when neither
+tier has the conversation.
+
+Next to each conversation the store keeps its message total and a rolling
+summary versioned by the number of messages it covers (a Redis hash,
+conversation_meta:{id}, mirrored locally); see rolling_summary.
+"""
+
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from cache_keys import conversation_key, conversation_meta_key
+
+try:
+    from cache import redis_client
+except ImportError:
+    redis_client = None
+
+try:
+    from circuit_breaker import get_breaker
+    redis_breaker = get_breaker("redis")
+except ImportError:
+    redis_breaker = None
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CONVERSATION_STORE_MAX_CONVERSATIONS = int(
+    os.getenv("CONVERSATION_STORE_MAX_CONVERSATIONS", "5000")
+)
+CONVERSATION_STORE_MAX_MESSAGES = int(
+    os.getenv("CONVERSATION_STORE_MAX_MESSAGES", "20")
+)
+# Idle conversations expire from Redis after this many seconds
+CONVERSATION_STORE_TTL = int(os.getenv("CONVERSATION_STORE_TTL", "86400"))
+
+
+class ConversationStore:
+    """
+    Bounded store of the most recent messages per conversation.
+
+    Messages are dicts of the form {"role": str, "content": str}.
+    """
+
+    def __init__(
+        self,
+        redis=redis_client,
+        max_conversations: int = CONVERSATION_STORE_MAX_CONVERSATIONS,
+        max_messages: int = CONVERSATION_STORE_MAX_MESSAGES,
+        ttl: int = CONVERSATION_STORE_TTL,
+        breaker=redis_breaker
+    ):
+        """
+        Initialize ConversationStore.
+
+        Args:
+            redis: Redis client for the shared tier (None for local only)
+            max_conversations: Conversations kept in the local LRU
+            max_messages: Messages kept per conversation
+            ttl: Seconds an idle conversation stays in Redis
+            breaker: Circuit breaker guarding Redis calls
+        """
+        self.redis = redis
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.breaker = breaker
+        self._local: "OrderedDict[str, deque]" = OrderedDict()
+        # conversation_id -> {"total", "summary", "version"}
+        self._meta: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def append(self, conversation_id: str, role: str, content: str):
+        """
+        Record one message at the end of a conversation.
+
+        Args:
+            conversation_id: Conversation ID
+            role: 'user' or 'assistant'
+            content: Message text
+        """
+        message = {"role": role, "content": content}
+        shared = self._redis_append(conversation_id, message)
+        if shared is not None:
+            # Mirror the shared list, which may hold other workers' turns
+            messages, total = shared
+            self._put(conversation_id, messages)
+            with self._lock:
+                self._meta.setdefault(conversation_id, {})["total"] = total
+            return
+        with self._lock:
+            messages = self._local.get(conversation_id)
+            if messages is not None:
+                messages.append(message)
+                self._local.move_to_end(conversation_id)
+                meta = self._meta.setdefault(conversation_id, {})
+                meta["total"] = meta.get("total", len(messages) - 1) + 1
+                return
+        self._put(conversation_id, [message])
+        with self._lock:
+            self._meta[conversation_id] = {"total": 1}
+
+    def recent(
+        self, conversation_id: str, limit: Optional[int] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Most recent messages of a conversation, oldest first.
+
+        Redis is authoritative when configured; the local copy answers
+        when Redis is absent, failing or does not know the conversation.
+
+        Args:
+            conversation_id: Conversation ID
+            limit: Return at most this many messages
+
+        Returns:
+            List of message dicts, or None if neither tier knows the
+            conversation
+        """
+        result = self._redis_range(conversation_id)
+        if result is not None:
+            self._put(conversation_id, result)
+        else:
+            with self._lock:
+                messages = self._local.get(conversation_id)
+                if messages is None:
+                    return None
+                self._local.move_to_end(conversation_id)
+                result = list(messages)
+        return result[-limit:] if limit else result
+
+    def seed(self, conversation_id: str, messages: List[Dict]):
+        """
+        Fill a conversation loaded from tutor_messages, unless another
+        worker has already started it.
+
+        Args:
+            conversation_id: Conversation ID
+            messages: Messages oldest first
+        """
+        if not messages or self.recent(conversation_id) is not None:
+            return
+        total = len(messages)
+        messages = [
+            {"role": m.get("role"), "content": m.get("content")}
+            for m in messages[-self.max_messages:]
+        ]
+        self._put(conversation_id, messages)
+        with self._lock:
+            self._meta.setdefault(conversation_id, {}).setdefault(
+                "total", total
+            )
+        if self._redis_allowed():
+            key = conversation_key(conversation_id)
+            meta_key = conversation_meta_key(conversation_id)
+            try:
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.delete(key)
+                pipe.rpush(key, *[json.dumps(m) for m in messages])
+                pipe.expire(key, self.ttl)
+                pipe.hsetnx(meta_key, "total", total)
+                pipe.expire(meta_key, self.ttl)
+                pipe.execute()
+                self._record(True)
+            except Exception as e:
+                self._record(False)
+                logger.warning(f"[WARNING] Conversation seed failed: {e}")
+
+    def clear(self, conversation_id: str):
+        """Forget a conversation in both tiers."""
+        with self._lock:
+            self._local.pop(conversation_id, None)
+            self._meta.pop(conversation_id, None)
+        if self._redis_allowed():
+            try:
+                self.redis.delete(
+                    conversation_key(conversation_id),
+                    conversation_meta_key(conversation_id)
+                )
+                self._record(True)
+            except Exception as e:
+                self._record(False)
+                logger.warning(f"[WARNING] Conversation clear failed: {e}")
+
+    def summary(self, conversation_id: str) -> Optional[Dict]:
+        """
+        The conversation's rolling summary and message total.
+
+        Args:
+            conversation_id: Conversation ID
+
+        Returns:
+            {"summary": str or None, "version": int, "total": int}, where
+            version is the number of messages the summary covers, or None
+            if the conversation is unknown
+        """
+        meta = self._redis_meta(conversation_id)
+        with self._lock:
+            if meta is not None:
+                if conversation_id in self._local:
+                    self._meta[conversation_id] = dict(meta)
+            else:
+                meta = self._meta.get(conversation_id)
+                if meta is None:
+                    return None
+        return {
+            "summary": meta.get("summary"),
+            "version": int(meta.get("version") or 0),
+            "total": int(meta.get("total") or 0),
+        }
+
+    def total(self, conversation_id: str) -> int:
+        """Number of messages ever appended to a conversation."""
+        meta = self.summary(conversation_id)
+        return meta["total"] if meta else 0
+
+    def set_summary(
+        self, conversation_id: str, summary: str, version: int
+    ) -> bool:
+        """
+        Store a rolling summary unless a newer one is already stored.
+
+        Args:
+            conversation_id: Conversation ID
+            summary: Summary text
+            version: Number of messages the summary covers
+
+        Returns:
+            True if the summary was stored
+        """
+        current = self.summary(conversation_id)
+        if current and current["version"] >= version:
+            return False
+        with self._lock:
+            if conversation_id in self._local:
+                meta = self._meta.setdefault(conversation_id, {})
+                meta.update(summary=summary, version=version)
+        if self._redis_allowed():
+            meta_key = conversation_meta_key(conversation_id)
+            try:
+                # Two workers may race here; both summaries are current
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.hset(
+                    meta_key,
+                    mapping={"summary": summary, "version": version}
+                )
+                pipe.expire(meta_key, self.ttl)
+                pipe.execute()
+                self._record(True)
+            except Exception as e:
+                self._record(False)
+                logger.warning(f"[WARNING] Summary write failed: {e}")
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._local)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _put(self, conversation_id: str, messages: List[Dict]):
+        """Store a conversation locally, evicting the least recent."""
+        with self._lock:
+            self._local[conversation_id] = deque(
+                messages, maxlen=self.max_messages
+            )
+            self._local.move_to_end(conversation_id)
+            while len(self._local) > self.max_conversations:
+                evicted, _ = self._local.popitem(last=False)
+                self._meta.pop(evicted, None)
+
+    def _redis_allowed(self) -> bool:
+        if self.redis is None:
+            return False
+        return self.breaker is None or self.breaker.allow_request()
+
+    def _record(self, ok: bool):
+        if self.breaker is None:
+            return
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _redis_append(
+        self, conversation_id: str, message: Dict
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """
+        RPUSH + LTRIM + HINCRBY + LRANGE (and EXPIREs) in one round trip.
+
+        Returns:
+            (trimmed list, message total), or None if Redis is unavailable
+        """
+        if not self._redis_allowed():
+            return None
+        key = conversation_key(conversation_id)
+        meta_key = conversation_meta_key(conversation_id)
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.rpush(key, json.dumps(message))
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            pipe.hincrby(meta_key, "total", 1)
+            pipe.expire(meta_key, self.ttl)
+            pipe.lrange(key, 0, -1)
+            results = pipe.execute()
+            self._record(True)
+        except Exception as e:
+            self._record(False)
+            logger.warning(f"[WARNING] Conversation append failed: {e}")
+            return None
+        return self._decode(results[-1]), int(results[3])
+
+    def _redis_range(self, conversation_id: str) -> Optional[List[Dict]]:
+        if not self._redis_allowed():
+            return None
+        try:
+            raw = self.redis.lrange(conversation_key(conversation_id), 0, -1)
+            self._record(True)
+        except Exception as e:
+            self._record(False)
+            logger.warning(f"[WARNING] Conversation read failed: {e}")
+            return None
+        return self._decode(raw) or None
+
+    def _redis_meta(self, conversation_id: str) -> Optional[Dict]:
+        if not self._redis_allowed():
+            return None
+        try:
+            raw = self.redis.hgetall(conversation_meta_key(conversation_id))
+            self._record(True)
+        except Exception as e:
+            self._record(False)
+            logger.warning(f"[WARNING] Conversation meta read failed: {e}")
+            return None
+        if not raw:
+            return None
+        return {
+            (k.decode() if isinstance(k, bytes) else k):
+            (v.decode() if isinstance(v, bytes) else v)
+            for k, v in raw.items()
+        }
+
+    @staticmethod
+    def _decode(raw) -> List[Dict]:
+        messages = []
+        for item in raw or []:
+            try:
+                messages.append(json.loads(item))
+            except (TypeError, ValueError):
+                continue
+        return messages
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Per-request deadlines and adaptive dependency timeouts.
+
+Every layer used to have its own fixed timeout (3-10 s per Supabase
+query, 30 s per reply generation, 15 s per classification) without
+knowing how much of the request's time was left. A Deadline is created
+by the endpoint with the request budget (TUTOR_DEADLINE_SECONDS), carried
+in TutorState and made current for the node that is running (see
+use_deadline), so any call can size its timeout from it:
+
+    timeout = timeout_for("supabase", 10)
+
+returns the smaller of
+
+    - the adaptive timeout: ADAPTIVE_TIMEOUT_HEADROOM x the dependency's
+      observed p99 latency (once ADAPTIVE_TIMEOUT_MIN_SAMPLES calls were
+      seen), never above the call's own default
+    - the time left before the deadline
+
+Optional steps ask Deadline.allows() first: a step runs only if its
+expected duration (observed p95, or a default) plus any time reserved
+for later required work (the reply) still fits, and is skipped and
+counted otherwise.
+
+Latencies are kept per worker process (last LATENCY_WINDOW calls per
+dependency) and reset on restart.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Configuration
+# Total time budget of a tutor request
+TUTOR_DEADLINE_SECONDS = float(os.getenv("TUTOR_DEADLINE_SECONDS", "30"))
+# Extra time the endpoint waits past the deadline before giving up
+DEADLINE_GRACE_SECONDS = float(os.getenv("DEADLINE_GRACE_SECONDS", "2"))
+ADAPTIVE_TIMEOUTS_ENABLED = os.getenv(
+    "ADAPTIVE_TIMEOUTS_ENABLED", "true"
+).lower() == "true"
+# Adaptive timeout = headroom x observed p99 latency
+ADAPTIVE_TIMEOUT_HEADROOM = float(
+    os.getenv("ADAPTIVE_TIMEOUT_HEADROOM", "1.5")
+)
+# Calls observed before a dependency's timeout adapts
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(
+    os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20")
+)
+# Shortest adaptive timeout (seconds)
+ADAPTIVE_TIMEOUT_FLOOR = float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR", "0.5"))
+# Latencies kept per dependency
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "500"))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list (q in 0..1)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """
+    Recent latencies per dependency and the timeouts derived from them.
+    """
+
+    def __init__(
+        self,
+        window: int = LATENCY_WINDOW,
+        min_samples: int = ADAPTIVE_TIMEOUT_MIN_SAMPLES,
+        headroom: float = ADAPTIVE_TIMEOUT_HEADROOM,
+        floor: float = ADAPTIVE_TIMEOUT_FLOOR,
+        enabled: bool = ADAPTIVE_TIMEOUTS_ENABLED
+    ):
+        """
+        Initialize LatencyTracker.
+
+        Args:
+            window: Latencies kept per dependency
+            min_samples: Latencies needed before estimates are used
+            headroom: Adaptive timeout as a multiple of the p99 latency
+            floor: Shortest adaptive timeout in seconds
+            enabled: False to always use the defaults
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.floor = floor
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=self.window)
+        )
+
+    def observe(self, dependency: str, seconds: float):
+        """
+        Record one call.
+
+        Args:
+            dependency: e.g. "supabase", "llm:generate_reply"
+            seconds: Duration; for a timed-out call, the timeout
+        """
+        with self._lock:
+            self._samples[dependency].append(seconds)
+
+    def percentile(self, dependency: str, q: float) -> Optional[float]:
+        """
+        Observed latency percentile.
+
+        Args:
+            dependency: Dependency name
+            q: Percentile in 0..1
+
+        Returns:
+            Seconds, or None with fewer than min_samples observations
+        """
+        with self._lock:
+            samples = list(self._samples.get(dependency, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return _percentile(samples, q)
+
+    def timeout_for(self, dependency: str, default: float) -> float:
+        """
+        Adaptive timeout for a dependency.
+
+        Args:
+            dependency: Dependency name
+            default: The call's fixed timeout (upper bound)
+
+        Returns:
+            headroom x p99 (at least floor, at most default), or default
+            until enough calls were observed
+        """
+        if not self.enabled:
+            return default
+        p99 = self.percentile(dependency, 0.99)
+        if p99 is None:
+            return default
+        return min(default, max(self.floor, p99 * self.headroom))
+
+    def estimate(self, dependency: str, default: float) -> float:
+        """
+        Expected duration (p95) of a dependency or step.
+
+        Args:
+            dependency: Dependency or step name
+            default: Used until enough calls were observed
+
+        Returns:
+            Seconds
+        """
+        if not self.enabled:
+            return default
+        p95 = self.percentile(dependency, 0.95)
+        return default if p95 is None else p95
+
+    def snapshot(self) -> Dict:
+        """
+        Percentiles per dependency.
+
+        Returns:
+            {dependency: {"samples", "p50", "p95", "p99"}} (percentiles
+            None below min_samples)
+        """
+        with self._lock:
+            names = sorted(self._samples)
+        result = {}
+        for name in names:
+            with self._lock:
+                count = len(self._samples[name])
+            result[name] = {
+                "samples": count,
+                "p50": self.percentile(name, 0.5),
+                "p95": self.percentile(name, 0.95),
+                "p99": self.percentile(name, 0.99),
+            }
+        return result
+
+    def clear(self):
+        """Forget every observation."""
+        with self._lock:
+            self._samples.clear()
+
+
+# Process-wide latencies
+latency = LatencyTracker()
+
+_counter_lock = threading.Lock()
+_skipped: Dict[str, int] = defaultdict(int)
+_exceeded = {"count": 0}
+
+
+class Deadline:
+    """
+    Time budget of one request.
+    """
+
+    def __init__(
+        self,
+        budget: float = TUTOR_DEADLINE_SECONDS,
+        tracker: Optional[LatencyTracker] = None
+    ):
+        """
+        Initialize Deadline, starting the clock.
+
+        Args:
+            budget: Seconds the request may take
+            tracker: Latencies to size timeouts from (defaults to the
+                process-wide tracker)
+        """
+        self.budget = budget
+        self.tracker = tracker or latency
+        self._expires_at = time.monotonic() + budget
+        self._lock = threading.Lock()
+        self.skipped: List[str] = []
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)."""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Whether the budget is used up."""
+        return self.remaining() <= 0
+
+    def timeout(
+        self, dependency: str, default: float, reserve: float = 0.0
+    ) -> float:
+        """
+        Timeout for a call made now.
+
+        Args:
+            dependency: Dependency name (for the adaptive timeout)
+            default: The call's fixed timeout
+            reserve: Seconds to keep for work after the call
+
+        Returns:
+            min(adaptive timeout, remaining - reserve); 0 if no time is
+            left for the call
+        """
+        return max(0.0, min(
+            self.tracker.timeout_for(dependency, default),
+            self.remaining() - reserve
+        ))
+
+    def allows(
+        self, step: str, default_cost: float, reserve: float = 0.0,
+        cost_key: Optional[str] = None
+    ) -> bool:
+        """
+        Whether an optional step still fits, recording it as skipped if
+        it does not.
+
+        Args:
+            step: Step name (for the skip counters)
+            default_cost: Expected seconds until the step was observed
+            reserve: Seconds to keep for required work after the step
+            cost_key: Latencies giving the expected cost (p95; defaults
+                to step)
+
+        Returns:
+            True if the step should run
+        """
+        cost = self.tracker.estimate(cost_key or step, default_cost)
+        if self.remaining() - reserve >= cost:
+            return True
+        with self._lock:
+            self.skipped.append(step)
+        with _counter_lock:
+            _skipped[step] += 1
+        return False
+
+    def finish(self):
+        """Count the request as late if it ran past its deadline."""
+        if self.expired():
+            with _counter_lock:
+                _exceeded["count"] += 1
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]):
+    """
+    Make a deadline current for the calls made inside the block.
+
+    Args:
+        deadline: Deadline (None leaves only the adaptive timeouts)
+    """
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the request being processed, if any."""
+    return _current.get()
+
+
+def timeout_for(dependency: str, default: float) -> float:
+    """
+    Timeout for a call to a dependency made now.
+
+    Args:
+        dependency: e.g. "supabase", "llm:generate_reply"
+        default: The call's fixed timeout
+
+    Returns:
+        The current deadline's timeout (0 if it has expired), or the
+        adaptive timeout outside a request
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return latency.timeout_for(dependency, default)
+    return deadline.timeout(dependency, default)
+
+
+def stats() -> Dict:
+    """
+    Deadline counters and latency percentiles for this worker.
+
+    Returns:
+        Dict with "skipped" (per step), "exceeded" and "latency"
+    """
+    with _counter_lock:
+        skipped = dict(sorted(_skipped.items()))
+        exceeded = _exceeded["count"]
+    return {
+        "skipped": skipped,
+        "exceeded": exceeded,
+        "latency": latency.snapshot(),
+    }
+
+
+def reset_stats():
+    """Reset the skip and late-request counters (latencies are kept)."""
+    with _counter_lock:
+        _skipped.clear()
+        _exceeded["count"] = 0
+
+
+def _metric_families():
+    """Skipped steps, late requests and adaptive timeouts for /metrics."""
+    snapshot = stats()
+    families = [
+        (
+            "tutor_steps_skipped", "counter",
+            "Optional tutor steps skipped because the deadline was near",
+            [("_total", {"step": step}, count)
+             for step, count in snapshot["skipped"].items()]
+        ),
+        (
+            "tutor_deadline_exceeded", "counter",
+            "Tutor requests that finished after their deadline",
+            [("_total", {}, snapshot["exceeded"])]
+        ),
+    ]
+    samples = [
+        ("", {"dependency": name, "quantile": q}, row[key])
+        for name, row in snapshot["latency"].items()
+        for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))
+        if row[key] is not None
+    ]
+    families.append((
+        "dependency_latency_seconds", "gauge",
+        "Recent latency percentiles used for adaptive timeouts", samples
+    ))
+    return families
+
+
+# Deadline counters on /metrics (optional)
+try:
+    from metrics import registry as _metrics_registry
+    _metrics_registry.add_collector(_metric_families)
+except ImportError:
+    pass
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Idempotency keys and in-flight request coalescing for expensive endpoints.
+
+The frontend retry wrapper and double-clicks resend identical /tutor/chat,
+/grade-answer and mock exam requests, and each copy used to run the whole
+LLM pipeline (or start another grading job). IdempotencyStore.run() gives
+every request a key and makes duplicates share one computation:
+
+- a duplicate that arrives while the first request is still running waits
+  for it and gets the same response (coalesced)
+- a duplicate that arrives after it finished gets the stored response
+  (replayed) for a short time
+
+The key is the Idempotency-Key header when the client sends one (kept for
+IDEMPOTENCY_TTL seconds), otherwise a hash of the user and the request
+body (kept for IDEMPOTENCY_DERIVED_TTL seconds, short enough that asking
+the same question again later is answered afresh). Reusing a header key
+with a different body raises IdempotencyConflict. Failed computations are
+never stored, so a retry after an error runs again.
+
+In-flight coalescing is per worker process. Completed responses are
+shared through the cache layer (Redis when configured) unless a call
+passes shared=False.
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cache_keys import idempotency_key, stable_hash
+
+# Shared tier for completed responses (optional)
+try:
+    from cache import acache_get, acache_set
+except ImportError:
+    async def acache_get(key): return None
+    async def acache_set(key, value, ttl=3600): return False
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+IDEMPOTENCY_ENABLED = os.getenv(
+    "IDEMPOTENCY_ENABLED", "true"
+).lower() == "true"
+# Seconds a response is replayed for a client-supplied Idempotency-Key
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "600"))
+# Seconds a response is replayed for a key derived from the request body
+IDEMPOTENCY_DERIVED_TTL = int(os.getenv("IDEMPOTENCY_DERIVED_TTL", "30"))
+# Completed responses kept in this worker's memory
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "2000"))
+
+# Longest Idempotency-Key header accepted
+MAX_HEADER_KEY_LENGTH = 255
+
+_OUTCOMES = ("computed", "replayed", "coalesced", "conflicts", "errors")
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused with a different request body."""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """
+    Stable hash of a request body.
+
+    Args:
+        payload: JSON-serializable request fields
+
+    Returns:
+        32 hex characters
+    """
+    canonical = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return stable_hash(canonical, 32)
+
+
+class IdempotencyStore:
+    """
+    Coalesces duplicate requests and replays completed responses.
+    """
+
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCY_TTL,
+        derived_ttl: int = IDEMPOTENCY_DERIVED_TTL,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES
+    ):
+        """
+        Initialize IdempotencyStore.
+
+        Args:
+            ttl: Seconds to replay responses for client-supplied keys
+            derived_ttl: Seconds to replay responses for derived keys
+            max_entries: Completed responses kept in memory
+        """
+        self.ttl = ttl
+        self.derived_ttl = derived_ttl
+        self.max_entries = max_entries
+        # key -> (expires_at, fingerprint, response)
+        self._done: "OrderedDict[str, Tuple[float, str, Any]]" = (
+            OrderedDict()
+        )
+        # key -> (fingerprint, future) for computations on this loop
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: dict.fromkeys(_OUTCOMES, 0)
+        )
+
+    async def run(
+        self,
+        scope: str,
+        user_id: Optional[str],
+        payload: Any,
+        compute: Callable[[], Awaitable[Any]],
+        header_key: Optional[str] = None,
+        shared: bool = True
+    ) -> Any:
+        """
+        Return compute()'s response, sharing it between duplicates.
+
+        Args:
+            scope: Endpoint name (keys never match across scopes)
+            user_id: User the request is for
+            payload: Request fields that identify a duplicate
+            compute: Coroutine function producing a JSON-serializable
+                response
+            header_key: Idempotency-Key header, if sent
+            shared: Also store the response in the shared cache so other
+                workers can replay it
+
+        Returns:
+            The response of the first request with this key
+
+        Raises:
+            IdempotencyConflict: header_key was used for a different body
+        """
+        if not IDEMPOTENCY_ENABLED:
+            return await compute()
+
+        fingerprint = request_fingerprint(payload)
+        if header_key:
+            token = "k" + stable_hash(header_key[:MAX_HEADER_KEY_LENGTH], 32)
+            ttl = self.ttl
+        else:
+            token = "p" + fingerprint
+            ttl = self.derived_ttl
+        key = idempotency_key(scope, user_id or "anonymous", token)
+
+        stored = self._local(key)
+        if stored is None and shared and key not in self._inflight:
+            stored = await self._shared(key)
+            # The first request may have finished during the await
+            stored = stored or self._local(key)
+        if stored is not None:
+            self._check(scope, stored[0], fingerprint)
+            self._count(scope, "replayed")
+            return stored[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check(scope, inflight[0], fingerprint)
+            self._count(scope, "coalesced")
+            return await asyncio.shield(inflight[1])
+
+        # compute() runs in its own task, so a cancelled first request
+        # (a client that disconnected) does not cancel its duplicates
+        task = asyncio.ensure_future(
+            self._compute(scope, key, fingerprint, compute, ttl, shared)
+        )
+        self._inflight[key] = (fingerprint, task)
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        """
+        Counters for this worker.
+
+        Returns:
+            Dict with per-scope outcome counters, "duplicates_avoided"
+            (replayed + coalesced), "entries" and "inflight"
+        """
+        with self._lock:
+            scopes = {
+                scope: dict(row)
+                for scope, row in sorted(self._counters.items())
+            }
+            entries = len(self._done)
+        avoided = sum(
+            row["replayed"] + row["coalesced"] for row in scopes.values()
+        )
+        return {
+            "scopes": scopes,
+            "duplicates_avoided": avoided,
+            "entries": entries,
+            "inflight": len(self._inflight),
+        }
+
+    def reset_stats(self):
+        """Reset the counters, keeping stored responses."""
+        with self._lock:
+            self._counters.clear()
+
+    def clear(self):
+        """Forget stored responses and reset the counters."""
+        with self._lock:
+            self._done.clear()
+            self._counters.clear()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    async def _compute(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int,
+        shared: bool
+    ) -> Any:
+        try:
+            response = await compute()
+        except Exception:
+            self._count(scope, "errors")
+            raise
+        self._count(scope, "computed")
+        # Still registered as in flight, so nothing recomputes while the
+        # response is written to the shared cache
+        await self._store(key, fingerprint, response, ttl, shared)
+        return response
+
+    def _forget(self, key: str, task: asyncio.Future):
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so an unawaited failure is not logged
+            task.exception()
+
+    def _count(self, scope: str, outcome: str):
+        with self._lock:
+            self._counters[scope][outcome] += 1
+
+    def _check(self, scope: str, stored: str, fingerprint: str):
+        if stored != fingerprint:
+            self._count(scope, "conflicts")
+            raise IdempotencyConflict(
+                "Idempotency-Key was already used for a different request"
+            )
+
+    def _local(self, key: str) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            entry = self._done.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._done[key]
+                return None
+            return entry[1], entry[2]
+
+    async def _shared(self, key: str) -> Optional[Tuple[str, Any]]:
+        cached = await acache_get(key)
+        if not isinstance(cached, dict) or "fingerprint" not in cached:
+            return None
+        return cached["fingerprint"], cached.get("response")
+
+    async def _store(
+        self, key: str, fingerprint: str, response: Any, ttl: int,
+        shared: bool
+    ):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._done[key] = (time.time() + ttl, fingerprint, response)
+            self._done.move_to_end(key)
+            while len(self._done) > self.max_entries:
+                self._done.popitem(last=False)
+        if shared:
+            try:
+                await acache_set(
+                    key, {"fingerprint": fingerprint, "response": response},
+                    ttl
+                )
+            except Exception as e:
+                logger.warning(
+                    f"[WARNING] Could not share idempotent response: {e}"
+                )
+
+
+def _metric_families():
+    """Idempotency outcomes as a counter family for /metrics."""
+    samples = [
+        ("_total", {"scope": scope, "outcome": outcome}, count)
+        for scope, row in store.stats()["scopes"].items()
+        for outcome, count in row.items()
+    ]
+    return [(
+        "idempotent_requests", "counter",
+        "Requests by idempotency outcome (replayed and coalesced requests "
+        "skipped the pipeline)", samples
+    )]
+
+
+# Process-wide store used by the API endpoints
+store = IdempotencyStore()
+
+# Outcome counters on /metrics (optional)
+try:
+    from metrics import registry as _metrics_registry
+    _metrics_registry.add_collector(_metric_families)
+except ImportError:
+    pass
@@ -1,30 +1,63 @@
-from typing import TypedDict, Dict, List, Optional  # noqa: F401
-from langgraph.graph import StateGraph, END  # noqa: F401
-from agents.ai_tutor_agent import AITutorAgent  # to load services only
+from typing import TypedDict, Dict, Iterator, List, Optional  # noqa: F401
+from langgraph.constants import END
 from dotenv import load_dotenv
 import os
+import importlib.util
 import logging
 import hashlib
 import time
 import threading
 from datetime import datetime
 from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
-# Optional LangChain support
-try:
-    import langchain_openai  # noqa: F401
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    LANGCHAIN_AVAILABLE = False
+# Optional LangChain support (checked without importing it)
+LANGCHAIN_AVAILABLE = importlib.util.find_spec("langchain_openai") is not None
 
 # Import cache for potential cache invalidation if needed
 try:
-    from cache import cache_get, cache_set, cache_delete
+    from cache import (
+        cache_set, cache_delete, cache_get_or_load, cache_get_many,
+        cache_set_many, bump_mastery_generation
+    )
 except ImportError:
-    def cache_get(key): return None
     def cache_set(key, value, ttl=3600): return False
     def cache_delete(key): return False
+    def cache_get_or_load(key, loader, ttl=3600, negative_ttl=30):
+        return loader()
+    def cache_get_many(keys): return {}
+    def cache_set_many(items, ttl=3600): return False
+    def bump_mastery_generation(user_id): return None
+
+import cache_keys
+from circuit_breaker import get_breaker
+from conversation_store import ConversationStore
+from semantic_cache import SemanticAnswerCache, SEMANTIC_CACHE_ENABLED
+from rolling_summary import RollingSummarizer, ROLLING_SUMMARY_ENABLED
+from pre_router import PreRouter
+from topic_bundle import (
+    TopicBundleStore, sample_concepts, next_concept, shown_count,
+    SHOWN_CONCEPTS_TTL
+)
+from token_budget import count_tokens, truncate_to_tokens, pack_context
+from app_container import container, LazyProxy
+from outbox import get_outbox
+from metrics import (
+    registry as metrics_registry, TUTOR_NODE_SECONDS, SUPABASE_CALL_SECONDS,
+    SUPABASE_SKIPPED
+)
+from deadline import (
+    Deadline, use_deadline, timeout_for, latency as dependency_latency
+)
+
+try:
+    from agents.services.concept_service import TOPIC_CONCEPT_POOL_LIMIT
+except ImportError:
+    TOPIC_CONCEPT_POOL_LIMIT = 200
+
+# Shared by every Supabase query that goes through safe_supabase_query
+supabase_breaker = get_breaker("supabase")
 
 logger = logging.getLogger(__name__)
 
@@ -44,19 +77,31 @@ if DEBUG_MODE:
     logger.info(f"[DEBUG] Environment DEBUG value: {os.getenv('DEBUG', '0')}")
     logger.info("="*60)
 
-# In-memory conversation history cache
-# Stores last 20 messages per conversation_id for fast retrieval
-conversation_cache = {}
+# Recent messages per conversation (bounded local LRU + optional Redis
+# list shared by every worker)
+conversation_store = ConversationStore()
+
+
+# Shared pool for fire-and-forget work that has to read before it writes
+# (plain inserts go straight to the outbox)
+ASYNC_WRITE_WORKERS = int(os.getenv("ASYNC_WRITE_WORKERS", "4"))
+_async_write_executor = ThreadPoolExecutor(
+    max_workers=ASYNC_WRITE_WORKERS, thread_name_prefix="async-write"
+)
 
 
 def async_write(fn, *args, **kwargs):
     """
     Fire-and-forget wrapper for Supabase writes.
-    Executes the function in a background thread to avoid blocking.
+    Runs the function on a small shared thread pool to avoid blocking.
     """
-    threading.Thread(
-        target=lambda: fn(*args, **kwargs), daemon=True
-    ).start()
+    def run():
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"[ERROR] Background write failed: {e}")
+
+    _async_write_executor.submit(run)
 
 
 @contextmanager
@@ -83,28 +128,75 @@ def timeout_context(seconds):
         timer.cancel()
 
 
-def safe_supabase_query(query_func, timeout=10, default_return=None):
+def _query_name(query_func) -> str:
+    """Metric label for a query function ("Class.method" or "fn")."""
+    name = getattr(query_func, "__qualname__", None) or "query"
+    parts = [
+        p for p in name.split(".") if p not in ("<locals>", "<lambda>")
+    ]
+    return ".".join(parts[-2:]) or "query"
+
+
+def safe_supabase_query(
+    query_func, timeout=10, default_return=None, operation=None
+):
     """
     Execute a Supabase query with timeout protection.
     Returns default_return if query times out or fails.
 
     Args:
         query_func: Function that executes the Supabase query
-        timeout: Timeout in seconds (default: 10, increased from 3)
+        timeout: Timeout in seconds (default: 10, increased from 3),
+            shortened to the adaptive Supabase timeout and the time left
+            before the request's deadline
         default_return: Value to return on timeout/error
+        operation: Label for supabase_call_duration_seconds (defaults to
+            the name of the function that built query_func)
 
     Returns:
-        Query result or default_return on timeout/error
+        Query result or default_return on timeout/error, or immediately
+        while the Supabase circuit breaker is open or once the request's
+        deadline has passed
     """
+    operation = operation or _query_name(query_func)
+    if not supabase_breaker.allow_request():
+        if DEBUG_MODE:
+            logger.info("[DEBUG] Supabase circuit open, skipping query")
+        SUPABASE_SKIPPED.inc(operation=operation)
+        return default_return
+
+    if timeout > 0:
+        timeout = timeout_for("supabase", timeout)
+        if timeout <= 0:
+            # Deadline passed (0 here must not mean "no timeout")
+            if DEBUG_MODE:
+                logger.info("[DEBUG] Deadline passed, skipping query")
+            return default_return
+
+    start = time.perf_counter()
+
+    def observe(status):
+        seconds = time.perf_counter() - start
+        SUPABASE_CALL_SECONDS.observe(
+            seconds, operation=operation, status=status
+        )
+        if status in ("ok", "timeout"):
+            dependency_latency.observe("supabase", seconds)
+
     if timeout <= 0:
         # No timeout, execute directly
         try:
-            return query_func()
+            result = query_func()
         except Exception as e:
+            observe("error")
+            supabase_breaker.record_failure()
             logger.error(f"Supabase query failed: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             return default_return
+        observe("ok")
+        supabase_breaker.record_success()
+        return result
 
     result_container = {"value": None, "error": None, "completed": False}
 
@@ -121,37 +213,53 @@ def safe_supabase_query(query_func, timeout=10, default_return=None):
     query_thread.join(timeout=timeout)
 
     if not result_container["completed"]:
+        observe("timeout")
+        supabase_breaker.record_failure()
         logger.error(
             f"Supabase query timed out after {timeout}s"
         )
         return default_return
 
     if result_container["error"]:
+        observe("error")
+        supabase_breaker.record_failure()
         err_msg = str(result_container["error"])
         logger.error(f"Supabase query error: {err_msg}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         return default_return
 
+    observe("ok")
+    supabase_breaker.record_success()
     return result_container["value"]
 
 
 def timed_node(fn):
     """
     Decorator to wrap LangGraph nodes with timing and logging.
-    Measures execution time and logs to Supabase tutor_traces table.
+    Measures execution time into tutor_node_duration_seconds and, in
+    debug mode, logs it to Supabase tutor_traces table.
     Also handles errors and logs to tutor_errors table.
+    The state's deadline is current while the node runs (see
+    deadline.use_deadline).
     """
     def wrapper(state):
         node_name = fn.__name__
         start_time = time.time()
 
         try:
-            result = fn(state)
+            with use_deadline(state.get("deadline")):
+                result = fn(state)
             end_time = time.time()
             duration_ms = int((end_time - start_time) * 1000)
+            TUTOR_NODE_SECONDS.observe(
+                end_time - start_time, node=node_name, status="ok"
+            )
+            dependency_latency.observe(
+                f"node:{node_name}", end_time - start_time
+            )
 
-            # Log timing to Supabase (async fire-and-forget)
+            # Queue timing for a batched Supabase insert
             if DEBUG_MODE and supabase_client:
                 trace_data = {
                     "user_id": state.get("user_id"),
@@ -161,19 +269,18 @@ def timed_node(fn):
                     "timestamp": datetime.now().isoformat(),
                     "trace_id": state.get("trace_id")
                 }
-                async_write(
-                    lambda: supabase_client.table("tutor_traces").insert(
-                        trace_data
-                    ).execute()
-                )
+                get_outbox().enqueue("tutor_traces", trace_data)
 
             return result
 
         except Exception as e:
             end_time = time.time()
             duration_ms = int((end_time - start_time) * 1000)
+            TUTOR_NODE_SECONDS.observe(
+                end_time - start_time, node=node_name, status="error"
+            )
 
-            # Log error timing to Supabase (async fire-and-forget)
+            # Queue error timing for a batched Supabase insert
             if DEBUG_MODE and supabase_client:
                 trace_data = {
                     "user_id": state.get("user_id"),
@@ -184,16 +291,12 @@ def timed_node(fn):
                     "trace_id": state.get("trace_id"),
                     "error": str(e)
                 }
-                async_write(
-                    lambda: supabase_client.table("tutor_traces").insert(
-                        trace_data
-                    ).execute()
-                )
+                get_outbox().enqueue("tutor_traces", trace_data)
 
             # Log to console
             logger.error(f"[Node Error] {node_name}: {e}")
 
-            # Log structured analytics to Supabase (async fire-and-forget)
+            # Queue structured analytics for a batched Supabase insert
             if DEBUG_MODE and supabase_client:
                 error_data = {
                     "node": node_name,
@@ -201,11 +304,7 @@ def timed_node(fn):
                     "topic": state.get("topic"),
                     "error": str(e)
                 }
-                async_write(
-                    lambda: supabase_client.table("tutor_errors").insert(
-                        error_data
-                    ).execute()
-                )
+                get_outbox().enqueue("tutor_errors", error_data)
 
             return {}
     return wrapper
@@ -227,7 +326,7 @@ def safe_node(fn):
             # Log to console
             logger.error(f"[Node Error] {fn.__name__}: {e}")
 
-            # Log structured analytics to Supabase (async fire-and-forget)
+            # Queue structured analytics for a batched Supabase insert
             if supabase_client:
                 error_data = {
                     "node": fn.__name__,
@@ -235,11 +334,7 @@ def safe_node(fn):
                     "topic": state.get("topic"),
                     "error": str(e)
                 }
-                async_write(
-                    lambda: supabase_client.table("tutor_errors").insert(
-                        error_data
-                    ).execute()
-                )
+                get_outbox().enqueue("tutor_errors", error_data)
 
             return {}
     return wrapper
@@ -248,54 +343,142 @@ def safe_node(fn):
 # Load environment variables from config.env
 load_dotenv('config.env')
 
-# Initialize Supabase client if available
-supabase_client = None
-try:
-    from supabase import create_client
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_ANON_KEY") or os.getenv(
-        "SUPABASE_SERVICE_ROLE_KEY"
+# The Supabase client, AITutorAgent and its services are built on first
+# use by the application container (see app_container), not at import
+supabase_client = LazyProxy(
+    lambda: container.supabase_client, "supabase_client"
+)
+agent = LazyProxy(lambda: container.tutor_agent, "tutor_agent")
+# One structured-output call returns the reply and the reasoning label
+# (no ClassifyReasoning node); switch per deployment to compare latency
+STRUCTURED_REPLY_ENABLED = os.getenv(
+    "STRUCTURED_REPLY_ENABLED", "false"
+).lower() == "true"
+# Expected reply generation time until it has been observed (seconds)
+REPLY_COST_SECONDS = float(os.getenv("REPLY_COST_SECONDS", "8"))
+
+
+def _within_budget(
+    state: Dict, step: str, cost_key: str, default_cost: float,
+    before_reply: bool = False
+) -> bool:
+    """
+    Whether an optional step fits in the request's remaining time
+    (the degradation ladder: skipped steps are counted per step and
+    listed in the response's "degraded").
+
+    Args:
+        state: Tutor state (no deadline: always True)
+        step: Step name for the skip counters
+        cost_key: Latencies giving the step's expected duration
+        default_cost: Expected seconds until the step was observed
+        before_reply: Keep the reply's expected duration in reserve
+
+    Returns:
+        True if the step should run
+    """
+    deadline = state.get("deadline")
+    if deadline is None:
+        return True
+    reserve = 0.0
+    if before_reply:
+        operation = (
+            "generate_labelled_reply" if STRUCTURED_REPLY_ENABLED
+            else "generate_reply"
+        )
+        reserve = dependency_latency.estimate(
+            f"llm:{operation}", REPLY_COST_SECONDS
+        )
+    if deadline.allows(step, default_cost, reserve, cost_key=cost_key):
+        return True
+    logger.warning(
+        f"[WARNING] Skipping {step}: {deadline.remaining():.1f}s left "
+        "before the deadline"
     )
-    if supabase_url and supabase_key:
-        supabase_client = create_client(supabase_url, supabase_key)
-        # Enable HTTP keep-alive for better performance
-        if hasattr(supabase_client, 'postgrest') and hasattr(
-            supabase_client.postgrest, 'session'
-        ):
-            supabase_client.postgrest.session.keep_alive = True
-        if DEBUG_MODE:
-            logger.info("[OK] Supabase client initialized for LangGraph tutor")
-    else:
-        if DEBUG_MODE:
-            logger.info(
-                "[WARNING] Supabase credentials not found - "
-                "LangGraph tutor will work without Supabase features"
-            )
-except ImportError:
-    logger.error(
-        "[ERROR] Supabase Python client not installed - "
-        "install with: pip install supabase"
+    return False
+
+
+services = LazyProxy(lambda: container.get("services"), "services")
+
+
+def _service(name: str) -> LazyProxy:
+    return LazyProxy(lambda: container.service(name), f"{name} service")
+
+
+lesson_service = _service("lesson")
+concept_service = _service("concepts")
+history_service = _service("history")
+llm_service = _service("llm")
+mastery_service = _service("mastery")
+readiness_service = _service("readiness")
+message_service = _service("messages")
+student_service = _service("student")
+
+# Conversation summaries, updated in the background after each turn
+rolling_summary = RollingSummarizer(
+    conversation_store,
+    lambda previous, messages: llm_service.update_summary(
+        previous, messages
     )
-except Exception as e:
-    logger.error(f"[ERROR] Error initializing Supabase client: {e}")
-
-# Initialize AITutorAgent to build all services
-api_key = os.getenv("OPENAI_API_KEY")
-agent = AITutorAgent(
-    api_key=api_key,
-    supabase_client=supabase_client
 )
 
-# Get all services from agent
-services = agent.build_services()
-lesson_service = services["lesson"]
-concept_service = services["concepts"]
-history_service = services["history"]
-llm_service = services["llm"]
-mastery_service = services["mastery"]
-readiness_service = services["readiness"]
-message_service = services["messages"]
-student_service = services["student"]
+# Answers to first-turn questions, reused for similar questions per topic
+semantic_cache = SemanticAnswerCache(
+    embed=lambda text: concept_service.generate_embedding(text)
+)
+
+# Lesson excerpt, concept pool and subject per topic, in one cache entry
+topic_bundles = TopicBundleStore(
+    load_lesson=lambda topic: lesson_service.load_lesson_content(str(topic)),
+    load_concepts=lambda topic: concept_service.fetch_concepts_by_topic(
+        str(topic), TOPIC_CONCEPT_POOL_LIMIT, False
+    ),
+    load_subject=lambda topic: lesson_service.get_subject_id_from_topic(
+        topic
+    )
+)
+
+
+def _semantic_cache_families():
+    """semantic_cache counters as metric families for /metrics."""
+    stats = semantic_cache.stats()
+    families = [
+        (
+            f"semantic_answer_cache_{name}", "counter",
+            f"Semantic answer cache {name.replace('_', ' ')}",
+            [("_total", {}, value)]
+        )
+        for name, value in stats.items()
+        if name not in ("hit_rate", "topics", "entries")
+    ]
+    families.append((
+        "semantic_answer_cache_entries", "gauge",
+        "Answers held by the semantic answer cache",
+        [("", {}, stats["entries"])]
+    ))
+    return families
+
+
+metrics_registry.add_collector(_semantic_cache_families)
+
+# Greetings, thanks, goodbyes and off-topic messages answered from
+# templates before the graph runs
+pre_router = PreRouter()
+
+
+def _pre_router_families():
+    """pre_router routing counts as a metric family for /metrics."""
+    stats = pre_router.stats()
+    return [(
+        "tutor_pre_routed_messages", "counter",
+        "Tutor messages by pre-router category (passed: sent to the graph)",
+        [("_total", {"category": category}, count)
+         for category, count in stats.items()
+         if category not in ("routed", "routed_rate")]
+    )]
+
+
+metrics_registry.add_collector(_pre_router_families)
 
 
 # Unified state object passed across LangGraph nodes
@@ -320,6 +503,11 @@ class TutorState(TypedDict):
     mastery_updates: List[Dict]
     readiness: Optional[Dict]
     learning_path: Optional[Dict]
+    # Topic bundle and the student's shown-concept bitset (topic_bundle)
+    topic_bundle: Optional[Dict]
+    shown_concepts: Optional[Dict]
+    # Request time budget (None: no deadline)
+    deadline: Optional[Deadline]
 
 
 # -----------------------------------------------------
@@ -333,9 +521,8 @@ def LogUserMessage(state: TutorState):
     # Extract concept IDs (will be empty at this point, but structure is ready)
     concept_ids = []
 
-    # Write the user message to Supabase (async fire-and-forget)
-    async_write(
-        message_service.log,
+    # Queue the user message for Supabase (batched by the outbox)
+    message_service.log(
         user_id=state["user_id"],
         lesson_topic=state["topic"],
         conversation_id=state["conversation_id"],
@@ -344,20 +531,9 @@ def LogUserMessage(state: TutorState):
         concept_ids=concept_ids
     )
 
-    # Update in-memory conversation cache
-    conversation_id = state["conversation_id"]
-    if conversation_id not in conversation_cache:
-        conversation_cache[conversation_id] = []
-
-    # Add user message to cache
-    conversation_cache[conversation_id].append({
-        "role": "user",
-        "content": state["user_message"]
-    })
-
-    # Keep only last 20 messages in cache
-    conversation_cache[conversation_id] = (
-        conversation_cache[conversation_id][-20:]
+    # Add the user message to the shared conversation store
+    conversation_store.append(
+        state["conversation_id"], "user", state["user_message"]
     )
 
     return {}
@@ -371,50 +547,24 @@ def ValidateInput(state: TutorState):
     Validate and limit input sizes to prevent token overflow.
 
     Limits:
-    - user_message: 800 tokens (summarize if over)
+    - user_message: 800 tokens (summarize if over, truncate instead when
+      the deadline leaves no time for the summary)
     - lesson_text: 4000 tokens (truncate if over)
     - lesson_chunks: 2000 tokens total (truncate if over)
     - concept descriptions: 500 tokens combined (truncate if over)
 
+    Token counts come from the model's tokenizer (token_budget).
+
     Returns updated state with validated/truncated inputs.
     """
-    # Helper function to estimate tokens (rough: 1 token ≈ 4 characters)
-    def estimate_tokens(text: str) -> int:
-        if not text:
-            return 0
-        return len(text) // 4
-
-    # Helper function to truncate text to token limit
-    def truncate_to_tokens(text: str, max_tokens: int) -> str:
-        if not text:
-            return text
-        max_chars = max_tokens * 4
-        if len(text) <= max_chars:
-            return text
-        # Truncate and add ellipsis
-        return text[:max_chars - 3] + "..."
-
     updated_state = {}
 
     # 0. Quick check for obvious off-topic questions (Business Studies only)
     user_message = state.get("user_message", "")
-    user_message_lower = user_message.lower()
-
-    # List of non-Business Studies topics that should be rejected
-    off_topic_keywords = [
-        "solve this math", "calculate", "algebra", "geometry",
-        "calculus", "physics", "chemistry", "biology",
-        "science experiment", "write a poem", "literature",
-        "novel", "poetry", "code", "programming", "python",
-        "javascript", "html", "css", "history of", "world war",
-        "ancient", "medieval", "translate", "language",
-        "grammar", "vocabulary"
-    ]
 
-    # Check if message contains off-topic keywords
-    is_off_topic = any(
-        keyword in user_message_lower for keyword in off_topic_keywords
-    )
+    # Same keyword check as the pre-router (which has already answered
+    # these messages unless it is disabled)
+    is_off_topic = pre_router.is_off_topic(user_message)
 
     # If off-topic, add a flag to state (will be handled in LLM)
     if is_off_topic and DEBUG_MODE:
@@ -424,7 +574,7 @@ def ValidateInput(state: TutorState):
         )
 
     # 1. Validate user_message (800 tokens limit)
-    user_tokens = estimate_tokens(user_message)
+    user_tokens = count_tokens(user_message)
     if user_tokens > 800:
         if DEBUG_MODE:
             logger.info(
@@ -433,10 +583,15 @@ def ValidateInput(state: TutorState):
             )
         # Summarize using llm_service
         try:
+            if not _within_budget(
+                state, "summarize_message", "llm:summarize_history", 5.0,
+                before_reply=True
+            ):
+                raise TimeoutError("no time left before the deadline")
             summarized = llm_service.summarize_history(user_message)
             updated_state["user_message"] = summarized
             if DEBUG_MODE:
-                new_tokens = estimate_tokens(summarized)
+                new_tokens = count_tokens(summarized)
                 logger.info(
                     f"[DEBUG] Summarized to {new_tokens} tokens "
                     f"(from {user_tokens})"
@@ -453,7 +608,7 @@ def ValidateInput(state: TutorState):
     # 2. Validate lesson_text (4000 tokens limit)
     lesson_text = state.get("lesson_text")
     if lesson_text:
-        lesson_tokens = estimate_tokens(lesson_text)
+        lesson_tokens = count_tokens(lesson_text)
         if lesson_tokens > 4000:
             if DEBUG_MODE:
                 logger.info(
@@ -470,7 +625,7 @@ def ValidateInput(state: TutorState):
     lesson_chunks = state.get("lesson_chunks", [])
     if lesson_chunks:
         total_chunk_tokens = sum(
-            estimate_tokens(chunk.get("chunk_text", ""))
+            count_tokens(chunk.get("chunk_text", ""))
             for chunk in lesson_chunks
         )
         if total_chunk_tokens > 2000:
@@ -484,7 +639,7 @@ def ValidateInput(state: TutorState):
             remaining_tokens = 2000
             for chunk in lesson_chunks:
                 chunk_text = chunk.get("chunk_text", "")
-                chunk_tokens = estimate_tokens(chunk_text)
+                chunk_tokens = count_tokens(chunk_text)
                 if chunk_tokens <= remaining_tokens:
                     truncated_chunks.append(chunk)
                     remaining_tokens -= chunk_tokens
@@ -505,7 +660,7 @@ def ValidateInput(state: TutorState):
     concept_rows = state.get("concept_rows", [])
     if concept_rows:
         total_desc_tokens = sum(
-            estimate_tokens(
+            count_tokens(
                 f"{c.get('name', '')} {c.get('description', '')}"
             )
             for c in concept_rows
@@ -524,10 +679,10 @@ def ValidateInput(state: TutorState):
                 name = concept.get("name", "")
                 desc = concept.get("description", "")
                 combined = f"{name} {desc}"
-                combined_tokens = estimate_tokens(combined)
+                combined_tokens = count_tokens(combined)
                 if combined_tokens > tokens_per_concept:
                     # Truncate description to fit
-                    desc_tokens = tokens_per_concept - estimate_tokens(name)
+                    desc_tokens = tokens_per_concept - count_tokens(name)
                     if desc_tokens > 0:
                         truncated_concept["description"] = truncate_to_tokens(
                             desc, desc_tokens
@@ -542,6 +697,30 @@ def ValidateInput(state: TutorState):
     return updated_state
 
 
+# -----------------------------------------------------
+# Node 0.75: FetchTopicBundle
+# -----------------------------------------------------
+def FetchTopicBundle(state: TutorState):
+    """
+    Read the topic bundle (lesson excerpt, concept pool, learning path
+    order, subject) and the student's shown-concept bitset in one cache
+    round-trip, building the bundle on a miss (see topic_bundle).
+
+    FetchLesson, FetchConcepts and ComputeLearningPath use them when the
+    bundle is there and fall back to their own queries otherwise.
+    """
+    bundle, shown = topic_bundles.get(
+        state.get("topic"), state.get("user_id")
+    )
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] FetchTopicBundle: "
+            f"{'version ' + bundle['version'] if bundle else 'no bundle'} "
+            f"for topic {state.get('topic')}"
+        )
+    return {"topic_bundle": bundle, "shown_concepts": shown}
+
+
 # -----------------------------------------------------
 # Node 1: FetchLesson
 # -----------------------------------------------------
@@ -551,7 +730,8 @@ def FetchLesson(state: TutorState):
     based on topic_id (state['topic']), using LessonService.
 
     OPTIMIZED: Skip lesson chunks entirely for speed.
-    Only fetch lesson text if not already in state.
+    Only fetch lesson text if not already in state, and take it from the
+    topic bundle when there is one.
     """
     topic = state["topic"]
 
@@ -563,29 +743,35 @@ def FetchLesson(state: TutorState):
             "lesson_chunks": []  # Skip chunks for speed
         }
 
-    # Check cache for lesson content
-    lesson_cache_key = f"lesson:{topic}"
-    lesson_text = cache_get(lesson_cache_key)
-
-    if lesson_text is None:
-        # Fetch from service if not in cache
+    def load_lesson():
         if DEBUG_MODE:
             logger.info(f"[FetchLesson] Fetching lesson for topic_id: {topic}")
-        lesson_text = lesson_service.fetch_lesson_content(topic)
-        if lesson_text:
-            if DEBUG_MODE:
+        text = lesson_service.fetch_lesson_content(topic)
+        if DEBUG_MODE:
+            if text:
                 logger.info(
                     f"[FetchLesson] Successfully fetched lesson "
-                    f"({len(lesson_text)} chars)"
+                    f"({len(text)} chars)"
                 )
-            # Cache for 1 hour (3600 seconds)
-            cache_set(lesson_cache_key, lesson_text, ttl=3600)
-        else:
-            if DEBUG_MODE:
+            else:
                 logger.warning(
                     f"[FetchLesson] No lesson content returned for "
                     f"topic_id: {topic}"
                 )
+        return text
+
+    bundle = state.get("topic_bundle")
+    if bundle:
+        # Lesson excerpt from the topic bundle (no lesson read)
+        lesson_text = bundle["lesson"]
+    else:
+        # Cache lesson content for 1 hour (3600 seconds). Concurrent
+        # misses share one fetch; a missing lesson is remembered for 30
+        # seconds.
+        lesson_text = cache_get_or_load(
+            cache_keys.lesson_key(topic), load_lesson, ttl=3600,
+            negative_ttl=30
+        )
 
     # Skip lesson chunks entirely for speed (not critical for responses)
     # Compute hash and update state
@@ -611,9 +797,11 @@ def FetchConcepts(state: TutorState):
 
     Priority (ALWAYS use topic_id when available):
     1. ALWAYS fetch concepts directly by topic_id if available
-       (returns concepts in random order from database)
+       (returns concepts in random order, sampled from the topic bundle's
+       pool when there is one, otherwise from the database)
        This works for EVERY message, regardless of message length or content
     2. If topic_id fetch fails or returns empty, use pgvector similarity search
+       (skipped on a cache miss when the deadline leaves no time for it)
     3. Fallback to keyword matching if no concepts found
 
     The result is stored in state['concept_rows'].
@@ -640,13 +828,18 @@ def FetchConcepts(state: TutorState):
                 f"for message: '{user_message[:50]}...'"
             )
         try:
-            # Fetch concepts directly from database for this topic
-            # This works regardless of message length or content
-            concept_rows = concept_service.fetch_concepts_by_topic(
-                topic_id=str(topic_id),
-                limit=10,  # Return 10 concepts in random order
-                random_order=True
-            )
+            bundle = state.get("topic_bundle")
+            if bundle:
+                # Sample the topic bundle's pool (no concept read)
+                concept_rows = sample_concepts(bundle, limit=10)
+            else:
+                # Fetch concepts directly from database for this topic
+                # This works regardless of message length or content
+                concept_rows = concept_service.fetch_concepts_by_topic(
+                    topic_id=str(topic_id),
+                    limit=10,  # Return 10 concepts in random order
+                    random_order=True
+                )
             if DEBUG_MODE:
                 logger.info(
                     f"[DEBUG] FetchConcepts: Fetched {len(concept_rows)} "
@@ -699,7 +892,11 @@ def FetchConcepts(state: TutorState):
 
     # Priority 2: Use pgvector similarity search (original method)
     # Skip embeddings/RPC for short queries, but still try keyword matching
-    subject_id = state.get("subject_id") or 101
+    subject_id = (
+        state.get("subject_id")
+        or (state.get("topic_bundle") or {}).get("subject_id")
+        or 101
+    )
 
     # Only try embedding search for messages with 4+ words
     # AND if we don't already have concepts from topic fetch
@@ -708,32 +905,18 @@ def FetchConcepts(state: TutorState):
         (concept_rows is None or len(concept_rows) == 0)
     )
     if needs_embedding:
-        # Hash user message for cache key
-        message_hash = hashlib.md5(
-            user_message.encode('utf-8')
-        ).hexdigest()
-        concept_cache_key = f"concepts:{subject_id}:{message_hash}"
-
-        # Check cache for concept rows
-        cached_result = cache_get(concept_cache_key)
-
-        # Only use cache if it has actual results (not empty list)
-        concept_rows_from_cache = (
-            cached_result
-            if (cached_result and len(cached_result) > 0)
-            else None
+        concept_cache_key = cache_keys.concept_search_key(
+            subject_id, user_message
         )
 
-        if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] FetchConcepts: Cache check - "
-                f"cached={cached_result is not None}, "
-                f"cached_count={len(cached_result) if cached_result else 0}, "
-                f"using_cache={concept_rows_from_cache is not None}"
-            )
-
-        if concept_rows_from_cache is None:
-            # Fetch from service if not in cache
+        def load_related_concepts():
+            if not _within_budget(
+                state, "concept_search", "concept_search", 3.0,
+                before_reply=True
+            ):
+                # Raised so the skipped search is not cached as empty
+                raise TimeoutError("no time left before the deadline")
+            started = time.perf_counter()
             if DEBUG_MODE:
                 logger.info(
                     f"[DEBUG] FetchConcepts: Fetching from service - "
@@ -741,25 +924,33 @@ def FetchConcepts(state: TutorState):
                     f"subject_id={subject_id}, "
                     f"topic_id={state.get('topic')}"
                 )
-            concept_rows_from_cache = concept_service.find_related_concepts(
+            rows = concept_service.find_related_concepts(
                 message_text=user_message,
                 subject_id=subject_id,  # From state (backend)
                 topic_id=state.get("topic"),
                 k=7,
                 min_similarity=0.18
             )
+            dependency_latency.observe(
+                "concept_search", time.perf_counter() - started
+            )
             if DEBUG_MODE:
-                count = (
-                    len(concept_rows_from_cache)
-                    if concept_rows_from_cache else 0
-                )
                 logger.info(
                     f"[DEBUG] FetchConcepts: Embedding search returned "
-                    f"{count} concepts"
+                    f"{len(rows) if rows else 0} concepts"
                 )
-            if concept_rows_from_cache:
-                # Cache for 2 hours (7200 seconds)
-                cache_set(concept_cache_key, concept_rows_from_cache, ttl=7200)
+            return rows
+
+        # Cache for 2 hours (7200 seconds); empty results for 60 seconds
+        try:
+            concept_rows_from_cache = cache_get_or_load(
+                concept_cache_key,
+                load_related_concepts,
+                ttl=7200,
+                negative_ttl=60
+            )
+        except TimeoutError:
+            concept_rows_from_cache = None
 
         # Use embedding search results if found
         if concept_rows_from_cache:
@@ -842,7 +1033,7 @@ def RetrieveHistory(state: TutorState):
 
     Priority:
     1. Use history from state if already present (from frontend)
-    2. Use in-memory conversation_cache if available
+    2. Use conversation_store (local LRU, then Redis) if available
     3. Fetch only last 3 messages from Supabase (fallback)
 
     The method returns a list of dicts:
@@ -862,16 +1053,15 @@ def RetrieveHistory(state: TutorState):
             )
         return {}  # No update needed
 
-    # 2. Check in-memory cache
-    if conversation_id in conversation_cache:
-        cached_history = conversation_cache[conversation_id]
-        if len(cached_history) > 0:
-            if DEBUG_MODE:
-                logger.info(
-                    f"[DEBUG] Using cached history: "
-                    f"{len(cached_history)} messages"
-                )
-            return {"history": cached_history}
+    # 2. Check the conversation store (local LRU, then Redis)
+    cached_history = conversation_store.recent(conversation_id)
+    if cached_history:
+        if DEBUG_MODE:
+            logger.info(
+                f"[DEBUG] Using cached history: "
+                f"{len(cached_history)} messages"
+            )
+        return {"history": cached_history}
 
     # 3. Fallback: Fetch only last 2 messages from Supabase (further reduced)
     # Skip DB query if cache exists (even if empty) to save time
@@ -885,9 +1075,9 @@ def RetrieveHistory(state: TutorState):
         limit=2  # Reduced to 2 for speed
     )
 
-    # Update cache with fetched messages (store up to 10 for speed)
+    # Seed the store so later turns (on any worker) skip Supabase
     if history:
-        conversation_cache[conversation_id] = history[:10]
+        conversation_store.seed(conversation_id, history)
 
     return {"history": history or []}
 
@@ -897,80 +1087,49 @@ def RetrieveHistory(state: TutorState):
 # -----------------------------------------------------
 def SummarizeHistory(state: TutorState):
     """
-    Summarize conversation history if it exceeds token limits.
+    Build the history text for the reply prompt without calling the LLM.
 
-    If total tokens > 6000:
-        Use llm_service.summarize_history() to summarize into a short abstract.
-    Only summarizes every 3 turns to reduce LLM calls.
-    Otherwise:
-        condensed_history = the concatenated history.
+    The conversation's rolling summary is read from the conversation store
+    (kept up to date in the background by rolling_summary after each
+    turn) and followed by the messages it does not cover yet. Without a
+    summary the history is used as is; pack_context keeps the most recent
+    part that fits the prompt budget.
+
+    The result is stored in state['condensed_history'].
     """
     history = state.get("history", [])
 
     if not history:
         return {"condensed_history": None}
 
-    # Build history text
+    current = (
+        rolling_summary.current(state["conversation_id"])
+        if ROLLING_SUMMARY_ENABLED else None
+    )
+    if current:
+        # Messages appended since the summary was written
+        uncovered = max(current["total"] - current["version"], 1)
+        recent = history[-uncovered:]
+    else:
+        recent = history
+
     history_text = "\n".join([
         f"{m['role']}: {m['content']}"
-        for m in history
+        for m in recent
     ])
+    if current:
+        history_text = (
+            f"Summary of the earlier conversation: {current['summary']}\n"
+            f"{history_text}"
+        )
 
-    # Estimate tokens (rough: 1 token ≈ 4 characters)
-    total_chars = sum(
-        len(msg.get("content", "")) for msg in history
-    )
-    estimated_tokens = total_chars // 4
-
-    # Debug: History token count
     if DEBUG_MODE:
         logger.info(
-            f"[DEBUG] History token count: {estimated_tokens} tokens "
-            f"({len(history)} messages)"
+            f"[DEBUG] History: {len(recent)} messages, summary version "
+            f"{current['version'] if current else None}"
         )
 
-    # Fast path: If history is small, return immediately without LLM call
-    # Increased threshold to 8000 tokens to skip summarization more often
-    if estimated_tokens <= 8000:
-        if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] History within limit ({estimated_tokens} tokens) - "
-                f"skipping summarization"
-            )
-        return {"condensed_history": history_text}
-
-    # Only summarize every 5 turns to reduce LLM calls (increased from 3)
-    if len(history) % 5 != 0:
-        if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] Skipping summarization (turn {len(history)} "
-                f"not divisible by 5, tokens: {estimated_tokens})"
-            )
-        # Use last 8000 tokens worth of history instead of full summary
-        # Approximate: keep last N messages that fit in 8000 tokens
-        remaining_tokens = 8000
-        trimmed_messages = []
-        for msg in reversed(history):
-            msg_tokens = len(msg.get("content", "")) // 4
-            if remaining_tokens >= msg_tokens:
-                trimmed_messages.insert(0, msg)
-                remaining_tokens -= msg_tokens
-            else:
-                break
-        trimmed_history = "\n".join([
-            f"{m['role']}: {m['content']}"
-            for m in trimmed_messages
-        ])
-        return {"condensed_history": trimmed_history}
-
-    # Only summarize if tokens exceed threshold AND it's the right turn
-    if estimated_tokens > 8000:
-        # Summarize using llm_service with SHORT input (first 1500 chars)
-        summary = llm_service.summarize_history(history_text[:1500])
-        return {"condensed_history": summary}
-    else:
-        # Use concatenated history as-is
-        return {"condensed_history": history_text}
+    return {"condensed_history": history_text}
 
 
 # -----------------------------------------------------
@@ -1011,21 +1170,11 @@ def ClassifyReasoning(state: TutorState):
     return {"reasoning_label": label}
 
 
-# -----------------------------------------------------
-# Node 5: GenerateLLMResponse
-# -----------------------------------------------------
-def GenerateLLMResponse(state: TutorState):
+def _reply_kwargs(state: TutorState) -> Dict:
     """
-    Generate the AI tutor's detailed explanation using LLMService.
-
-    This method uses:
-      - lesson_text
-      - related concepts
-      - conversation history
-      - student question
-    to produce the final answer.
-
-    The result is stored in state['llm_response'].
+    Build the llm_service.generate_reply / stream_reply arguments for a
+    state: concept names, history and a lesson excerpt packed into the
+    TUTOR_CONTEXT_TOKENS budget (see token_budget.pack_context).
     """
     # OPTIMIZED: Skip student profile fetch entirely for speed
     # Use default profile to avoid DB query
@@ -1036,38 +1185,123 @@ def GenerateLLMResponse(state: TutorState):
         "subject_strengths": []
     }
 
-    # 1. Limit lesson_text to first 500 chars (further reduced for speed)
-    lesson_text = (state.get("lesson_text") or "")[:500]
+    # Exact token budget for concepts, history and the lesson excerpt
+    # (lesson_chunks are skipped entirely for speed)
+    packed = pack_context(
+        lesson_text=state.get("lesson_text"),
+        history=state.get("history") or [],
+        concept_rows=state["concept_rows"],
+        condensed_history=state.get("condensed_history")
+    )
+    if DEBUG_MODE:
+        logger.info(f"[DEBUG] Prompt context tokens: {packed['tokens']}")
 
-    # 2. Limit history to last 2 messages
-    trimmed_history = state["history"][-2:] if state.get("history") else []
+    return {
+        "message": state["user_message"],
+        "topic": state["topic"],
+        "learning_level": student_profile.get(
+            "grade_level", "intermediate"
+        ),
+        "conversation_history": packed["history"],
+        "lesson_content": packed["lesson_text"],
+        "concept_rows": packed["concept_rows"],
+        "explanation_style": state["explanation_style"],
+        "lesson_chunks": [],
+        "condensed_history": packed["condensed_history"],
+        "student_profile": student_profile
+    }
 
-    # 3. Skip lesson_chunks entirely (always empty for speed)
-    trimmed_chunks = []
 
-    # Trim context to fit within token budget (2000 tokens, further reduced)
-    trimmed_history_final, trimmed_lesson_final, trimmed_chunks_final = (
-        llm_service.trim_context(
-            history=trimmed_history,
-            lesson_text=lesson_text,
-            chunks=trimmed_chunks,
-            max_tokens=2000  # Further reduced for speed
-        )
+def _first_turn(state: TutorState) -> bool:
+    """
+    True if the conversation has no history besides the current message
+    (LogUserMessage has already added it to the conversation store).
+    """
+    message = state["user_message"]
+    return all(
+        m.get("role") == "user" and m.get("content") == message
+        for m in state.get("history") or []
     )
 
-    try:
-        response_text, token_usage = llm_service.generate_reply(
-            message=state["user_message"],
-            topic=state["topic"],
-            learning_level=student_profile.get("grade_level", "intermediate"),
-            conversation_history=trimmed_history_final,
-            lesson_content=trimmed_lesson_final,
-            concept_rows=state["concept_rows"],
-            explanation_style=state["explanation_style"],
-            lesson_chunks=trimmed_chunks_final,
-            condensed_history=state.get("condensed_history"),
-            student_profile=student_profile
+
+def _cached_reply(state: TutorState) -> Optional[str]:
+    """Answer from the semantic cache for a first-turn question, if any."""
+    if not SEMANTIC_CACHE_ENABLED or not _first_turn(state):
+        return None
+    hit = semantic_cache.lookup(
+        state["topic"], state["explanation_style"], state["user_message"]
+    )
+    if hit is None:
+        return None
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] Semantic cache {hit['match']} hit "
+            f"(similarity {hit['similarity']})"
+        )
+    return hit["answer"]
+
+
+def _remember_reply(state: TutorState, reply: str, token_usage: Dict):
+    """Cache a generated first-turn reply (never a fallback reply)."""
+    if (
+        SEMANTIC_CACHE_ENABLED
+        and token_usage.get("completion_tokens", 0) > 0
+        and _first_turn(state)
+    ):
+        semantic_cache.store(
+            state["topic"], state["explanation_style"],
+            state["user_message"], reply, token_usage
         )
+
+
+# -----------------------------------------------------
+# Node 5: GenerateLLMResponse
+# -----------------------------------------------------
+def GenerateLLMResponse(state: TutorState):
+    """
+    Generate the AI tutor's detailed explanation using LLMService.
+
+    This method uses:
+      - lesson_text
+      - related concepts
+      - conversation history
+      - student question
+    to produce the final answer.
+
+    A conversation's first question is answered from the semantic cache
+    when the same (or a very similar) question was answered before for
+    the topic and explanation style.
+
+    The result is stored in state['llm_response']. With
+    STRUCTURED_REPLY_ENABLED the same call also labels the student's
+    reasoning and the label is stored in state['reasoning_label']
+    (ClassifyReasoning then only runs when no label came back).
+    """
+    cached = _cached_reply(state)
+    if cached is not None:
+        result = {
+            "llm_response": cached,
+            "token_usage": {
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_tokens": 0
+            }
+        }
+        if STRUCTURED_REPLY_ENABLED:
+            result.update(ClassifyReasoning(state))
+        return result
+
+    label = None
+    try:
+        if STRUCTURED_REPLY_ENABLED:
+            response_text, label, token_usage = (
+                llm_service.generate_labelled_reply(**_reply_kwargs(state))
+            )
+        else:
+            response_text, token_usage = llm_service.generate_reply(
+                **_reply_kwargs(state)
+            )
+        _remember_reply(state, response_text, token_usage)
     except Exception as e:
         logger.error(f"[LLM Failure] {e}")
         response_text = llm_service.fallback_reply(
@@ -1086,13 +1320,26 @@ def GenerateLLMResponse(state: TutorState):
             f"[DEBUG] Token Usage: "
             f"Input={token_usage.get('prompt_tokens', 0)}, "
             f"Output={token_usage.get('completion_tokens', 0)}, "
-            f"Total={token_usage.get('total_tokens', 0)}"
+            f"Total={token_usage.get('total_tokens', 0)}, "
+            f"Cached={token_usage.get('cached_tokens', 0)}"
         )
 
-    return {
+    result = {
         "llm_response": response_text,
         "token_usage": token_usage
     }
+    if STRUCTURED_REPLY_ENABLED:
+        if label is None or not state.get("concept_rows"):
+            # Same rules as the separate node: no concepts -> neutral
+            result.update(ClassifyReasoning(state))
+        else:
+            result["reasoning_label"] = label
+        if DEBUG_MODE:
+            logger.info(
+                f"[DEBUG] Reasoning label: {result['reasoning_label']} "
+                f"(structured reply)"
+            )
+    return result
 
 
 # -----------------------------------------------------
@@ -1111,6 +1358,25 @@ def UpdateMastery(state: TutorState):
       4. Store updates inside state['mastery_updates'].
     """
 
+    updates = _mastery_updates(state)
+    if updates:
+        _apply_mastery_updates(state["user_id"], updates)
+
+    # Debug: Mastery deltas
+    if DEBUG_MODE:
+        logger.info(f"[DEBUG] Mastery deltas: {len(updates)} updates")
+        for u in updates[:3]:  # Show first 3
+            logger.info(f"  - Concept {u['concept_id']}: {u['delta']:+d}")
+
+    # Save updates (may be empty)
+    return {"mastery_updates": updates}
+
+
+def _mastery_updates(state: TutorState) -> List[Dict]:
+    """
+    Turn the reasoning label into one mastery update per detected concept
+    (no writes).
+    """
     concept_ids = [
         int(row["concept_id"])
         for row in state["concept_rows"]
@@ -1119,64 +1385,44 @@ def UpdateMastery(state: TutorState):
 
     # Return empty updates if no concept_ids found
     if not concept_ids:
-        return {"mastery_updates": []}
+        return []
 
     label = state["reasoning_label"]
 
     # Convert label -> mastery delta using MasteryService
     delta = mastery_service.label_to_delta(label)
+    if delta == 0:
+        return []
+
+    return [
+        {
+            "concept_id": cid,
+            "delta": delta,
+            "reason": f"tutor_chat_{label}"
+        }
+        for cid in concept_ids
+    ]
 
-    updates = []
-    if delta != 0:
-        for cid in concept_ids:
-            updates.append({
-                "concept_id": cid,
-                "delta": delta,
-                "reason": f"tutor_chat_{label}"
-            })
-
-        # Apply full update logic using MasteryService (async fire-and-forget)
-        async_write(
-            mastery_service.apply_mastery_updates,
-            user_id=state["user_id"],
-            updates=updates
-        )
 
-        # Invalidate readiness cache for this user/concept combination
-        # This ensures readiness reflects updated mastery scores
-        concept_ids_str = [str(cid) for cid in concept_ids]
-        # Invalidate cache using both cache key formats
-        # Format 1: readiness_agent format (sorted concept IDs hash)
-        try:
-            from cache import _hash_string
-            concept_ids_sorted = sorted(concept_ids_str)
-            concept_ids_hash = _hash_string(":".join(concept_ids_sorted))
-            cache_key_1 = f"readiness:{state['user_id']}:{concept_ids_hash}"
-            cache_delete(cache_key_1)
-        except Exception:
-            pass
-        # Format 2: langgraph_tutor format (hash of concept_ids list)
-        try:
-            cache_key_2 = (
-                f"readiness:{state['user_id']}:{hash(str(concept_ids))}"
-            )
-            cache_delete(cache_key_2)
-        except Exception:
-            pass
+def _apply_mastery_updates(user_id: str, updates: List[Dict]):
+    """Write mastery updates and invalidate the user's readiness cache."""
+    # Apply full update logic using MasteryService off the request path;
+    # it reads current mastery, then queues the writes in the outbox
+    async_write(
+        mastery_service.apply_mastery_updates,
+        user_id=user_id,
+        updates=updates
+    )
 
-        if DEBUG_MODE:
-            logger.info(
-                "[DEBUG] Invalidated readiness cache after mastery updates"
-            )
+    # Invalidate every readiness entry for this user so readiness
+    # reflects updated mastery scores (MasteryAgent bumps again once
+    # the write has landed)
+    bump_mastery_generation(user_id)
 
-    # Debug: Mastery deltas
     if DEBUG_MODE:
-        logger.info(f"[DEBUG] Mastery deltas: {len(updates)} updates")
-        for u in updates[:3]:  # Show first 3
-            logger.info(f"  - Concept {u['concept_id']}: {u['delta']:+d}")
-
-    # Save updates (may be empty)
-    return {"mastery_updates": updates}
+        logger.info(
+            "[DEBUG] Invalidated readiness cache after mastery updates"
+        )
 
 
 # -----------------------------------------------------
@@ -1205,9 +1451,8 @@ def LogMessage(state: TutorState):
         if row.get("concept_id")
     ]
 
-    # Write the assistant message to Supabase (async fire-and-forget)
-    async_write(
-        message_service.log,
+    # Queue the assistant message for Supabase (batched by the outbox)
+    message_service.log(
         user_id=state["user_id"],
         lesson_topic=state["topic"],
         conversation_id=state["conversation_id"],
@@ -1216,28 +1461,18 @@ def LogMessage(state: TutorState):
         concept_ids=concept_ids
     )
 
-    # Update in-memory conversation cache
-    conversation_id = state["conversation_id"]
-    if conversation_id not in conversation_cache:
-        conversation_cache[conversation_id] = []
-
-    # Add assistant message to cache
-    conversation_cache[conversation_id].append({
-        "role": "assistant",
-        "content": state["llm_response"]
-    })
-
-    # Keep only last 20 messages in cache
-    conversation_cache[conversation_id] = (
-        conversation_cache[conversation_id][-20:]
+    # Add the assistant message to the shared conversation store
+    conversation_store.append(
+        state["conversation_id"], "assistant", state["llm_response"]
     )
 
+    # Fold the finished turn into the rolling summary in the background
+    if ROLLING_SUMMARY_ENABLED:
+        rolling_summary.schedule(state["conversation_id"])
+
     # Invalidate conversation history cache only
     # (concepts and lesson_chunks caches persist for 1-2 hours)
-    conversation_cache_key = (
-        f"history:{state['conversation_id']}"
-    )
-    cache_delete(conversation_cache_key)
+    cache_delete(cache_keys.history_key(state["conversation_id"]))
 
     return {}
 
@@ -1259,6 +1494,7 @@ def ComputeReadiness(state: TutorState):
             "average_mastery": float,
             "min_mastery": int
         }
+        (None when the deadline leaves no time for it)
     """
 
     # Extract concept_ids and convert to strings
@@ -1286,16 +1522,13 @@ def ComputeReadiness(state: TutorState):
             }
         }
 
-    # Check cache before computing
-    cache_key = f"readiness:{state['user_id']}:{hash(str(concept_ids))}"
-    cached = cache_get(cache_key)
-    if cached:
-        if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] ComputeReadiness: Cache hit for "
-                f"{len(concept_ids)} concepts"
-            )
-        return {"readiness": cached}
+    if not _within_budget(
+        state, "readiness", "node:ComputeReadiness", 1.0
+    ):
+        return {"readiness": None}
+
+    # Caching happens in ReadinessAgent.compute_readiness, keyed by the
+    # sorted concept IDs and the user's mastery generation
 
     # Debug: Concept IDs extraction
     if DEBUG_MODE:
@@ -1355,10 +1588,6 @@ def ComputeReadiness(state: TutorState):
                 f"{len(readiness.get('concept_readiness', []))}"
             )
 
-    # Store in cache (1 minute TTL - reduced to reflect mastery updates faster)
-    # Mastery can change during session, so shorter cache ensures freshness
-    cache_set(cache_key, readiness, ttl=60)
-
     return {"readiness": readiness}
 
 
@@ -1371,6 +1600,10 @@ def ComputeLearningPath(state: TutorState):
 
     Uses:
         readiness_service.compute_next_learning_step(readiness, concept_ids)
+
+    Produces state['learning_path'] (None when the deadline leaves no time
+    for it). With a topic bundle, the next concept comes from the bundle
+    and the student's shown-concept bitset (see _bundle_learning_path).
     """
     # Extract concept_ids and ensure they're strings
     concept_ids = [
@@ -1395,6 +1628,15 @@ def ComputeLearningPath(state: TutorState):
             }
         }
 
+    if not _within_budget(
+        state, "learning_path", "node:ComputeLearningPath", 1.0
+    ):
+        return {"learning_path": None}
+
+    bundle = state.get("topic_bundle")
+    if bundle and bundle["path"]:
+        return {"learning_path": _bundle_learning_path(state, bundle)}
+
     # NO-REPEAT ROTATION: Track shown concepts per user/topic
     # Ensures all 10 concepts are shown before any repeat
     user_id = state.get("user_id", "")
@@ -1403,47 +1645,52 @@ def ComputeLearningPath(state: TutorState):
     # Fetch ALL concepts for this topic (up to 10) to ensure we have
     # the complete set for rotation
     # Use a persistent cache key to ensure we always get the same order
-    all_concepts_cache_key = f"all_concepts_ordered:{topic_id}"
-    all_topic_concepts = cache_get(all_concepts_cache_key)
+    all_concepts_cache_key = cache_keys.all_concepts_ordered_key(topic_id)
+    # Track shown concepts per user/topic combination
+    # Use user_id + topic_id to track across all conversations
+    shown_concepts_key = cache_keys.shown_concepts_key(user_id, topic_id)
 
-    if all_topic_concepts is None:
-        # Fetch from database if not in cache
-        try:
-            all_topic_concepts = concept_service.fetch_concepts_by_topic(
-                topic_id=str(topic_id),
-                limit=10,
-                random_order=False  # Get in consistent order
-            )
-            # Sort by concept_id to ensure consistent order
-            all_topic_concepts.sort(
-                key=lambda x: x.get("concept_id", 0)
+    # Read the ordered list and the shown list in one round-trip
+    cached = cache_get_many([all_concepts_cache_key, shown_concepts_key])
+
+    def load_ordered_concepts():
+        concepts = concept_service.fetch_concepts_by_topic(
+            topic_id=str(topic_id),
+            limit=10,
+            random_order=False  # Get in consistent order
+        )
+        # Sort by concept_id to ensure consistent order
+        concepts.sort(key=lambda x: x.get("concept_id", 0))
+        if DEBUG_MODE:
+            logger.info(
+                f"[DEBUG] ComputeLearningPath: Fetched "
+                f"{len(concepts)} concepts for topic {topic_id}"
             )
-            # Cache the ordered list for 24 hours
-            cache_set(all_concepts_cache_key, all_topic_concepts, ttl=86400)
-            if DEBUG_MODE:
-                logger.info(
-                    f"[DEBUG] ComputeLearningPath: Fetched and cached "
-                    f"{len(all_topic_concepts)} concepts for topic {topic_id}"
-                )
-        except Exception as e:
-            if DEBUG_MODE:
-                logger.warning(
-                    f"[DEBUG] ComputeLearningPath: Error fetching all "
-                    f"concepts: {e}"
-                )
-            # Fallback to concepts from state
-            all_topic_concepts = state.get("concept_rows", [])
-            # Sort by concept_id for consistency
-            all_topic_concepts.sort(
-                key=lambda x: x.get("concept_id", 0)
+        return concepts
+
+    try:
+        all_topic_concepts = cached.get(all_concepts_cache_key)
+        if all_topic_concepts is None:
+            # Miss: load once, cache the ordered list for 24 hours
+            # (empty list for 60 seconds)
+            all_topic_concepts = cache_get_or_load(
+                all_concepts_cache_key,
+                load_ordered_concepts,
+                ttl=86400,
+                negative_ttl=60
             )
-    else:
+    except Exception as e:
         if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] ComputeLearningPath: Using cached ordered "
-                f"concepts ({len(all_topic_concepts)} concepts) for "
-                f"topic {topic_id}"
+            logger.warning(
+                f"[DEBUG] ComputeLearningPath: Error fetching all "
+                f"concepts: {e}"
             )
+        # Fallback to concepts from state
+        all_topic_concepts = state.get("concept_rows", [])
+        # Sort by concept_id for consistency
+        all_topic_concepts.sort(
+            key=lambda x: x.get("concept_id", 0)
+        )
 
     # Extract concept_ids from all topic concepts (already sorted)
     all_concept_ids = [
@@ -1466,14 +1713,8 @@ def ComputeLearningPath(state: TutorState):
             if c.get("concept_id") not in (None, "None", "")
         ]
 
-    # Track shown concepts per user/topic combination
-    # Use user_id + topic_id to track across all conversations
-    shown_concepts_key = f"shown_concepts:{user_id}:{topic_id}"
-
-    # Get list of already shown concept IDs from cache
-    shown_concept_ids = cache_get(shown_concepts_key)
-    if shown_concept_ids is None:
-        shown_concept_ids = []
+    # List of already shown concept IDs (read above with the ordered list)
+    shown_concept_ids = cached.get(shown_concepts_key) or []
 
     # Find concepts that haven't been shown yet
     # Convert shown_concept_ids to set for faster lookup
@@ -1493,8 +1734,7 @@ def ComputeLearningPath(state: TutorState):
         shown_concept_ids = []
         shown_set = set()
         unseen_concept_ids = all_concept_ids.copy()
-        # Clear the cache to reset
-        cache_set(shown_concepts_key, [], ttl=86400)
+        # The reset list is written back below with the next concept
 
     # Select the next unseen concept (first in list for sequential order)
     recommended_concept_id = (
@@ -1538,11 +1778,14 @@ def ComputeLearningPath(state: TutorState):
             shown_concept_ids.append(recommended_concept_id_str)
             shown_set.add(recommended_concept_id_str)
         # Store updated list in cache (24 hour TTL to persist across sessions)
-        # Always save to ensure persistence
-        cache_set(shown_concepts_key, shown_concept_ids, ttl=86400)
-
-        # Also store the ordered concept list to ensure consistency
-        cache_set(all_concepts_cache_key, all_topic_concepts, ttl=86400)
+        # along with the ordered concept list, in one pipeline
+        cache_set_many(
+            {
+                shown_concepts_key: shown_concept_ids,
+                all_concepts_cache_key: all_topic_concepts,
+            },
+            ttl=86400
+        )
 
         if DEBUG_MODE:
             logger.info(
@@ -1572,33 +1815,7 @@ def ComputeLearningPath(state: TutorState):
     # Build learning path directly from actual concepts in database
     # Don't use readiness service - use actual concepts from database
     # Always use "learn_next_concept" decision with sequential rotation
-    if recommended_concept_id:
-        if concept_name:
-            details = (
-                f"Continue exploring concepts in this topic. "
-                f"Try asking questions about '{concept_name}' "
-                f"to deepen your understanding."
-            )
-        else:
-            details = (
-                "Continue exploring concepts in this topic. "
-                "Try asking questions about the recommended concept "
-                "to deepen your understanding."
-            )
-        learning_path = {
-            "decision": "learn_next_concept",
-            "recommended_concept": recommended_concept_id,
-            "recommended_concept_name": concept_name,
-            "details": details
-        }
-    else:
-        # Fallback if no concept found
-        learning_path = {
-            "decision": "unknown",
-            "recommended_concept": None,
-            "recommended_concept_name": None,
-            "details": "No concepts available."
-        }
+    learning_path = _learning_path(recommended_concept_id, concept_name)
 
     # Debug: Learning path result
     if DEBUG_MODE:
@@ -1614,59 +1831,337 @@ def ComputeLearningPath(state: TutorState):
     return {"learning_path": learning_path}
 
 
+def _learning_path(
+    recommended_concept_id: Optional[str], concept_name: Optional[str]
+) -> Dict:
+    """ComputeLearningPath result recommending a concept (or none)."""
+    if not recommended_concept_id:
+        # Fallback if no concept found
+        return {
+            "decision": "unknown",
+            "recommended_concept": None,
+            "recommended_concept_name": None,
+            "details": "No concepts available."
+        }
+    if concept_name:
+        details = (
+            f"Continue exploring concepts in this topic. "
+            f"Try asking questions about '{concept_name}' "
+            f"to deepen your understanding."
+        )
+    else:
+        details = (
+            "Continue exploring concepts in this topic. "
+            "Try asking questions about the recommended concept "
+            "to deepen your understanding."
+        )
+    return {
+        "decision": "learn_next_concept",
+        "recommended_concept": recommended_concept_id,
+        "recommended_concept_name": concept_name,
+        "details": details
+    }
+
+
+def _bundle_learning_path(state: Dict, bundle: Dict) -> Dict:
+    """
+    ComputeLearningPath from the topic bundle: the first path concept
+    whose bit is clear in the student's bitset (read by FetchTopicBundle)
+    is recommended and its bit set, starting over once all are set.
+    """
+    concept, shown = next_concept(bundle, state.get("shown_concepts"))
+    cache_set(
+        cache_keys.shown_concepts_bits_key(state["user_id"], state["topic"]),
+        shown, ttl=SHOWN_CONCEPTS_TTL
+    )
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] ComputeLearningPath: Recommended concept "
+            f"{concept['concept_id']} from the topic bundle "
+            f"(shown: {shown_count(bundle, shown)}/{len(bundle['path'])})"
+        )
+    return _learning_path(str(concept["concept_id"]), concept["name"])
+
+
 # -----------------------------------------------------
 # BUILD LANGGRAPH PIPELINE
 # -----------------------------------------------------
 
-# Node execution order:
-#   0. LogUserMessage     (log student message to Supabase)
-#   0.5. ValidateInput    (validate and limit input token sizes)
-#   1. FetchLesson        (load lesson content from Supabase)
-#   2. RetrieveHistory    (load last N messages)
-#   3. SummarizeHistory   (condense history if needed)
-#   4. FetchConcepts      (pgvector similarity search)
-#   5. ClassifyReasoning  (LLM classify reasoning)
-#   6. GenerateLLMResponse (main ChatGPT tutor response)
-#   7. UpdateMastery      (update mastery scores)
-#   8. ComputeReadiness   (compute readiness levels)
-#   9. ComputeLearningPath (determine next learning step)
-#   10. LogMessage         (store AI message)
-
-graph = StateGraph(TutorState)
-
-# All nodes wrapped with timed_node for timing and error handling
-graph.add_node("LogUserMessage", timed_node(LogUserMessage))
-graph.add_node("ValidateInput", timed_node(ValidateInput))
-graph.add_node("FetchLesson", timed_node(FetchLesson))
-graph.add_node("RetrieveHistory", timed_node(RetrieveHistory))
-graph.add_node("SummarizeHistory", timed_node(SummarizeHistory))
-graph.add_node("FetchConcepts", timed_node(FetchConcepts))
-graph.add_node("ClassifyReasoning", timed_node(ClassifyReasoning))
-graph.add_node("GenerateLLMResponse", timed_node(GenerateLLMResponse))
-graph.add_node("UpdateMastery", timed_node(UpdateMastery))
-graph.add_node("ComputeReadiness", timed_node(ComputeReadiness))
-graph.add_node("ComputeLearningPath", timed_node(ComputeLearningPath))
-graph.add_node("LogMessage", timed_node(LogMessage))
-
-# ------------------------------
-# Define the linear flow
-# ------------------------------
-graph.set_entry_point("LogUserMessage")
-graph.add_edge("LogUserMessage", "ValidateInput")
-graph.add_edge("ValidateInput", "FetchLesson")
-graph.add_edge("FetchLesson", "RetrieveHistory")
-graph.add_edge("RetrieveHistory", "SummarizeHistory")
-graph.add_edge("SummarizeHistory", "FetchConcepts")
-graph.add_edge("FetchConcepts", "ClassifyReasoning")
-graph.add_edge("ClassifyReasoning", "GenerateLLMResponse")
-graph.add_edge("GenerateLLMResponse", "UpdateMastery")
-graph.add_edge("UpdateMastery", "ComputeReadiness")
-graph.add_edge("ComputeReadiness", "ComputeLearningPath")
-graph.add_edge("ComputeLearningPath", "LogMessage")
-graph.add_edge("LogMessage", END)
-
-# Compile the graph into an executable app
-tutor_app = graph.compile()
+# The graph is a fan-out/fan-in DAG. LangGraph runs the nodes of one
+# superstep concurrently and a node with several sources waits for all
+# of them:
+#
+#   1. LogUserMessage      (log student message to Supabase)
+#   2. ValidateInput       (validate and limit input token sizes)
+#   3. FetchTopicBundle    (topic bundle and shown concepts, one read)
+#   4. FetchLesson | RetrieveHistory | FetchConcepts      (independent I/O)
+#   5. SummarizeHistory
+#   6. GenerateLLMResponse | ClassifyReasoning | ComputeLearningPath
+#      (all three wait for the same inputs; the reasoning label only
+#      feeds mastery and the learning path only the response, so their
+#      work overlaps the reply's LLM call)
+#   7. UpdateMastery       (deltas only; the write is async_write)
+#   8. ComputeReadiness
+#
+# Steps 7 and 8 still run after the reply: readiness is part of the
+# response and reflects this turn's mastery deltas. LogMessage is not a
+# graph node; run_tutor_graph queues it with async_write once the graph
+# has returned, as stream_tutor_graph does after the final event.
+TUTOR_NODES = (
+    LogUserMessage,
+    ValidateInput,
+    FetchTopicBundle,
+    FetchLesson,
+    RetrieveHistory,
+    SummarizeHistory,
+    FetchConcepts,
+    ClassifyReasoning,
+    GenerateLLMResponse,
+    UpdateMastery,
+    ComputeReadiness,
+    ComputeLearningPath,
+)
+
+# (sources, target); a list of sources is a join
+TUTOR_EDGES = (
+    ("LogUserMessage", "ValidateInput"),
+    ("ValidateInput", "FetchTopicBundle"),
+    ("FetchTopicBundle", "FetchLesson"),
+    ("FetchTopicBundle", "RetrieveHistory"),
+    ("FetchTopicBundle", "FetchConcepts"),
+    ("RetrieveHistory", "SummarizeHistory"),
+    (["FetchLesson", "SummarizeHistory", "FetchConcepts"],
+     "GenerateLLMResponse"),
+    (["FetchLesson", "SummarizeHistory", "FetchConcepts"],
+     "ComputeLearningPath"),
+    (["SummarizeHistory", "FetchConcepts"], "ClassifyReasoning"),
+    ("ClassifyReasoning", "UpdateMastery"),
+    ("UpdateMastery", "ComputeReadiness"),
+    ("GenerateLLMResponse", END),
+    ("ComputeLearningPath", END),
+    ("ComputeReadiness", END),
+)
+
+
+# STRUCTURED_REPLY_ENABLED: GenerateLLMResponse also sets the reasoning
+# label, so UpdateMastery follows it and ClassifyReasoning is not a node
+STRUCTURED_TUTOR_NODES = tuple(
+    fn for fn in TUTOR_NODES if fn is not ClassifyReasoning
+)
+
+STRUCTURED_TUTOR_EDGES = (
+    ("LogUserMessage", "ValidateInput"),
+    ("ValidateInput", "FetchTopicBundle"),
+    ("FetchTopicBundle", "FetchLesson"),
+    ("FetchTopicBundle", "RetrieveHistory"),
+    ("FetchTopicBundle", "FetchConcepts"),
+    ("RetrieveHistory", "SummarizeHistory"),
+    (["FetchLesson", "SummarizeHistory", "FetchConcepts"],
+     "GenerateLLMResponse"),
+    (["FetchLesson", "SummarizeHistory", "FetchConcepts"],
+     "ComputeLearningPath"),
+    ("GenerateLLMResponse", "UpdateMastery"),
+    ("UpdateMastery", "ComputeReadiness"),
+    ("ComputeLearningPath", END),
+    ("ComputeReadiness", END),
+)
+
+
+def build_tutor_graph(nodes=TUTOR_NODES, edges=TUTOR_EDGES):
+    """
+    Build and compile the tutor graph.
+
+    Args:
+        nodes: Node functions; each is registered under its __name__ and
+            wrapped with timed_node for timing and error handling
+        edges: (sources, target) pairs; sources may be a list (join)
+
+    Returns:
+        Compiled LangGraph app
+    """
+    from langgraph.graph import StateGraph
+
+    graph = StateGraph(TutorState)
+    for fn in nodes:
+        graph.add_node(fn.__name__, timed_node(fn))
+    graph.set_entry_point(nodes[0].__name__)
+    for sources, target in edges:
+        graph.add_edge(sources, target)
+    return graph.compile()
+
+
+# The graphs are compiled on first use (importing LangGraph's graph
+# builder is slow)
+container.register(
+    "tutor_app",
+    lambda: build_tutor_graph(STRUCTURED_TUTOR_NODES, STRUCTURED_TUTOR_EDGES)
+    if STRUCTURED_REPLY_ENABLED else build_tutor_graph()
+)
+tutor_app = LazyProxy(lambda: container.get("tutor_app"), "tutor_app")
+
+# Streaming runs only the nodes the reply depends on as a graph; the reply
+# itself is streamed by stream_tutor_graph, which then finishes the turn
+PREPARE_NODES = (
+    LogUserMessage,
+    ValidateInput,
+    FetchTopicBundle,
+    FetchLesson,
+    RetrieveHistory,
+    SummarizeHistory,
+    FetchConcepts,
+)
+
+PREPARE_EDGES = (
+    ("LogUserMessage", "ValidateInput"),
+    ("ValidateInput", "FetchTopicBundle"),
+    ("FetchTopicBundle", "FetchLesson"),
+    ("FetchTopicBundle", "RetrieveHistory"),
+    ("FetchTopicBundle", "FetchConcepts"),
+    ("RetrieveHistory", "SummarizeHistory"),
+    ("FetchLesson", END),
+    ("SummarizeHistory", END),
+    ("FetchConcepts", END),
+)
+
+container.register(
+    "tutor_prepare_app",
+    lambda: build_tutor_graph(PREPARE_NODES, PREPARE_EDGES)
+)
+tutor_prepare_app = LazyProxy(
+    lambda: container.get("tutor_prepare_app"), "tutor_prepare_app"
+)
+
+# Runs ClassifyReasoning and ComputeLearningPath while a streamed reply
+# is being generated
+_stream_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TUTOR_STREAM_WORKERS", "16")),
+    thread_name_prefix="tutor-stream"
+)
+
+
+def _initial_state(
+    user_id: str,
+    topic: str,
+    message: str,
+    conversation_id: str,
+    explanation_style: str,
+    trace_id: str,
+    subject_id: Optional[int],
+    history_from_frontend: List[Dict],
+    deadline: Optional[Deadline] = None
+) -> Dict:
+    """Initial TutorState for one tutor turn."""
+    return {
+        "user_id": user_id,
+        "topic": topic,
+        "user_message": message,
+        "conversation_id": conversation_id,
+        "explanation_style": explanation_style,
+        "trace_id": trace_id,
+        "subject_id": subject_id,
+        "lesson_text": None,
+        "lesson_chunks": [],
+        "history": history_from_frontend,  # Use history from frontend
+        "condensed_history": None,
+        "concept_rows": [],
+        "reasoning_label": "neutral",
+        "llm_response": "",
+        "token_usage": {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0
+        },
+        "mastery_updates": [],
+        "readiness": None,
+        "learning_path": None,
+        "topic_bundle": None,
+        "shown_concepts": None,
+        "deadline": deadline,
+    }
+
+
+def _tutor_response(final_state: Dict) -> Dict:
+    """Build the standard API response from a finished TutorState."""
+    deadline = final_state.get("deadline")
+    # Build standard API response
+    # Ensure suggestions is always a list
+    suggestions = final_state.get("suggestions", [])
+    if not isinstance(suggestions, list):
+        # Convert single suggestion to list if needed
+        suggestions = [suggestions] if suggestions else []
+
+    # Extract related concepts from concept_rows
+    concept_rows = final_state.get("concept_rows", [])
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] Building response: concept_rows count = "
+            f"{len(concept_rows)}"
+        )
+        if concept_rows:
+            logger.info(
+                f"[DEBUG] Sample concept_row: {concept_rows[0]}"
+            )
+
+    related_concepts_list = [
+        row.get("name") for row in concept_rows
+        if row.get("name")
+    ]
+    concept_ids_list = [
+        str(row.get("concept_id"))
+        for row in concept_rows
+        if row.get("concept_id") is not None
+    ]
+
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] Extracted {len(related_concepts_list)} related "
+            f"concepts and {len(concept_ids_list)} concept IDs"
+        )
+
+    return {
+        "response": final_state["llm_response"],
+        "suggestions": suggestions,
+        "related_concepts": related_concepts_list,
+        "concept_ids": concept_ids_list,
+        "reasoning_label": final_state["reasoning_label"],
+        "mastery_updates": final_state["mastery_updates"],
+        "readiness": final_state.get("readiness"),
+        "learning_path": final_state.get("learning_path"),
+        "token_usage": final_state.get("token_usage", {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0
+        }),
+        "conversation_id": final_state["conversation_id"],
+        "lesson_chunks": final_state.get("lesson_chunks", []),
+        # Optional steps skipped to meet the deadline
+        "degraded": list(deadline.skipped) if deadline else []
+    }
+
+
+def _pre_routed(state: Dict) -> Optional[Dict]:
+    """
+    Answer a greeting, thanks, goodbye or off-topic message from its
+    template, without running the graph.
+
+    Both messages are still logged and added to the conversation. Returns
+    the run_tutor_graph response (with "route" set to the category), or
+    None if the message needs the graph.
+    """
+    route = pre_router.route(state["user_message"])
+    if route is None:
+        return None
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] Pre-router answered a '{route['category']}' message "
+            f"without the graph"
+        )
+    state["llm_response"] = route["reply"]
+    timed_node(LogUserMessage)(state)
+    timed_node(LogMessage)(state)
+    response = _tutor_response(state)
+    response["route"] = route["category"]
+    return response
 
 
 # -----------------------------------------------------
@@ -1680,7 +2175,8 @@ def run_tutor_graph(
     explanation_style: str = "default",
     mode: str = "tutor",
     subject_id: Optional[int] = None,
-    conversation_history: Optional[List[Dict[str, str]]] = None
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    deadline: Optional[Deadline] = None
 ):
     """
     High-level function to execute the LangGraph tutor pipeline.
@@ -1697,6 +2193,8 @@ def run_tutor_graph(
         - mode             (str) optional, default="tutor"
               Options: "tutor", "exam", "essay"
         - subject_id       (int) optional, subject ID from Supabase
+        - deadline         (Deadline) optional, the request's time budget
+              (default: a new TUTOR_DEADLINE_SECONDS budget)
 
     Returns:
         dict containing:
@@ -1752,103 +2250,37 @@ def run_tutor_graph(
                 f"{len(history_from_frontend)} messages"
             )
 
-        initial_state = {
-            "user_id": user_id,
-            "topic": topic,
-            "user_message": message,
-            "conversation_id": conversation_id,
-            "explanation_style": explanation_style,
-            "trace_id": trace_id,
-            "subject_id": subject_id,
-            "lesson_text": None,
-            "lesson_chunks": [],
-            "history": history_from_frontend,  # Use history from frontend
-            "condensed_history": None,
-            "concept_rows": [],
-            "reasoning_label": "neutral",
-            "llm_response": "",
-            "token_usage": {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0
-            },
-            "mastery_updates": [],
-            "readiness": None,
-            "learning_path": None,
-        }
+        deadline = deadline or Deadline()
+        initial_state = _initial_state(
+            user_id, topic, message, conversation_id, explanation_style,
+            trace_id, subject_id, history_from_frontend, deadline=deadline
+        )
 
-        # Add timeout protection for graph execution
-        import threading
-        import time
-        invoke_container = {
-            "value": None, "error": None, "completed": False
-        }
+        routed = _pre_routed(initial_state)
+        if routed is not None:
+            return routed
 
+        # Run the graph on the caller's thread; the API already runs this
+        # function off the event loop and the graph fans out on its own
         if DEBUG_MODE:
-            logger.info("[DEBUG] Starting graph execution with timeout...")
+            logger.info("[DEBUG] Starting graph execution...")
 
         start_time = time.time()
-
-        def invoke_graph():
-            try:
-                if DEBUG_MODE:
-                    logger.info("[DEBUG] Graph invoke thread started")
-                invoke_container["value"] = tutor_app.invoke(initial_state)
-                invoke_container["completed"] = True
-                if DEBUG_MODE:
-                    elapsed = time.time() - start_time
-                    logger.info(
-                        f"[DEBUG] Graph execution completed in {elapsed:.2f}s"
-                    )
-            except Exception as e:
-                invoke_container["error"] = e
-                invoke_container["completed"] = True
-                if DEBUG_MODE:
-                    elapsed = time.time() - start_time
-                    logger.error(
-                        f"[ERROR] Graph execution failed after "
-                        f"{elapsed:.2f}s: {e}"
-                    )
-
-        invoke_thread = threading.Thread(target=invoke_graph, daemon=True)
-        invoke_thread.start()
-        invoke_thread.join()  # No timeout - let it complete
-
-        elapsed = time.time() - start_time
-
-        if not invoke_container["completed"]:
+        try:
+            final_state = tutor_app.invoke(initial_state)
+        except Exception as e:
             logger.error(
-                f"[ERROR] Graph execution did not complete after "
-                f"{elapsed:.2f}s"
+                f"[ERROR] Graph execution failed after "
+                f"{time.time() - start_time:.2f}s: {e}"
             )
-            # Return a fallback response instead of raising
-            return {
-                "response": (
-                    "I apologize, but I'm experiencing a delay. "
-                    "Please try asking your question again."
-                ),
-                "suggestions": [],
-                "related_concepts": [],
-                "concept_ids": [],
-                "reasoning_label": "neutral",
-                "mastery_updates": [],
-                "readiness": None,
-                "learning_path": None,
-                "token_usage": {
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0
-                }
-            }
+            raise
+        finally:
+            deadline.finish()
 
-        if invoke_container["error"]:
-            logger.error(
-                f"[ERROR] Graph execution failed after {elapsed:.2f}s: "
-                f"{invoke_container['error']}"
-            )
-            raise invoke_container["error"]
+        # Logging the reply is not on the response path
+        async_write(timed_node(LogMessage), final_state)
 
-        final_state = invoke_container["value"]
+        elapsed = time.time() - start_time
 
         if DEBUG_MODE:
             logger.info(
@@ -1884,58 +2316,7 @@ def run_tutor_graph(
             logger.info("="*60)
             logger.info("")
 
-        # Build standard API response
-        # Ensure suggestions is always a list
-        suggestions = final_state.get("suggestions", [])
-        if not isinstance(suggestions, list):
-            # Convert single suggestion to list if needed
-            suggestions = [suggestions] if suggestions else []
-
-        # Extract related concepts from concept_rows
-        concept_rows = final_state.get("concept_rows", [])
-        if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] Building response: concept_rows count = "
-                f"{len(concept_rows)}"
-            )
-            if concept_rows:
-                logger.info(
-                    f"[DEBUG] Sample concept_row: {concept_rows[0]}"
-                )
-
-        related_concepts_list = [
-            row.get("name") for row in concept_rows
-            if row.get("name")
-        ]
-        concept_ids_list = [
-            str(row.get("concept_id"))
-            for row in concept_rows
-            if row.get("concept_id") is not None
-        ]
-
-        if DEBUG_MODE:
-            logger.info(
-                f"[DEBUG] Extracted {len(related_concepts_list)} related "
-                f"concepts and {len(concept_ids_list)} concept IDs"
-            )
-
-        return {
-            "response": final_state["llm_response"],
-            "suggestions": suggestions,
-            "related_concepts": related_concepts_list,
-            "concept_ids": concept_ids_list,
-            "reasoning_label": final_state["reasoning_label"],
-            "mastery_updates": final_state["mastery_updates"],
-            "readiness": final_state.get("readiness"),
-            "learning_path": final_state.get("learning_path"),
-            "token_usage": final_state.get("token_usage", {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0
-            }),
-            "conversation_id": final_state["conversation_id"],
-            "lesson_chunks": final_state.get("lesson_chunks", [])
-        }
+        return _tutor_response(final_state)
 
     elif mode == "exam":
         # TODO: Build exam graph and run it
@@ -2017,5 +2398,123 @@ def run_tutor_graph(
             message=message,
             conversation_id=conversation_id,
             explanation_style=explanation_style,
-            mode="tutor"
+            mode="tutor",
+            subject_id=subject_id,
+            conversation_history=conversation_history,
+            deadline=deadline
+        )
+
+
+# -----------------------------------------------------
+# FUNCTION: stream_tutor_graph(input)
+# -----------------------------------------------------
+def stream_tutor_graph(
+    user_id: str,
+    topic: str,
+    message: str,
+    conversation_id: str = None,
+    explanation_style: str = "default",
+    subject_id: Optional[int] = None,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Tutor mode of run_tutor_graph with the reply streamed token by token.
+
+    Runs the pre-generation nodes (PREPARE_NODES), then streams the reply
+    from LLMService while ClassifyReasoning and ComputeLearningPath run
+    beside it. After the last token, readiness is computed with this
+    turn's mastery deltas and the final event is yielded. The mastery
+    write and the assistant message log only happen after the consumer
+    has taken the final event, or when it goes away mid-reply (the part
+    sent is logged). A reply from the semantic cache or the pre-router
+    is sent as a single token event. The deadline (default: a new
+    TUTOR_DEADLINE_SECONDS budget) bounds the steps around the reply; a
+    reply that has started streaming is not cut off.
+
+    Yields:
+        {"event": "token", "data": {"text": str}} per reply chunk, then
+        {"event": "final", "data": dict} with the run_tutor_graph response
+        fields (the full "response" text included)
+    """
+    topic = str(topic)
+    if conversation_id is None:
+        conversation_id = f"{user_id}_{topic}"
+
+    deadline = deadline or Deadline()
+    state = _initial_state(
+        user_id, topic, message, conversation_id, explanation_style,
+        str(uuid4()), subject_id, conversation_history or [],
+        deadline=deadline
+    )
+    routed = _pre_routed(state)
+    if routed is not None:
+        yield {"event": "token", "data": {"text": routed["response"]}}
+        yield {"event": "final", "data": routed}
+        return
+
+    start_time = time.time()
+    state = tutor_prepare_app.invoke(state)
+    if DEBUG_MODE:
+        logger.info(
+            f"[DEBUG] Stream: pre-generation nodes done in "
+            f"{time.time() - start_time:.2f}s"
         )
+
+    classify = _stream_executor.submit(
+        timed_node(ClassifyReasoning), dict(state)
+    )
+    learning_path = _stream_executor.submit(
+        timed_node(ComputeLearningPath), dict(state)
+    )
+
+    chunks = []
+    token_usage = {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0
+    }
+    reply_done = final_sent = False
+    try:
+        cached = _cached_reply(state)
+        if cached is not None:
+            chunks.append(cached)
+            yield {"event": "token", "data": {"text": cached}}
+        else:
+            for text in llm_service.stream_reply(
+                **_reply_kwargs(state), token_usage=token_usage
+            ):
+                chunks.append(text)
+                yield {"event": "token", "data": {"text": text}}
+            _remember_reply(state, "".join(chunks), token_usage)
+
+        state["llm_response"] = "".join(chunks)
+        state["token_usage"] = token_usage
+        state.update(classify.result())
+        state.update(learning_path.result())
+        state["mastery_updates"] = _mastery_updates(state)
+        reply_done = True
+        state.update(timed_node(ComputeReadiness)(state))
+        deadline.finish()
+
+        yield {"event": "final", "data": _tutor_response(state)}
+        final_sent = True
+    finally:
+        # Runs once the final event has been handed to the client, or when
+        # the client goes away during or after the reply
+        if chunks:
+            if not reply_done:
+                # Cut off mid-reply: keep the part the student received
+                state["llm_response"] = "".join(chunks)
+                state["token_usage"] = token_usage
+                state.update(classify.result())
+                state["mastery_updates"] = _mastery_updates(state)
+                deadline.finish()
+            if state["mastery_updates"]:
+                _apply_mastery_updates(user_id, state["mastery_updates"])
+            timed_node(LogMessage)(state)
+        if DEBUG_MODE:
+            logger.info(
+                f"[DEBUG] Stream finished in {time.time() - start_time:.2f}s "
+                f"(final event sent: {final_sent})"
+            )
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+In-process metrics registry exported in Prometheus text format.
+
+Latency histograms and counters for every tutor graph node, each grading
+stage, LLM calls, Supabase calls and cache operations. render() returns
+the Prometheus text exposition format (0.0.4) served by /metrics, so
+p50/p95/p99 per node and per dependency can be computed with
+histogram_quantile() instead of read from the ad-hoc timing prints.
+
+Values are per worker process and reset on restart (like cache_stats);
+Prometheus tells workers apart by their scrape target.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (suffix, labels, value) rows of one metric family
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_family(
+    name: str, kind: str, help_text: str, samples: Iterable[Sample]
+) -> List[str]:
+    """
+    Prometheus text lines for one metric family.
+
+    Args:
+        name: Metric name
+        kind: "counter", "gauge" or "histogram"
+        help_text: HELP line
+        samples: (suffix, labels, value) rows, e.g. ("_bucket",
+            {"le": "0.1"}, 3)
+
+    Returns:
+        Lines without trailing newlines
+    """
+    lines = [f"# HELP {name} {_escape(help_text)}", f"# TYPE {name} {kind}"]
+    for suffix, labels, value in samples:
+        label_text = ",".join(
+            f'{key}="{_escape(val)}"' for key, val in labels.items()
+        )
+        label_text = "{" + label_text + "}" if label_text else ""
+        lines.append(f"{name}{suffix}{label_text} {_format_value(value)}")
+    return lines
+
+
+class _Metric:
+    """Base for labelled metrics."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(
+                f"Unknown labels for {self.name}: {sorted(unknown)}"
+            )
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def reset(self):
+        """Clear all values."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter per label set.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Add to the counter for a label set.
+
+        Args:
+            amount: Non-negative increment
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for a label set (0 if never incremented)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("_total", self._labels(k), v) for k, v in items]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket latency histogram (seconds) per label set.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labelnames=(),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, seconds: float, **labels):
+        """
+        Add one observation.
+
+        Args:
+            seconds: Duration in seconds
+            **labels: Label values
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                # Per-bucket counts (last is +Inf), count, sum
+                row = [[0] * (len(self.buckets) + 1), 0, 0.0]
+                self._values[key] = row
+            row[0][index] += 1
+            row[1] += 1
+            row[2] += seconds
+
+    def count(self, **labels) -> int:
+        """Observations recorded for a label set."""
+        with self._lock:
+            row = self._values.get(self._key(labels))
+            return row[1] if row else 0
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(
+                (k, (list(row[0]), row[1], row[2]))
+                for k, row in self._values.items()
+            )
+        result = []
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        for key, (counts, count, total) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                result.append(
+                    ("_bucket", {**labels, "le": bound}, cumulative)
+                )
+            result.append(("_sum", labels, total))
+            result.append(("_count", labels, count))
+        return result
+
+
+class MetricsRegistry:
+    """
+    Named metrics plus collectors rendered together for /metrics.
+    """
+
+    def __init__(self):
+        """Initialize an empty MetricsRegistry."""
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(
+                        f"Metric {metric.name} already registered as "
+                        f"{existing.kind}"
+                    )
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(
+        self, name: str, help_text: str, labelnames=()
+    ) -> Counter:
+        """Register (or return the existing) counter."""
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self, name: str, help_text: str, labelnames=(),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Register (or return the existing) histogram."""
+        return self._register(
+            Histogram(name, help_text, labelnames, buckets)
+        )
+
+    def add_collector(self, collector: Callable[[], Iterable]):
+        """
+        Add a callable run on every render().
+
+        Args:
+            collector: Returns (name, kind, help, samples) families built
+                from state kept elsewhere (e.g. cache_stats)
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+
+        Returns:
+            Text ending with a newline
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(format_family(
+                metric.name, metric.kind, metric.help, metric.samples()
+            ))
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# collector failed: {_escape(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.extend(format_family(name, kind, help_text, samples))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Clear all metric values (collectors are kept)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+@contextmanager
+def timed(metric: Optional[Histogram], **labels):
+    """
+    Observe the duration of a block.
+
+    The "status" label (if the metric has one) is "ok", or "error" when
+    the block raises. The yielded labels dict may be changed inside the
+    block, e.g. to record a timeout or a fallback; a status set that way
+    is kept even if the block then raises.
+
+    Args:
+        metric: Histogram to observe (None to skip)
+        **labels: Label values
+    """
+    if metric is not None and "status" in metric.labelnames:
+        labels.setdefault("status", "ok")
+    start = time.perf_counter()
+    try:
+        yield labels
+    except Exception:
+        if labels.get("status") == "ok":
+            labels["status"] = "error"
+        raise
+    finally:
+        if metric is not None:
+            metric.observe(time.perf_counter() - start, **labels)
+
+
+def wants_prometheus(accept: Optional[str], fmt: Optional[str] = None):
+    """
+    Whether a /metrics request asks for Prometheus text.
+
+    Args:
+        accept: Accept header
+        fmt: ?format= query parameter
+
+    Returns:
+        True for ?format=prometheus or a Prometheus/OpenMetrics Accept
+    """
+    if fmt:
+        return fmt.lower() in ("prometheus", "text")
+    accept = (accept or "").lower()
+    return "openmetrics" in accept or "version=0.0.4" in accept
+
+
+# Process-wide registry
+registry = MetricsRegistry()
+
+TUTOR_NODE_SECONDS = registry.histogram(
+    "tutor_node_duration_seconds",
+    "Time spent in each tutor graph node",
+    ("node", "status")
+)
+GRADING_STAGE_SECONDS = registry.histogram(
+    "grading_stage_duration_seconds",
+    "Time spent in each grading stage",
+    ("pipeline", "stage", "status")
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "llm_call_duration_seconds",
+    "OpenAI chat and embedding call latency",
+    ("operation", "status")
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens",
+    "Tokens used by LLM calls (kind: prompt, cached_prompt, completion)",
+    ("operation", "kind")
+)
+SUPABASE_CALL_SECONDS = registry.histogram(
+    "supabase_call_duration_seconds",
+    "Supabase query latency",
+    ("operation", "status")
+)
+SUPABASE_SKIPPED = registry.counter(
+    "supabase_calls_skipped",
+    "Supabase queries skipped while the circuit breaker is open",
+    ("operation",)
+)
+MOCK_EXAM_EVENTS = registry.counter(
+    "mock_exam_events",
+    "Mock exam grading service events (log_metric)",
+    ("event",)
+)
+
+
+def _cache_families(stats=None):
+    """cache_stats counters and Redis latency as metric families."""
+    from cache_stats import LATENCY_BUCKETS_MS
+    if stats is None:
+        from cache_stats import stats
+
+    snapshot = stats.snapshot()
+    prefixes = snapshot["prefixes"]
+    families = []
+    for counter in ("hits", "misses", "sets", "deletes", "evictions",
+                    "expirations", "errors", "bytes_read",
+                    "bytes_written"):
+        families.append((
+            f"cache_{counter}", "counter",
+            f"Cache {counter.replace('_', ' ')} per key prefix",
+            [("_total", {"prefix": prefix}, row[counter])
+             for prefix, row in prefixes.items()]
+        ))
+
+    samples = []
+    bounds = [str(ms / 1000.0) for ms in LATENCY_BUCKETS_MS] + ["+Inf"]
+    for operation, histogram in snapshot["redis_latency_ms"].items():
+        labels = {"operation": operation}
+        cumulative = 0
+        for bound, count in zip(bounds, histogram["buckets"].values()):
+            cumulative += count
+            samples.append(("_bucket", {**labels, "le": bound}, cumulative))
+        samples.append(("_sum", labels, histogram["sum_ms"] / 1000.0))
+        samples.append(("_count", labels, histogram["count"]))
+    families.append((
+        "redis_call_duration_seconds", "histogram",
+        "Redis call latency per operation", samples
+    ))
+    return families
+
+
+registry.add_collector(_cache_families)
+
+
+def render_metrics() -> str:
+    """Prometheus text for the process-wide registry."""
+    return registry.render()
@@ -0,0 +1,748 @@
+#!/usr/bin/env python3
+"""
+Write-behind outbox for Supabase writes.
+
+Callers hand rows to enqueue() and return immediately. Rows are:
+
+    1. appended to this process's spool file (JSON lines, spool.<pid>.jsonl
+       next to OUTBOX_SPOOL_PATH), so a crash or restart does not lose
+       them. Each process holds an exclusive lock on its own spool; on
+       start it replays its own unacknowledged rows and adopts the spools
+       it can lock, i.e. those whose process has exited
+    2. buffered per (table, operation) in a bounded in-memory queue
+    3. written by a fixed worker pool as one bulk insert/upsert per table
+       once a buffer reaches OUTBOX_BATCH_SIZE rows or its oldest row is
+       OUTBOX_FLUSH_INTERVAL seconds old
+
+Failed batches are retried with backoff (and not attempted at all while
+the Supabase circuit breaker is open); after OUTBOX_MAX_ATTEMPTS they are
+moved to a dead-letter file next to the spool. close() drains the queue.
+
+Rows with key_columns replace any still-buffered row with the same key,
+and pending_row() lets read-modify-write callers (mastery updates) see a
+value that has not been flushed yet.
+
+The process-wide outbox (get_outbox) writes with its own Supabase client,
+built from the environment like SupabaseRepository (service role key
+preferred).
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): each process replays only its own spool
+    fcntl = None
+
+try:
+    from circuit_breaker import get_breaker
+    supabase_breaker = get_breaker("supabase")
+except ImportError:
+    supabase_breaker = None
+
+# Supabase call latency histogram (optional)
+try:
+    from metrics import SUPABASE_CALL_SECONDS
+except ImportError:
+    SUPABASE_CALL_SECONDS = None
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OUTBOX_SPOOL_PATH = os.getenv("OUTBOX_SPOOL_PATH", ".outbox/spool.jsonl")
+OUTBOX_FSYNC = os.getenv("OUTBOX_FSYNC", "false").lower() == "true"
+# Spool entries written before it is rewritten without acknowledged rows
+OUTBOX_SPOOL_COMPACT_ENTRIES = int(
+    os.getenv("OUTBOX_SPOOL_COMPACT_ENTRIES", "10000")
+)
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", "10000"))
+OUTBOX_ENQUEUE_TIMEOUT = float(os.getenv("OUTBOX_ENQUEUE_TIMEOUT", "0.5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_FLUSH_INTERVAL = float(os.getenv("OUTBOX_FLUSH_INTERVAL", "1.0"))
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "0.5"))
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "30"))
+
+INSERT = "insert"
+UPSERT = "upsert"
+
+# (table, op, key_columns, on_conflict)
+BatchKey = Tuple[str, str, Optional[Tuple[str, ...]], Optional[str]]
+
+
+def _row_key(row: Dict, key_columns: Tuple[str, ...]) -> Tuple:
+    return tuple(str(row.get(col)) for col in key_columns)
+
+
+def _process_spool_path(base: str, pid: int) -> str:
+    """Spool of one process: spool.jsonl -> spool.<pid>.jsonl."""
+    stem, ext = os.path.splitext(base)
+    return f"{stem}.{pid}{ext}"
+
+
+def _lock_spool(path: str, create: bool):
+    """
+    Open a spool and lock it exclusively.
+
+    Args:
+        path: Spool file
+        create: True for this process's own spool (created if missing,
+            waits for a process adopting it); False for another
+            process's spool (never waits)
+
+    Returns:
+        Locked file object, or None if another process holds the lock or
+        the file was removed or replaced while the lock was acquired
+    """
+    while True:
+        handle = open(path, "a+" if create else "r+")
+        if fcntl is None:
+            return handle
+        try:
+            flags = fcntl.LOCK_EX if create else fcntl.LOCK_EX | fcntl.LOCK_NB
+            fcntl.flock(handle.fileno(), flags)
+            opened = os.fstat(handle.fileno())
+            current = os.stat(path)
+            if (opened.st_dev, opened.st_ino) == \
+                    (current.st_dev, current.st_ino):
+                return handle
+        except OSError:
+            pass
+        handle.close()
+        if not create:
+            return None
+
+
+def _unacked(spool) -> Dict[str, Dict]:
+    """Records added to an open spool and never acknowledged."""
+    records: Dict[str, Dict] = {}
+    spool.seek(0)
+    for line in spool:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # torn last line after a crash
+        if "add" in entry:
+            records[entry["add"]["id"]] = entry["add"]
+        for record_id in entry.get("ack", ()):
+            records.pop(record_id, None)
+    spool.seek(0, os.SEEK_END)
+    return records
+
+
+class Outbox:
+    """
+    Durable, batched write-behind queue for Supabase tables.
+    """
+
+    def __init__(
+        self,
+        client,
+        spool_path: Optional[str] = OUTBOX_SPOOL_PATH,
+        max_pending: int = OUTBOX_MAX_PENDING,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        flush_interval: float = OUTBOX_FLUSH_INTERVAL,
+        workers: int = OUTBOX_WORKERS,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        enqueue_timeout: float = OUTBOX_ENQUEUE_TIMEOUT,
+        fsync: bool = OUTBOX_FSYNC,
+        breaker=supabase_breaker,
+        compact_entries: int = OUTBOX_SPOOL_COMPACT_ENTRIES
+    ):
+        """
+        Initialize Outbox and replay any unacknowledged spooled rows.
+
+        Args:
+            client: Supabase client used for the writes
+            spool_path: Base name of the JSON-lines spool files; this
+                process writes spool.<pid>.jsonl next to it ("" or None
+                disables spooling)
+            max_pending: Buffered rows before enqueue applies
+                backpressure
+            batch_size: Rows per table that trigger an immediate flush
+            flush_interval: Seconds a row may wait before being flushed
+            workers: Threads writing batches concurrently
+            max_attempts: Attempts before a batch is dead-lettered
+            enqueue_timeout: Seconds enqueue waits for space when full
+                before writing the rows itself
+            fsync: fsync the spool after every append
+            breaker: Circuit breaker consulted before each batch
+            compact_entries: Spool entries after which the spool is
+                rewritten with only the unacknowledged records
+        """
+        self.client = client
+        self.spool_base = spool_path or None
+        self.spool_path = None
+        if self.spool_base:
+            self.spool_path = _process_spool_path(
+                self.spool_base, os.getpid()
+            )
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.enqueue_timeout = enqueue_timeout
+        self.fsync = fsync
+        self.breaker = breaker
+        self.compact_entries = compact_entries
+
+        self._cond = threading.Condition()
+        self._buffers: Dict[BatchKey, List[Dict]] = {}
+        self._inflight: Dict[str, List[Dict]] = {}
+        self._retry_at: Dict[BatchKey, float] = {}
+        self._callbacks: Dict[str, Callable[[], Any]] = {}
+        self._pending = 0
+        self._closed = False
+        self._spool = None
+        self._spool_entries = 0
+
+        self.written = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+
+        if self.spool_path:
+            self._open_spool()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="outbox"
+        )
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name="outbox-dispatch", daemon=True
+        )
+        self._dispatcher.start()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def enqueue(
+        self,
+        table: str,
+        rows,
+        op: str = INSERT,
+        key_columns: Optional[Iterable[str]] = None,
+        on_written: Optional[Callable[[], Any]] = None,
+        on_conflict: Optional[str] = None
+    ) -> bool:
+        """
+        Queue rows for a bulk insert or upsert.
+
+        Args:
+            table: Table name
+            rows: Row dict or list of row dicts
+            op: "insert" or "upsert"
+            key_columns: Columns identifying a row; a buffered row with
+                the same key is replaced (required to batch upserts on
+                tables whose primary key is not in every row)
+            on_written: Called once the rows are in Supabase (not called
+                for rows replayed after a restart)
+            on_conflict: Unique columns an upsert resolves conflicts on,
+                comma-separated (default: the primary key)
+
+        Returns:
+            True if queued (or written directly under backpressure)
+        """
+        if op not in (INSERT, UPSERT):
+            raise ValueError(f"Unknown outbox operation: {op}")
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        if not rows or self.client is None:
+            return False
+
+        record = {
+            "id": uuid.uuid4().hex,
+            "table": table,
+            "op": op,
+            "key": list(key_columns) if key_columns else None,
+            "on_conflict": on_conflict,
+            "rows": rows,
+            "attempts": 0,
+            "queued_at": time.time(),
+        }
+
+        with self._cond:
+            if self._closed:
+                return False
+            deadline = time.monotonic() + self.enqueue_timeout
+            while self._pending + len(rows) > self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            overflow = self._pending + len(rows) > self.max_pending
+            self._spool_append({"add": record})
+            if on_written is not None:
+                self._callbacks[record["id"]] = on_written
+            if overflow:
+                self._inflight[record["id"]] = [record]
+                self._pending += len(rows)
+            else:
+                self._add(record)
+
+        if overflow:
+            logger.warning(
+                f"[WARNING] Outbox full ({self.max_pending} rows); "
+                f"writing {table} inline"
+            )
+            self._write_batch(record["id"], self._batch_key(record))
+        return True
+
+    def pending_row(self, table: str, **match) -> Optional[Dict]:
+        """
+        Return the newest not-yet-written row of a table whose columns
+        equal the given values, or None.
+        """
+        with self._cond:
+            candidates = []
+            for (name, _, _, _), records in self._buffers.items():
+                if name == table:
+                    candidates.extend(records)
+            for records in self._inflight.values():
+                candidates.extend(r for r in records if r["table"] == table)
+        best = None
+        for record in candidates:
+            for row in record["rows"]:
+                if all(row.get(k) == v for k, v in match.items()):
+                    if best is None or record["queued_at"] >= best[0]:
+                        best = (record["queued_at"], row)
+        return dict(best[1]) if best else None
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Write everything queued now and wait for it.
+
+        Returns:
+            True if nothing is pending any more
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._retry_at.clear()
+            self._flush_all = True
+            self._cond.notify_all()
+            while self._pending and time.monotonic() < deadline:
+                self._cond.wait(min(0.05, deadline - time.monotonic()))
+                self._flush_all = True
+                self._cond.notify_all()
+            self._flush_all = False
+            return self._pending == 0
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """
+        Drain the queue and stop the workers. Rows still pending after
+        timeout stay in the spool and are replayed on the next start.
+
+        Returns:
+            True if everything was written
+        """
+        with self._cond:
+            if self._closed:
+                return self._pending == 0
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._dispatcher.join(timeout=1.0)
+        self._executor.shutdown(wait=True)
+        with self._cond:
+            if self._spool is not None:
+                if drained:
+                    # Removed while still locked, so no other process
+                    # adopts it in between
+                    try:
+                        os.remove(self.spool_path)
+                    except OSError:
+                        pass
+                self._spool.close()
+                self._spool = None
+        if not drained:
+            logger.warning(
+                f"[WARNING] Outbox closed with {self._pending} rows "
+                f"pending; they remain in {self.spool_path}"
+            )
+        return drained
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for health checks."""
+        with self._cond:
+            return {
+                "pending_rows": self._pending,
+                "inflight_batches": len(self._inflight),
+                "written_rows": self.written,
+                "failed_batches": self.failed_batches,
+                "dead_lettered_rows": self.dead_lettered,
+            }
+
+    # ------------------------------------------------------------------
+    # Buffering and dispatch
+    # ------------------------------------------------------------------
+
+    _flush_all = False
+
+    @staticmethod
+    def _batch_key(record: Dict) -> BatchKey:
+        key = tuple(record["key"]) if record["key"] else None
+        return (
+            record["table"], record["op"], key, record.get("on_conflict")
+        )
+
+    def _add(self, record: Dict):
+        """Buffer a record (lock held), replacing rows with its key."""
+        batch_key = self._batch_key(record)
+        buffer = self._buffers.setdefault(batch_key, [])
+        key_columns = batch_key[2]
+        if key_columns and record["attempts"] == 0:
+            keys = {_row_key(row, key_columns) for row in record["rows"]}
+            for old in buffer:
+                kept = [
+                    row for row in old["rows"]
+                    if _row_key(row, key_columns) not in keys
+                ]
+                self._pending -= len(old["rows"]) - len(kept)
+                old["rows"] = kept
+        elif key_columns:
+            # A retried record must not overwrite a newer buffered row
+            newer = {
+                _row_key(row, key_columns)
+                for old in buffer for row in old["rows"]
+            }
+            record["rows"] = [
+                row for row in record["rows"]
+                if _row_key(row, key_columns) not in newer
+            ]
+        buffer.append(record)
+        self._pending += len(record["rows"])
+        if len(buffer) >= self.batch_size:
+            self._cond.notify_all()
+
+    def _due_batches(self, now: float) -> List[BatchKey]:
+        due = []
+        for batch_key, records in self._buffers.items():
+            if not records:
+                continue
+            if self._retry_at.get(batch_key, 0) > now:
+                continue
+            rows = sum(len(r["rows"]) for r in records)
+            oldest = min(r["queued_at"] for r in records)
+            if (self._flush_all or rows >= self.batch_size or
+                    time.time() - oldest >= self.flush_interval):
+                due.append(batch_key)
+        return due
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=min(0.1, self.flush_interval))
+                if self._closed:
+                    return
+                if self.breaker and self.breaker.state == "open":
+                    continue
+                now = time.monotonic()
+                jobs = []
+                for batch_key in self._due_batches(now):
+                    records = self._buffers.pop(batch_key)
+                    # Records that already failed go alone, so one bad row
+                    # cannot keep failing everyone else's batch
+                    fresh = [r for r in records if not r["attempts"]]
+                    groups = [[r] for r in records if r["attempts"]]
+                    if fresh:
+                        groups.insert(0, fresh)
+                    for group in groups:
+                        batch_id = uuid.uuid4().hex
+                        self._inflight[batch_id] = group
+                        jobs.append((batch_id, batch_key))
+            for batch_id, batch_key in jobs:
+                try:
+                    self._executor.submit(
+                        self._write_batch, batch_id, batch_key
+                    )
+                except RuntimeError:
+                    # Executor already shut down; write on this thread
+                    self._write_batch(batch_id, batch_key)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _write_batch(self, batch_id: str, batch_key: BatchKey):
+        table, op, key_columns, on_conflict = batch_key
+        with self._cond:
+            records = self._inflight.get(batch_id, [])
+        rows = [row for record in records for row in record["rows"]]
+        if key_columns:
+            # Keep the last row per key; Postgres rejects a statement that
+            # touches the same row twice
+            latest = {}
+            for row in rows:
+                latest[_row_key(row, key_columns)] = row
+            rows = list(latest.values())
+
+        started = time.perf_counter()
+        try:
+            if rows:
+                query = self.client.table(table)
+                if op == INSERT:
+                    query = query.insert(rows)
+                elif on_conflict:
+                    query = query.upsert(rows, on_conflict=on_conflict)
+                else:
+                    query = query.upsert(rows)
+                query.execute()
+        except Exception as e:
+            self._observe(f"outbox_{op}:{table}", started, "error")
+            if self.breaker:
+                self.breaker.record_failure()
+            self._batch_failed(batch_id, batch_key, records, e)
+            return
+        if rows:
+            self._observe(f"outbox_{op}:{table}", started, "ok")
+        if self.breaker and rows:
+            self.breaker.record_success()
+
+        callbacks = []
+        with self._cond:
+            self._inflight.pop(batch_id, None)
+            self._retry_at.pop(batch_key, None)
+            count = sum(len(r["rows"]) for r in records)
+            self._pending -= count
+            self.written += len(rows)
+            self._spool_append({"ack": [r["id"] for r in records]})
+            for record in records:
+                callback = self._callbacks.pop(record["id"], None)
+                if callback is not None:
+                    callbacks.append(callback)
+            self._maybe_compact_spool()
+            self._cond.notify_all()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[WARNING] Outbox callback failed: {e}")
+
+    @staticmethod
+    def _observe(operation: str, started: float, status: str):
+        if SUPABASE_CALL_SECONDS is not None:
+            SUPABASE_CALL_SECONDS.observe(
+                time.perf_counter() - started,
+                operation=operation, status=status
+            )
+
+    def _batch_failed(self, batch_id, batch_key, records, error):
+        with self._cond:
+            self._inflight.pop(batch_id, None)
+            self._pending -= sum(len(r["rows"]) for r in records)
+            self.failed_batches += 1
+            retry, dead = [], []
+            for record in records:
+                record["attempts"] += 1
+                if record["attempts"] >= self.max_attempts:
+                    dead.append(record)
+                else:
+                    retry.append(record)
+            for record in retry:
+                self._add(record)
+            if retry:
+                attempts = max(r["attempts"] for r in retry)
+                delay = min(
+                    OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** attempts
+                )
+                self._retry_at[batch_key] = time.monotonic() + delay
+            if dead:
+                self._dead_letter(dead)
+            self._cond.notify_all()
+        logger.warning(
+            f"[WARNING] Outbox write to {batch_key[0]} failed "
+            f"({len(retry)} records retried, {len(dead)} dead): {error}"
+        )
+
+    def _dead_letter(self, records: List[Dict]):
+        """Give up on records (lock held)."""
+        self.dead_lettered += sum(len(r["rows"]) for r in records)
+        for record in records:
+            self._callbacks.pop(record["id"], None)
+        if self.spool_path:
+            try:
+                with open(self.spool_base + ".dead", "a") as dead:
+                    for record in records:
+                        dead.write(json.dumps(record, default=str) + "\n")
+            except OSError as e:
+                logger.error(f"[ERROR] Outbox dead-letter write failed: {e}")
+        self._spool_append({"ack": [r["id"] for r in records]})
+
+    # ------------------------------------------------------------------
+    # Spool
+    # ------------------------------------------------------------------
+
+    def _spool_append(self, entry: Dict):
+        """Append one entry to the spool (lock held)."""
+        if self._spool is None:
+            return
+        try:
+            self._spool.write(json.dumps(entry, default=str) + "\n")
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._spool_entries += 1
+        except OSError as e:
+            logger.error(f"[ERROR] Outbox spool write failed: {e}")
+
+    def _unacked_records(self) -> List[Dict]:
+        """Records not written yet, buffered or in flight (lock held)."""
+        records = [r for group in self._buffers.values() for r in group]
+        records.extend(r for group in self._inflight.values() for r in group)
+        return records
+
+    def _maybe_compact_spool(self):
+        """Compact once nothing is pending or the spool grew (lock held)."""
+        if self._spool is None:
+            return
+        if (self._pending or self._inflight) and \
+                self._spool_entries < self.compact_entries:
+            return
+        self._compact_spool()
+
+    def _compact_spool(self):
+        """
+        Rewrite this process's spool with only the unacknowledged
+        records (lock held).
+
+        The new file is locked before it replaces the old one, so the
+        spool is never unlocked while this process runs.
+        """
+        records = self._unacked_records()
+        tmp_path = self.spool_path + ".tmp"
+        tmp = None
+        try:
+            tmp = open(tmp_path, "w")
+            if fcntl is not None:
+                fcntl.flock(tmp.fileno(), fcntl.LOCK_EX)
+            for record in records:
+                tmp.write(json.dumps({"add": record}, default=str) + "\n")
+            tmp.flush()
+            if self.fsync:
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, self.spool_path)
+        except OSError as e:
+            logger.error(f"[ERROR] Outbox spool compaction failed: {e}")
+            if tmp is not None:
+                tmp.close()
+            return
+        self._spool.close()
+        self._spool = tmp
+        self._spool_entries = len(records)
+
+    def _other_spools(self) -> List[str]:
+        """Spool files of other processes (and the pre-pid shared one)."""
+        if fcntl is None:
+            return []
+        directory = os.path.dirname(self.spool_path)
+        stem, ext = os.path.splitext(os.path.basename(self.spool_base))
+        pattern = re.compile(rf"{re.escape(stem)}\.\d+{re.escape(ext)}")
+        own = os.path.basename(self.spool_path)
+        paths = [
+            os.path.join(directory, name)
+            for name in sorted(os.listdir(directory or "."))
+            if pattern.fullmatch(name) and name != own
+        ]
+        if os.path.exists(self.spool_base):
+            paths.insert(0, self.spool_base)
+        return paths
+
+    def _open_spool(self):
+        """
+        Lock this process's spool and re-queue the records spooled but
+        never acknowledged, by this pid before or by exited processes.
+        """
+        directory = os.path.dirname(self.spool_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._spool = _lock_spool(self.spool_path, create=True)
+        records = _unacked(self._spool)
+
+        # A live process holds the lock on its spool; one that can be
+        # locked belongs to a process that exited
+        adopted = []
+        for path in self._other_spools():
+            try:
+                handle = _lock_spool(path, create=False)
+            except OSError:
+                continue  # removed by another process adopting it
+            if handle is None:
+                continue
+            records.update(_unacked(handle))
+            adopted.append((path, handle))
+
+        with self._cond:
+            for record in records.values():
+                self._add(record)
+            # The adopted records are in this spool before theirs go
+            self._compact_spool()
+        for path, handle in adopted:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"[ERROR] Outbox could not remove {path}: {e}")
+            handle.close()
+        if records:
+            logger.info(
+                f"[OK] Outbox replayed {len(records)} spooled writes"
+                f" ({len(adopted)} spools of exited processes adopted)"
+            )
+
+
+_outbox: Optional[Outbox] = None
+_outbox_lock = threading.Lock()
+
+
+def _default_client():
+    url = os.getenv("SUPABASE_URL")
+    key = (
+        os.getenv("SUPABASE_SERVICE_ROLE_KEY") or
+        os.getenv("SUPABASE_ANON_KEY")
+    )
+    if not url or not key:
+        return None
+    try:
+        from supabase import create_client
+        return create_client(url, key)
+    except Exception as e:
+        logger.error(f"[ERROR] Outbox could not create Supabase client: {e}")
+        return None
+
+
+def get_outbox(client=None) -> Outbox:
+    """
+    Return the process-wide outbox, creating it on first use.
+
+    Args:
+        client: Supabase client to use if the outbox is created now;
+            defaults to one built from SUPABASE_URL and the service role
+            (or anon) key
+
+    Returns:
+        Outbox
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox(client or _default_client())
+            atexit.register(close_outbox)
+        return _outbox
+
+
+def close_outbox(timeout: float = 10.0) -> bool:
+    """Drain and stop the process-wide outbox, if it was created."""
+    global _outbox
+    with _outbox_lock:
+        outbox, _outbox = _outbox, None
+    if outbox is None:
+        return True
+    return outbox.close(timeout)
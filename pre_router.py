@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Zero-LLM pre-router for tutor messages.
+
+Greetings, thanks, goodbyes and off-topic requests used to run the whole
+tutor graph: lesson and concept fetches, reasoning classification and a
+full reply generation. PreRouter.route() recognises them before the graph
+runs and answers them from templates:
+
+    - greeting / thanks / farewell: the whole (normalized) message is one
+      of the known phrases, matched by a single compiled regex with one
+      named group per category
+    - off_topic: the message mentions another subject (maths, science,
+      programming, ...) and none of the Business Studies vocabulary; both
+      lists are compiled into one alternation each, so a message is
+      scanned once per list whatever the number of keywords
+
+Anything else (including "hi, what is a sole trader?") returns None and
+goes through the graph as before. Routing counts per category are kept
+for /cache/stats and /metrics.
+"""
+
+import os
+import re
+import threading
+from typing import Dict, Iterable, Optional
+
+# Configuration
+PRE_ROUTER_ENABLED = os.getenv("PRE_ROUTER_ENABLED", "true").lower() == "true"
+# Longer messages are never treated as a greeting, thanks or farewell
+PRE_ROUTER_TRIVIAL_MAX_CHARS = int(
+    os.getenv("PRE_ROUTER_TRIVIAL_MAX_CHARS", "60")
+)
+
+# Other subjects the tutor does not cover. Only subject names and
+# requests that never occur in Business Studies questions: generic words
+# such as "calculate", "language" or "code" appear in syllabus questions
+# ("calculate the payback period", "body language", "code of conduct")
+OFF_TOPIC_KEYWORDS = (
+    "solve this math", "algebra", "geometry", "trigonometry",
+    "calculus", "physics", "chemistry", "biology",
+    "science experiment", "write a poem", "literature",
+    "poetry", "programming", "coding", "python",
+    "javascript", "html", "css", "world war", "medieval",
+)
+
+# Business Studies vocabulary; one of these keeps a message on topic
+# ("write a poem about marketing", "the history of the company")
+SUBJECT_KEYWORDS = (
+    "business", "company", "firm", "enterprise", "entrepreneur",
+    "sole trader", "partnership", "shareholder", "stakeholder", "market",
+    "marketing", "customer", "consumer", "product", "production", "price",
+    "pricing", "demand", "supply", "competition", "competitor", "sale",
+    "revenue", "profit", "loss", "cost", "margin", "ratio", "break even",
+    "break-even", "cash flow", "budget", "finance", "loan", "interest",
+    "investment", "income", "expenditure", "account", "tax", "economy",
+    "economic", "trade", "export", "import", "employee", "worker",
+    "recruitment", "motivation", "management", "manager", "organisation",
+    "organization", "objective", "strategy", "brand", "advertising",
+    "promotion", "location", "quality", "inflation", "exchange rate",
+    "globalisation", "globalization", "ethics", "ethical",
+    "payback", "arr", "average rate of return", "net present value",
+    "npv", "investment appraisal", "gearing", "liquidity", "acid test",
+    "capital", "asset", "liabilities", "liability", "dividend",
+    "depreciation", "balance sheet", "income statement", "stock",
+    "inventory", "communication", "leadership", "training", "wage",
+    "salary", "labour", "labor", "recruit", "legislation",
+)
+_GREETING = (
+    r"(?:hi+|hello+|hey+|hiya|yo|howdy|greetings|salam|"
+    r"assalam[ou]? ?[ao]laikum|good (?:morning|afternoon|evening|day))"
+    r"(?: (?:there|tutor|teacher|sir|miss|everyone|all))?"
+    r"(?: how are you(?: doing)?(?: today)?)?"
+)
+_THANKS = (
+    r"(?:(?:ok(?:ay)?|great|perfect|cool|nice|awesome) )?"
+    r"(?:thanks?|thank (?:you|u)|thx|ty|cheers|much appreciated)"
+    r"(?: (?:so|very) much| a lot| a ton)?"
+    r"(?: (?:tutor|teacher|sir|miss))?"
+)
+_FAREWELL = (
+    r"(?:(?:ok(?:ay)?|thanks?) )?"
+    r"(?:bye(?: bye)?|goodbye|good night|see (?:you|ya)"
+    r"(?: later| soon| tomorrow)?|cya|gotta go|talk (?:to you )?later)"
+)
+
+# Normalized message -> category (whole-message match only)
+_TRIVIAL = re.compile(
+    rf"(?P<greeting>{_GREETING})|(?P<thanks>{_THANKS})"
+    rf"|(?P<farewell>{_FAREWELL})"
+)
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+REPLY_TEMPLATES = {
+    "greeting": (
+        "Hi! I'm your Business Studies tutor. What would you like to "
+        "learn about today? You can ask me to explain a concept, give "
+        "an example or help you revise for an exam question."
+    ),
+    "thanks": (
+        "You're welcome! Let me know if there's anything else in this "
+        "topic you'd like to go over."
+    ),
+    "farewell": (
+        "Goodbye, and good luck with your revision! Come back any time "
+        "you want to go over another topic."
+    ),
+    "off_topic": (
+        "I'm your Business Studies tutor, so I can only help with "
+        "Business Studies questions. Try asking me about this topic - "
+        "for example how businesses set prices, manage cash flow or "
+        "motivate their employees."
+    ),
+}
+
+CATEGORIES = tuple(REPLY_TEMPLATES)
+
+
+def _keyword_pattern(keywords: Iterable[str]) -> "re.Pattern":
+    """One alternation matching any keyword as whole words (plurals ok)."""
+    # Longest first so "sole trader" wins over shorter prefixes
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    alternation = "|".join(re.escape(k) for k in ordered)
+    return re.compile(rf"\b(?:{alternation})(?:e?s)?\b")
+
+
+def normalize_message(text: str) -> str:
+    """
+    Lowercase words separated by single spaces, no punctuation.
+
+    Args:
+        text: Student message
+
+    Returns:
+        Normalized message ("" if nothing is left)
+    """
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+class PreRouter:
+    """
+    Answers trivial and off-topic tutor messages without the LLM.
+    """
+
+    def __init__(
+        self,
+        off_topic_keywords: Iterable[str] = OFF_TOPIC_KEYWORDS,
+        subject_keywords: Iterable[str] = SUBJECT_KEYWORDS,
+        templates: Optional[Dict[str, str]] = None,
+        trivial_max_chars: int = PRE_ROUTER_TRIVIAL_MAX_CHARS,
+        enabled: bool = PRE_ROUTER_ENABLED
+    ):
+        """
+        Initialize PreRouter.
+
+        Args:
+            off_topic_keywords: Phrases naming subjects the tutor rejects
+            subject_keywords: Phrases that keep a message on topic
+            templates: Reply per category (defaults to REPLY_TEMPLATES)
+            trivial_max_chars: Longest message checked for greetings,
+                thanks and farewells
+            enabled: False to pass every message to the graph
+        """
+        self.off_topic = _keyword_pattern(off_topic_keywords)
+        self.subject = _keyword_pattern(subject_keywords)
+        self.templates = {**REPLY_TEMPLATES, **(templates or {})}
+        self.trivial_max_chars = trivial_max_chars
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(CATEGORIES + ("passed",), 0)
+
+    def classify(self, message: str) -> Optional[str]:
+        """
+        Category of a message, without counting it.
+
+        Args:
+            message: Student message
+
+        Returns:
+            "greeting", "thanks", "farewell", "off_topic", or None when
+            the message needs the tutor graph
+        """
+        text = normalize_message(message)
+        if not text:
+            return None
+        if len(text) <= self.trivial_max_chars:
+            match = _TRIVIAL.fullmatch(text)
+            if match:
+                return match.lastgroup
+        if self.is_off_topic(text):
+            return "off_topic"
+        return None
+
+    def is_off_topic(self, message: str) -> bool:
+        """
+        Whether a message asks about another subject.
+
+        Args:
+            message: Student message (raw or normalized)
+
+        Returns:
+            True if an off-topic keyword matches and no Business Studies
+            keyword does
+        """
+        text = normalize_message(message)
+        return bool(
+            self.off_topic.search(text) and not self.subject.search(text)
+        )
+
+    def route(self, message: str) -> Optional[Dict]:
+        """
+        Template answer for a trivial or off-topic message.
+
+        Args:
+            message: Student message
+
+        Returns:
+            {"category": str, "reply": str}, or None to run the graph
+        """
+        if not self.enabled:
+            return None
+        category = self.classify(message)
+        self._count(category or "passed")
+        if category is None:
+            return None
+        return {"category": category, "reply": self.templates[category]}
+
+    def stats(self) -> Dict:
+        """
+        Routing counters for this worker.
+
+        Returns:
+            Dict with a count per category, "passed" (sent to the graph),
+            "routed" and "routed_rate"
+        """
+        with self._lock:
+            row = dict(self._counters)
+        row["routed"] = sum(row[c] for c in CATEGORIES)
+        total = row["routed"] + row["passed"]
+        row["routed_rate"] = round(row["routed"] / total, 4) if total else None
+        return row
+
+    def reset_stats(self):
+        """Reset the counters."""
+        with self._lock:
+            self._counters = dict.fromkeys(CATEGORIES + ("passed",), 0)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Local reasoning classifier for tutor messages (good / neutral / confused).
+
+MasteryAgent.classify_reasoning used to make a blocking gpt-4o-mini call
+for every tutor turn with concepts. ReasoningClassifier labels the
+message in-process instead: a small multinomial logistic regression over
+cheap text features
+
+    cue:*    phrase groups ("i don't understand", "because", "compared
+             to", "what is", ...) found by one compiled regex
+    w:*      the message's words
+    len:*    short / medium / long
+
+that runs in tens of microseconds. The built-in weights only use the cue
+features; the word weights are learned from LLM labels. When the top
+label's probability is below REASONING_LOCAL_MIN_CONFIDENCE the LLM is
+asked instead, and every LLM label is compared with the local prediction
+(agreement counters and a confusion matrix) and, unless
+REASONING_ONLINE_LEARNING is off, learned from. REASONING_SHADOW_RATE of
+the confident local labels are also checked against the LLM in the
+background so agreement keeps being measured.
+
+LLM labels can be appended to REASONING_LABEL_LOG (JSON lines) and used
+to train weights offline, which are loaded from REASONING_MODEL_PATH:
+
+Usage:
+    python reasoning_classifier.py LABELS.jsonl [--out PATH]
+                                   [--epochs N] [--holdout F]
+"""
+
+import os
+import re
+import json
+import math
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+REASONING_LOCAL_ENABLED = os.getenv(
+    "REASONING_LOCAL_ENABLED", "true"
+).lower() == "true"
+# Below this top-label probability the LLM labels the message
+REASONING_LOCAL_MIN_CONFIDENCE = float(
+    os.getenv("REASONING_LOCAL_MIN_CONFIDENCE", "0.8")
+)
+# Fraction of confident local labels also checked against the LLM
+REASONING_SHADOW_RATE = float(os.getenv("REASONING_SHADOW_RATE", "0.05"))
+REASONING_ONLINE_LEARNING = os.getenv(
+    "REASONING_ONLINE_LEARNING", "true"
+).lower() == "true"
+# Trained weights (JSON written by this module's CLI)
+REASONING_MODEL_PATH = os.getenv("REASONING_MODEL_PATH", "")
+# JSON lines of LLM-labelled messages, for offline training
+REASONING_LABEL_LOG = os.getenv("REASONING_LABEL_LOG", "")
+# Most word features the model keeps
+REASONING_MAX_FEATURES = int(os.getenv("REASONING_MAX_FEATURES", "20000"))
+
+LABELS = ("good", "neutral", "confused")
+
+# Same cut-off as the LLM prompt
+MAX_MESSAGE_CHARS = 200
+
+# Phrase groups; one named group per cue feature
+_CUE_PATTERNS = {
+    "confusion": (
+        r"(?:i )?(?:don ?t|do not|didn ?t|can ?t|cannot) "
+        r"(?:understand|get|see|follow)|confus\w*|i ?m lost|lost me|"
+        r"makes? no sense|doesn ?t make sense|what do you mean|"
+        r"no idea|not sure|still unclear|huh"
+    ),
+    "hedge": (
+        r"i thought|isn ?t it|is it not|i guess|maybe|or is it|"
+        r"wait|so is"
+    ),
+    "reasoning": (
+        r"because|therefore|so that|which means|this means|that means|"
+        r"as a result|leads? to|would (?:increase|decrease|reduce|raise)|"
+        r"if a (?:business|firm|company)|what if|why (?:would|do|does)"
+    ),
+    "comparison": (
+        r"whereas|compared (?:to|with)|on the other hand|"
+        r"difference between|differ from|\w+ vs|versus|rather than|"
+        r"more \w+ than|less \w+ than"
+    ),
+    "evaluation": (
+        r"advantages?|disadvantages?|evaluate|analy[sz]e|impact|"
+        r"effects? (?:of|on)|justify|trade ?off|best option|"
+        r"to what extent|however"
+    ),
+    "basic_question": (
+        r"what (?:is|are|does)|define|definition of|meaning of|"
+        r"what s|explain|tell me about|give (?:me )?an example|"
+        r"can you (?:explain|tell)"
+    ),
+}
+_CUES = re.compile("|".join(
+    rf"\b(?P<{name}>{pattern})\b" for name, pattern in _CUE_PATTERNS.items()
+))
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Weights used until a trained model is loaded
+DEFAULT_WEIGHTS = {
+    "good": {
+        "cue:reasoning": 2.0, "cue:comparison": 2.0,
+        "cue:evaluation": 1.5, "len:long": 0.5,
+    },
+    "neutral": {
+        "bias": 1.0, "cue:basic_question": 1.5, "len:short": 0.5,
+    },
+    "confused": {
+        "cue:confusion": 3.0, "cue:hedge": 1.0,
+    },
+}
+
+_COUNTERS = (
+    "local", "llm", "llm_unavailable", "shadow", "compared", "agreed",
+    "confident_compared", "confident_agreed", "learned",
+)
+
+
+def _normalize(text: str) -> str:
+    """Lowercase words separated by single spaces, no punctuation."""
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def extract_features(text: str) -> Dict[str, float]:
+    """
+    Feature vector of a message.
+
+    Args:
+        text: Student message
+
+    Returns:
+        Dict of feature name -> value (all 1.0)
+    """
+    normalized = _normalize((text or "")[:MAX_MESSAGE_CHARS])
+    words = normalized.split()
+    features = {"bias": 1.0}
+    if len(words) <= 6:
+        features["len:short"] = 1.0
+    elif len(words) >= 20:
+        features["len:long"] = 1.0
+    else:
+        features["len:medium"] = 1.0
+    for match in _CUES.finditer(normalized):
+        features[f"cue:{match.lastgroup}"] = 1.0
+    for word in words:
+        features[f"w:{word}"] = 1.0
+    return features
+
+
+def _softmax(scores: Dict[str, float]) -> Dict[str, float]:
+    top = max(scores.values())
+    exps = {label: math.exp(s - top) for label, s in scores.items()}
+    total = sum(exps.values())
+    return {label: value / total for label, value in exps.items()}
+
+
+class ReasoningClassifier:
+    """
+    Labels messages locally and falls back to the LLM when unsure.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, Dict[str, float]]] = None,
+        min_confidence: float = REASONING_LOCAL_MIN_CONFIDENCE,
+        shadow_rate: float = REASONING_SHADOW_RATE,
+        online_learning: bool = REASONING_ONLINE_LEARNING,
+        label_log: str = REASONING_LABEL_LOG,
+        max_features: int = REASONING_MAX_FEATURES,
+        learning_rate: float = 0.1
+    ):
+        """
+        Initialize ReasoningClassifier.
+
+        Args:
+            weights: label -> feature -> weight (defaults to
+                DEFAULT_WEIGHTS)
+            min_confidence: Lowest probability a local label is used at
+            shadow_rate: Fraction of local labels checked by the LLM
+            online_learning: Learn from every LLM label
+            label_log: JSON lines file LLM labels are appended to ("" off)
+            max_features: Most word features kept
+            learning_rate: Step size for learn()
+        """
+        source = weights if weights is not None else DEFAULT_WEIGHTS
+        self.weights = {
+            label: dict(source.get(label, {})) for label in LABELS
+        }
+        self.min_confidence = min_confidence
+        self.shadow_rate = shadow_rate
+        self.online_learning = online_learning
+        self.label_log = label_log
+        self.max_features = max_features
+        self.learning_rate = learning_rate
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._counters = dict.fromkeys(_COUNTERS, 0)
+        # llm label -> local label -> count
+        self._confusion = {
+            label: dict.fromkeys(LABELS, 0) for label in LABELS
+        }
+        self._shadow_executor = None
+
+    # ------------------------------------------------------------------
+    # Model
+    # ------------------------------------------------------------------
+
+    def probabilities(self, text: str) -> Dict[str, float]:
+        """
+        Probability of each label.
+
+        Args:
+            text: Student message
+
+        Returns:
+            Dict of label -> probability (sums to 1)
+        """
+        return self._probabilities(extract_features(text))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Most likely label and its probability.
+
+        Args:
+            text: Student message
+
+        Returns:
+            (label, confidence)
+        """
+        probs = self.probabilities(text)
+        label = max(LABELS, key=probs.__getitem__)
+        return label, probs[label]
+
+    def learn(self, text: str, label: str):
+        """
+        One gradient step towards a label (softmax regression).
+
+        Args:
+            text: Student message
+            label: Correct label (ignored if not in LABELS)
+        """
+        if label not in LABELS:
+            return
+        features = extract_features(text)
+        with self._lock:
+            probs = self._probabilities(features)
+            for candidate in LABELS:
+                error = (1.0 if candidate == label else 0.0)
+                error -= probs[candidate]
+                row = self.weights[candidate]
+                for name, value in features.items():
+                    if name not in row and not self._has_room(name):
+                        continue
+                    row[name] = (
+                        row.get(name, 0.0)
+                        + self.learning_rate * error * value
+                    )
+            self._counters["learned"] += 1
+
+    def fit(
+        self, examples: Iterable[Tuple[str, str]], epochs: int = 5
+    ) -> float:
+        """
+        Train on labelled messages.
+
+        Args:
+            examples: (message, label) pairs
+            epochs: Passes over the examples (shuffled each time)
+
+        Returns:
+            Accuracy on the examples after training
+        """
+        examples = [(m, l) for m, l in examples if l in LABELS]
+        rng = random.Random(0)
+        for _ in range(epochs):
+            rng.shuffle(examples)
+            for message, label in examples:
+                self.learn(message, label)
+        return self.accuracy(examples)
+
+    def accuracy(self, examples: List[Tuple[str, str]]) -> float:
+        """Share of examples predicted correctly (0.0 if none)."""
+        if not examples:
+            return 0.0
+        correct = sum(
+            1 for message, label in examples
+            if self.predict(message)[0] == label
+        )
+        return correct / len(examples)
+
+    def to_dict(self) -> Dict:
+        """Weights as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "labels": list(LABELS),
+                "weights": {
+                    label: dict(row) for label, row in self.weights.items()
+                },
+            }
+
+    def save(self, path: str):
+        """Write the weights to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "ReasoningClassifier":
+        """
+        Classifier with weights from a file written by save().
+
+        Args:
+            path: JSON weights file ("" or missing: default weights)
+            **kwargs: Other ReasoningClassifier arguments
+
+        Returns:
+            ReasoningClassifier
+        """
+        weights = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    weights = json.load(f)["weights"]
+                logger.info(f"[OK] Loaded reasoning classifier from {path}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(
+                    f"[WARNING] Could not load reasoning classifier "
+                    f"{path}: {e}; using default weights"
+                )
+        return cls(weights=weights, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Classification with LLM fallback
+    # ------------------------------------------------------------------
+
+    def classify(
+        self, text: str, llm_label: Callable[[str], Optional[str]]
+    ) -> str:
+        """
+        Label a message, asking the LLM only when the model is unsure.
+
+        Args:
+            text: Student message
+            llm_label: Returns the LLM's label for a message, or None if
+                the LLM could not be asked
+
+        Returns:
+            "good", "neutral" or "confused"
+        """
+        label, confidence = self.predict(text)
+        confident = confidence >= self.min_confidence
+        if confident:
+            self._count("local")
+            if self.shadow_rate > 0 and random.random() < self.shadow_rate:
+                self._count("shadow")
+                self._shadow(text, llm_label, label)
+            return label
+
+        reference = llm_label(text)
+        if reference not in LABELS:
+            # LLM unavailable: the local guess beats a flat "neutral"
+            self._count("llm_unavailable")
+            return label
+        self._count("llm")
+        self.observe(text, reference, label, confident=False)
+        return reference
+
+    def observe(
+        self, text: str, reference: str, predicted: str,
+        confident: bool = False
+    ):
+        """
+        Record an LLM label next to the local prediction for a message.
+
+        Updates the agreement counters, appends the pair to the label log
+        and learns from it (if enabled).
+
+        Args:
+            text: Student message
+            reference: LLM label
+            predicted: Local label
+            confident: Whether the local label was confident enough to use
+        """
+        if reference not in LABELS or predicted not in LABELS:
+            return
+        agreed = reference == predicted
+        with self._lock:
+            self._counters["compared"] += 1
+            self._counters["agreed"] += agreed
+            if confident:
+                self._counters["confident_compared"] += 1
+                self._counters["confident_agreed"] += agreed
+            self._confusion[reference][predicted] += 1
+        self._log_label(text, reference)
+        if self.online_learning:
+            self.learn(text, reference)
+
+    def stats(self) -> Dict:
+        """
+        Counters for this worker.
+
+        Returns:
+            Dict of counters plus "local_rate" (labels served without the
+            LLM), "agreement" and "confident_agreement" (share of LLM
+            labels the local model matched; None before any) and
+            "confusion" (llm label -> local label -> count)
+        """
+        with self._lock:
+            row = dict(self._counters)
+            row["confusion"] = {
+                label: dict(counts)
+                for label, counts in self._confusion.items()
+            }
+            row["features"] = sum(len(w) for w in self.weights.values())
+        served = row["local"] + row["llm"] + row["llm_unavailable"]
+        row["local_rate"] = (
+            round((served - row["llm"]) / served, 4) if served else None
+        )
+        row["agreement"] = (
+            round(row["agreed"] / row["compared"], 4)
+            if row["compared"] else None
+        )
+        row["confident_agreement"] = (
+            round(row["confident_agreed"] / row["confident_compared"], 4)
+            if row["confident_compared"] else None
+        )
+        return row
+
+    def reset_stats(self):
+        """Reset the counters, keeping the weights."""
+        with self._lock:
+            self._counters = dict.fromkeys(_COUNTERS, 0)
+            self._confusion = {
+                label: dict.fromkeys(LABELS, 0) for label in LABELS
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _probabilities(self, features: Dict[str, float]):
+        scores = {
+            label: sum(
+                self.weights[label].get(name, 0.0) * value
+                for name, value in features.items()
+            )
+            for label in LABELS
+        }
+        return _softmax(scores)
+
+    def _has_room(self, name: str) -> bool:
+        """Whether a new feature may be added (lock held)."""
+        if not name.startswith("w:"):
+            return True
+        return len(self.weights["neutral"]) < self.max_features
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _shadow(self, text: str, llm_label, predicted: str):
+        """Ask the LLM in the background and compare its label."""
+        def check():
+            try:
+                reference = llm_label(text)
+            except Exception as e:
+                logger.warning(f"[WARNING] Shadow classification failed: {e}")
+                return
+            self.observe(text, reference, predicted, confident=True)
+
+        with self._lock:
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="reasoning-shadow"
+                )
+            executor = self._shadow_executor
+        executor.submit(check)
+
+    def _log_label(self, text: str, label: str):
+        if not self.label_log:
+            return
+        line = json.dumps({
+            "message": (text or "")[:MAX_MESSAGE_CHARS], "label": label
+        })
+        try:
+            with self._log_lock, \
+                    open(self.label_log, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"[WARNING] Could not log reasoning label: {e}")
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """
+    Labelled messages from a JSON lines file.
+
+    Args:
+        path: File with one {"message": str, "label": str} per line
+
+    Returns:
+        (message, label) pairs with a known label
+    """
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("label") in LABELS and row.get("message"):
+                examples.append((row["message"], row["label"]))
+    return examples
+
+
+def _metric_families():
+    """Local/LLM label counts and agreement as metric families."""
+    stats = classifier.stats()
+    return [
+        (
+            "reasoning_classifications", "counter",
+            "Reasoning labels by source (llm_unavailable: local label used "
+            "because the LLM could not be asked)",
+            [("_total", {"source": source}, stats[source])
+             for source in ("local", "llm", "llm_unavailable")]
+        ),
+        (
+            "reasoning_label_comparisons", "counter",
+            "LLM labels compared with the local prediction",
+            [("_total", {"llm_label": reference, "local_label": predicted},
+              count)
+             for reference, row in stats["confusion"].items()
+             for predicted, count in row.items()]
+        ),
+    ]
+
+
+# Process-wide classifier used by MasteryAgent
+classifier = ReasoningClassifier.from_path(REASONING_MODEL_PATH)
+
+# Label counts on /metrics (optional)
+try:
+    from metrics import registry as _metrics_registry
+    _metrics_registry.add_collector(_metric_families)
+except ImportError:
+    pass
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Train the local reasoning classifier from LLM labels"
+    )
+    parser.add_argument("labels", help="JSON lines of message and label")
+    parser.add_argument("--out", default=REASONING_MODEL_PATH or
+                        "reasoning_model.json",
+                        help="where to write the weights")
+    parser.add_argument("--epochs", type=int, default=5,
+                        help="passes over the training examples")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="share of examples kept for evaluation")
+    args = parser.parse_args(argv)
+
+    examples = load_examples(args.labels)
+    if not examples:
+        print(f"[ERROR] No labelled messages in {args.labels}")
+        return 1
+    random.Random(0).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout))
+    train, test = examples[:split], examples[split:]
+
+    model = ReasoningClassifier(online_learning=False, label_log="")
+    baseline = model.accuracy(test)
+    accuracy = model.fit(train, epochs=args.epochs)
+    model.save(args.out)
+    print(
+        f"[OK] Trained on {len(train)} messages (accuracy "
+        f"{accuracy:.3f}); held-out agreement with the LLM "
+        f"{model.accuracy(test):.3f} (default weights {baseline:.3f}) "
+        f"over {len(test)} messages; saved to {args.out}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
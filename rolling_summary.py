@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Rolling conversation summaries, maintained off the request path.
+
+After each tutor turn, RollingSummarizer.schedule() queues a background
+update for the conversation. The update folds the messages the summary does
+not cover yet into it (one small LLM call with the previous summary and
+the new messages, not the whole history) and stores the result with the
+conversation in ConversationStore, versioned by the number of messages it
+covers. The newest ROLLING_SUMMARY_KEEP_RECENT messages are never
+summarized; they reach the prompt verbatim.
+
+The tutor graph only reads the stored summary (SummarizeHistory), so a
+student's reply never waits for a summarization call. Updates for one
+conversation never overlap: a turn that ends while its conversation is
+being summarized just asks for one more pass.
+"""
+
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ROLLING_SUMMARY_ENABLED = os.getenv(
+    "ROLLING_SUMMARY_ENABLED", "true"
+).lower() == "true"
+# Newest messages left out of the summary (sent verbatim)
+ROLLING_SUMMARY_KEEP_RECENT = int(
+    os.getenv("ROLLING_SUMMARY_KEEP_RECENT", "4")
+)
+# Summarize once at least this many older messages are not covered
+ROLLING_SUMMARY_MIN_NEW = int(os.getenv("ROLLING_SUMMARY_MIN_NEW", "2"))
+ROLLING_SUMMARY_WORKERS = int(os.getenv("ROLLING_SUMMARY_WORKERS", "2"))
+
+
+class RollingSummarizer:
+    """
+    Keeps each conversation's summary up to date in the background.
+    """
+
+    def __init__(
+        self,
+        store,
+        summarize: Callable[[Optional[str], List[Dict]], Optional[str]],
+        keep_recent: int = ROLLING_SUMMARY_KEEP_RECENT,
+        min_new: int = ROLLING_SUMMARY_MIN_NEW,
+        workers: int = ROLLING_SUMMARY_WORKERS
+    ):
+        """
+        Initialize RollingSummarizer.
+
+        Args:
+            store: ConversationStore holding messages and summaries
+            summarize: Callable (previous summary, new messages) returning
+                the updated summary, or None on failure
+            keep_recent: Newest messages left out of the summary
+            min_new: Uncovered messages needed before summarizing
+            workers: Background threads
+        """
+        self.store = store
+        self.summarize = summarize
+        self.keep_recent = keep_recent
+        self.min_new = min_new
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="rolling-summary"
+        )
+        # conversation_id -> another pass requested while running
+        self._running: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def current(self, conversation_id: str) -> Optional[Dict]:
+        """
+        The stored summary of a conversation (no LLM call).
+
+        Returns:
+            {"summary": str, "version": int, "total": int}, or None if the
+            conversation has no summary yet
+        """
+        meta = self.store.summary(conversation_id)
+        if not meta or not meta.get("summary"):
+            return None
+        return meta
+
+    def schedule(self, conversation_id: str):
+        """
+        Queue a summary update for a conversation (returns immediately).
+
+        Args:
+            conversation_id: Conversation ID
+        """
+        with self._lock:
+            if conversation_id in self._running:
+                self._running[conversation_id] = True
+                return
+            self._running[conversation_id] = False
+        try:
+            self._executor.submit(self._run, conversation_id)
+        except RuntimeError:
+            # Executor shut down (process exiting)
+            with self._lock:
+                self._running.pop(conversation_id, None)
+
+    def update(self, conversation_id: str) -> bool:
+        """
+        Fold uncovered messages into the summary now.
+
+        Args:
+            conversation_id: Conversation ID
+
+        Returns:
+            True if a new summary was stored
+        """
+        meta = self.store.summary(conversation_id)
+        if not meta:
+            return False
+        total, version = meta["total"], meta["version"]
+        target = total - self.keep_recent
+        if target - version < self.min_new:
+            return False
+
+        # recent() holds the last len(messages) of `total` messages
+        messages = self.store.recent(conversation_id) or []
+        first = total - len(messages)
+        new_messages = messages[max(version - first, 0):target - first]
+        if not new_messages:
+            return False
+
+        summary = self.summarize(meta.get("summary"), new_messages)
+        if not summary:
+            return False
+        return self.store.set_summary(conversation_id, summary, target)
+
+    def close(self):
+        """Stop accepting updates; queued ones are dropped."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, conversation_id: str):
+        try:
+            while True:
+                self.update(conversation_id)
+                with self._lock:
+                    if not self._running.get(conversation_id):
+                        self._running.pop(conversation_id, None)
+                        return
+                    self._running[conversation_id] = False
+        except Exception as e:
+            logger.error(
+                f"[ERROR] Summary update for {conversation_id} failed: {e}"
+            )
+            with self._lock:
+                self._running.pop(conversation_id, None)
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Semantic answer cache for first-turn tutor questions.
+
+Students ask the same things about a topic ("what is a sole trader?"), and
+each one used to cost a full reply generation. Answers are cached per
+(topic, explanation_style) bucket and keyed by the normalized question:
+
+    1. exact match on the normalized question, in this worker and then
+       in the shared cache (Redis when configured) under
+       semantic_answer:{topic}:{style}:{hash}
+    2. otherwise the question is embedded and compared (cosine) with the
+       bucket's stored questions; the closest answer is reused when the
+       similarity is at least SEMANTIC_CACHE_THRESHOLD
+
+Only replies to a conversation's first message are cached or served: with
+prior history the right answer depends on the conversation. Entries expire
+after SEMANTIC_CACHE_TTL seconds, each bucket keeps at most
+SEMANTIC_CACHE_MAX_PER_TOPIC questions (least recently used evicted) and
+at most SEMANTIC_CACHE_MAX_TOPICS buckets are kept per worker.
+"""
+
+import os
+import re
+import math
+import time
+import operator
+import threading
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import cache_keys
+
+try:
+    from cache import cache_get, cache_set
+except ImportError:
+    def cache_get(key): return None
+    def cache_set(key, value, ttl=3600): return False
+
+try:
+    from circuit_breaker import get_breaker
+    openai_breaker = get_breaker("openai")
+except ImportError:
+    openai_breaker = None
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SEMANTIC_CACHE_ENABLED = os.getenv(
+    "SEMANTIC_CACHE_ENABLED", "true"
+).lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(
+    os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")
+)
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_PER_TOPIC = int(
+    os.getenv("SEMANTIC_CACHE_MAX_PER_TOPIC", "256")
+)
+SEMANTIC_CACHE_MAX_TOPICS = int(
+    os.getenv("SEMANTIC_CACHE_MAX_TOPICS", "500")
+)
+
+# Embeddings kept for questions seen recently (lookup, then store)
+_EMBEDDING_MEMO_SIZE = 1024
+
+_COUNTERS = (
+    "lookups", "exact_hits", "semantic_hits", "misses", "stores",
+    "evictions", "expirations", "embed_failures", "tokens_saved",
+)
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_question(text: str) -> str:
+    """
+    Canonical form of a question: lowercase words, no punctuation.
+
+    Args:
+        text: Student message
+
+    Returns:
+        Normalized question ("" if nothing is left)
+    """
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def _unit_vector(values) -> Optional[array]:
+    """Return values scaled to length 1 as float32, or None if invalid."""
+    try:
+        vector = array("f", values)
+    except TypeError:
+        return None
+    length = math.sqrt(sum(v * v for v in vector))
+    if not length:
+        return None
+    return array("f", (v / length for v in vector))
+
+
+class _Entry:
+    __slots__ = ("vector", "answer", "tokens", "expires_at")
+
+    def __init__(self, vector, answer, tokens, expires_at):
+        self.vector = vector
+        self.answer = answer
+        self.tokens = tokens
+        self.expires_at = expires_at
+
+
+class SemanticAnswerCache:
+    """
+    Per-topic cache of tutor answers, matched exactly or by embedding.
+    """
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[str], Optional[List[float]]]] = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: int = SEMANTIC_CACHE_TTL,
+        max_per_topic: int = SEMANTIC_CACHE_MAX_PER_TOPIC,
+        max_topics: int = SEMANTIC_CACHE_MAX_TOPICS,
+        shared: bool = True,
+        breaker=openai_breaker
+    ):
+        """
+        Initialize SemanticAnswerCache.
+
+        Args:
+            embed: Callable returning the embedding of a text (None for
+                exact matches only)
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl: Seconds an answer stays valid
+            max_per_topic: Questions kept per (topic, style) bucket
+            max_topics: Buckets kept in this worker
+            shared: Also store exact matches in the shared cache
+            breaker: Circuit breaker guarding the embedding call
+        """
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_topic = max_per_topic
+        self.max_topics = max_topics
+        self.shared = shared
+        self.breaker = breaker
+        # (topic, style) -> OrderedDict[normalized question, _Entry]
+        self._buckets: "OrderedDict[tuple, OrderedDict]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, array]" = OrderedDict()
+        self._counters = dict.fromkeys(_COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, topic: Any, style: str, question: str
+    ) -> Optional[Dict]:
+        """
+        Find a stored answer for a question.
+
+        Args:
+            topic: Topic ID
+            style: Explanation style
+            question: Student message
+
+        Returns:
+            {"answer": str, "match": "exact" | "semantic",
+            "similarity": float}, or None on a miss
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        bucket_key = (str(topic), style)
+        now = time.time()
+        self._count("lookups")
+
+        with self._lock:
+            entry = self._live_entry(bucket_key, normalized, now)
+            if entry is not None:
+                return self._hit("exact_hits", entry, 1.0)
+
+        if self.shared:
+            stored = cache_get(
+                cache_keys.semantic_answer_key(topic, style, normalized)
+            )
+            if isinstance(stored, dict) and stored.get("answer"):
+                # Another worker's answer; not embedded, so exact matches only
+                entry = self._add(
+                    bucket_key, normalized, None, stored["answer"],
+                    stored.get("tokens", 0), now
+                )
+                with self._lock:
+                    return self._hit("exact_hits", entry, 1.0)
+
+        vector = self._embedding(normalized)
+        if vector is None:
+            self._count("misses")
+            return None
+
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            candidates = list(bucket.items()) if bucket else []
+
+        best, best_score = None, -1.0
+        expired = []
+        for key, entry in candidates:
+            if entry.expires_at <= now:
+                expired.append(key)
+            elif entry.vector is not None:
+                score = sum(map(operator.mul, vector, entry.vector))
+                if score > best_score:
+                    best, best_score = key, score
+
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            for key in expired:
+                if bucket is not None and bucket.pop(key, None):
+                    self._counters["expirations"] += 1
+            if best is not None and best_score >= self.threshold:
+                entry = bucket.get(best) if bucket is not None else None
+                if entry is not None:
+                    bucket.move_to_end(best)
+                    return self._hit("semantic_hits", entry, best_score)
+            self._counters["misses"] += 1
+        return None
+
+    def store(
+        self,
+        topic: Any,
+        style: str,
+        question: str,
+        answer: str,
+        token_usage: Optional[Dict] = None
+    ):
+        """
+        Remember the generated answer to a question.
+
+        Args:
+            topic: Topic ID
+            style: Explanation style
+            question: Student message
+            answer: Generated reply
+            token_usage: Usage of the generation (counted as saved on
+                every later hit)
+        """
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        tokens = (token_usage or {}).get("total_tokens", 0)
+        self._add(
+            (str(topic), style), normalized, self._embedding(normalized),
+            answer, tokens, time.time()
+        )
+        self._count("stores")
+        if self.shared:
+            cache_set(
+                cache_keys.semantic_answer_key(topic, style, normalized),
+                {"answer": answer, "tokens": tokens},
+                ttl=self.ttl
+            )
+
+    def stats(self) -> Dict:
+        """
+        Hit/miss counters for this worker.
+
+        Returns:
+            Dict of counters plus hit_rate, topics and entries
+        """
+        with self._lock:
+            row = dict(self._counters)
+            row["topics"] = len(self._buckets)
+            row["entries"] = sum(len(b) for b in self._buckets.values())
+        hits = row["exact_hits"] + row["semantic_hits"]
+        row["hit_rate"] = (
+            round(hits / row["lookups"], 4) if row["lookups"] else None
+        )
+        return row
+
+    def reset_stats(self):
+        """Reset the counters, keeping the stored answers."""
+        with self._lock:
+            self._counters = dict.fromkeys(_COUNTERS, 0)
+
+    def clear(self):
+        """Forget every stored answer and reset the counters."""
+        with self._lock:
+            self._buckets.clear()
+            self._embeddings.clear()
+            self._counters = dict.fromkeys(_COUNTERS, 0)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _hit(self, counter: str, entry: _Entry, similarity: float) -> Dict:
+        """Count a hit and describe it (lock held)."""
+        self._counters[counter] += 1
+        self._counters["tokens_saved"] += entry.tokens
+        return {
+            "answer": entry.answer,
+            "match": "exact" if counter == "exact_hits" else "semantic",
+            "similarity": round(similarity, 4),
+        }
+
+    def _live_entry(
+        self, bucket_key: tuple, normalized: str, now: float
+    ) -> Optional[_Entry]:
+        """Unexpired entry for a question (lock held)."""
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            return None
+        entry = bucket.get(normalized)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del bucket[normalized]
+            self._counters["expirations"] += 1
+            return None
+        bucket.move_to_end(normalized)
+        self._buckets.move_to_end(bucket_key)
+        return entry
+
+    def _add(
+        self, bucket_key: tuple, normalized: str, vector, answer: str,
+        tokens: int, now: float
+    ) -> _Entry:
+        """Insert an entry, evicting least recently used ones."""
+        entry = _Entry(vector, answer, tokens, now + self.ttl)
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = OrderedDict()
+            bucket[normalized] = entry
+            bucket.move_to_end(normalized)
+            self._buckets.move_to_end(bucket_key)
+            while len(bucket) > self.max_per_topic:
+                bucket.popitem(last=False)
+                self._counters["evictions"] += 1
+            while len(self._buckets) > self.max_topics:
+                _, dropped = self._buckets.popitem(last=False)
+                self._counters["evictions"] += len(dropped)
+        return entry
+
+    def _embedding(self, normalized: str) -> Optional[array]:
+        """Unit embedding of a normalized question, memoized."""
+        with self._lock:
+            vector = self._embeddings.get(normalized)
+            if vector is not None:
+                self._embeddings.move_to_end(normalized)
+                return vector
+        if self.embed is None:
+            return None
+        # Exact matches still work while OpenAI is failing
+        if self.breaker is not None and self.breaker.state == "open":
+            return None
+        try:
+            vector = _unit_vector(self.embed(normalized) or ())
+        except Exception as e:
+            logger.warning(f"[WARNING] Question embedding failed: {e}")
+            vector = None
+        if vector is None:
+            self._count("embed_failures")
+            return None
+        with self._lock:
+            self._embeddings[normalized] = vector
+            while len(self._embeddings) > _EMBEDDING_MEMO_SIZE:
+                self._embeddings.popitem(last=False)
+        return vector
@@ -0,0 +1,99 @@
+"""
+Tests for the lazy application container
+"""
+import os
+import sys
+import subprocess
+import threading
+from unittest.mock import MagicMock, patch
+
+from app_container import AppContainer, LazyProxy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestAppContainer:
+    """Test cases for on-first-use construction."""
+
+    def test_built_once_on_first_use(self):
+        """Test a component is built lazily and exactly once."""
+        container = AppContainer()
+        factory = MagicMock(return_value=object())
+        container.register("thing", factory)
+
+        assert "thing" not in container.built()
+        first = container.get("thing")
+        assert container.get("thing") is first
+        factory.assert_called_once()
+
+    def test_concurrent_first_use(self):
+        """Test racing threads share a single construction."""
+        container = AppContainer()
+        calls = []
+        container.register("thing", lambda: calls.append(1) or object())
+
+        threads = [
+            threading.Thread(target=container.get, args=("thing",))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+
+    def test_reset_rebuilds(self):
+        """Test reset() forgets components (e.g. after a fork)."""
+        container = AppContainer()
+        container.register("thing", object)
+        first = container.get("thing")
+        container.reset()
+        assert container.get("thing") is not first
+
+    def test_warm_reports_failures(self):
+        """Test warm() builds what it can and names what failed."""
+        container = AppContainer()
+        container._factories = {}
+        container.register("ok", object)
+        container.register("broken", MagicMock(side_effect=RuntimeError))
+
+        assert container.warm() == ["broken"]
+        assert "ok" in container.built()
+
+
+class TestLazyProxy:
+    """Test cases for module-level stand-ins."""
+
+    def test_resolves_on_attribute_access(self):
+        """Test the proxy forwards attributes and truthiness."""
+        resolve = MagicMock(return_value=MagicMock(value=3))
+        proxy = LazyProxy(resolve, "thing")
+
+        resolve.assert_not_called()
+        assert proxy.value == 3
+        assert bool(proxy)
+
+    def test_patch_on_proxy_shadows_component(self):
+        """Test unittest.mock.patch.object works on the proxy."""
+        proxy = LazyProxy(lambda: MagicMock(name="real"), "thing")
+        with patch.object(proxy, "method", return_value="patched"):
+            assert proxy.method() == "patched"
+
+
+class TestImportSideEffects:
+    """Test importing the tutor builds nothing."""
+
+    def test_import_is_lazy(self):
+        """Test no client library is loaded by the import itself."""
+        code = (
+            "import sys, langgraph_tutor\n"
+            "from app_container import container\n"
+            "heavy = {'langchain_openai', 'supabase', 'openai'}\n"
+            "print(sorted(heavy & set(sys.modules)), container.built())\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT,
+            capture_output=True, text=True, timeout=60
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert proc.stdout.strip().endswith("[] []")
@@ -0,0 +1,272 @@
+"""
+Tests for the caching layer
+"""
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+import cache
+import cache_codec
+import cache_keys
+from cache import MemoryCache
+from circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def memory_cache():
+    """Small cache so limits are easy to hit."""
+    return MemoryCache(max_entries=3, max_bytes=1000, sweep_interval=0)
+
+
+class TestMemoryCache:
+    """Test cases for the in-process MemoryCache."""
+
+    def test_set_and_get(self, memory_cache):
+        """Test a value round-trips through the cache."""
+        memory_cache.set("lesson:1", {"text": "hello"}, ttl=60)
+        assert memory_cache.get("lesson:1") == {"text": "hello"}
+
+    def test_get_returns_copy(self, memory_cache):
+        """Test callers cannot mutate the cached value in place."""
+        memory_cache.set("shown_concepts:u:1", ["1"], ttl=60)
+        value = memory_cache.get("shown_concepts:u:1")
+        value.append("2")
+        assert memory_cache.get("shown_concepts:u:1") == ["1"]
+
+    def test_lru_eviction_by_count(self, memory_cache):
+        """Test the least recently used entry is evicted first."""
+        memory_cache.set("a", 1)
+        memory_cache.set("b", 2)
+        memory_cache.set("c", 3)
+        memory_cache.get("a")  # "b" is now least recently used
+        memory_cache.set("d", 4)
+        assert memory_cache.get("b") is None
+        assert memory_cache.get("a") == 1
+        assert len(memory_cache) == 3
+        assert memory_cache.evictions == 1
+
+    def test_eviction_by_bytes(self):
+        """Test the byte budget is enforced."""
+        small = MemoryCache(max_entries=100, max_bytes=50, sweep_interval=0)
+        small.set("a", "x" * 30)
+        small.set("b", "y" * 30)
+        assert small.get("a") is None
+        assert small.get("b") == "y" * 30
+        assert small.size_bytes <= 50
+
+    def test_value_larger_than_budget_rejected(self, memory_cache):
+        """Test an oversized value is not stored."""
+        assert memory_cache.set("big", "x" * 2000) is False
+        assert memory_cache.get("big") is None
+
+    def test_oversized_overwrite_drops_old_value(self, memory_cache):
+        """Test a rejected overwrite does not leave the stale value."""
+        memory_cache.set("a", "old")
+        assert memory_cache.set("a", "x" * 2000) is False
+        assert memory_cache.get("a") is None
+        assert memory_cache.size_bytes == 0
+
+    def test_expired_entry_not_returned(self, memory_cache):
+        """Test TTL expiry on read."""
+        with patch("cache.time.monotonic", return_value=100.0):
+            memory_cache.set("k", "v", ttl=5)
+        with patch("cache.time.monotonic", return_value=106.0):
+            assert memory_cache.get("k") is None
+        assert len(memory_cache) == 0
+
+    def test_sweep_drops_expired_entries(self, memory_cache):
+        """Test the sweep removes expired keys nobody reads."""
+        with patch("cache.time.monotonic", return_value=100.0):
+            memory_cache.set("short", 1, ttl=1)
+            memory_cache.set("long", 2, ttl=600)
+        assert memory_cache.sweep(now=105.0) == 1
+        assert len(memory_cache) == 1
+        assert memory_cache.size_bytes == len("2")
+
+    def test_overwrite_updates_size(self, memory_cache):
+        """Test overwriting a key does not leak bytes."""
+        memory_cache.set("k", "x" * 10)
+        memory_cache.set("k", "y")
+        assert memory_cache.size_bytes == len('"y"')
+
+    def test_delete(self, memory_cache):
+        """Test delete removes the entry and its bytes."""
+        memory_cache.set("k", "v")
+        assert memory_cache.delete("k") is True
+        assert memory_cache.delete("k") is False
+        assert memory_cache.size_bytes == 0
+
+
+class TestCacheFunctions:
+    """Test cases for the module-level cache API without Redis."""
+
+    @pytest.fixture(autouse=True)
+    def no_redis(self):
+        with patch.object(cache, "redis_client", None), \
+             patch.object(cache, "_memory_cache", MemoryCache()):
+            yield
+
+    def test_cache_set_get_delete(self):
+        """Test the public API falls back to the memory cache."""
+        assert cache.cache_set("lesson:1", "text", ttl=60) is True
+        assert cache.cache_get("lesson:1") == "text"
+        assert cache.cache_delete("lesson:1") is True
+        assert cache.cache_get("lesson:1") is None
+
+    def test_cache_many_memory_fallback(self):
+        """Test the batch API against the memory cache."""
+        assert cache.cache_set_many({"a": 1, "b": [2]}, ttl=60) is True
+        assert cache.cache_get_many(["a", "b", "missing"]) == {
+            "a": 1, "b": [2]
+        }
+        assert cache.cache_delete_many(["a", "b"]) is True
+        assert cache.cache_get_many(["a", "b"]) == {}
+
+    def test_cache_incr(self):
+        """Test counters start at zero and increment."""
+        assert cache.cache_incr("counter") == 1
+        assert cache.cache_incr("counter", 2) == 3
+        assert cache.cache_get("counter") == 3
+
+    def test_mastery_generation_bump(self):
+        """Test a bump moves readiness to a new key."""
+        assert cache.get_mastery_generation("u1") == 0
+        before = cache_keys.readiness_key(
+            "u1", ["1"], cache.get_mastery_generation("u1")
+        )
+        cache.cache_set(before, {"overall_readiness": "ready"}, ttl=60)
+        assert cache.bump_mastery_generation("u1") == 1
+        after = cache_keys.readiness_key(
+            "u1", ["1"], cache.get_mastery_generation("u1")
+        )
+        assert after != before
+        assert cache.cache_get(after) is None
+        assert cache.get_mastery_generation("u2") == 0
+
+    def test_cache_many_empty_inputs(self):
+        """Test empty batches do nothing."""
+        assert cache.cache_get_many([]) == {}
+        assert cache.cache_set_many({}) is True
+        assert cache.cache_delete_many([]) is True
+
+
+class TestCacheFunctionsRedis:
+    """Test cases for the batch API against a (mocked) Redis client."""
+
+    @pytest.fixture
+    def redis_client(self):
+        client = MagicMock()
+        with patch.object(cache, "redis_client", client), \
+             patch.object(cache, "redis_breaker", CircuitBreaker("redis")), \
+             patch.object(cache, "_memory_cache", MemoryCache()):
+            yield client
+
+    def test_get_many_uses_single_mget(self, redis_client):
+        """Test get_many reads every key with one MGET."""
+        redis_client.mget.return_value = [
+            cache_codec.encode({"text": "lesson"}), None
+        ]
+        assert cache.cache_get_many(["lesson:1", "concepts:1"]) == {
+            "lesson:1": {"text": "lesson"}
+        }
+        redis_client.mget.assert_called_once_with(["lesson:1", "concepts:1"])
+        redis_client.get.assert_not_called()
+
+    def test_set_many_uses_pipeline(self, redis_client):
+        """Test set_many writes through one non-transactional pipeline."""
+        pipe = redis_client.pipeline.return_value
+        assert cache.cache_set_many({"a": 1, "b": 2}, ttl=30) is True
+        redis_client.pipeline.assert_called_once_with(transaction=False)
+        assert pipe.setex.call_count == 2
+        pipe.execute.assert_called_once()
+
+    def test_delete_many_single_command(self, redis_client):
+        """Test delete_many issues one DEL for all keys."""
+        cache.cache_delete_many(["a", "b", "a"])
+        redis_client.delete.assert_called_once_with("a", "b")
+
+    def test_get_many_falls_back_on_redis_error(self, redis_client):
+        """Test a Redis failure falls back to the memory cache."""
+        cache._memory_cache.set("a", 1)
+        redis_client.mget.side_effect = ConnectionError("down")
+        assert cache.cache_get_many(["a", "b"]) == {"a": 1}
+
+
+class TestCacheGetOrLoad:
+    """Test cases for single-flight loading and negative caching."""
+
+    @pytest.fixture(autouse=True)
+    def no_redis(self):
+        with patch.object(cache, "redis_client", None), \
+             patch.object(cache, "_memory_cache", MemoryCache()):
+            yield
+
+    def test_hit_skips_loader(self):
+        """Test a cached value is returned without calling loader."""
+        cache.cache_set("lesson:1", "text", ttl=60)
+        loader = Mock(return_value="fresh")
+        assert cache.cache_get_or_load("lesson:1", loader) == "text"
+        loader.assert_not_called()
+
+    def test_empty_result_is_negative_cached(self):
+        """Test an empty result is cached and returned unwrapped."""
+        loader = Mock(return_value=[])
+        assert cache.cache_get_or_load("concepts:1", loader) == []
+        assert cache.cache_get_or_load("concepts:1", loader) == []
+        assert loader.call_count == 1
+
+    def test_plain_reads_never_see_the_negative_marker(self):
+        """Test cache_get and cache_get_many return the empty value."""
+        cache.cache_get_or_load("concepts:2", lambda: [])
+        none_loader = Mock(return_value=None)
+        cache.cache_get_or_load("lesson:3", none_loader)
+        cache.cache_get_or_load("lesson:3", none_loader)
+
+        assert cache.cache_get("concepts:2") == []
+        assert cache.cache_get("lesson:3") is None
+        assert cache.cache_get_many(["concepts:2", "lesson:3"]) == {
+            "concepts:2": []
+        }
+        # A cached None is still a hit for cache_get_or_load
+        assert none_loader.call_count == 1
+
+    def test_negative_ttl_zero_disables_negative_cache(self):
+        """Test empty results are not cached when negative_ttl is 0."""
+        loader = Mock(return_value=None)
+        cache.cache_get_or_load("lesson:2", loader, negative_ttl=0)
+        cache.cache_get_or_load("lesson:2", loader, negative_ttl=0)
+        assert loader.call_count == 2
+
+    def test_loader_exception_not_cached(self):
+        """Test a failing loader propagates and leaves no entry."""
+        loader = Mock(side_effect=TimeoutError("slow"))
+        with pytest.raises(TimeoutError):
+            cache.cache_get_or_load("lesson:3", loader)
+        assert cache.cache_get("lesson:3") is None
+
+    def test_concurrent_misses_call_loader_once(self):
+        """Test threads missing the same key share one load."""
+        calls = []
+        start = threading.Event()
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return ["row"]
+
+        def worker():
+            start.wait()
+            results.append(cache.cache_get_or_load("topic_concepts:1", loader))
+
+        results = []
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert results == [["row"]] * 8
@@ -0,0 +1,191 @@
+"""
+Tests for the async cache API
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import cache
+import cache_codec
+from cache import MemoryCache
+from circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def memory_only():
+    with patch.object(cache, "redis_client", None), \
+         patch.object(cache, "_memory_cache", MemoryCache()):
+        yield
+
+
+class TestAsyncMemoryFallback:
+    """Test cases for the async API without Redis."""
+
+    @pytest.mark.asyncio
+    async def test_set_get_delete(self):
+        """Test values round-trip through the memory cache."""
+        assert await cache.acache_set("lesson:1", "text", ttl=60) is True
+        assert await cache.acache_get("lesson:1") == "text"
+        # Shared with the sync API
+        assert cache.cache_get("lesson:1") == "text"
+        assert await cache.acache_delete("lesson:1") is True
+        assert await cache.acache_get("lesson:1") is None
+
+    @pytest.mark.asyncio
+    async def test_many(self):
+        """Test the batch calls."""
+        await cache.acache_set_many({"a": 1, "b": 2})
+        assert await cache.acache_get_many(["a", "b", "c"]) == {
+            "a": 1, "b": 2
+        }
+        await cache.acache_delete_many(["a", "b"])
+        assert await cache.acache_get_many(["a", "b"]) == {}
+
+
+class TestAsyncGetOrLoad:
+    """Test cases for acache_get_or_load."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        """Test coroutines missing the same key await one loader call."""
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return ["row"]
+
+        results = await asyncio.gather(*[
+            cache.acache_get_or_load("topic_concepts:1", loader)
+            for _ in range(5)
+        ])
+        assert results == [["row"]] * 5
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_sync_loader_and_negative_cache(self):
+        """Test a plain function loader and negative caching."""
+        loader = MagicMock(return_value=[])
+        assert await cache.acache_get_or_load("concepts:1", loader) == []
+        assert await cache.acache_get_or_load("concepts:1", loader) == []
+        assert loader.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_plain_reads_never_see_the_negative_marker(self):
+        """Test acache_get and acache_get_many return the empty value."""
+        await cache.acache_get_or_load("concepts:2", lambda: [])
+        assert await cache.acache_get("concepts:2") == []
+        assert await cache.acache_get_many(["concepts:2"]) == {
+            "concepts:2": []
+        }
+
+    @pytest.mark.asyncio
+    async def test_loader_exception_reaches_waiters(self):
+        """Test a failing load raises for every waiter and is not cached."""
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise TimeoutError("slow")
+
+        results = await asyncio.gather(
+            cache.acache_get_or_load("lesson:2", loader),
+            cache.acache_get_or_load("lesson:2", loader),
+            return_exceptions=True
+        )
+        assert all(isinstance(r, TimeoutError) for r in results)
+        assert await cache.acache_get("lesson:2") is None
+
+    @pytest.mark.asyncio
+    async def test_cancelled_first_caller_does_not_cancel_waiters(self):
+        """Test waiters still get the value when the first caller stops."""
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return ["row"]
+
+        first = asyncio.ensure_future(
+            cache.acache_get_or_load("topic_concepts:2", loader)
+        )
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(
+            cache.acache_get_or_load("topic_concepts:2", loader)
+        )
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await waiter == ["row"]
+        assert first.cancelled()
+        assert len(calls) == 1
+        assert cache._async_inflight == {}
+
+
+class TestAsyncRedis:
+    """Test cases for the async API against a mocked redis.asyncio client."""
+
+    @pytest.fixture
+    def client(self):
+        client = MagicMock()
+        client.get = AsyncMock()
+        client.mget = AsyncMock()
+        client.setex = AsyncMock()
+        client.pipeline.return_value.execute = AsyncMock()
+        with patch.object(cache, "_get_async_redis", return_value=client), \
+             patch.object(cache, "redis_breaker", CircuitBreaker("redis")):
+            yield client
+
+    @pytest.mark.asyncio
+    async def test_get_decodes_codec_value(self, client):
+        """Test values are decoded with the shared codec."""
+        client.get.return_value = cache_codec.encode({"text": "lesson"})
+        assert await cache.acache_get("lesson:1") == {"text": "lesson"}
+
+    @pytest.mark.asyncio
+    async def test_set_many_uses_pipeline(self, client):
+        """Test set_many awaits one pipeline execute."""
+        await cache.acache_set_many({"a": 1, "b": 2}, ttl=30)
+        pipe = client.pipeline.return_value
+        assert pipe.setex.call_count == 2
+        pipe.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_redis_error_falls_back(self, client):
+        """Test a Redis failure falls back to the memory cache."""
+        cache._memory_cache.set("a", 1)
+        client.get.side_effect = ConnectionError("down")
+        assert await cache.acache_get("a") == 1
+
+
+class TestAsyncClient:
+    """Test cases for the shared redis.asyncio client."""
+
+    @pytest.fixture
+    def redis_asyncio(self, monkeypatch):
+        module = MagicMock()
+        module.from_url.side_effect = lambda *a, **kw: MagicMock(
+            aclose=AsyncMock()
+        )
+        monkeypatch.setattr(cache, "redis_asyncio", module)
+        monkeypatch.setattr(cache, "redis_client", MagicMock())
+        monkeypatch.setattr(cache, "redis_breaker", CircuitBreaker("redis"))
+        monkeypatch.setattr(cache, "_async_client", None)
+        monkeypatch.setattr(cache, "_async_client_loop", None)
+        return module
+
+    def test_timeouts_and_close_on_loop_change(self, redis_asyncio):
+        """Test the client gets timeouts and a new loop closes the old."""
+        async def get_client():
+            client = cache._get_async_redis()
+            await asyncio.sleep(0)
+            return client
+
+        first = asyncio.run(get_client())
+        kwargs = redis_asyncio.from_url.call_args.kwargs
+        assert kwargs["socket_timeout"] == cache.CACHE_REDIS_TIMEOUT
+        assert kwargs["socket_connect_timeout"] == cache.CACHE_REDIS_TIMEOUT
+
+        second = asyncio.run(get_client())
+        assert second is not first
+        first.aclose.assert_awaited_once()
+        second.aclose.assert_not_awaited()
@@ -0,0 +1,87 @@
+"""
+Tests for the cache value codecs
+"""
+import json
+
+import pytest
+
+import cache_codec
+from cache_codec import (
+    CacheCodec,
+    FLAG_ZSTD,
+    FORMAT_VERSION,
+    SERIALIZER_JSON,
+    SERIALIZER_MSGPACK,
+)
+
+LESSON = {"lesson_text": "Demand is the quantity consumers buy. " * 200}
+CONCEPTS = [
+    {
+        "concept_id": i,
+        "name": f"Concept {i}",
+        "explanation": "A long explanation of the concept. " * 20,
+        "similarity": 0.5,
+    }
+    for i in range(10)
+]
+
+needs_msgpack = pytest.mark.skipif(
+    cache_codec.msgpack is None, reason="msgpack not installed"
+)
+needs_zstd = pytest.mark.skipif(
+    cache_codec.zstandard is None, reason="zstandard not installed"
+)
+
+
+class TestCacheCodec:
+    """Test cases for CacheCodec encode/decode."""
+
+    @pytest.mark.parametrize("serializer", [
+        SERIALIZER_JSON,
+        pytest.param(SERIALIZER_MSGPACK, marks=needs_msgpack),
+    ])
+    @pytest.mark.parametrize("value", [
+        "short text", 42, None, [], {"a": [1, 2.5, None]}, LESSON, CONCEPTS,
+    ])
+    def test_round_trip(self, serializer, value):
+        """Test values survive encode/decode unchanged."""
+        codec = CacheCodec(serializer=serializer, compress_threshold=256)
+        assert codec.decode(codec.encode(value)) == value
+
+    def test_header(self):
+        """Test the version byte and serializer flags are written."""
+        data = CacheCodec(SERIALIZER_JSON, compress_threshold=0).encode("x")
+        assert data[0] == FORMAT_VERSION
+        assert data[1] == SERIALIZER_JSON
+        assert data[2:] == b'"x"'
+
+    @needs_zstd
+    def test_large_values_compressed(self):
+        """Test bodies above the threshold are zstd-compressed."""
+        codec = CacheCodec(SERIALIZER_JSON, compress_threshold=1024)
+        data = codec.encode(LESSON)
+        assert data[1] & FLAG_ZSTD
+        assert len(data) < len(json.dumps(LESSON)) / 4
+
+    def test_small_values_not_compressed(self):
+        """Test bodies below the threshold are stored as-is."""
+        codec = CacheCodec(SERIALIZER_JSON, compress_threshold=1024)
+        assert not codec.encode({"a": 1})[1] & FLAG_ZSTD
+
+    def test_legacy_json_entries_decode(self):
+        """Test entries written as json.dumps text before the codec."""
+        codec = CacheCodec()
+        assert codec.decode(json.dumps(CONCEPTS).encode()) == CONCEPTS
+        assert codec.decode(json.dumps("text")) == "text"
+
+    def test_unknown_version_rejected(self):
+        """Test a header from a newer format raises ValueError."""
+        with pytest.raises(ValueError):
+            CacheCodec().decode(bytes((FORMAT_VERSION + 1, 0)) + b"{}")
+
+    def test_unknown_serializer_rejected(self):
+        """Test an unknown serializer id raises ValueError."""
+        with pytest.raises(ValueError):
+            CacheCodec(serializer=9)
+        with pytest.raises(ValueError):
+            CacheCodec().decode(bytes((FORMAT_VERSION, 9)) + b"{}")
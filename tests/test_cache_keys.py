@@ -0,0 +1,55 @@
+"""
+Tests for the cache key builders
+"""
+import os
+import subprocess
+import sys
+
+import cache_keys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCacheKeys:
+    """Test cases for deterministic cache keys."""
+
+    def test_readiness_key_ignores_order_and_type(self):
+        """Test concept IDs hash the same regardless of order or int/str."""
+        assert (
+            cache_keys.readiness_key("u1", [3, "1", 2], 4) ==
+            cache_keys.readiness_key("u1", ["2", "3", 1], 4)
+        )
+
+    def test_readiness_key_embeds_generation(self):
+        """Test bumping the generation changes the key."""
+        key_0 = cache_keys.readiness_key("u1", ["1", "2"], 0)
+        key_1 = cache_keys.readiness_key("u1", ["1", "2"], 1)
+        assert key_0 != key_1
+        assert key_1.startswith("readiness:u1:g1:")
+
+    def test_keys_stable_across_processes(self):
+        """Test keys do not depend on the per-process hash seed."""
+        code = (
+            "import cache_keys;"
+            "print(cache_keys.readiness_key('u1', ['7', '9'], 2));"
+            "print(cache_keys.concept_search_key(101, 'what is demand'))"
+        )
+        outputs = set()
+        for seed in ("1", "2"):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            result = subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=ROOT, env=env, capture_output=True, text=True, check=True
+            )
+            outputs.add(result.stdout)
+        assert len(outputs) == 1
+        assert outputs.pop().splitlines() == [
+            cache_keys.readiness_key("u1", ["9", "7"], 2),
+            cache_keys.concept_search_key(101, "what is demand"),
+        ]
+
+    def test_concept_search_key_format_unchanged(self):
+        """Test existing concept search entries stay reachable."""
+        assert cache_keys.concept_search_key(101, "abc") == (
+            "concepts:101:900150983cd24fb0d6963f7d28e17f72"
+        )
@@ -0,0 +1,97 @@
+"""
+Tests for the per-prefix cache counters
+"""
+from unittest.mock import patch
+
+import pytest
+
+import cache
+from cache import MemoryCache
+from cache_stats import CacheStats, key_prefix
+
+
+@pytest.fixture
+def stats():
+    return CacheStats()
+
+
+class TestCacheStats:
+    """Test cases for CacheStats."""
+
+    def test_key_prefix(self):
+        """Test keys are grouped by the text before the first colon."""
+        assert key_prefix("readiness:u1:g0:abc") == "readiness"
+        assert key_prefix("plain") == "plain"
+
+    def test_hit_rate_per_prefix(self, stats):
+        """Test hits and misses are counted per prefix."""
+        stats.hit("lesson:1", 100)
+        stats.hit("lesson:2", 50)
+        stats.miss("lesson:3")
+        stats.miss("concepts:101:abc")
+        snapshot = stats.snapshot()["prefixes"]
+        assert snapshot["lesson"]["hits"] == 2
+        assert snapshot["lesson"]["bytes_read"] == 150
+        assert snapshot["lesson"]["hit_rate"] == pytest.approx(2 / 3, 1e-3)
+        assert snapshot["concepts"]["hit_rate"] == 0.0
+
+    def test_latency_histogram(self, stats):
+        """Test durations land in the right bucket."""
+        stats.observe_latency("get", 0.0004)   # 0.4 ms -> "0.5"
+        stats.observe_latency("get", 0.003)    # 3 ms -> "5"
+        stats.observe_latency("get", 5.0)      # 5 s -> "+Inf"
+        histogram = stats.snapshot()["redis_latency_ms"]["get"]
+        assert histogram["count"] == 3
+        assert histogram["buckets"]["0.5"] == 1
+        assert histogram["buckets"]["5"] == 1
+        assert histogram["buckets"]["+Inf"] == 1
+
+    def test_reset(self, stats):
+        """Test reset clears every counter."""
+        stats.set("lesson:1", 10)
+        stats.observe_latency("setex", 0.001)
+        stats.reset()
+        assert stats.snapshot() == {"prefixes": {}, "redis_latency_ms": {}}
+
+
+class TestCacheInstrumentation:
+    """Test cases for counters recorded by cache.py."""
+
+    @pytest.fixture(autouse=True)
+    def isolated_cache(self, stats):
+        memory = MemoryCache(max_entries=2, stats=stats)
+        with patch.object(cache, "redis_client", None), \
+             patch.object(cache, "stats", stats), \
+             patch.object(cache, "_memory_cache", memory):
+            yield
+
+    def test_get_and_set_counted(self, stats):
+        """Test the public API records misses, sets and hits."""
+        cache.cache_get("lesson:1")
+        cache.cache_set("lesson:1", "text")
+        cache.cache_get("lesson:1")
+        lesson = stats.snapshot()["prefixes"]["lesson"]
+        assert (lesson["misses"], lesson["sets"], lesson["hits"]) == (1, 1, 1)
+        assert lesson["bytes_written"] == len('"text"')
+
+    def test_evictions_counted_by_prefix(self, stats):
+        """Test memory cache evictions are attributed to the evicted key."""
+        cache.cache_set("lesson:1", 1)
+        cache.cache_set("concepts:1", 2)
+        cache.cache_set("concepts:2", 3)
+        assert stats.snapshot()["prefixes"]["lesson"]["evictions"] == 1
+
+    def test_get_or_load_counts_one_miss(self, stats):
+        """Test single-flight re-checks do not inflate the miss count."""
+        cache.cache_get_or_load("lesson:9", lambda: "text")
+        lesson = stats.snapshot()["prefixes"]["lesson"]
+        assert lesson["misses"] == 1
+        assert lesson["hits"] == 0
+
+    def test_get_cache_stats_snapshot(self):
+        """Test the snapshot served over HTTP includes memory totals."""
+        cache.cache_set("lesson:1", 1)
+        snapshot = cache.get_cache_stats()
+        assert snapshot["backend"] == "memory"
+        assert snapshot["memory_cache"]["entries"] == 1
+        assert "lesson" in snapshot["prefixes"]
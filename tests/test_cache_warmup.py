@@ -0,0 +1,131 @@
+"""
+Tests for the cache warm-up
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import cache_warmup
+
+
+def _query(rows):
+    """Supabase query builder whose execute() returns rows."""
+    query = MagicMock()
+    for method in ("select", "gte", "order", "limit", "in_", "eq"):
+        getattr(query, method).return_value = query
+    query.execute.return_value = MagicMock(data=rows)
+    return query
+
+
+@pytest.fixture
+def supabase():
+    """Supabase client with messages, topics and questions."""
+    tables = {
+        "tutor_messages": _query([
+            {"topic": "11"}, {"topic": "11"}, {"topic": "12"},
+            {"topic": None}, {"topic": "11"}, {"topic": "12"},
+            {"topic": "13"},
+        ]),
+        "topics": _query([{"topic_id": 11}, {"topic_id": 12}]),
+        "business_activity_questions": _query([
+            {"question_id": "q1", "context": "Market research"},
+            {"question_id": "q2", "context": ""},
+        ]),
+    }
+    client = MagicMock()
+    client.table.side_effect = lambda name: tables[name]
+    client.tables = tables
+    return client
+
+
+@pytest.fixture
+def services():
+    """Lesson and concept services returning canned data."""
+    lesson = MagicMock()
+    lesson.fetch_lesson_content.side_effect = lambda t: f"lesson {t}"
+    lesson.get_subject_id_from_topic.return_value = 101
+    concepts = MagicMock()
+    concepts.fetch_concepts_by_topic.return_value = [
+        {"concept_id": 3}, {"concept_id": 1}, {"concept_id": 2},
+    ]
+    return lesson, concepts
+
+
+class TestTopicEnumeration:
+    """Test cases for choosing topics to warm."""
+
+    def test_popular_topics_ranked_by_messages(self, supabase):
+        """Test topics are ordered by message count and normalized."""
+        assert cache_warmup.popular_topics(supabase, limit=2) == [11, 12]
+
+    def test_all_topics(self, supabase):
+        """Test every topic row is returned."""
+        assert cache_warmup.all_topics(supabase) == [11, 12]
+
+
+class TestWarmCache:
+    """Test cases for warm_cache."""
+
+    def test_writes_topic_and_question_entries(self, supabase, services):
+        """Test every key is written once with its reader's TTL."""
+        with patch.object(cache_warmup, "cache_set_many") as set_many:
+            report = cache_warmup.warm_cache(
+                supabase, *services, topic_ids=[11], concurrency=2
+            )
+
+        written = {}
+        for call in set_many.call_args_list:
+            for key, value in call.args[0].items():
+                written[key] = (value, call.kwargs["ttl"])
+        assert written["lesson:11"] == ("lesson 11", 3600)
+        assert written["lesson_text:11"] == ("lesson 11", 300)
+        assert written["topic_concepts:11"][1] == 3600
+        assert [c["concept_id"] for c in
+                written["all_concepts_ordered:11"][0]] == [1, 2, 3]
+        bundle, ttl = written["topic_bundle:v1:11"]
+        assert (bundle["lesson"], bundle["subject_id"], ttl) == (
+            "lesson 11", 101, 86400
+        )
+        assert bundle["concepts"]["ids"] == [3, 1, 2]
+        assert written["lesson_context:q1"] == ("Market research", 3600)
+        assert "lesson_context:q2" not in written
+        assert report["topics"] == 1
+        assert report["entries"] == len(written) == 6
+        assert report["bytes"] > 0
+        assert report["failed_topics"] == []
+
+    def test_one_call_per_ttl(self, supabase, services):
+        """Test entries are batched into one write per TTL."""
+        with patch.object(cache_warmup, "cache_set_many") as set_many:
+            cache_warmup.warm_cache(supabase, *services, top=3)
+        ttls = [call.kwargs["ttl"] for call in set_many.call_args_list]
+        assert sorted(ttls) == sorted(set(ttls))
+        assert len(set_many.call_args_list[0].args[0]) > 0
+
+    def test_failed_topic_is_reported(self, supabase, services):
+        """Test a topic that raises does not stop the others."""
+        lesson, concepts = services
+
+        def fetch(topic_id):
+            if topic_id == "12":
+                raise TimeoutError("supabase timeout")
+            return f"lesson {topic_id}"
+
+        lesson.fetch_lesson_content.side_effect = fetch
+        with patch.object(cache_warmup, "cache_set_many"):
+            report = cache_warmup.warm_cache(
+                supabase, lesson, concepts, include_all=True,
+                include_questions=False
+            )
+        assert report["topics"] == 2
+        assert report["failed_topics"] == [12]
+        assert report["entries"] == 5
+
+    def test_no_topics(self, supabase, services):
+        """Test an empty topic list writes nothing."""
+        with patch.object(cache_warmup, "cache_set_many") as set_many:
+            report = cache_warmup.warm_cache(
+                supabase, *services, topic_ids=[]
+            )
+        set_many.assert_not_called()
+        assert report["entries"] == 0
@@ -0,0 +1,132 @@
+"""
+Tests for the dependency circuit breakers
+"""
+from unittest.mock import patch
+
+import pytest
+
+import cache
+from cache import MemoryCache
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+@pytest.fixture
+def clock():
+    """Controllable time.monotonic for circuit_breaker."""
+    now = [1000.0]
+    with patch("circuit_breaker.time.monotonic", side_effect=lambda: now[0]):
+        yield now
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        "test", failure_rate=0.5, window_seconds=10, min_calls=4,
+        open_seconds=5
+    )
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker state transitions."""
+
+    def test_stays_closed_below_min_calls(self, breaker):
+        """Test a few failures do not open the breaker."""
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_opens_on_error_rate(self, breaker):
+        """Test the breaker opens once the error rate crosses the limit."""
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()  # 2 of 4 failed
+        assert breaker.state == OPEN
+        assert breaker.allow_request() is False
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_old_calls_leave_the_window(self, breaker, clock):
+        """Test failures outside the window are forgotten."""
+        for _ in range(3):
+            breaker.record_failure()
+        clock[0] += 11
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_closes_on_success(self, breaker, clock):
+        """Test one probe is allowed after open_seconds."""
+        for _ in range(4):
+            breaker.record_failure()
+        clock[0] += 5
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False  # probe in flight
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def test_success_while_open_keeps_it_open(self, breaker, clock):
+        """Test a late success does not close an open breaker."""
+        for _ in range(4):
+            breaker.record_failure()
+        breaker.record_success()
+        assert breaker.state == OPEN
+        assert breaker.allow_request() is False
+        clock[0] += 5
+        assert breaker.state == HALF_OPEN
+
+    def test_half_open_probe_failure_reopens(self, breaker, clock):
+        """Test a failed probe opens the breaker again."""
+        for _ in range(4):
+            breaker.record_failure()
+        clock[0] += 5
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.snapshot()["times_opened"] == 2
+
+    def test_call_uses_fallback(self, breaker):
+        """Test call() falls back on errors and while open."""
+        def boom():
+            raise ConnectionError("down")
+
+        for _ in range(4):
+            assert breaker.call(boom, fallback=lambda: "fallback") == (
+                "fallback"
+            )
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "ok")
+
+
+class TestRedisBreaker:
+    """Test cases for the breaker around the Redis client."""
+
+    @pytest.fixture
+    def failing_redis(self, clock):
+        client = type("Client", (), {})()
+        client.calls = 0
+
+        def get(key):
+            client.calls += 1
+            raise ConnectionError("redis down")
+
+        client.get = get
+        redis_breaker = CircuitBreaker("redis", min_calls=2, open_seconds=30)
+        with patch.object(cache, "redis_client", client), \
+             patch.object(cache, "redis_breaker", redis_breaker), \
+             patch.object(cache, "_memory_cache", MemoryCache()):
+            yield client
+
+    def test_open_breaker_skips_redis(self, failing_redis):
+        """Test cache_get stops calling Redis once the breaker opens."""
+        cache._memory_cache.set("lesson:1", "text")
+        for _ in range(5):
+            assert cache.cache_get("lesson:1") == "text"
+        assert failing_redis.calls == 2
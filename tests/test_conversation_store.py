@@ -0,0 +1,229 @@
+"""
+Tests for the shared conversation store
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from circuit_breaker import CircuitBreaker
+from conversation_store import ConversationStore
+
+
+class FakeRedis:
+    """The list and hash commands ConversationStore uses, in memory."""
+
+    def __init__(self):
+        self.lists = {}
+        self.hashes = {}
+        self.ttls = {}
+        self.calls = 0
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(
+            v.encode() if isinstance(v, str) else v for v in values
+        )
+
+    def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        end = len(items) if end == -1 else end + 1
+        self.lists[key] = items[start:end]
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def lrange(self, key, start, end):
+        self.calls += 1
+        return list(self.lists.get(key, []))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.lists.pop(key, None)
+            self.hashes.pop(key, None)
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount).encode()
+        return int(fields[field])
+
+    def hsetnx(self, key, field, value):
+        self.hashes.setdefault(key, {}).setdefault(
+            field, str(value).encode()
+        )
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(
+            {k: str(v).encode() for k, v in mapping.items()}
+        )
+
+    def hgetall(self, key):
+        self.calls += 1
+        return {
+            k.encode(): v for k, v in self.hashes.get(key, {}).items()
+        }
+
+    def pipeline(self, transaction=True):
+        redis = self
+        commands = []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                def queue(*args, **kwargs):
+                    commands.append((name, args, kwargs))
+                return queue
+
+            def execute(self):
+                redis.calls += 1
+                return [getattr(redis, name)(*args, **kwargs)
+                        for name, args, kwargs in commands]
+
+        return Pipeline()
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+def _store(redis=None, **kwargs):
+    return ConversationStore(
+        redis=redis, breaker=CircuitBreaker("redis"), **kwargs
+    )
+
+
+class TestLocalTier:
+    """Test cases for the in-process LRU of deques."""
+
+    def test_append_and_recent(self):
+        """Test messages come back oldest first."""
+        store = _store()
+        store.append("c1", "user", "hi")
+        store.append("c1", "assistant", "hello")
+
+        assert store.recent("c1") == [
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "hello"},
+        ]
+        assert store.recent("c1", limit=1) == [
+            {"role": "assistant", "content": "hello"}
+        ]
+        assert store.recent("missing") is None
+
+    def test_messages_capped_per_conversation(self):
+        """Test only the last max_messages are kept."""
+        store = _store(max_messages=3)
+        for i in range(5):
+            store.append("c1", "user", str(i))
+        assert [m["content"] for m in store.recent("c1")] == ["2", "3", "4"]
+
+    def test_least_recent_conversation_evicted(self):
+        """Test the number of conversations is bounded (LRU)."""
+        store = _store(max_conversations=2)
+        store.append("c1", "user", "a")
+        store.append("c2", "user", "b")
+        store.recent("c1")  # c1 is now most recent
+        store.append("c3", "user", "c")
+
+        assert len(store) == 2
+        assert store.recent("c2") is None
+        assert store.recent("c1") is not None
+
+    def test_seed_does_not_overwrite(self):
+        """Test seeding only fills a conversation nobody has started."""
+        store = _store()
+        store.seed("c1", [{"role": "user", "content": "from db",
+                           "created_at": "x"}])
+        store.seed("c1", [{"role": "user", "content": "again"}])
+        assert store.recent("c1") == [{"role": "user", "content": "from db"}]
+
+
+class TestRedisTier:
+    """Test cases for the Redis list shared between workers."""
+
+    def test_other_worker_sees_turns(self, redis):
+        """Test a second process reads history without Supabase."""
+        worker_a = _store(redis, max_messages=3)
+        worker_b = _store(redis, max_messages=3)
+        for i in range(4):
+            worker_a.append("c1", "user", str(i))
+
+        assert [m["content"] for m in worker_b.recent("c1")] == [
+            "1", "2", "3"
+        ]
+        assert redis.ttls["conversation:c1"] > 0
+
+    def test_append_on_local_miss_adopts_shared_list(self, redis):
+        """Test appending on a fresh worker keeps earlier turns."""
+        _store(redis).append("c1", "user", "first")
+        worker_b = _store(redis)
+        worker_b.append("c1", "assistant", "second")
+
+        assert [m["content"] for m in worker_b.recent("c1")] == [
+            "first", "second"
+        ]
+
+    def test_turns_alternating_between_workers(self, redis):
+        """Test neither worker serves a stale local copy."""
+        worker_a = _store(redis)
+        worker_b = _store(redis)
+        worker_a.append("c1", "user", "q1")
+        worker_b.append("c1", "assistant", "a1")
+        worker_a.append("c1", "user", "q2")
+
+        expected = ["q1", "a1", "q2"]
+        assert [m["content"] for m in worker_a.recent("c1")] == expected
+        assert [m["content"] for m in worker_b.recent("c1")] == expected
+
+    def test_local_copy_used_while_redis_down(self, redis):
+        """Test the mirrored local copy answers when Redis fails."""
+        store = _store(redis)
+        store.append("c1", "user", "hi")
+        redis.lrange = MagicMock(side_effect=ConnectionError("down"))
+        assert store.recent("c1") == [{"role": "user", "content": "hi"}]
+
+    def test_redis_failure_falls_back_to_local(self):
+        """Test a failing Redis does not lose the turn locally."""
+        broken = MagicMock()
+        broken.pipeline.side_effect = ConnectionError("redis down")
+        store = _store(broken)
+        store.append("c1", "user", "hi")
+        assert store.recent("c1") == [{"role": "user", "content": "hi"}]
+
+
+class TestSummaryMeta:
+    """Test cases for the message total and rolling summary."""
+
+    def test_total_counts_every_append(self, redis):
+        """Test the total keeps growing past the message limit."""
+        worker_a = _store(redis, max_messages=2)
+        worker_b = _store(redis, max_messages=2)
+        for i in range(3):
+            worker_a.append("c1", "user", str(i))
+        worker_b.append("c1", "assistant", "3")
+
+        assert worker_a.total("c1") == 4
+        assert len(worker_a.recent("c1")) == 2
+
+    def test_summary_shared_and_versioned(self, redis):
+        """Test a summary is seen by other workers and never regresses."""
+        worker_a = _store(redis)
+        worker_b = _store(redis)
+        worker_a.append("c1", "user", "hi")
+
+        assert worker_a.set_summary("c1", "new", 6)
+        assert not worker_b.set_summary("c1", "old", 4)
+        assert worker_b.summary("c1") == {
+            "summary": "new", "version": 6, "total": 1
+        }
+
+    def test_local_summary_without_redis(self):
+        """Test the local tier keeps the summary next to the messages."""
+        store = _store()
+        store.append("c1", "user", "hi")
+        store.append("c1", "assistant", "hello")
+        store.set_summary("c1", "greetings", 2)
+
+        assert store.summary("c1") == {
+            "summary": "greetings", "version": 2, "total": 2
+        }
+        store.clear("c1")
+        assert store.summary("c1") is None
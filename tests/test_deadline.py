@@ -0,0 +1,175 @@
+"""
+Tests for per-request deadlines and adaptive timeouts
+"""
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+import deadline as deadline_module
+import langgraph_tutor
+from deadline import Deadline, LatencyTracker, timeout_for, use_deadline
+
+
+@pytest.fixture(autouse=True)
+def fresh_counters():
+    deadline_module.reset_stats()
+    yield
+    deadline_module.reset_stats()
+
+
+@pytest.fixture
+def tracker():
+    return LatencyTracker(min_samples=10, headroom=2.0, floor=0.5)
+
+
+class TestLatencyTracker:
+    """Test cases for percentiles and adaptive timeouts."""
+
+    def test_defaults_until_enough_samples(self, tracker):
+        """Test too few observations leave the fixed timeout."""
+        for _ in range(9):
+            tracker.observe("supabase", 0.1)
+        assert tracker.percentile("supabase", 0.99) is None
+        assert tracker.timeout_for("supabase", 10) == 10
+        assert tracker.estimate("supabase", 3.0) == 3.0
+
+    def test_timeout_follows_p99(self, tracker):
+        """Test the timeout is headroom x p99, within floor and default."""
+        for ms in range(1, 101):
+            tracker.observe("llm:generate_reply", ms / 100)
+        assert tracker.percentile("llm:generate_reply", 0.99) == 0.99
+        assert tracker.timeout_for("llm:generate_reply", 30) == 1.98
+        assert tracker.timeout_for("llm:generate_reply", 1.5) == 1.5
+
+        for _ in range(10):
+            tracker.observe("supabase", 0.01)
+        assert tracker.timeout_for("supabase", 10) == 0.5
+
+    def test_disabled(self):
+        """Test a disabled tracker always returns the defaults."""
+        tracker = LatencyTracker(min_samples=1, enabled=False)
+        tracker.observe("supabase", 0.01)
+        assert tracker.timeout_for("supabase", 10) == 10
+
+
+class TestDeadline:
+    """Test cases for Deadline and the current-deadline helpers."""
+
+    def test_timeout_capped_by_remaining(self, tracker):
+        """Test a call never gets more time than the request has left."""
+        deadline = Deadline(2.0, tracker)
+        assert 1.9 < deadline.timeout("supabase", 10) <= 2.0
+        assert deadline.timeout("supabase", 10, reserve=5) == 0.0
+        assert deadline.timeout("supabase", 0.5) == 0.5
+
+    def test_allows_records_skips(self, tracker):
+        """Test steps that do not fit are listed and counted."""
+        deadline = Deadline(2.0, tracker)
+        assert deadline.allows("readiness", 1.0)
+        assert not deadline.allows("learning_path", 1.0, reserve=1.5)
+
+        assert deadline.skipped == ["learning_path"]
+        assert deadline_module.stats()["skipped"] == {"learning_path": 1}
+
+    def test_cost_from_observed_latency(self, tracker):
+        """Test the expected cost is the observed p95 of cost_key."""
+        for _ in range(10):
+            tracker.observe("node:ComputeReadiness", 5.0)
+        deadline = Deadline(2.0, tracker)
+        assert not deadline.allows(
+            "readiness", 0.1, cost_key="node:ComputeReadiness"
+        )
+        assert deadline.allows("readiness", 0.1, cost_key="unseen")
+
+    def test_finish_counts_late_requests(self, tracker):
+        """Test finish() counts only requests past their deadline."""
+        Deadline(5.0, tracker).finish()
+        Deadline(0, tracker).finish()
+        assert deadline_module.stats()["exceeded"] == 1
+
+    def test_timeout_for_uses_current_deadline(self):
+        """Test module-level timeout_for reads the current deadline."""
+        assert timeout_for("unseen-dependency", 10) == 10
+        with use_deadline(Deadline(0)):
+            assert timeout_for("unseen-dependency", 10) == 0.0
+        assert timeout_for("unseen-dependency", 10) == 10
+
+
+class TestTutorDegradation:
+    """Test cases for the tutor graph near its deadline."""
+
+    def test_supabase_query_skipped_after_deadline(self):
+        """Test an expired deadline returns the default without querying."""
+        query = MagicMock(return_value=[{"id": 1}])
+        with use_deadline(Deadline(0)):
+            result = langgraph_tutor.safe_supabase_query(
+                query, default_return=[]
+            )
+        assert result == []
+        query.assert_not_called()
+
+    def test_readiness_skipped_and_reported(self, monkeypatch):
+        """Test ComputeReadiness is skipped and listed in the response."""
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        state = langgraph_tutor._initial_state(
+            "u1", "11", "What is a sole trader?", "u1_11", "default",
+            "trace", 101, [], deadline=Deadline(0)
+        )
+        state["concept_rows"] = [{"concept_id": "c1", "name": "Sole trader"}]
+
+        service = MagicMock()
+        monkeypatch.setattr(langgraph_tutor, "readiness_service", service)
+        update = langgraph_tutor.timed_node(
+            langgraph_tutor.ComputeReadiness
+        )(state)
+        service.compute_readiness_signal.assert_not_called()
+        assert update == {"readiness": None}
+
+        state.update(update)
+        response = langgraph_tutor._tutor_response(state)
+        assert response["degraded"] == ["readiness"]
+        assert deadline_module.stats()["skipped"] == {"readiness": 1}
+
+    def test_backend_gives_up_after_grace(self, monkeypatch):
+        """Test /tutor/chat answers 504 once deadline and grace pass."""
+        import unified_backend
+
+        monkeypatch.setattr(unified_backend, "AI_TUTOR_AVAILABLE", True)
+        monkeypatch.setattr(unified_backend, "TUTOR_DEADLINE_SECONDS", 0.05)
+        monkeypatch.setattr(unified_backend, "DEADLINE_GRACE_SECONDS", 0.05)
+
+        def slow_graph(**kwargs):
+            assert isinstance(kwargs["deadline"], Deadline)
+            time.sleep(0.5)
+
+        monkeypatch.setattr(unified_backend, "run_tutor_graph", slow_graph)
+        request = unified_backend.TutorRequest(
+            message="What is a sole trader?", topic=11, user_id="u1"
+        )
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(unified_backend._chat_with_tutor(request))
+        assert error.value.status_code == 504
+
+    def test_invalid_mode_keeps_deadline(self, monkeypatch):
+        """Test the tutor-mode fallback keeps the caller's arguments."""
+        calls = []
+        original = langgraph_tutor.run_tutor_graph
+
+        def recorder(**kwargs):
+            if kwargs.get("mode") != "tutor":
+                return original(**kwargs)
+            calls.append(kwargs)
+
+        monkeypatch.setattr(langgraph_tutor, "run_tutor_graph", recorder)
+        deadline, history = Deadline(5.0), [{"role": "user", "content": "x"}]
+        recorder(
+            user_id="u1", topic="11", message="What is a PLC?",
+            mode="unknown", subject_id=101,
+            conversation_history=history, deadline=deadline
+        )
+        assert calls[0]["deadline"] is deadline
+        assert calls[0]["subject_id"] == 101
+        assert calls[0]["conversation_history"] is history
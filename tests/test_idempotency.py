@@ -0,0 +1,198 @@
+"""
+Tests for idempotency keys and duplicate request coalescing
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+
+from idempotency import IdempotencyConflict, IdempotencyStore
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class SlowCompute:
+    """Counts calls; each one waits for the test to release it."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result or {"answer": "A"}
+        self.error = error
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is None:
+            self.release = asyncio.Event()
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+async def _concurrently(store, compute, count, **kwargs):
+    kwargs.setdefault("payload", {"message": "What is a sole trader?"})
+    tasks = [
+        asyncio.create_task(
+            store.run("tutor_chat", "u1", compute=compute, **kwargs)
+        )
+        for _ in range(count)
+    ]
+    while compute.release is None:
+        await asyncio.sleep(0)
+    compute.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class TestCoalescing:
+    """Test cases for duplicates of a running request."""
+
+    def test_concurrent_duplicates_share_one_run(self):
+        """Test duplicates wait for the first request's response."""
+        store = IdempotencyStore()
+        compute = SlowCompute()
+
+        results = _run(_concurrently(store, compute, 3, shared=False))
+
+        assert compute.calls == 1
+        assert results == [{"answer": "A"}] * 3
+        stats = store.stats()
+        assert stats["scopes"]["tutor_chat"]["coalesced"] == 2
+        assert stats["duplicates_avoided"] == 2
+
+    def test_failure_reaches_waiters_and_is_not_stored(self):
+        """Test an error is shared once, then a retry runs again."""
+        store = IdempotencyStore()
+        compute = SlowCompute(error=RuntimeError("LLM down"))
+
+        results = _run(_concurrently(store, compute, 2, shared=False))
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        retry = AsyncMock(return_value={"answer": "B"})
+        assert _run(store.run(
+            "tutor_chat", "u1", {"message": "What is a sole trader?"},
+            retry, shared=False
+        )) == {"answer": "B"}
+        retry.assert_awaited_once()
+
+    def test_cancelled_first_request_does_not_cancel_duplicates(self):
+        """Test a duplicate still gets the response if the first stops."""
+        store = IdempotencyStore()
+        compute = SlowCompute()
+
+        async def scenario():
+            payload = {"message": "What is a sole trader?"}
+            first = asyncio.create_task(store.run(
+                "tutor_chat", "u1", payload, compute, shared=False
+            ))
+            while compute.release is None:
+                await asyncio.sleep(0)
+            duplicate = asyncio.create_task(store.run(
+                "tutor_chat", "u1", payload, compute, shared=False
+            ))
+            await asyncio.sleep(0)
+            first.cancel()
+            compute.release.set()
+            return first, await duplicate
+
+        first, response = _run(scenario())
+        assert first.cancelled()
+        assert response == {"answer": "A"}
+        assert compute.calls == 1
+        assert store.stats()["inflight"] == 0
+
+
+class TestReplay:
+    """Test cases for duplicates of a finished request."""
+
+    def test_replays_until_ttl(self):
+        """Test a finished response is replayed, then expires."""
+        store = IdempotencyStore(derived_ttl=30)
+        compute = AsyncMock(return_value={"answer": "A"})
+        payload = {"message": "What is a sole trader?"}
+
+        with patch("idempotency.time.time", return_value=1000.0):
+            _run(store.run("tutor_chat", "u1", payload, compute,
+                           shared=False))
+            _run(store.run("tutor_chat", "u1", payload, compute,
+                           shared=False))
+        assert compute.await_count == 1
+        with patch("idempotency.time.time", return_value=1031.0):
+            _run(store.run("tutor_chat", "u1", payload, compute,
+                           shared=False))
+        assert compute.await_count == 2
+
+    def test_keys_are_per_user_and_payload(self):
+        """Test other users and other messages are computed."""
+        store = IdempotencyStore()
+        compute = AsyncMock(return_value={"answer": "A"})
+
+        _run(store.run("tutor_chat", "u1", {"m": 1}, compute, shared=False))
+        _run(store.run("tutor_chat", "u2", {"m": 1}, compute, shared=False))
+        _run(store.run("tutor_chat", "u1", {"m": 2}, compute, shared=False))
+        assert compute.await_count == 3
+
+    def test_header_key_conflict(self):
+        """Test a reused Idempotency-Key with another body is rejected."""
+        store = IdempotencyStore()
+        compute = AsyncMock(return_value={"job_id": "j1"})
+
+        _run(store.run("mock_start", "u1", {"answers": [1]}, compute,
+                       header_key="retry-1", shared=False))
+        with pytest.raises(IdempotencyConflict):
+            _run(store.run("mock_start", "u1", {"answers": [2]}, compute,
+                           header_key="retry-1", shared=False))
+        assert store.stats()["scopes"]["mock_start"]["conflicts"] == 1
+
+    def test_shared_tier_serves_other_workers(self):
+        """Test a response stored by one worker is replayed by another."""
+        user = f"u-{uuid4()}"
+        compute = AsyncMock(return_value={"answer": "A"})
+
+        _run(IdempotencyStore().run("grade_answer", user, {"q": 1}, compute))
+        other = IdempotencyStore()
+        assert _run(other.run(
+            "grade_answer", user, {"q": 1}, compute
+        )) == {"answer": "A"}
+        assert compute.await_count == 1
+        assert other.stats()["scopes"]["grade_answer"]["replayed"] == 1
+
+
+class TestEndpoint:
+    """Test cases for /tutor/chat."""
+
+    def test_double_submit_runs_pipeline_once(self, monkeypatch):
+        """Test two identical chat requests share one graph run."""
+        import unified_backend
+
+        monkeypatch.setattr(
+            unified_backend, "idempotency_store", IdempotencyStore()
+        )
+        reply = unified_backend.TutorResponse(
+            response="A sole trader is...", suggestions=[],
+            related_concepts=[], confidence_score=0.9
+        )
+        request = unified_backend.TutorRequest(
+            message="What is a sole trader?", topic=11, user_id="u1"
+        )
+
+        async def slow_chat(_request):
+            await asyncio.sleep(0.01)
+            return reply
+
+        async def double_submit():
+            return await asyncio.gather(
+                unified_backend.chat_with_tutor(request, None),
+                unified_backend.chat_with_tutor(request, None),
+            )
+
+        pipeline = AsyncMock(side_effect=slow_chat)
+        with patch.object(unified_backend, "_chat_with_tutor", pipeline):
+            first, second = _run(double_submit())
+
+        pipeline.assert_awaited_once()
+        assert first == second
+        assert first["response"] == "A sole trader is..."
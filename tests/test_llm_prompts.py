@@ -0,0 +1,144 @@
+"""
+Tests for the cacheable tutor prompt layout and structured replies
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from agents.services import llm_service as llm_module
+from agents.services.llm_service import (
+    LLMService, LABELLED_REPLY_SYSTEM_PROMPT, REPLY_SYSTEM_PROMPT,
+    token_usage_from
+)
+from circuit_breaker import CircuitBreaker
+
+
+def _args(**overrides):
+    args = {
+        "message": "What is demand?",
+        "topic": "11",
+        "learning_level": "intermediate",
+        "conversation_history": [{"role": "user", "content": "Hi"}],
+        "lesson_content": "Demand is the quantity wanted at each price.",
+        "concept_rows": [{"name": "Demand"}],
+        "explanation_style": "simple",
+    }
+    args.update(overrides)
+    return args
+
+
+@pytest.fixture
+def service():
+    with patch.object(llm_module, "openai_breaker", CircuitBreaker("openai")):
+        yield LLMService(MagicMock(), langchain_available=True)
+
+
+class TestReplyMessages:
+    """Test cases for the reply prompt layout."""
+
+    def test_static_system_prefix(self, service):
+        """Test nothing request-specific reaches the system message."""
+        first = service._build_reply_messages(**_args())
+        second = service._build_reply_messages(**_args(
+            message="Define supply", topic="12", learning_level="beginner",
+            lesson_content="Supply is...", explanation_style="steps"
+        ))
+
+        assert first[0] == second[0] == ("system", REPLY_SYSTEM_PROMPT)
+        assert "{" not in REPLY_SYSTEM_PROMPT
+
+    def test_dynamic_sections_most_shared_first(self, service):
+        """Test the lesson comes before history and the question."""
+        role, context = service._build_reply_messages(**_args())[1]
+
+        assert role == "human"
+        order = [
+            context.index("TOPIC: 11"),
+            context.index("Demand is the quantity wanted"),
+            context.index("user: Hi"),
+            context.index("What is demand?"),
+            context.index("EXPLANATION STYLE: simple"),
+        ]
+        assert order == sorted(order)
+
+
+class TestTokenUsage:
+    """Test cases for cached-token reporting."""
+
+    def test_generate_reply_reports_cached_tokens(self, service):
+        """Test cached prompt tokens from the response are reported."""
+        service.llm.invoke.return_value = SimpleNamespace(
+            content="Demand is...",
+            usage_metadata=None,
+            response_metadata={"token_usage": {
+                "prompt_tokens": 1500, "completion_tokens": 40,
+                "total_tokens": 1540,
+                "prompt_tokens_details": {"cached_tokens": 1280},
+            }}
+        )
+        reply, usage = service.generate_reply(**_args())
+
+        assert reply == "Demand is..."
+        assert usage["cached_tokens"] == 1280
+        sent = service.llm.invoke.call_args.args[0]
+        assert sent[0] == ("system", REPLY_SYSTEM_PROMPT)
+
+    def test_usage_without_cache_details(self):
+        """Test responses without cache details report zero."""
+        message = SimpleNamespace(usage_metadata={
+            "input_tokens": 10, "output_tokens": 2, "total_tokens": 12
+        })
+        assert token_usage_from(message)["cached_tokens"] == 0
+
+
+class TestLabelledReply:
+    """Test cases for the structured reply-plus-label call."""
+
+    def _structured(self, service, result):
+        runnable = MagicMock()
+        runnable.invoke.return_value = result
+        service.llm.with_structured_output.return_value = runnable
+        return runnable
+
+    def test_reply_and_label_in_one_call(self, service):
+        """Test one structured call returns the reply and the label."""
+        raw = SimpleNamespace(content="", usage_metadata={
+            "input_tokens": 900, "output_tokens": 60, "total_tokens": 960,
+            "input_token_details": {"cache_read": 768}
+        })
+        runnable = self._structured(service, {
+            "raw": raw, "parsing_error": None,
+            "parsed": {"reply": "Demand is...", "reasoning_label": "good"},
+        })
+
+        reply, label, usage = service.generate_labelled_reply(**_args())
+
+        assert (reply, label) == ("Demand is...", "good")
+        assert usage["cached_tokens"] == 768
+        runnable.invoke.assert_called_once()
+        sent = runnable.invoke.call_args.args[0]
+        assert sent[0] == ("system", LABELLED_REPLY_SYSTEM_PROMPT)
+        assert "{" not in LABELLED_REPLY_SYSTEM_PROMPT
+        service.llm.invoke.assert_not_called()
+
+    def test_unparsed_raw_json_and_bad_label(self, service):
+        """Test raw JSON is decoded and an unknown label becomes None."""
+        raw = SimpleNamespace(
+            content='{"reply": "Demand is...", "reasoning_label": "meh"}',
+            usage_metadata=None
+        )
+        self._structured(service, {
+            "raw": raw, "parsed": None, "parsing_error": "bad"
+        })
+
+        reply, label, _ = service.generate_labelled_reply(**_args())
+        assert (reply, label) == ("Demand is...", None)
+
+    def test_failure_returns_fallback_without_label(self, service):
+        """Test a failed call gives the fallback reply and no label."""
+        self._structured(service, {"raw": None, "parsed": None})
+
+        reply, label, usage = service.generate_labelled_reply(**_args())
+        assert reply and label is None
+        assert usage["total_tokens"] == 0
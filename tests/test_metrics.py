@@ -0,0 +1,126 @@
+"""
+Tests for the Prometheus metrics registry
+"""
+import asyncio
+
+import pytest
+
+import langgraph_tutor
+import metrics
+from metrics import MetricsRegistry, timed
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+class TestRender:
+    """Test cases for the text exposition format."""
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        """Test le buckets, _sum and _count of a histogram."""
+        histogram = registry.histogram(
+            "node_seconds", "Node time", ("node",), buckets=(0.1, 1.0)
+        )
+        histogram.observe(0.05, node="a")
+        histogram.observe(0.5, node="a")
+        histogram.observe(3.0, node="a")
+
+        lines = registry.render().splitlines()
+        assert "# TYPE node_seconds histogram" in lines
+        assert 'node_seconds_bucket{node="a",le="0.1"} 1' in lines
+        assert 'node_seconds_bucket{node="a",le="1.0"} 2' in lines
+        assert 'node_seconds_bucket{node="a",le="+Inf"} 3' in lines
+        assert 'node_seconds_sum{node="a"} 3.55' in lines
+        assert 'node_seconds_count{node="a"} 3' in lines
+
+    def test_counter_and_label_escaping(self, registry):
+        """Test counters get _total and label values are escaped."""
+        counter = registry.counter("events", "Events", ("event",))
+        counter.inc(event='say "hi"')
+        counter.inc(2, event='say "hi"')
+
+        assert 'events_total{event="say \\"hi\\""} 3' in (
+            registry.render().splitlines()
+        )
+        with pytest.raises(ValueError):
+            counter.inc(unknown="x")
+
+    def test_collectors_are_rendered(self, registry):
+        """Test cache_stats counters are exported through a collector."""
+        from cache_stats import CacheStats
+
+        stats = CacheStats()
+        stats.hit("lesson:1")
+        stats.observe_latency("get", 0.003)
+        registry.add_collector(lambda: metrics._cache_families(stats))
+        text = registry.render()
+
+        assert 'cache_hits_total{prefix="lesson"} 1' in text
+        assert (
+            'redis_call_duration_seconds_bucket{operation="get",le="0.005"} 1'
+        ) in text
+
+
+class TestTimed:
+    """Test cases for the timed() context manager."""
+
+    def test_status_label(self, registry):
+        """Test ok, error and a status set inside the block."""
+        histogram = registry.histogram(
+            "call_seconds", "Calls", ("operation", "status")
+        )
+        with timed(histogram, operation="get"):
+            pass
+        with pytest.raises(RuntimeError):
+            with timed(histogram, operation="get"):
+                raise RuntimeError("boom")
+        with pytest.raises(TimeoutError):
+            with timed(histogram, operation="get") as call:
+                call["status"] = "timeout"
+                raise TimeoutError()
+
+        for status in ("ok", "error", "timeout"):
+            assert histogram.count(operation="get", status=status) == 1
+
+
+class TestInstrumentation:
+    """Test cases for the hooks in the tutor graph and the endpoints."""
+
+    def test_timed_node_observes_duration(self, monkeypatch):
+        """Test each tutor node lands in tutor_node_duration_seconds."""
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        node = metrics.TUTOR_NODE_SECONDS
+        before = node.count(node="ExampleNode", status="error")
+
+        def ExampleNode(state):
+            raise ValueError("bad state")
+
+        assert langgraph_tutor.timed_node(ExampleNode)({}) == {}
+        assert node.count(node="ExampleNode", status="error") == before + 1
+
+    def test_supabase_query_labelled_by_caller(self):
+        """Test safe_supabase_query labels calls with their method."""
+        class Repo:
+            def load_lesson(self):
+                return lambda: {"id": 1}
+
+        query = Repo().load_lesson()
+        supabase = metrics.SUPABASE_CALL_SECONDS
+        before = supabase.count(operation="Repo.load_lesson", status="ok")
+
+        assert langgraph_tutor.safe_supabase_query(query) == {"id": 1}
+        assert supabase.count(
+            operation="Repo.load_lesson", status="ok"
+        ) == before + 1
+
+    def test_backend_serves_prometheus_text(self):
+        """Test /metrics on the unified backend."""
+        import unified_backend
+
+        response = asyncio.run(unified_backend.prometheus_metrics())
+        assert response.media_type.startswith("text/plain; version=0.0.4")
+        assert b"# TYPE tutor_node_duration_seconds histogram" in (
+            response.body
+        )
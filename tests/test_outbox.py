@@ -0,0 +1,293 @@
+"""
+Tests for the write-behind outbox
+"""
+import json
+import os
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from circuit_breaker import CircuitBreaker
+from outbox import Outbox
+
+
+class FakeClient:
+    """Supabase client recording each bulk write as (table, op, rows)."""
+
+    def __init__(self, fail_times=0, reject=None):
+        self.writes = []
+        self.options = []
+        self.fail_times = fail_times
+        self.reject = reject
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        query = MagicMock()
+
+        def write(op):
+            def call(rows, **options):
+                def execute():
+                    with self.lock:
+                        if self.fail_times:
+                            self.fail_times -= 1
+                            raise ConnectionError("supabase down")
+                        if self.reject and any(map(self.reject, rows)):
+                            raise ValueError("constraint violation")
+                        self.writes.append((name, op, list(rows)))
+                        self.options.append(options)
+                    return MagicMock(data=rows)
+                result = MagicMock()
+                result.execute.side_effect = execute
+                return result
+            return call
+
+        query.insert.side_effect = write("insert")
+        query.upsert.side_effect = write("upsert")
+        return query
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    """Build outboxes that flush only when asked and close them after."""
+    created = []
+
+    def make(client, **kwargs):
+        options = {
+            "spool_path": str(tmp_path / "spool.jsonl"),
+            "flush_interval": 60,
+            "breaker": CircuitBreaker("supabase", min_calls=100),
+        }
+        options.update(kwargs)
+        outbox = Outbox(client, **options)
+        created.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in created:
+        outbox.close(timeout=1)
+
+
+class TestBatching:
+    """Test cases for batching writes per table."""
+
+    def test_rows_for_a_table_written_in_one_call(self, make_outbox):
+        """Test queued inserts become a single bulk insert."""
+        client = FakeClient()
+        outbox = make_outbox(client)
+        for i in range(3):
+            outbox.enqueue("tutor_traces", {"node_name": f"n{i}"})
+        outbox.enqueue("tutor_messages", {"role": "user"})
+
+        assert client.writes == []
+        assert outbox.flush(timeout=2)
+        writes = sorted(client.writes)
+        assert writes == [
+            ("tutor_messages", "insert", [{"role": "user"}]),
+            ("tutor_traces", "insert", [
+                {"node_name": "n0"}, {"node_name": "n1"},
+                {"node_name": "n2"},
+            ]),
+        ]
+
+    def test_batch_size_triggers_flush(self, make_outbox):
+        """Test a full buffer is written without waiting for the timer."""
+        client = FakeClient()
+        written = threading.Event()
+        outbox = make_outbox(client, batch_size=2)
+        outbox.enqueue("tutor_traces", {"n": 1})
+        outbox.enqueue("tutor_traces", {"n": 2}, on_written=written.set)
+
+        assert written.wait(timeout=2)
+        assert client.writes == [
+            ("tutor_traces", "insert", [{"n": 1}, {"n": 2}])
+        ]
+
+    def test_keyed_rows_replace_older_ones(self, make_outbox):
+        """Test a newer row with the same key replaces the buffered one."""
+        client = FakeClient()
+        outbox = make_outbox(client)
+        key = ("user_id", "concept_id")
+        outbox.enqueue("student_mastery", [
+            {"user_id": "u1", "concept_id": 7, "mastery_score": 52},
+            {"user_id": "u1", "concept_id": 8, "mastery_score": 49},
+        ], op="upsert", key_columns=key)
+        outbox.enqueue("student_mastery", {
+            "user_id": "u1", "concept_id": 7, "mastery_score": 54
+        }, op="upsert", key_columns=key)
+
+        assert outbox.pending_row(
+            "student_mastery", user_id="u1", concept_id=7
+        )["mastery_score"] == 54
+        outbox.flush(timeout=2)
+        (table, op, rows), = client.writes
+        assert op == "upsert"
+        assert sorted(r["mastery_score"] for r in rows) == [49, 54]
+        assert outbox.pending_row(
+            "student_mastery", user_id="u1", concept_id=7
+        ) is None
+
+    def test_upsert_on_conflict_columns(self, make_outbox):
+        """Test upserts resolve conflicts on the given unique columns."""
+        client = FakeClient()
+        outbox = make_outbox(client)
+        for mastery in (55, 60):
+            outbox.enqueue(
+                "user_mastery",
+                {"user_id": "u1", "concept_id": "7", "mastery": mastery},
+                op="upsert", key_columns=("user_id", "concept_id"),
+                on_conflict="user_id,concept_id"
+            )
+            outbox.flush(timeout=2)
+
+        assert [rows for _, _, rows in client.writes] == [
+            [{"user_id": "u1", "concept_id": "7", "mastery": 55}],
+            [{"user_id": "u1", "concept_id": "7", "mastery": 60}],
+        ]
+        assert client.options == [{"on_conflict": "user_id,concept_id"}] * 2
+
+    def test_no_client_is_a_no_op(self, make_outbox):
+        """Test enqueue without Supabase reports nothing queued."""
+        outbox = make_outbox(None)
+        assert outbox.enqueue("tutor_traces", {"n": 1}) is False
+        assert outbox.stats()["pending_rows"] == 0
+
+
+class TestDurability:
+    """Test cases for the spool, retries and shutdown."""
+
+    def test_unwritten_rows_replayed_after_restart(self, make_outbox):
+        """Test rows spooled by a dead process are written on start."""
+        down = make_outbox(FakeClient(), breaker=MagicMock(state="open"))
+        down.enqueue("tutor_messages", {"role": "user", "n": 1})
+        down.enqueue("tutor_messages", {"role": "assistant", "n": 2})
+        assert not down.close(timeout=0.3)
+
+        client = FakeClient()
+        restarted = make_outbox(client)
+        assert restarted.stats()["pending_rows"] == 2
+        restarted.flush(timeout=2)
+        assert client.writes == [("tutor_messages", "insert", [
+            {"role": "user", "n": 1}, {"role": "assistant", "n": 2}
+        ])]
+
+    def test_written_rows_not_replayed(self, make_outbox, tmp_path):
+        """Test acknowledged rows are dropped from the spool."""
+        first = make_outbox(FakeClient())
+        first.enqueue("tutor_messages", {"n": 1})
+        assert first.close(timeout=2)
+        assert list(tmp_path.glob("spool*.jsonl")) == []
+
+        client = FakeClient()
+        make_outbox(client).flush(timeout=1)
+        assert client.writes == []
+
+    def test_live_workers_keep_their_own_spools(
+        self, make_outbox, monkeypatch, tmp_path
+    ):
+        """Test a worker neither wipes nor replays another's rows."""
+        monkeypatch.setattr(os, "getpid", lambda: 101)
+        busy = make_outbox(FakeClient(), breaker=MagicMock(state="open"))
+        busy.enqueue("tutor_messages", {"n": 1})
+
+        monkeypatch.setattr(os, "getpid", lambda: 102)
+        client = FakeClient()
+        idle = make_outbox(client)
+        assert idle.stats()["pending_rows"] == 0
+        idle.enqueue("tutor_messages", {"n": 2})
+        assert idle.flush(timeout=2)
+
+        assert client.writes == [("tutor_messages", "insert", [{"n": 2}])]
+        spool = (tmp_path / "spool.101.jsonl").read_text().splitlines()
+        assert json.loads(spool[0])["add"]["rows"] == [{"n": 1}]
+
+    def test_spool_of_exited_worker_adopted(
+        self, make_outbox, monkeypatch, tmp_path
+    ):
+        """Test unlocked spools (and the old shared one) are taken over."""
+        old = {"add": {
+            "id": "a", "table": "tutor_messages", "op": "insert",
+            "key": None, "rows": [{"n": 1}], "attempts": 0,
+            "queued_at": 0,
+        }}
+        (tmp_path / "spool.101.jsonl").write_text(json.dumps(old) + "\n")
+        legacy = dict(old["add"], id="b", rows=[{"n": 2}])
+        (tmp_path / "spool.jsonl").write_text(
+            json.dumps({"add": legacy}) + "\n" + json.dumps({"ack": ["b"]})
+        )
+
+        monkeypatch.setattr(os, "getpid", lambda: 102)
+        client = FakeClient()
+        outbox = make_outbox(client)
+        assert outbox.stats()["pending_rows"] == 1
+        assert sorted(p.name for p in tmp_path.glob("spool*.jsonl")) == [
+            "spool.102.jsonl"
+        ]
+        outbox.flush(timeout=2)
+        assert client.writes == [("tutor_messages", "insert", [{"n": 1}])]
+
+    def test_compaction_keeps_unacknowledged_rows(
+        self, make_outbox, monkeypatch, tmp_path
+    ):
+        """Test a grown spool is rewritten without the written rows."""
+        monkeypatch.setattr(os, "getpid", lambda: 101)
+        client = FakeClient()
+        outbox = make_outbox(client, compact_entries=3)
+        outbox.enqueue("tutor_messages", {"n": 1})
+        outbox.flush(timeout=2)
+        outbox.breaker = MagicMock(state="open")
+        outbox.enqueue("tutor_messages", {"n": 2})
+        outbox.enqueue("tutor_traces", {"n": 3})
+        with outbox._cond:
+            outbox._maybe_compact_spool()
+
+        entries = [
+            json.loads(line) for line in
+            (tmp_path / "spool.101.jsonl").read_text().splitlines()
+        ]
+        assert sorted(e["add"]["rows"][0]["n"] for e in entries) == [2, 3]
+
+    def test_failed_batch_retried(self, make_outbox):
+        """Test a failed write is retried and callbacks wait for it."""
+        client = FakeClient(fail_times=1)
+        done = []
+        outbox = make_outbox(client)
+        outbox.enqueue("tutor_traces", {"n": 1},
+                       on_written=lambda: done.append(True))
+        outbox.flush(timeout=3)
+
+        assert client.writes == [("tutor_traces", "insert", [{"n": 1}])]
+        assert done == [True]
+        assert outbox.stats()["failed_batches"] == 1
+
+    def test_dead_letter_after_max_attempts(self, make_outbox, tmp_path):
+        """Test rows that keep failing move to the dead-letter file."""
+        outbox = make_outbox(FakeClient(fail_times=10), max_attempts=2)
+        outbox.enqueue("tutor_traces", {"n": 1})
+
+        assert outbox.flush(timeout=3)
+        assert outbox.stats()["dead_lettered_rows"] == 1
+        dead = (tmp_path / "spool.jsonl.dead").read_text().splitlines()
+        assert json.loads(dead[0])["rows"] == [{"n": 1}]
+
+    def test_bad_record_isolated_on_retry(self, make_outbox):
+        """Test a failed batch is retried record by record."""
+        client = FakeClient(reject=lambda row: row.get("bad"))
+        outbox = make_outbox(client, max_attempts=2)
+        outbox.enqueue("user_trends", {"n": 1, "bad": True})
+        outbox.enqueue("user_trends", {"n": 2})
+        outbox.flush(timeout=3)
+
+        assert client.writes == [("user_trends", "insert", [{"n": 2}])]
+        assert outbox.stats()["dead_lettered_rows"] == 1
+
+    def test_full_queue_writes_inline(self, make_outbox):
+        """Test backpressure falls back to a direct write."""
+        client = FakeClient()
+        outbox = make_outbox(client, max_pending=1, enqueue_timeout=0)
+        outbox.enqueue("tutor_traces", {"n": 1})
+        outbox.enqueue("tutor_traces", {"n": 2})
+
+        assert client.writes == [("tutor_traces", "insert", [{"n": 2}])]
+        outbox.flush(timeout=2)
+        assert len(client.writes) == 2
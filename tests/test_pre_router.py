@@ -0,0 +1,125 @@
+"""
+Tests for the zero-LLM tutor pre-router
+"""
+from unittest.mock import patch
+
+import pytest
+
+import langgraph_tutor
+from pre_router import PreRouter, REPLY_TEMPLATES
+
+
+@pytest.fixture
+def router():
+    return PreRouter(enabled=True)
+
+
+class TestClassify:
+    """Test cases for message categories."""
+
+    @pytest.mark.parametrize("message,category", [
+        ("Hi!", "greeting"),
+        ("hello there, how are you?", "greeting"),
+        ("Good morning sir", "greeting"),
+        ("Thanks a lot!!", "thanks"),
+        ("ok thank you", "thanks"),
+        ("Bye", "farewell"),
+        ("see you tomorrow", "farewell"),
+        ("Can you write a poem about love?", "off_topic"),
+        ("help me with my python code", "off_topic"),
+        ("Can you help with my algebra homework?", "off_topic"),
+    ])
+    def test_routed(self, router, message, category):
+        """Test trivial and off-topic messages get a category."""
+        assert router.classify(message) == category
+
+    @pytest.mark.parametrize("message", [
+        "hi, what is a sole trader?",
+        "Thank you, but what about partnerships?",
+        "Calculate the gross profit margin",
+        "What is the history of the company?",
+        "How do I calculate the payback period?",
+        "How do I calculate ARR?",
+        "calculate gearing",
+        "What is body language in communication?",
+        "What should a code of conduct include?",
+        "ok",
+        "",
+    ])
+    def test_passed_to_graph(self, router, message):
+        """Test questions (and subject words) keep messages on the graph."""
+        assert router.classify(message) is None
+
+    def test_counts_per_category(self, router):
+        """Test route() answers from templates and counts each outcome."""
+        assert router.route("thanks") == {
+            "category": "thanks", "reply": REPLY_TEMPLATES["thanks"]
+        }
+        router.route("hello")
+        router.route("What is demand?")
+
+        stats = router.stats()
+        assert stats["thanks"] == stats["greeting"] == stats["passed"] == 1
+        assert stats["routed"] == 2
+        assert stats["routed_rate"] == round(2 / 3, 4)
+
+    def test_disabled(self):
+        """Test a disabled router passes everything without counting."""
+        router = PreRouter(enabled=False)
+        assert router.route("hello") is None
+        assert router.stats()["passed"] == 0
+
+
+class TestTutorGraph:
+    """Test cases for pre-routed turns in the tutor entry points."""
+
+    @pytest.fixture
+    def logged(self, monkeypatch):
+        """Fresh router; graph, LLM and logging replaced by recorders."""
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        monkeypatch.setattr(
+            langgraph_tutor, "pre_router", PreRouter(enabled=True)
+        )
+        calls = []
+
+        def log(role):
+            def node(state):
+                calls.append((role, state["llm_response"]))
+                return {}
+            return node
+
+        with patch.object(langgraph_tutor, "tutor_app") as app, \
+                patch.object(langgraph_tutor, "tutor_prepare_app") as prep, \
+                patch.object(langgraph_tutor, "llm_service") as llm, \
+                patch.object(langgraph_tutor, "LogUserMessage", log("user")), \
+                patch.object(langgraph_tutor, "LogMessage", log("tutor")):
+            yield calls
+            app.invoke.assert_not_called()
+            prep.invoke.assert_not_called()
+            assert not llm.mock_calls
+
+    def test_greeting_skips_graph(self, logged):
+        """Test a greeting is answered from its template and logged."""
+        result = langgraph_tutor.run_tutor_graph(
+            user_id="u1", topic="11", message="Hello!"
+        )
+
+        assert result["response"] == REPLY_TEMPLATES["greeting"]
+        assert result["route"] == "greeting"
+        assert result["conversation_id"] == "u1_11"
+        assert logged == [
+            ("user", REPLY_TEMPLATES["greeting"]),
+            ("tutor", REPLY_TEMPLATES["greeting"]),
+        ]
+        assert langgraph_tutor.pre_router.stats()["greeting"] == 1
+
+    def test_stream_off_topic(self, logged):
+        """Test a streamed off-topic message gets one token and a final."""
+        events = list(langgraph_tutor.stream_tutor_graph(
+            user_id="u1", topic="11", message="Write a poem about rain"
+        ))
+
+        assert [e["event"] for e in events] == ["token", "final"]
+        assert events[0]["data"]["text"] == REPLY_TEMPLATES["off_topic"]
+        assert events[1]["data"]["route"] == "off_topic"
+        assert len(logged) == 2
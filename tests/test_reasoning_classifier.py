@@ -0,0 +1,148 @@
+"""
+Tests for the local reasoning classifier
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from agents import mastery_agent as mastery_module
+from agents.mastery_agent import MasteryAgent
+from circuit_breaker import CircuitBreaker
+from reasoning_classifier import ReasoningClassifier, extract_features
+
+
+@pytest.fixture
+def classifier():
+    return ReasoningClassifier(shadow_rate=0, label_log="")
+
+
+class TestPredict:
+    """Test cases for the default weights."""
+
+    @pytest.mark.parametrize("message,label", [
+        ("What is a sole trader?", "neutral"),
+        ("I don't understand why a sole trader has unlimited liability",
+         "confused"),
+        ("Because a PLC sells shares publicly, it can raise more capital "
+         "than a Ltd", "good"),
+    ])
+    def test_clear_messages_are_confident(self, classifier, message, label):
+        """Test cue phrases give a confident local label."""
+        predicted, confidence = classifier.predict(message)
+        assert predicted == label
+        assert confidence >= classifier.min_confidence
+
+    def test_cue_features(self):
+        """Test phrase groups survive punctuation and case."""
+        features = extract_features("Wait, I DON'T get it... isn't it?")
+        assert features["cue:confusion"] == features["cue:hedge"] == 1.0
+        assert features["w:get"] == features["len:medium"] == 1.0
+
+
+class TestClassify:
+    """Test cases for the LLM fallback and agreement tracking."""
+
+    def test_confident_label_skips_llm(self, classifier):
+        """Test a confident prediction never calls the LLM."""
+        llm = MagicMock()
+        assert classifier.classify("What is a sole trader?", llm) == "neutral"
+        llm.assert_not_called()
+        assert classifier.stats()["local_rate"] == 1.0
+
+    def test_unsure_asks_llm_and_learns(self, classifier):
+        """Test a low-confidence message uses and learns the LLM label."""
+        message = "So revenue minus costs is profit?"
+        llm = MagicMock(return_value="good")
+
+        assert classifier.classify(message, llm) == "good"
+        llm.assert_called_once_with(message)
+        stats = classifier.stats()
+        assert stats["llm"] == stats["compared"] == stats["learned"] == 1
+        assert stats["confusion"]["good"]["neutral"] == 1
+        assert stats["agreement"] == 0.0
+
+    def test_llm_unavailable_uses_local_guess(self, classifier):
+        """Test a failed LLM call falls back to the local label."""
+        assert classifier.classify("hmm", lambda text: None) == "neutral"
+        assert classifier.stats()["llm_unavailable"] == 1
+
+    def test_shadow_checks_confident_labels(self):
+        """Test shadow checks compare confident labels in the background."""
+        classifier = ReasoningClassifier(shadow_rate=1.0, label_log="")
+        classifier.classify("What is a sole trader?", lambda t: "neutral")
+        classifier._shadow_executor.shutdown(wait=True)
+
+        stats = classifier.stats()
+        assert stats["shadow"] == stats["confident_compared"] == 1
+        assert stats["confident_agreement"] == 1.0
+
+
+class TestTraining:
+    """Test cases for learning from LLM labels."""
+
+    def test_fit_learns_words(self, classifier):
+        """Test training picks up labels the cues do not cover."""
+        examples = [
+            ("sole traders keep all the profit", "good"),
+            ("a sole trader has one customer", "confused"),
+        ] * 5
+        assert classifier.fit(examples, epochs=10) == 1.0
+        assert classifier.predict("a sole trader has one customer")[0] == (
+            "confused"
+        )
+
+    def test_save_and_load(self, classifier, tmp_path):
+        """Test weights written by save() are loaded by from_path()."""
+        classifier.learn("a sole trader has one customer", "confused")
+        path = tmp_path / "model.json"
+        classifier.save(str(path))
+
+        loaded = ReasoningClassifier.from_path(str(path))
+        assert loaded.probabilities("a sole trader has one customer") == (
+            pytest.approx(classifier.probabilities(
+                "a sole trader has one customer"
+            ))
+        )
+
+
+class TestMasteryAgent:
+    """Test cases for MasteryAgent.classify_reasoning."""
+
+    @pytest.fixture
+    def agent(self, classifier):
+        with patch.object(mastery_module, "reasoning_classifier",
+                          classifier), \
+                patch.object(mastery_module, "REASONING_LOCAL_ENABLED",
+                             True), \
+                patch.object(mastery_module, "openai_breaker",
+                             CircuitBreaker("openai")), \
+                patch.object(mastery_module, "cache_get", lambda key: None), \
+                patch.object(mastery_module, "cache_set",
+                             lambda *args, **kwargs: True), \
+                patch.object(mastery_module, "OpenAI") as client_class:
+            client = client_class.return_value
+            client.chat.completions.create.return_value = SimpleNamespace(
+                choices=[SimpleNamespace(
+                    message=SimpleNamespace(content="confused")
+                )]
+            )
+            yield MasteryAgent(api_key="sk-test"), client_class
+
+    def test_local_label_makes_no_openai_call(self, agent):
+        """Test a confident local label never builds an OpenAI client."""
+        mastery, client_class = agent
+        assert mastery.classify_reasoning("What is a sole trader?") == (
+            "neutral"
+        )
+        client_class.assert_not_called()
+
+    def test_llm_client_is_reused(self, agent):
+        """Test unsure messages share one OpenAI client."""
+        mastery, client_class = agent
+        assert mastery.classify_reasoning("hmm") == "confused"
+        assert mastery.classify_reasoning("well okay") == "confused"
+
+        client_class.assert_called_once()
+        create = client_class.return_value.chat.completions.create
+        assert create.call_count == 2
@@ -0,0 +1,120 @@
+"""
+Tests for rolling conversation summaries
+"""
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import langgraph_tutor
+from circuit_breaker import CircuitBreaker
+from conversation_store import ConversationStore
+from rolling_summary import RollingSummarizer
+
+
+@pytest.fixture
+def store():
+    return ConversationStore(redis=None, breaker=CircuitBreaker("redis"))
+
+
+def _turns(store, count, conversation_id="c1"):
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        store.append(conversation_id, role, f"m{i}")
+
+
+class TestUpdate:
+    """Test cases for folding messages into the summary."""
+
+    def test_folds_only_uncovered_messages(self, store):
+        """Test each update sends the previous summary and new messages."""
+        calls = []
+
+        def summarize(previous, messages):
+            calls.append((previous, [m["content"] for m in messages]))
+            return f"summary {len(calls)}"
+
+        summarizer = RollingSummarizer(
+            store, summarize, keep_recent=2, min_new=2, workers=1
+        )
+        _turns(store, 4)
+        assert summarizer.update("c1")
+        _turns(store, 1)
+        assert not summarizer.update("c1")  # only one new message
+        _turns(store, 1)
+        assert summarizer.update("c1")
+
+        assert calls == [
+            (None, ["m0", "m1"]),
+            ("summary 1", ["m2", "m3"]),
+        ]
+        assert summarizer.current("c1") == {
+            "summary": "summary 2", "version": 4, "total": 6
+        }
+
+    def test_failed_summary_not_stored(self, store):
+        """Test a failed LLM call leaves the previous summary."""
+        summarizer = RollingSummarizer(
+            store, lambda previous, messages: None, keep_recent=0,
+            min_new=1, workers=1
+        )
+        _turns(store, 2)
+        assert not summarizer.update("c1")
+        assert summarizer.current("c1") is None
+
+
+class TestSchedule:
+    """Test cases for background scheduling."""
+
+    def test_overlapping_turns_coalesce(self, store):
+        """Test turns ending mid-update trigger one more pass, not more."""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def summarize(previous, messages):
+            calls.append(len(messages))
+            started.set()
+            release.wait(5)
+            return "s"
+
+        summarizer = RollingSummarizer(
+            store, summarize, keep_recent=0, min_new=1, workers=2
+        )
+        _turns(store, 2)
+        summarizer.schedule("c1")
+        assert started.wait(5)
+        _turns(store, 2)
+        summarizer.schedule("c1")
+        summarizer.schedule("c1")
+        release.set()
+        summarizer._executor.shutdown(wait=True)
+
+        assert calls == [2, 2]
+        assert store.summary("c1")["version"] == 4
+
+
+class TestSummarizeHistoryNode:
+    """Test cases for the graph reading the stored summary."""
+
+    def test_uses_summary_without_llm_call(self, store, monkeypatch):
+        """Test the node combines the summary with newer messages."""
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        monkeypatch.setattr(langgraph_tutor, "conversation_store", store)
+        summarizer = RollingSummarizer(
+            store, MagicMock(), keep_recent=2, min_new=1, workers=1
+        )
+        monkeypatch.setattr(langgraph_tutor, "rolling_summary", summarizer)
+        _turns(store, 6)
+        store.set_summary("c1", "Asked about demand.", 4)
+
+        with patch.object(langgraph_tutor, "llm_service") as llm:
+            result = langgraph_tutor.SummarizeHistory({
+                "conversation_id": "c1",
+                "history": store.recent("c1"),
+            })
+        llm.assert_not_called()
+        assert result["condensed_history"] == (
+            "Summary of the earlier conversation: Asked about demand.\n"
+            "user: m4\nassistant: m5"
+        )
@@ -0,0 +1,168 @@
+"""
+Tests for the semantic answer cache
+"""
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+import langgraph_tutor
+from circuit_breaker import CircuitBreaker
+from semantic_cache import SemanticAnswerCache, normalize_question
+
+VOCABULARY = ("what", "is", "a", "sole", "trader", "partnership", "define")
+
+
+def bag_of_words(text):
+    """Deterministic stand-in for an embedding model."""
+    words = text.split()
+    return [float(words.count(w)) for w in VOCABULARY]
+
+
+def _cache(**kwargs):
+    kwargs.setdefault("embed", bag_of_words)
+    kwargs.setdefault("shared", False)
+    kwargs.setdefault("threshold", 0.8)
+    return SemanticAnswerCache(breaker=CircuitBreaker("openai"), **kwargs)
+
+
+class TestLookup:
+    """Test cases for exact and semantic matches."""
+
+    def test_normalize_question(self):
+        """Test case and punctuation do not matter."""
+        assert normalize_question("  What IS a Sole-Trader?? ") == (
+            "what is a sole trader"
+        )
+
+    def test_exact_hit_without_embedding(self):
+        """Test a repeated question is served without embedding it."""
+        embed = MagicMock(side_effect=bag_of_words)
+        cache = _cache(embed=embed)
+        cache.store("11", "default", "What is a sole trader?", "Answer")
+        embed.reset_mock()
+
+        hit = cache.lookup("11", "default", "what is a sole trader")
+        assert hit == {"answer": "Answer", "match": "exact",
+                       "similarity": 1.0}
+        embed.assert_not_called()
+
+    def test_semantic_hit_above_threshold(self):
+        """Test a similar question reuses the stored answer."""
+        cache = _cache()
+        cache.store("11", "default", "What is a sole trader?", "Answer")
+
+        hit = cache.lookup("11", "default", "what is sole trader")
+        assert hit["match"] == "semantic"
+        assert hit["answer"] == "Answer"
+        assert cache.lookup("11", "default", "what is a partnership") is None
+
+    def test_buckets_are_per_topic_and_style(self):
+        """Test answers never cross topics or explanation styles."""
+        cache = _cache()
+        cache.store("11", "default", "what is a sole trader", "Answer")
+        assert cache.lookup("12", "default", "what is a sole trader") is None
+        assert cache.lookup("11", "simple", "what is a sole trader") is None
+
+    def test_shared_tier_serves_other_workers(self):
+        """Test an answer stored by one worker is found by another."""
+        topic = f"t-{uuid4()}"
+        _cache(shared=True).store(topic, "default", "what is a", "Answer")
+        hit = _cache(shared=True, embed=None).lookup(
+            topic, "default", "What is a?"
+        )
+        assert hit["answer"] == "Answer"
+
+    def test_open_circuit_skips_embedding(self):
+        """Test only exact matches are tried while OpenAI is failing."""
+        embed = MagicMock(side_effect=bag_of_words)
+        cache = SemanticAnswerCache(
+            embed=embed, shared=False,
+            breaker=CircuitBreaker("openai", min_calls=1, failure_rate=0.5)
+        )
+        cache.breaker.record_failure()
+
+        assert cache.lookup("11", "default", "define a sole trader") is None
+        embed.assert_not_called()
+
+
+class TestBounds:
+    """Test cases for TTL, capacity and counters."""
+
+    def test_entries_expire(self):
+        """Test answers are not served after their TTL."""
+        cache = _cache(ttl=60)
+        with patch("semantic_cache.time.time", return_value=1000.0):
+            cache.store("11", "default", "what is a sole trader", "Answer")
+        with patch("semantic_cache.time.time", return_value=1061.0):
+            assert cache.lookup(
+                "11", "default", "what is a sole trader"
+            ) is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_capacity_per_topic(self):
+        """Test the least recently used question is evicted."""
+        cache = _cache(max_per_topic=2)
+        cache.store("11", "default", "what is a sole trader", "A")
+        cache.store("11", "default", "what is a partnership", "B")
+        cache.lookup("11", "default", "what is a sole trader")
+        cache.store("11", "default", "define", "C")
+
+        stats = cache.stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+        assert cache.lookup("11", "default", "what is a partnership") is None
+
+    def test_hit_rate_and_tokens_saved(self):
+        """Test the counters reported by /cache/stats."""
+        cache = _cache()
+        cache.store("11", "default", "what is a sole trader", "A",
+                    {"total_tokens": 400})
+        cache.lookup("11", "default", "what is a sole trader")
+        cache.lookup("11", "default", "what is a partnership")
+
+        stats = cache.stats()
+        assert stats["exact_hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["tokens_saved"] == 400
+
+
+class TestGenerateLLMResponse:
+    """Test cases for the cache in front of the reply node."""
+
+    @pytest.fixture
+    def llm(self, monkeypatch):
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        monkeypatch.setattr(langgraph_tutor, "semantic_cache", _cache())
+        service = MagicMock()
+        service.generate_reply.return_value = (
+            "Generated", {"completion_tokens": 10, "total_tokens": 50}
+        )
+        with patch.object(langgraph_tutor, "llm_service", service):
+            yield service
+
+    def _state(self, history):
+        state = langgraph_tutor._initial_state(
+            "u1", "11", "What is a sole trader?", "c1", "default", "t1",
+            101, history
+        )
+        state["concept_rows"] = []
+        return state
+
+    def test_first_turn_answer_reused(self, llm):
+        """Test the second student asking gets the cached answer."""
+        current = [{"role": "user", "content": "What is a sole trader?"}]
+        first = langgraph_tutor.GenerateLLMResponse(self._state(current))
+        second = langgraph_tutor.GenerateLLMResponse(self._state([]))
+
+        assert first["llm_response"] == second["llm_response"]
+        assert second["token_usage"]["total_tokens"] == 0
+        llm.generate_reply.assert_called_once()
+
+    def test_follow_up_not_cached(self, llm):
+        """Test a question with prior history always goes to the LLM."""
+        history = [{"role": "assistant", "content": "Hi!"}]
+        langgraph_tutor.GenerateLLMResponse(self._state(history))
+        langgraph_tutor.GenerateLLMResponse(self._state(history))
+
+        assert llm.generate_reply.call_count == 2
+        assert langgraph_tutor.semantic_cache.stats()["lookups"] == 0
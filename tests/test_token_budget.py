@@ -0,0 +1,118 @@
+"""
+Tests for tokenizer-based context budgeting
+"""
+import pytest
+
+import token_budget
+from token_budget import (
+    count_tokens, truncate_to_tokens, fit_messages, pack_context
+)
+
+
+class PairEncoding:
+    """Stand-in BPE: every two characters are one token."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text, disallowed_special=()):
+        self.encoded.append(text)
+        return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def _use_encoding(monkeypatch, encoding):
+    monkeypatch.setattr(token_budget, "_encoding", encoding)
+    monkeypatch.setattr(token_budget, "_encoding_loaded", True)
+    count_tokens.cache_clear()
+    truncate_to_tokens.cache_clear()
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    fake = PairEncoding()
+    _use_encoding(monkeypatch, fake)
+    yield fake
+    count_tokens.cache_clear()
+    truncate_to_tokens.cache_clear()
+
+
+@pytest.fixture
+def no_tokenizer(monkeypatch):
+    _use_encoding(monkeypatch, None)
+    yield
+    count_tokens.cache_clear()
+    truncate_to_tokens.cache_clear()
+
+
+class TestCounting:
+    """Test cases for count_tokens and truncate_to_tokens."""
+
+    def test_counts_are_memoized(self, encoding):
+        """Test the same lesson text is only encoded once."""
+        lesson = "x" * 1000
+        assert count_tokens(lesson) == 500
+        assert count_tokens(lesson) == 500
+        assert encoding.encoded.count(lesson) == 1
+
+    def test_truncate_head_and_tail(self, encoding):
+        """Test cuts fit the limit and are marked with an ellipsis."""
+        text = "abcdefghijklmnopqrst"
+        head = truncate_to_tokens(text, 5)
+        tail = truncate_to_tokens(text, 5, keep_tail=True)
+
+        assert head.startswith("abcd") and head.endswith("...")
+        assert tail.startswith("...") and tail.endswith("qrst")
+        assert count_tokens(head) <= 5 and count_tokens(tail) <= 5
+        assert truncate_to_tokens("short", 5) == "short"
+
+    def test_estimate_without_tokenizer(self, no_tokenizer):
+        """Test non-ASCII text is not undercounted like len // 4."""
+        urdu = "کاروبار کیا ہے"
+        assert count_tokens("a" * 40) == 10
+        assert count_tokens(urdu) > len(urdu) // 4
+        assert count_tokens(truncate_to_tokens(urdu, 6)) <= 6
+
+
+class TestPacking:
+    """Test cases for fit_messages and pack_context."""
+
+    def test_fit_messages_keeps_newest(self, encoding):
+        """Test whole messages are kept newest first."""
+        messages = [{"role": "user", "content": "x" * 20} for _ in range(5)]
+        # 10 content tokens + 4 formatting tokens each
+        assert len(fit_messages(messages, 30)) == 2
+        assert fit_messages(messages, 10) == []
+
+    def test_pack_context_respects_budget(self, encoding):
+        """Test every part is cut so the total fits the budget."""
+        packed = pack_context(
+            lesson_text="l" * 5000,
+            history=[
+                {"role": "user", "content": "h" * 100} for _ in range(10)
+            ],
+            concept_rows=[
+                {"concept_id": i, "name": f"Concept {i}"} for i in range(8)
+            ],
+            max_tokens=200,
+            lesson_tokens=150
+        )
+        tokens = packed["tokens"]
+
+        assert tokens["total"] <= 200
+        assert tokens["concepts"] <= 20 and len(packed["concept_rows"]) <= 5
+        assert len(packed["history"]) == 1
+        assert tokens["lesson"] == count_tokens(packed["lesson_text"])
+        assert packed["lesson_text"].endswith("...")
+
+    def test_condensed_history_keeps_recent_part(self, encoding):
+        """Test a long condensed history keeps its newest lines."""
+        condensed = "user: old\n" * 50 + "assistant: newest"
+        packed = pack_context(
+            lesson_text="", history=[], concept_rows=[],
+            condensed_history=condensed, max_tokens=40
+        )
+        assert packed["condensed_history"].endswith("assistant: newest")
+        assert packed["tokens"]["total"] <= 40
@@ -0,0 +1,180 @@
+"""
+Tests for topic bundles and shown-concept bitsets
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import langgraph_tutor
+import topic_bundle
+from topic_bundle import (
+    TopicBundleStore, build_bundle, next_concept, sample_concepts
+)
+
+CONCEPTS = [
+    {"concept_id": 30, "name": "Sole trader", "description": "One owner",
+     "embedding": [0.1, 0.2]},
+    {"concept_id": 10, "name": "Partnership", "description": "2-20"},
+    {"concept_id": 20, "name": "PLC", "description": None},
+]
+
+
+@pytest.fixture
+def bundle():
+    return build_bundle(11, "Business ownership...", CONCEPTS, 101)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Dict-backed stand-in for the shared cache."""
+    data = {}
+    get_many = MagicMock(
+        side_effect=lambda keys: {k: data[k] for k in keys if k in data}
+    )
+
+    def get_or_load(key, loader, ttl=3600, negative_ttl=30):
+        if key not in data:
+            data[key] = loader()
+        return data[key]
+
+    monkeypatch.setattr(topic_bundle, "cache_get_many", get_many)
+    monkeypatch.setattr(topic_bundle, "cache_get_or_load", get_or_load)
+    data["get_many"] = get_many
+    return data
+
+
+class TestBundle:
+    """Test cases for the bundle layout and sampling."""
+
+    def test_compact_pool_and_path(self, bundle):
+        """Test concepts are stored as columns and the path by id."""
+        assert bundle["schema"] == topic_bundle.TOPIC_BUNDLE_SCHEMA
+        assert bundle["topic_id"] == "11"
+        assert bundle["subject_id"] == 101
+        assert bundle["concepts"] == {
+            "ids": [30, 10, 20],
+            "names": ["Sole trader", "Partnership", "PLC"],
+            "descriptions": ["One owner", "2-20", ""],
+        }
+        assert bundle["path"] == [1, 2, 0]
+
+    def test_version_follows_content(self, bundle):
+        """Test the version changes with the contents only."""
+        assert build_bundle(11, "Business ownership...", CONCEPTS, 101)[
+            "version"
+        ] == bundle["version"]
+        assert build_bundle(11, "Updated lesson", CONCEPTS, 101)[
+            "version"
+        ] != bundle["version"]
+
+    def test_sample_concepts(self, bundle):
+        """Test samples are distinct rows of the pool."""
+        rows = sample_concepts(bundle, limit=2)
+        assert len({row["concept_id"] for row in rows}) == 2
+        assert all(set(row) == {"concept_id", "name", "description"}
+                   for row in rows)
+        assert len(sample_concepts(bundle, limit=10)) == 3
+
+
+class TestRotation:
+    """Test cases for the shown-concept bitset."""
+
+    def test_rotates_then_starts_over(self, bundle):
+        """Test every path concept is shown once before any repeats."""
+        shown, seen = None, []
+        for _ in range(4):
+            concept, shown = next_concept(bundle, shown)
+            seen.append(concept["concept_id"])
+        assert seen == [10, 20, 30, 10]
+        assert shown == {"v": bundle["version"], "bits": 0b001}
+
+    def test_other_version_starts_over(self, bundle):
+        """Test a bitset built for another pool is ignored."""
+        concept, shown = next_concept(bundle, {"v": "old", "bits": 0b011})
+        assert concept["concept_id"] == 10
+        assert shown["bits"] == 0b001
+
+
+class TestStore:
+    """Test cases for TopicBundleStore."""
+
+    @pytest.fixture
+    def store(self):
+        return TopicBundleStore(
+            load_lesson=MagicMock(return_value="Lesson"),
+            load_concepts=MagicMock(return_value=CONCEPTS),
+            load_subject=MagicMock(return_value=101),
+            enabled=True
+        )
+
+    def test_bundle_and_bits_in_one_read(self, store, cache, bundle):
+        """Test a hit reads the bundle and the bitset together."""
+        cache["topic_bundle:v1:11"] = bundle
+        cache["shown_concepts_bits:u1:11"] = {"v": "x", "bits": 1}
+
+        assert store.get(11, "u1") == (bundle, {"v": "x", "bits": 1})
+        cache["get_many"].assert_called_once_with(
+            ["topic_bundle:v1:11", "shown_concepts_bits:u1:11"]
+        )
+        store.load_concepts.assert_not_called()
+
+    def test_miss_builds_once(self, store, cache):
+        """Test a miss builds the bundle and caches it."""
+        built, shown = store.get(11, "u1")
+        assert built["lesson"] == "Lesson"
+        assert shown is None
+        store.get(11, "u1")
+        store.load_concepts.assert_called_once_with(11)
+
+    def test_topic_without_concepts(self, store, cache):
+        """Test topics without concepts get no bundle."""
+        store.load_concepts.return_value = []
+        assert store.get(11, "u1") == (None, None)
+        store.load_lesson.assert_not_called()
+
+    def test_failed_build_is_not_fatal(self, store, cache):
+        """Test a failed lesson query leaves the caller's own queries."""
+        store.load_lesson.side_effect = TimeoutError("supabase timeout")
+        assert store.get(11) == (None, None)
+
+
+class TestTutorNodes:
+    """Test cases for the nodes reading the bundle from the state."""
+
+    @pytest.fixture
+    def state(self, bundle, monkeypatch):
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        state = langgraph_tutor._initial_state(
+            "u1", "11", "What is a PLC?", "u1_11", "default", "trace",
+            None, []
+        )
+        state["topic_bundle"] = bundle
+        return state
+
+    def test_fetches_make_no_queries(self, state, monkeypatch):
+        """Test lesson and concepts come from the bundle."""
+        concepts, lesson = MagicMock(), MagicMock()
+        monkeypatch.setattr(langgraph_tutor, "concept_service", concepts)
+        monkeypatch.setattr(langgraph_tutor, "lesson_service", lesson)
+        fetched = langgraph_tutor.FetchLesson(state)
+        rows = langgraph_tutor.FetchConcepts(state)["concept_rows"]
+        assert fetched["lesson_text"] == "Business ownership..."
+        assert sorted(row["concept_id"] for row in rows) == [10, 20, 30]
+        assert not concepts.mock_calls and not lesson.mock_calls
+
+    def test_learning_path_sets_bit(self, state, bundle):
+        """Test the next concept is recommended and its bit written."""
+        state["concept_rows"] = sample_concepts(bundle)
+        state["shown_concepts"] = {"v": bundle["version"], "bits": 0b001}
+
+        with patch.object(langgraph_tutor, "cache_set") as cache_set, \
+                patch.object(langgraph_tutor, "cache_get_many") as get_many:
+            result = langgraph_tutor.ComputeLearningPath(state)
+
+        get_many.assert_not_called()
+        assert result["learning_path"]["recommended_concept"] == "20"
+        assert result["learning_path"]["recommended_concept_name"] == "PLC"
+        cache_set.assert_called_once_with(
+            "shown_concepts_bits:u1:11",
+            {"v": bundle["version"], "bits": 0b011}, ttl=86400
+        )
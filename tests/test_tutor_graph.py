@@ -0,0 +1,248 @@
+"""
+Tests for the tutor graph wiring
+"""
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import langgraph_tutor
+from langgraph_tutor import TUTOR_NODES, build_tutor_graph
+
+INITIAL_STATE = {
+    "user_id": "u1",
+    "topic": "11",
+    "user_message": "What is price elasticity?",
+    "conversation_id": "u1_11",
+    "explanation_style": "default",
+    "trace_id": "t1",
+    "subject_id": 101,
+    "lesson_text": None,
+    "lesson_chunks": [],
+    "history": [],
+    "condensed_history": None,
+    "concept_rows": [],
+    "reasoning_label": "neutral",
+    "llm_response": "",
+    "token_usage": {},
+    "mastery_updates": [],
+    "readiness": None,
+    "learning_path": None,
+}
+
+
+def _stub(name, fn):
+    fn.__name__ = name
+    return fn
+
+
+@pytest.fixture
+def stub_nodes(monkeypatch):
+    """Stand-ins for every node, recording what each one saw."""
+    # Stubs never touch Supabase; keep timed_node from tracing them
+    monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+    seen = {}
+    fetch_barrier = threading.Barrier(3, timeout=5)
+    # The reply, the reasoning label and the learning path share a superstep
+    reply_barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(key, value):
+        def node(state):
+            fetch_barrier.wait()
+            return {key: value}
+        return node
+
+    def generate(state):
+        reply_barrier.wait()
+        seen["reply_inputs"] = (
+            state["lesson_text"], state["condensed_history"],
+            state["concept_rows"],
+        )
+        return {"llm_response": "Elasticity is..."}
+
+    def classify(state):
+        reply_barrier.wait()
+        return {"reasoning_label": "good"}
+
+    def learning_path(state):
+        reply_barrier.wait()
+        return {"learning_path": {"recommended_concept": "7"}}
+
+    def readiness(state):
+        seen["readiness_updates"] = state["mastery_updates"]
+        return {"readiness": {"overall_readiness": "ready"}}
+
+    bodies = {
+        "LogUserMessage": lambda state: {},
+        "ValidateInput": lambda state: {},
+        "FetchTopicBundle": lambda state: {},
+        "FetchLesson": fetch("lesson_text", "Lesson"),
+        "RetrieveHistory": fetch("history", [{"role": "user",
+                                              "content": "hi"}]),
+        "FetchConcepts": fetch("concept_rows", [{"concept_id": 7}]),
+        "SummarizeHistory": lambda state: {
+            "condensed_history": f"{len(state['history'])} messages"
+        },
+        "ClassifyReasoning": classify,
+        "GenerateLLMResponse": generate,
+        "UpdateMastery": lambda state: {
+            "mastery_updates": [{"concept_id": 7, "delta": 5,
+                                 "label": state["reasoning_label"]}]
+        },
+        "ComputeReadiness": readiness,
+        "ComputeLearningPath": learning_path,
+    }
+    nodes = tuple(_stub(fn.__name__, bodies[fn.__name__])
+                  for fn in TUTOR_NODES)
+    return nodes, seen
+
+
+class TestTutorGraph:
+    """Test cases for the fan-out/fan-in tutor graph."""
+
+    def test_every_node_wired(self):
+        """Test every node has an incoming edge or is the entry point."""
+        targets = set()
+        for sources, target in langgraph_tutor.TUTOR_EDGES:
+            targets.add(target)
+        names = [fn.__name__ for fn in TUTOR_NODES]
+        assert set(names[1:]) <= targets
+        assert "LogMessage" not in names
+
+    def test_runs_fetches_and_reply_concurrently(self, stub_nodes):
+        """Test fan-out nodes overlap (barriers would time out if not)."""
+        nodes, seen = stub_nodes
+        final = build_tutor_graph(nodes).invoke(dict(INITIAL_STATE))
+
+        assert final["lesson_text"] == "Lesson"
+        assert final["concept_rows"] == [{"concept_id": 7}]
+        assert final["llm_response"] == "Elasticity is..."
+        assert final["reasoning_label"] == "good"
+        assert final["learning_path"] == {"recommended_concept": "7"}
+        assert final["readiness"] == {"overall_readiness": "ready"}
+
+    def test_reply_waits_for_all_inputs(self, stub_nodes):
+        """Test the reply joins lesson, summarized history and concepts."""
+        nodes, seen = stub_nodes
+        build_tutor_graph(nodes).invoke(dict(INITIAL_STATE))
+        assert seen["reply_inputs"] == (
+            "Lesson", "1 messages", [{"concept_id": 7}]
+        )
+
+    def test_readiness_sees_mastery_updates(self, stub_nodes):
+        """Test readiness runs after mastery updates from this turn."""
+        nodes, seen = stub_nodes
+        build_tutor_graph(nodes).invoke(dict(INITIAL_STATE))
+        assert seen["readiness_updates"] == [
+            {"concept_id": 7, "delta": 5, "label": "good"}
+        ]
+
+    def test_reply_logged_after_graph(self, monkeypatch):
+        """Test LogMessage is queued in the background after the graph."""
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        calls = []
+        final_state = dict(INITIAL_STATE, llm_response="Elasticity is...")
+        app = MagicMock()
+        app.invoke.side_effect = lambda state: (
+            calls.append("graph") or final_state
+        )
+        monkeypatch.setattr(langgraph_tutor, "tutor_app", app)
+        monkeypatch.setattr(
+            langgraph_tutor, "async_write",
+            lambda fn, state: calls.append(("background", fn(state)))
+        )
+        monkeypatch.setattr(
+            langgraph_tutor, "LogMessage",
+            _stub("LogMessage", lambda state: state["llm_response"])
+        )
+
+        result = langgraph_tutor.run_tutor_graph(
+            user_id="u1", topic="11", message="What is price elasticity?"
+        )
+
+        assert result["response"] == "Elasticity is..."
+        assert calls == ["graph", ("background", "Elasticity is...")]
+
+
+class TestStructuredReplyGraph:
+    """Test cases for the graph used with STRUCTURED_REPLY_ENABLED."""
+
+    def test_every_node_wired(self):
+        """Test every node has an incoming edge and no classifier node."""
+        targets = {
+            target for _, target in langgraph_tutor.STRUCTURED_TUTOR_EDGES
+        }
+        names = [fn.__name__ for fn in langgraph_tutor.STRUCTURED_TUTOR_NODES]
+        assert "ClassifyReasoning" not in names
+        assert set(names[1:]) <= targets
+
+    def test_reply_label_reaches_mastery(self, stub_nodes):
+        """Test UpdateMastery uses the label returned with the reply."""
+        nodes, seen = stub_nodes
+        bodies = {fn.__name__: fn for fn in nodes}
+        # No classifier: only the reply and the learning path overlap
+        reply_barrier = threading.Barrier(2, timeout=5)
+
+        def generate(state):
+            reply_barrier.wait()
+            return {"llm_response": "Elasticity is...",
+                    "reasoning_label": "confused"}
+
+        def learning_path(state):
+            reply_barrier.wait()
+            return {"learning_path": {"recommended_concept": "7"}}
+
+        bodies["GenerateLLMResponse"] = _stub("GenerateLLMResponse", generate)
+        bodies["ComputeLearningPath"] = _stub(
+            "ComputeLearningPath", learning_path
+        )
+        structured = tuple(
+            bodies[fn.__name__]
+            for fn in langgraph_tutor.STRUCTURED_TUTOR_NODES
+        )
+        final = build_tutor_graph(
+            structured, langgraph_tutor.STRUCTURED_TUTOR_EDGES
+        ).invoke(dict(INITIAL_STATE))
+
+        assert final["reasoning_label"] == "confused"
+        assert final["learning_path"] == {"recommended_concept": "7"}
+        assert seen["readiness_updates"] == [
+            {"concept_id": 7, "delta": 5, "label": "confused"}
+        ]
+
+    @pytest.mark.parametrize("label,concepts,expected", [
+        ("good", [{"concept_id": 7}], "good"),
+        (None, [{"concept_id": 7}], "confused"),
+        ("good", [], "neutral"),
+    ])
+    def test_generate_sets_label(self, monkeypatch, label, concepts,
+                                 expected):
+        """Test the node's label, falling back to ClassifyReasoning."""
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        monkeypatch.setattr(
+            langgraph_tutor, "STRUCTURED_REPLY_ENABLED", True
+        )
+        monkeypatch.setattr(
+            langgraph_tutor, "_cached_reply", lambda state: None
+        )
+        monkeypatch.setattr(
+            langgraph_tutor, "_reply_kwargs", lambda state: {}
+        )
+
+        class FakeLLM:
+            def generate_labelled_reply(self, **kwargs):
+                return "Elasticity is...", label, {"completion_tokens": 0}
+
+        class FakeMastery:
+            def classify_student_reasoning(self, message_text):
+                return "confused"
+
+        monkeypatch.setattr(langgraph_tutor, "llm_service", FakeLLM())
+        monkeypatch.setattr(
+            langgraph_tutor, "mastery_service", FakeMastery()
+        )
+        state = dict(INITIAL_STATE, concept_rows=concepts)
+
+        result = langgraph_tutor.GenerateLLMResponse(state)
+        assert result["llm_response"] == "Elasticity is..."
+        assert result["reasoning_label"] == expected
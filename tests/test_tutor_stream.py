@@ -0,0 +1,184 @@
+"""
+Tests for streamed tutor replies
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import langgraph_tutor
+from agents.services import llm_service as llm_module
+from agents.services.llm_service import LLMService
+from circuit_breaker import CircuitBreaker
+from semantic_cache import SemanticAnswerCache
+
+
+def _chunk(text, usage=None):
+    return SimpleNamespace(content=text, usage_metadata=usage)
+
+
+REPLY_ARGS = {
+    "message": "What is demand?",
+    "topic": "11",
+    "learning_level": "intermediate",
+    "conversation_history": [],
+}
+
+
+@pytest.fixture
+def breaker():
+    """Fresh OpenAI breaker so tests do not share failures."""
+    fresh = CircuitBreaker("openai", min_calls=1, failure_rate=0.5)
+    with patch.object(llm_module, "openai_breaker", fresh):
+        yield fresh
+
+
+class TestStreamReply:
+    """Test cases for LLMService.stream_reply."""
+
+    def test_yields_chunks_and_usage(self, breaker):
+        """Test chunks are passed through and usage is reported."""
+        llm = MagicMock()
+        llm.stream.return_value = iter([
+            _chunk("Demand "), _chunk("is "), _chunk("want."),
+            _chunk("", {"input_tokens": 50, "output_tokens": 3,
+                        "total_tokens": 53,
+                        "input_token_details": {"cache_read": 32}}),
+        ])
+        usage = {}
+        service = LLMService(llm, langchain_available=True)
+        chunks = list(service.stream_reply(**REPLY_ARGS, token_usage=usage))
+
+        assert chunks == ["Demand ", "is ", "want."]
+        assert usage == {"prompt_tokens": 50, "completion_tokens": 3,
+                         "total_tokens": 53, "cached_tokens": 32}
+        assert breaker.snapshot()["failures_in_window"] == 0
+
+    def test_failure_before_first_chunk_falls_back(self, breaker):
+        """Test an error before any text yields the fallback reply."""
+        llm = MagicMock()
+        llm.stream.side_effect = TimeoutError("read timeout")
+        service = LLMService(llm, langchain_available=True)
+        chunks = list(service.stream_reply(**REPLY_ARGS))
+
+        assert len(chunks) == 1 and chunks[0]
+        assert breaker.state == "open"
+
+    def test_open_circuit_skips_llm(self, breaker):
+        """Test an open OpenAI circuit answers without calling the LLM."""
+        breaker.record_failure()
+        llm = MagicMock()
+        service = LLMService(llm, langchain_available=True)
+        chunks = list(service.stream_reply(**REPLY_ARGS))
+
+        assert chunks == [service.fallback_reply("", "")]
+        llm.stream.assert_not_called()
+
+
+class TestStreamTutorGraph:
+    """Test cases for stream_tutor_graph."""
+
+    @pytest.fixture
+    def pipeline(self, monkeypatch):
+        """Stub the graph, LLM and bookkeeping used by the stream."""
+        # Stubs never touch Supabase; keep timed_node from tracing them
+        monkeypatch.setattr(langgraph_tutor, "DEBUG_MODE", False)
+        monkeypatch.setattr(
+            langgraph_tutor, "semantic_cache",
+            SemanticAnswerCache(shared=False)
+        )
+        calls = []
+        prepared = langgraph_tutor._initial_state(
+            "u1", "11", "What is demand?", "u1_11", "default", "t1",
+            101, []
+        )
+        prepared["concept_rows"] = [{"concept_id": 7, "name": "Demand"}]
+
+        def stream_reply(**kwargs):
+            calls.append("stream")
+            yield "Demand "
+            yield "is want."
+
+        def readiness(state):
+            calls.append(("readiness", state["mastery_updates"]))
+            return {"readiness": {"overall_readiness": "ready"}}
+
+        def log_message(state):
+            calls.append(("log", state["llm_response"]))
+            return {}
+
+        mastery = MagicMock()
+        mastery.label_to_delta.return_value = 5
+        with patch.object(langgraph_tutor, "tutor_prepare_app") as app, \
+                patch.object(langgraph_tutor.llm_service, "stream_reply",
+                             side_effect=stream_reply), \
+                patch.object(langgraph_tutor, "ClassifyReasoning",
+                             lambda state: {"reasoning_label": "good"}), \
+                patch.object(langgraph_tutor, "ComputeLearningPath",
+                             lambda state: {"learning_path": {
+                                 "decision": "learn_next_concept"}}), \
+                patch.object(langgraph_tutor, "mastery_service", mastery), \
+                patch.object(langgraph_tutor, "ComputeReadiness",
+                             readiness), \
+                patch.object(langgraph_tutor, "LogMessage", log_message), \
+                patch.object(
+                    langgraph_tutor, "_apply_mastery_updates",
+                    lambda user_id, updates: calls.append(("mastery", user_id))
+                ):
+            app.invoke.return_value = prepared
+            yield calls
+
+    def _stream(self):
+        return langgraph_tutor.stream_tutor_graph(
+            user_id="u1", topic="11", message="What is demand?"
+        )
+
+    def test_cached_answer_skips_llm(self, pipeline):
+        """Test a cached first-turn answer is sent as one token."""
+        langgraph_tutor.semantic_cache.store(
+            "11", "default", "what is demand", "Cached answer."
+        )
+        events = list(self._stream())
+
+        assert [e["event"] for e in events] == ["token", "final"]
+        assert events[-1]["data"]["response"] == "Cached answer."
+        assert "stream" not in pipeline
+
+    def test_tokens_then_final_event(self, pipeline):
+        """Test tokens stream first and the final event carries results."""
+        events = list(self._stream())
+
+        assert [e["event"] for e in events] == ["token", "token", "final"]
+        final = events[-1]["data"]
+        assert final["response"] == "Demand is want."
+        assert final["concept_ids"] == ["7"]
+        assert final["reasoning_label"] == "good"
+        assert final["readiness"] == {"overall_readiness": "ready"}
+        assert final["learning_path"] == {"decision": "learn_next_concept"}
+        assert pipeline[1] == ("readiness", [
+            {"concept_id": 7, "delta": 5, "reason": "tutor_chat_good"}
+        ])
+
+    def test_bookkeeping_after_final_event(self, pipeline):
+        """Test mastery writes and logging wait for the final event."""
+        stream = self._stream()
+        for event in stream:
+            if event["event"] == "final":
+                break
+        assert ("mastery", "u1") not in pipeline
+        stream.close()
+        assert pipeline[-2:] == [
+            ("mastery", "u1"), ("log", "Demand is want.")
+        ]
+
+    def test_disconnect_mid_reply_keeps_bookkeeping(self, pipeline):
+        """Test a client leaving during the tokens still logs the reply."""
+        stream = self._stream()
+        assert next(stream)["data"]["text"] == "Demand "
+        stream.close()
+
+        assert not any(
+            isinstance(call, tuple) and call[0] == "readiness"
+            for call in pipeline
+        )
+        assert pipeline[-2:] == [("mastery", "u1"), ("log", "Demand ")]
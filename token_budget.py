@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Token counting and context budgeting for tutor prompts.
+
+Tokens are counted with the model's BPE tokenizer (tiktoken, loaded on
+first use) instead of the old len(text) // 4 estimate, which undercounts
+non-English text by a wide margin. Counts and truncations are memoized,
+so the same lesson text or concept list is only encoded once per worker.
+
+pack_context() fits the variable parts of the reply prompt (concept names,
+conversation history and a lesson excerpt) into an exact token budget, so
+prompt size, latency and cost do not depend on how long a lesson or a
+conversation happens to be.
+
+tiktoken downloads its vocabulary on first use; point TIKTOKEN_CACHE_DIR
+at a pre-filled directory for hosts without internet access. If the
+vocabulary cannot be loaded, a script-aware estimate is used instead
+(about 4 ASCII characters or 1 other character per token).
+"""
+
+import os
+import threading
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TOKENIZER_MODEL = os.getenv("TOKENIZER_MODEL", "gpt-4o-mini")
+TOKENIZER_FALLBACK_ENCODING = os.getenv(
+    "TOKENIZER_FALLBACK_ENCODING", "o200k_base"
+)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Budget for the variable part of the tutor reply prompt
+TUTOR_CONTEXT_TOKENS = int(os.getenv("TUTOR_CONTEXT_TOKENS", "1500"))
+# Most of the context the lesson excerpt may take
+TUTOR_LESSON_TOKENS = int(os.getenv("TUTOR_LESSON_TOKENS", "600"))
+# Shares of TUTOR_CONTEXT_TOKENS reserved for history and concept names
+TUTOR_HISTORY_SHARE = float(os.getenv("TUTOR_HISTORY_SHARE", "0.5"))
+TUTOR_CONCEPT_SHARE = float(os.getenv("TUTOR_CONCEPT_SHARE", "0.1"))
+
+# Concepts the reply prompt lists (names only, see LLMService)
+PROMPT_CONCEPTS = 5
+# Formatting tokens per history message ("role: " and the newline)
+MESSAGE_OVERHEAD = 4
+
+ELLIPSIS = "..."
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """
+    Return the tiktoken encoding for TOKENIZER_MODEL (loaded once).
+
+    Returns:
+        tiktoken Encoding, or None if it cannot be loaded
+    """
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if _encoding_loaded:
+            return _encoding
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding(
+                    TOKENIZER_FALLBACK_ENCODING
+                )
+        except Exception as e:
+            logger.warning(
+                f"[WARNING] Tokenizer unavailable ({e}) - "
+                f"estimating token counts"
+            )
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def _char_cost(char: str) -> float:
+    return 0.25 if char < "\x80" else 1.0
+
+
+def _estimate(text: str) -> int:
+    ascii_chars = sum(1 for c in text if c < "\x80")
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def count_tokens(text: str) -> int:
+    """
+    Number of tokens in a text.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Token count (0 for empty text)
+    """
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return _estimate(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def truncate_to_tokens(
+    text: str, max_tokens: int, keep_tail: bool = False
+) -> str:
+    """
+    Cut a text to at most max_tokens tokens, marking the cut with "...".
+
+    Args:
+        text: Text to cut
+        max_tokens: Token limit (the marker included)
+        keep_tail: Keep the end of the text instead of the start
+
+    Returns:
+        The text itself if it fits, otherwise the cut text
+    """
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    room = max_tokens - count_tokens(ELLIPSIS)
+    if room <= 0:
+        return ""
+
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        while room > 0:
+            kept = tokens[-room:] if keep_tail else tokens[:room]
+            # Decoding a partial multi-byte sequence adds replacement chars
+            cut = encoding.decode(kept).strip("�")
+            cut = ELLIPSIS + cut if keep_tail else cut + ELLIPSIS
+            # Re-encoding at the seam can merge tokens differently
+            if count_tokens(cut) <= max_tokens:
+                return cut
+            room -= 1
+        return ""
+
+    chars = reversed(text) if keep_tail else iter(text)
+    cost, length = 0.0, 0
+    for char in chars:
+        cost += _char_cost(char)
+        if cost > room:
+            break
+        length += 1
+    cut = text[len(text) - length:] if keep_tail else text[:length]
+    return ELLIPSIS + cut if keep_tail else cut + ELLIPSIS
+
+
+def message_tokens(message: Dict) -> int:
+    """Tokens a history message takes in the prompt."""
+    return count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD
+
+
+def fit_messages(messages: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Newest whole messages that fit in max_tokens, oldest first.
+
+    Args:
+        messages: Conversation messages, oldest first
+        max_tokens: Token limit
+
+    Returns:
+        The most recent messages whose total fits
+    """
+    kept = []
+    used = 0
+    for message in reversed(messages or []):
+        cost = message_tokens(message)
+        if used + cost > max_tokens:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def pack_context(
+    lesson_text: Optional[str],
+    history: List[Dict],
+    concept_rows: List[Dict],
+    condensed_history: Optional[str] = None,
+    max_tokens: int = TUTOR_CONTEXT_TOKENS,
+    lesson_tokens: int = TUTOR_LESSON_TOKENS,
+    history_share: float = TUTOR_HISTORY_SHARE,
+    concept_share: float = TUTOR_CONCEPT_SHARE
+) -> Dict:
+    """
+    Fit concept names, history and a lesson excerpt into max_tokens.
+
+    Concepts come first (up to concept_share of the budget), then the most
+    recent history (up to history_share plus whatever the concepts left),
+    and the lesson excerpt gets the rest, up to lesson_tokens.
+
+    Args:
+        lesson_text: Full lesson text
+        history: Conversation messages, oldest first
+        concept_rows: Concept rows; only their names reach the prompt
+        condensed_history: History text used by the prompt instead of the
+            messages, if any; its most recent part is kept
+        max_tokens: Total budget
+        lesson_tokens: Most tokens the lesson excerpt may take
+        history_share: Share of the budget for history
+        concept_share: Share of the budget for concept names
+
+    Returns:
+        Dict with "concept_rows", "history", "condensed_history",
+        "lesson_text" and "tokens" (per part and "total")
+    """
+    # Concept names, joined by ", " in the prompt
+    concept_budget = int(max_tokens * concept_share)
+    concepts, concept_used = [], 0
+    for row in (concept_rows or [])[:PROMPT_CONCEPTS]:
+        cost = count_tokens(row.get("name") or "") + 1
+        if concept_used + cost > concept_budget:
+            break
+        concepts.append(row)
+        concept_used += cost
+
+    history_budget = (
+        int(max_tokens * history_share) + concept_budget - concept_used
+    )
+    messages = fit_messages(history, history_budget)
+    history_used = sum(message_tokens(m) for m in messages)
+    if condensed_history:
+        condensed_history = truncate_to_tokens(
+            condensed_history, history_budget, keep_tail=True
+        )
+        history_used = max(history_used, count_tokens(condensed_history))
+
+    lesson_budget = min(
+        lesson_tokens, max_tokens - concept_used - history_used
+    )
+    lesson = truncate_to_tokens(lesson_text or "", max(lesson_budget, 0))
+    lesson_used = count_tokens(lesson)
+
+    return {
+        "concept_rows": concepts,
+        "history": messages,
+        "condensed_history": condensed_history,
+        "lesson_text": lesson,
+        "tokens": {
+            "concepts": concept_used,
+            "history": history_used,
+            "lesson": lesson_used,
+            "total": concept_used + history_used + lesson_used,
+        },
+    }
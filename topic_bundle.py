@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Versioned per-topic context bundles and shown-concept bitsets.
+
+A tutor turn used to read its topic data from several places: the lesson
+text (lesson:{topic}), a random concept sample (fetched from the database
+every message), the ordered concepts for the learning path
+(all_concepts_ordered:{topic}) and the topic's subject. The bundle holds
+all of it in one cache entry, topic_bundle:v{schema}:{topic}:
+
+    {
+        "schema": 1,
+        "topic_id": "11",
+        "version": "3f2a9c0b1d4e",         # hash of the contents below
+        "subject_id": 101,
+        "lesson": "...",                   # excerpt, LESSON_EXCERPT_TOKENS
+        "concepts": {                      # pool, columns not rows
+            "ids": [...], "names": [...], "descriptions": [...]
+        },
+        "path": [4, 0, 7, ...]             # learning path order (indexes)
+    }
+
+FetchTopicBundle reads it together with the student's shown-concept
+bitset (shown_concepts_bits:{user}:{topic}, {"v": version, "bits": int},
+bit i set once path[i] was recommended) in one round-trip. FetchLesson,
+FetchConcepts and ComputeLearningPath then work from the state: concept
+samples are drawn locally and the next recommendation is the lowest
+clear bit.
+
+Bumping TOPIC_BUNDLE_SCHEMA changes every key, so a new layout never
+reads an old one. A bitset whose "v" differs from the bundle's version
+was built for another concept pool and starts over. Topics without
+concepts get no bundle (cached as empty briefly) and use the per-node
+queries as before.
+"""
+
+import os
+import json
+import random
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cache_keys
+from token_budget import truncate_to_tokens
+
+try:
+    from cache import cache_get_many, cache_get_or_load, cache_delete
+except ImportError:
+    def cache_get_many(keys): return {}
+
+    def cache_get_or_load(key, loader, ttl=3600, negative_ttl=30):
+        return loader()
+
+    def cache_delete(key): return False
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TOPIC_BUNDLE_ENABLED = os.getenv(
+    "TOPIC_BUNDLE_ENABLED", "true"
+).lower() == "true"
+TOPIC_BUNDLE_TTL = int(os.getenv("TOPIC_BUNDLE_TTL", "86400"))
+# Lesson text kept in the bundle (ValidateInput's lesson limit)
+LESSON_EXCERPT_TOKENS = int(os.getenv("LESSON_EXCERPT_TOKENS", "4000"))
+# Bumped whenever the bundle layout changes
+TOPIC_BUNDLE_SCHEMA = 1
+# ComputeLearningPath rotates through this many concepts per topic
+LEARNING_PATH_CONCEPTS = 10
+# Shown-concept bitsets live as long as the old shown lists did
+SHOWN_CONCEPTS_TTL = 86400
+
+
+def build_bundle(
+    topic_id: Any,
+    lesson_text: Optional[str],
+    concepts: List[Dict],
+    subject_id: Optional[int] = None
+) -> Dict:
+    """
+    Bundle a topic's lesson, concept pool and subject.
+
+    Args:
+        topic_id: Topic ID
+        lesson_text: Full lesson text (excerpted here)
+        concepts: Concept rows (concept_id, name, description) in pool
+            order
+        subject_id: Subject of the topic
+
+    Returns:
+        Bundle dict (see module docstring)
+    """
+    rows = [c for c in concepts if c.get("concept_id") not in (None, "")]
+    pool = {
+        "ids": [c["concept_id"] for c in rows],
+        "names": [c.get("name") or "" for c in rows],
+        "descriptions": [c.get("description") or "" for c in rows],
+    }
+    # Same order as the old all_concepts_ordered list: the first
+    # concepts of the pool, by concept_id
+    path = sorted(
+        range(min(LEARNING_PATH_CONCEPTS, len(rows))),
+        key=lambda i: rows[i]["concept_id"]
+    )
+    lesson = ""
+    if lesson_text:
+        lesson = truncate_to_tokens(lesson_text, LESSON_EXCERPT_TOKENS)
+    content = {"subject_id": subject_id, "lesson": lesson, "concepts": pool}
+    version = cache_keys.stable_hash(
+        json.dumps(content, sort_keys=True, default=str)
+    )
+    return {
+        "schema": TOPIC_BUNDLE_SCHEMA,
+        "topic_id": str(topic_id),
+        "version": version,
+        "path": path,
+        **content,
+    }
+
+
+def concept_rows(bundle: Dict, indexes: Optional[List[int]] = None
+                 ) -> List[Dict]:
+    """
+    Concept rows (concept_id, name, description) from a bundle.
+
+    Args:
+        bundle: Topic bundle
+        indexes: Pool positions to return (default: the whole pool)
+
+    Returns:
+        Concept dicts in the order of indexes
+    """
+    pool = bundle["concepts"]
+    if indexes is None:
+        indexes = range(len(pool["ids"]))
+    return [
+        {
+            "concept_id": pool["ids"][i],
+            "name": pool["names"][i],
+            "description": pool["descriptions"][i],
+        }
+        for i in indexes
+    ]
+
+
+def sample_concepts(bundle: Dict, limit: int = 10) -> List[Dict]:
+    """
+    Random concepts from a bundle's pool (FetchConcepts).
+
+    Args:
+        bundle: Topic bundle
+        limit: Maximum number of concepts
+
+    Returns:
+        Concept dicts in random order
+    """
+    size = len(bundle["concepts"]["ids"])
+    return concept_rows(bundle, random.sample(range(size), min(limit, size)))
+
+
+def next_concept(
+    bundle: Dict, shown: Optional[Dict]
+) -> Tuple[Optional[Dict], Dict]:
+    """
+    Next concept of the learning path rotation.
+
+    Every concept of the path is recommended once before any repeats;
+    after the last one the rotation starts over.
+
+    Args:
+        bundle: Topic bundle
+        shown: The student's bitset entry, {"v": version, "bits": int}
+            (None, or built for another version: nothing shown yet)
+
+    Returns:
+        (concept dict or None if the path is empty, updated bitset entry)
+    """
+    path = bundle["path"]
+    if not path:
+        return None, {"v": bundle["version"], "bits": 0}
+    bits = 0
+    if isinstance(shown, dict) and shown.get("v") == bundle["version"]:
+        bits = int(shown.get("bits") or 0)
+    full = (1 << len(path)) - 1
+    if bits & full == full:
+        bits = 0
+    # Lowest clear bit: first path concept not shown yet
+    position = (~bits & (bits + 1)).bit_length() - 1
+    bits |= 1 << position
+    concept = concept_rows(bundle, [path[position]])[0]
+    return concept, {"v": bundle["version"], "bits": bits}
+
+
+def shown_count(bundle: Dict, shown: Optional[Dict]) -> int:
+    """Concepts of the path already recommended, per a bitset entry."""
+    if not isinstance(shown, dict) or shown.get("v") != bundle["version"]:
+        return 0
+    return bin(int(shown.get("bits") or 0)).count("1")
+
+
+def _is_bundle(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and value.get("schema") == TOPIC_BUNDLE_SCHEMA
+    )
+
+
+class TopicBundleStore:
+    """
+    Loads topic bundles through the cache, building them on a miss.
+    """
+
+    def __init__(
+        self,
+        load_lesson: Callable[[Any], Optional[str]],
+        load_concepts: Callable[[Any], List[Dict]],
+        load_subject: Callable[[Any], Optional[int]],
+        ttl: int = TOPIC_BUNDLE_TTL,
+        enabled: bool = TOPIC_BUNDLE_ENABLED
+    ):
+        """
+        Initialize TopicBundleStore.
+
+        Args:
+            load_lesson: topic_id -> lesson text, uncached (raises on a
+                failed query so the failure is not cached)
+            load_concepts: topic_id -> concept rows in pool order
+            load_subject: topic_id -> subject_id
+            ttl: Seconds a bundle is cached
+            enabled: False to never return a bundle
+        """
+        self.load_lesson = load_lesson
+        self.load_concepts = load_concepts
+        self.load_subject = load_subject
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def build(self, topic_id: Any) -> Optional[Dict]:
+        """
+        Build a topic's bundle from the database.
+
+        Args:
+            topic_id: Topic ID
+
+        Returns:
+            Bundle, or None for a topic without concepts
+        """
+        concepts = self.load_concepts(topic_id) or []
+        if not concepts:
+            return None
+        return build_bundle(
+            topic_id,
+            self.load_lesson(topic_id),
+            concepts,
+            self.load_subject(topic_id)
+        )
+
+    def get(
+        self, topic_id: Any, user_id: Optional[str] = None
+    ) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        A topic's bundle and, given user_id, the student's shown-concept
+        bitset, in one cache round-trip (plus a build on a miss).
+
+        Args:
+            topic_id: Topic ID
+            user_id: Student whose bitset to read
+
+        Returns:
+            (bundle or None, bitset entry or None); a bundle that cannot
+            be built is None, for the caller's own queries
+        """
+        if not self.enabled or topic_id in (None, ""):
+            return None, None
+        bundle_key = cache_keys.topic_bundle_key(
+            topic_id, TOPIC_BUNDLE_SCHEMA
+        )
+        keys = [bundle_key]
+        if user_id:
+            keys.append(cache_keys.shown_concepts_bits_key(user_id, topic_id))
+        found = cache_get_many(keys)
+        shown = found.get(keys[-1]) if user_id else None
+
+        bundle = found.get(bundle_key)
+        if not _is_bundle(bundle):
+            # Miss (or an entry of another layout): build once, topics
+            # without concepts are remembered for a minute
+            try:
+                bundle = cache_get_or_load(
+                    bundle_key, lambda: self.build(topic_id),
+                    ttl=self.ttl, negative_ttl=60
+                )
+            except Exception as e:
+                logger.warning(
+                    f"[WARNING] Topic bundle for {topic_id} unavailable: {e}"
+                )
+                bundle = None
+        return (bundle if _is_bundle(bundle) else None), shown
+
+    def invalidate(self, topic_id: Any) -> bool:
+        """
+        Drop a topic's cached bundle (after its lesson or concepts change).
+
+        Args:
+            topic_id: Topic ID
+
+        Returns:
+            True if an entry was deleted
+        """
+        return bool(cache_delete(
+            cache_keys.topic_bundle_key(topic_id, TOPIC_BUNDLE_SCHEMA)
+        ))
@@ -5,12 +5,17 @@ Combines AI Tutor and Grading API on a single port (8000)
 """
 
 import os
+import sys
 import json
+import asyncio
+import importlib.util
 from typing import Dict, List, Optional
 from datetime import datetime, timezone
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 from dotenv import load_dotenv
@@ -18,65 +23,95 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv('config.env')
 
-# Optional LangChain support
+# Optional LangChain support (checked without importing it)
+LANGCHAIN_AVAILABLE = importlib.util.find_spec("langchain_openai") is not None
+
+# Cache counters and async client cleanup (optional)
 try:
-    import langchain_openai  # noqa: F401
-    LANGCHAIN_AVAILABLE = True
+    from cache import get_cache_stats, reset_cache_stats, acache_close
+    CACHE_STATS_AVAILABLE = True
 except ImportError:
-    LANGCHAIN_AVAILABLE = False
-    # ENABLE_DEBUG not yet defined, skip debug print
+    CACHE_STATS_AVAILABLE = False
+
+    async def acache_close(): return None
 
-# Import all agents from agents folder
+# Dependency circuit breakers (optional)
 try:
-    import sys
-    # Add agents folder to path so we can import directly
-    agents_path = os.path.join(os.path.dirname(__file__), 'agents')
-    if agents_path not in sys.path:
-        sys.path.insert(0, agents_path)
-
-    from agents.ai_tutor_agent import AITutorAgent  # to load services only
-    from langgraph_tutor import run_tutor_graph
-    from answer_grading_agent import (
-        AnswerGradingAgent, GradingResult
-    )
-    from mock_exam_grading_agent import (
-        MockExamGradingAgent, ExamReport, QuestionGrade,
-        run_mock_exam_graph
+    from circuit_breaker import breaker_states
+except ImportError:
+    def breaker_states(): return {}
+
+# Write-behind outbox drained at shutdown (optional)
+try:
+    from outbox import close_outbox
+except ImportError:
+    def close_outbox(timeout=10.0): return True
+
+# Prometheus metrics registry (optional)
+try:
+    from metrics import render_metrics, PROMETHEUS_CONTENT_TYPE
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
+# Idempotency keys and duplicate request coalescing (optional)
+try:
+    from idempotency import store as idempotency_store, IdempotencyConflict
+    IDEMPOTENCY_AVAILABLE = True
+except ImportError:
+    IDEMPOTENCY_AVAILABLE = False
+
+# Local reasoning classifier counters (optional)
+try:
+    from reasoning_classifier import classifier as reasoning_classifier
+    REASONING_CLASSIFIER_AVAILABLE = True
+except ImportError:
+    REASONING_CLASSIFIER_AVAILABLE = False
+
+# Per-request deadlines for the tutor (optional)
+try:
+    from deadline import (
+        Deadline, TUTOR_DEADLINE_SECONDS, DEADLINE_GRACE_SECONDS,
+        stats as deadline_stats, reset_stats as reset_deadline_stats
     )
-    GRADING_AVAILABLE = True
-    AI_TUTOR_AVAILABLE = True
+    DEADLINE_AVAILABLE = True
+except ImportError:
+    DEADLINE_AVAILABLE = False
 
-    # Import Mock Exam FastAPI app if available
-    # Note: app is created at module level if FASTAPI_AVAILABLE
-    try:
-        # Re-import to ensure app is created (it's created at module level)
-        import importlib
-        import mock_exam_grading_agent
-        # Reload to ensure app is initialized
-        mock_exam_module = importlib.reload(mock_exam_grading_agent)
-        if (hasattr(mock_exam_module, 'app') and
-                mock_exam_module.app is not None):
-            mock_exam_app = mock_exam_module.app
-            MOCK_EXAM_APP_AVAILABLE = True
-            print("[OK] Mock Exam FastAPI app found and loaded")
-        else:
-            MOCK_EXAM_APP_AVAILABLE = False
-            mock_exam_app = None
-            print("[WARNING] Mock Exam app not found in module")
-    except (ImportError, AttributeError) as e:
-        MOCK_EXAM_APP_AVAILABLE = False
-        mock_exam_app = None
-        print(f"[WARNING] Could not import Mock Exam app: {e}")
+# Cache warm-up on startup (optional)
+try:
+    from cache_warmup import warm_cache
+    CACHE_WARMUP_AVAILABLE = True
 except ImportError:
-    GRADING_AVAILABLE = False
-    AI_TUTOR_AVAILABLE = False
-    AITutorAgent = None
-    AnswerGradingAgent = None
-    GradingResult = None
-    MockExamGradingAgent = None
-    ExamReport = None
-    QuestionGrade = None
-    # ENABLE_DEBUG not yet defined, skip debug print
+    CACHE_WARMUP_AVAILABLE = False
+
+# Agents are imported and built on first use by the application container
+# (see app_container), so importing this module stays fast
+from app_container import container, LazyProxy, APP_WARM_ON_STARTUP
+
+# Add agents folder to path so we can import directly
+agents_path = os.path.join(os.path.dirname(__file__), 'agents')
+if agents_path not in sys.path:
+    sys.path.insert(0, agents_path)
+
+
+def _importable(*modules: str) -> bool:
+    """True if every module can be imported (without importing it)."""
+    try:
+        return all(importlib.util.find_spec(m) is not None for m in modules)
+    except (ImportError, ValueError):
+        return False
+
+
+AI_TUTOR_AVAILABLE = _importable("langchain_openai", "langgraph")
+GRADING_AVAILABLE = _importable(
+    "langchain_openai", "answer_grading_agent", "mock_exam_grading_agent"
+)
+if AI_TUTOR_AVAILABLE:
+    from langgraph_tutor import (
+        run_tutor_graph, stream_tutor_graph, semantic_cache, rolling_summary,
+        pre_router
+    )
 
 # Configuration with better error handling
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -110,6 +145,9 @@ ENABLE_DEBUG = os.getenv("ENABLE_DEBUG", "true").lower() == "true"
 
 # Performance Configuration
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))
+CACHE_WARMUP_ON_STARTUP = os.getenv(
+    "CACHE_WARMUP_ON_STARTUP", "false"
+).lower() == "true"
 MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
 
 # CORS Configuration
@@ -162,123 +200,160 @@ else:
     if ENABLE_DEBUG:
         print("[WARNING] LANGSMITH_API_KEY not found - tracing disabled")
 
-# Initialize Grading Agents (will be set in lifespan)
-grading_agent = None
-mock_exam_grading_agent = None
 
-# Initialize Supabase client if available
-supabase_client = None
-try:
-    from supabase import create_client
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_ANON_KEY") or os.getenv(
-        "SUPABASE_SERVICE_ROLE_KEY"
-    )
-    if supabase_url and supabase_key:
-        supabase_client = create_client(supabase_url, supabase_key)
-        # Enable HTTP keep-alive for better performance
-        if hasattr(supabase_client, 'postgrest') and hasattr(
-            supabase_client.postgrest, 'session'
-        ):
-            supabase_client.postgrest.session.keep_alive = True
-        if ENABLE_DEBUG:
-            print("[OK] Supabase client initialized for backend")
-    else:
-        if ENABLE_DEBUG:
-            print(
-                "[WARNING] Supabase credentials not found - "
-                "backend will work without Supabase features"
-            )
-except ImportError:
-    print(
-        "[ERROR] Supabase Python client not installed - "
-        "install with: pip install supabase"
-    )
-except Exception as e:
-    print(f"[ERROR] Error initializing Supabase client: {e}")
 
-# Initialize AI Tutor Agent (global, initialized once on boot)
-ai_tutor_agent = None
-if AI_TUTOR_AVAILABLE and AITutorAgent:
+def _create_grading_agent():
+    """Answer grading agent (imports LangChain on first use)."""
+    if not GRADING_AVAILABLE:
+        return None
     try:
-        ai_tutor_agent = AITutorAgent(
+        from answer_grading_agent import AnswerGradingAgent
+        agent = AnswerGradingAgent(
             api_key=OPENAI_API_KEY,
-            model=TUTOR_MODEL,
-            temperature=TUTOR_TEMPERATURE,
-            max_tokens=TUTOR_MAX_TOKENS,
-            supabase_client=supabase_client
+            model=GRADING_MODEL,
+            temperature=GRADING_TEMPERATURE,
+            max_tokens=GRADING_MAX_TOKENS
         )
         if ENABLE_DEBUG:
-            print("[OK] AI Tutor Agent initialized successfully")
-            print(f"   Model: {TUTOR_MODEL}")
-            print(f"   Temperature: {TUTOR_TEMPERATURE}")
-            print(f"   Max Tokens: {TUTOR_MAX_TOKENS}")
+            print("[OK] Answer Grading Agent initialized successfully")
+            print(f"   Model: {GRADING_MODEL}")
+            print(f"   Temperature: {GRADING_TEMPERATURE}")
+            print(f"   Max Tokens: {GRADING_MAX_TOKENS}")
+        return agent
     except Exception as e:
-        print(f"[ERROR] Error initializing AI Tutor agent: {e}")
-        ai_tutor_agent = None
-else:
-    if ENABLE_DEBUG:
-        print("[WARNING] AI Tutor agent not available")
-    ai_tutor_agent = None
+        print(f"[ERROR] Error initializing grading agent: {e}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+        return None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifespan event handler for startup and shutdown"""
-    global grading_agent, mock_exam_grading_agent
+def _create_mock_exam_grading_agent():
+    """Mock exam grading agent (imports LangChain on first use)."""
+    if not GRADING_AVAILABLE:
+        return None
+    try:
+        from mock_exam_grading_agent import MockExamGradingAgent
+        agent = MockExamGradingAgent(api_key=OPENAI_API_KEY)
+        if ENABLE_DEBUG:
+            print("[OK] Mock Exam Grading Agent initialized successfully")
+        return agent
+    except Exception as e:
+        print(f"[ERROR] Error initializing mock exam grading agent: {e}")
+        return None
 
-    # Startup: Initialize all agents
-    if ENABLE_DEBUG:
-        print("[STARTUP] Initializing agents...")
 
-    # Initialize Answer Grading Agent
-    if GRADING_AVAILABLE and AnswerGradingAgent:
-        try:
-            grading_agent = AnswerGradingAgent(
-                api_key=OPENAI_API_KEY,
-                model=GRADING_MODEL,
-                temperature=GRADING_TEMPERATURE,
-                max_tokens=GRADING_MAX_TOKENS
-            )
-            if ENABLE_DEBUG:
-                print("[OK] Answer Grading Agent initialized successfully")
-                print(f"   Model: {GRADING_MODEL}")
-                print(f"   Temperature: {GRADING_TEMPERATURE}")
-                print(f"   Max Tokens: {GRADING_MAX_TOKENS}")
-        except Exception as e:
-            print(f"[ERROR] Error initializing grading agent: {e}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
-    else:
-        if ENABLE_DEBUG:
-            print("[WARNING] Answer Grading agent not available")
-            print(f"   GRADING_AVAILABLE: {GRADING_AVAILABLE}")
-            print(f"   AnswerGradingAgent: {AnswerGradingAgent}")
+def _load_mock_exam_app():
+    """The mock exam module's FastAPI app, or None."""
+    if not GRADING_AVAILABLE:
+        return None
+    try:
+        import mock_exam_grading_agent
+        return getattr(mock_exam_grading_agent, "app", None)
+    except (ImportError, AttributeError) as e:
+        print(f"[WARNING] Could not import Mock Exam app: {e}")
+        return None
 
-    # Initialize Mock Exam Grading Agent
-    if GRADING_AVAILABLE and MockExamGradingAgent:
-        try:
-            mock_exam_grading_agent = MockExamGradingAgent(
-                api_key=OPENAI_API_KEY
+
+container.register("grading_agent", _create_grading_agent)
+container.register(
+    "mock_exam_grading_agent", _create_mock_exam_grading_agent
+)
+container.register("mock_exam_app", _load_mock_exam_app)
+
+# Module-level names for the endpoints; each is built on first use
+supabase_client = LazyProxy(
+    lambda: container.supabase_client, "supabase_client"
+)
+ai_tutor_agent = LazyProxy(
+    lambda: container.tutor_agent if AI_TUTOR_AVAILABLE else None,
+    "tutor_agent"
+)
+grading_agent = LazyProxy(
+    lambda: container.get("grading_agent"), "grading_agent"
+)
+mock_exam_grading_agent = LazyProxy(
+    lambda: container.get("mock_exam_grading_agent"),
+    "mock_exam_grading_agent"
+)
+
+
+def _ready(name: str) -> bool:
+    """True once a container component has been built successfully."""
+    return name in container.built() and container.get(name) is not None
+
+
+class _LazyASGIApp:
+    """ASGI app that loads the real app on its first request."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        inner = await loop.run_in_executor(None, container.get, self.name)
+        if inner is None:
+            response = JSONResponse(
+                {"detail": "Not Found"}, status_code=404
             )
-            if ENABLE_DEBUG:
-                print("[OK] Mock Exam Grading Agent initialized successfully")
-        except Exception as e:
+            await response(scope, receive, send)
+            return
+        await inner(scope, receive, send)
+
+
+def _run_cache_warmup():
+    """Warm the tutor cache with hot topics (runs in a worker thread)."""
+    try:
+        if not (ai_tutor_agent and supabase_client):
+            return
+        services = container.get("services")
+        report = warm_cache(
+            supabase_client, services["lesson"], services["concepts"]
+        )
+        if ENABLE_DEBUG:
             print(
-                f"[ERROR] Error initializing mock exam grading agent: {e}"
+                f"[OK] Cache warm-up: {report['entries']} entries for "
+                f"{report['topics']} topics ({report['bytes']} bytes) in "
+                f"{report['seconds']:.2f}s"
             )
-    else:
+    except Exception as e:
+        print(f"[WARNING] Cache warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan event handler for startup and shutdown"""
+    loop = asyncio.get_running_loop()
+
+    # Startup: build clients, agents and graphs in the background so the
+    # server accepts requests immediately (a request that needs a
+    # component first waits for it)
+    warm_task = None
+    if APP_WARM_ON_STARTUP:
         if ENABLE_DEBUG:
-            print("[WARNING] Mock Exam Grading agent not available")
+            print("[STARTUP] Initializing agents in the background...")
+        warm_task = loop.run_in_executor(None, container.warm)
 
-    if ENABLE_DEBUG:
-        print("[STARTUP] All agents initialized\n")
+    # Warm hot topics in the background so startup is not delayed
+    warmup_task = None
+    if CACHE_WARMUP_ON_STARTUP and CACHE_WARMUP_AVAILABLE:
+        warmup_task = loop.run_in_executor(None, _run_cache_warmup)
 
     yield  # Server runs here
 
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+
     # Shutdown: Cleanup if needed
     if ENABLE_DEBUG:
         print("[SHUTDOWN] Shutting down gracefully...")
+    if warm_task is not None and not warm_task.done():
+        warm_task.cancel()
+    # Pending summary updates are dropped; they rerun after the next turn
+    if AI_TUTOR_AVAILABLE:
+        rolling_summary.close()
+    # Write queued Supabase rows before exiting (the rest stay spooled)
+    await loop.run_in_executor(None, close_outbox)
+    await acache_close()
 
 
 # Initialize FastAPI app with lifespan
@@ -298,15 +373,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount Mock Exam Grading FastAPI app if available
-try:
-    if MOCK_EXAM_APP_AVAILABLE and mock_exam_app:
-        app.mount("/api/v1/mock", mock_exam_app)
-        if ENABLE_DEBUG:
-            print("[OK] Mock Exam Grading API mounted at /api/v1/mock")
-except NameError:
-    # MOCK_EXAM_APP_AVAILABLE not defined (import failed)
-    pass
+# Mount Mock Exam Grading FastAPI app (loaded on its first request)
+if GRADING_AVAILABLE:
+    app.mount("/api/v1/mock", _LazyASGIApp("mock_exam_app"))
+    if ENABLE_DEBUG:
+        print("[OK] Mock Exam Grading API mounted at /api/v1/mock")
 
 
 # Pydantic models for AI Tutor
@@ -333,6 +404,8 @@ class TutorResponse(BaseModel):
     learning_path: Optional[Dict] = None
     token_usage: Optional[Dict] = None
     lesson_chunks: Optional[List[Dict]] = []
+    # Optional steps skipped to answer within the deadline
+    degraded: List[str] = []
 
 
 class LessonRequest(BaseModel):
@@ -422,9 +495,170 @@ class TimeStopRequest(BaseModel):
 
 # ===== AI TUTOR ENDPOINTS =====
 
+def _normalize_readiness(readiness_raw: Optional[Dict]) -> Dict:
+    """Normalize the graph's readiness to the structure the frontend uses"""
+    if readiness_raw:
+        # Ensure all required fields are present
+        # Handle average_mastery and min_mastery - they might be None
+        avg_mastery = readiness_raw.get("average_mastery")
+        min_mastery = readiness_raw.get("min_mastery")
+
+        # Calculate dynamic readiness based on average_mastery
+        # Convert mastery (0-100) to readiness (0.0-1.0)
+        if avg_mastery is not None:
+            # Convert mastery score to readiness score
+            # This makes readiness responsive to actual mastery changes
+            overall = float(avg_mastery) / 100.0
+            # Clamp between 0.0 and 1.0
+            overall = max(0.0, min(1.0, overall))
+            if ENABLE_DEBUG:
+                print(
+                    f"[DEBUG] Readiness calculated from mastery: "
+                    f"avg_mastery={avg_mastery} -> overall={overall}"
+                )
+        else:
+            # Fallback: Convert readiness string to numeric if no mastery
+            overall = readiness_raw.get("overall_readiness")
+            if isinstance(overall, str):
+                # Map readiness strings to numeric scores (fallback only)
+                readiness_map = {
+                    "ready": 1.0,
+                    "almost_ready": 0.75,
+                    "needs_reinforcement": 0.5,
+                    "review_prerequisites": 0.25,
+                    "unknown": 0.0
+                }
+                overall = readiness_map.get(overall, 0.0)
+                if ENABLE_DEBUG:
+                    print(
+                        f"[DEBUG] Readiness from string mapping: "
+                        f"'{readiness_raw.get('overall_readiness')}' -> "
+                        f"{overall}"
+                    )
+            elif overall is None:
+                overall = 0.0
+            else:
+                overall = (
+                    float(overall) if overall is not None else 0.0
+                )
+
+        readiness_normalized = {
+            "overall_readiness": float(overall),
+            "overall": float(overall),  # Frontend expects 'overall' field
+            "average_mastery": (
+                float(avg_mastery) if avg_mastery is not None else 0.0
+            ),
+            "min_mastery": (
+                float(min_mastery) if min_mastery is not None else 0.0
+            ),
+            "concept_readiness": readiness_raw.get("concept_readiness", {})
+        }
+        # Convert concept_readiness list to dict if needed
+        if isinstance(readiness_normalized["concept_readiness"], list):
+            concept_dict = {}
+            for item in readiness_normalized["concept_readiness"]:
+                if isinstance(item, dict) and "concept_id" in item:
+                    concept_dict[item["concept_id"]] = item
+            readiness_normalized["concept_readiness"] = concept_dict
+    else:
+        # Return structure with null values if missing
+        readiness_normalized = {
+            "overall_readiness": 0.0,
+            "average_mastery": 0.0,
+            "min_mastery": 0.0,
+            "concept_readiness": {}
+        }
+
+    return readiness_normalized
+
+
+def _normalize_learning_path(learning_path_raw: Optional[Dict]) -> Dict:
+    """Normalize the graph's learning path to the frontend structure"""
+    if learning_path_raw:
+        learning_path_normalized = {
+            "decision": str(learning_path_raw.get("decision", "unknown")),
+            "recommended_concept": (
+                str(learning_path_raw.get("recommended_concept"))
+                if learning_path_raw.get("recommended_concept") is not None
+                else None
+            ),
+            "recommended_concept_name": (
+                str(learning_path_raw.get("recommended_concept_name"))
+                if learning_path_raw.get(
+                    "recommended_concept_name"
+                ) is not None
+                else None
+            ),
+            "details": str(learning_path_raw.get("details", ""))
+        }
+    else:
+        # Return structure with null values if missing
+        learning_path_normalized = {
+            "decision": "unknown",
+            "recommended_concept": None,
+            "recommended_concept_name": None,
+            "details": ""
+        }
+
+    return learning_path_normalized
+
+
+async def _idempotent(scope, user_id, payload, idempotency_key, compute):
+    """
+    Run compute() once for a request and its duplicates.
+
+    A duplicate (same Idempotency-Key header, or with no header the same
+    user and payload within a few seconds) waits for the running request
+    or gets its stored response instead of running the pipeline again.
+
+    Args:
+        scope: Endpoint name
+        user_id: Requesting user
+        payload: Request fields that identify a duplicate
+        idempotency_key: Idempotency-Key header, if sent
+        compute: Coroutine function producing the response
+
+    Returns:
+        The response, as JSON-compatible data
+    """
+    if not IDEMPOTENCY_AVAILABLE:
+        return await compute()
+
+    async def run():
+        return jsonable_encoder(await compute())
+
+    try:
+        return await idempotency_store.run(
+            scope, user_id, payload, run, header_key=idempotency_key
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @app.post("/tutor/chat", response_model=TutorResponse)
-async def chat_with_tutor(request: TutorRequest):
-    """Chat with the AI tutor using LangGraph pipeline"""
+async def chat_with_tutor(
+    request: TutorRequest, idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Chat with the AI tutor using LangGraph pipeline.
+
+    Retries and double submits of the same message share one pipeline
+    run (see _idempotent).
+    """
+    payload = {
+        "topic": request.topic,
+        "conversation_id": request.conversation_id,
+        "message": request.message,
+        "explanation_style": request.explanation_style,
+    }
+    return await _idempotent(
+        "tutor_chat", request.user_id, payload, idempotency_key,
+        lambda: _chat_with_tutor(request)
+    )
+
+
+async def _chat_with_tutor(request: TutorRequest):
+    """/tutor/chat body, run once per distinct request."""
     if not AI_TUTOR_AVAILABLE:
         raise HTTPException(
             status_code=503, detail="AI Tutor not available"
@@ -442,50 +676,48 @@ async def chat_with_tutor(request: TutorRequest):
     )
 
     try:
-        # Use LangGraph tutor pipeline with timeout protection
+        # Use LangGraph tutor pipeline
         if ENABLE_DEBUG:
             print(
                 f"[Backend] Calling run_tutor_graph for user: "
                 f"{request.user_id}, topic: {request.topic}"
             )
 
-        # Add overall timeout for graph execution (90 seconds)
-        # Increased from 60s to allow for LLM processing time
-        import threading
-        result_container = {
-            "value": None, "error": None, "completed": False
-        }
-
-        def execute_graph():
-            try:
-                result_container["value"] = run_tutor_graph(
-                    user_id=request.user_id,
-                    topic=str(request.topic),
-                    message=request.message,
-                    conversation_id=conversation_id,
-                    explanation_style=request.explanation_style or "default",
-                    subject_id=101,
-                    conversation_history=request.conversation_history
-                )
-                result_container["completed"] = True
-            except Exception as e:
-                result_container["error"] = e
-                result_container["completed"] = True
-
-        graph_thread = threading.Thread(
-            target=execute_graph, daemon=True
+        # Run the (blocking) graph in the default thread pool so the event
+        # loop keeps serving other requests while it runs. The graph
+        # degrades to meet the deadline; past it (plus a grace period) the
+        # request gives up
+        deadline = (
+            Deadline(TUTOR_DEADLINE_SECONDS) if DEADLINE_AVAILABLE else None
         )
-        graph_thread.start()
-        graph_thread.join()  # No timeout - let it complete
-
-        if not result_container["completed"]:
+        try:
+            graph_call = asyncio.to_thread(
+                run_tutor_graph,
+                user_id=request.user_id,
+                topic=str(request.topic),
+                message=request.message,
+                conversation_id=conversation_id,
+                explanation_style=request.explanation_style or "default",
+                subject_id=101,
+                conversation_history=request.conversation_history,
+                deadline=deadline
+            )
+            if deadline:
+                result = await asyncio.wait_for(
+                    graph_call,
+                    deadline.remaining() + DEADLINE_GRACE_SECONDS
+                )
+            else:
+                result = await graph_call
+        except asyncio.TimeoutError:
             raise HTTPException(
                 status_code=504,
-                detail="AI Tutor request did not complete"
+                detail=(
+                    f"AI Tutor did not answer within "
+                    f"{TUTOR_DEADLINE_SECONDS:g} seconds"
+                )
             )
-
-        if result_container["error"]:
-            error = result_container["error"]
+        except Exception as error:
             error_msg = str(error)
             if ENABLE_DEBUG:
                 print(f"[ERROR] Graph execution failed: {error_msg}")
@@ -495,8 +727,6 @@ async def chat_with_tutor(request: TutorRequest):
                 detail=f"AI Tutor processing error: {error_msg}"
             )
 
-        result = result_container["value"]
-
         if result is None:
             raise HTTPException(
                 status_code=500,
@@ -549,109 +779,11 @@ async def chat_with_tutor(request: TutorRequest):
                 f"(type: {concept_type})"
             )
 
-        # Normalize readiness structure to exact format
-        readiness_raw = result.get("readiness")
-        readiness_normalized = None
-        if readiness_raw:
-            # Ensure all required fields are present
-            # Handle average_mastery and min_mastery - they might be None
-            avg_mastery = readiness_raw.get("average_mastery")
-            min_mastery = readiness_raw.get("min_mastery")
-
-            # Calculate dynamic readiness based on average_mastery
-            # Convert mastery (0-100) to readiness (0.0-1.0)
-            if avg_mastery is not None:
-                # Convert mastery score to readiness score
-                # This makes readiness responsive to actual mastery changes
-                overall = float(avg_mastery) / 100.0
-                # Clamp between 0.0 and 1.0
-                overall = max(0.0, min(1.0, overall))
-                if ENABLE_DEBUG:
-                    print(
-                        f"[DEBUG] Readiness calculated from mastery: "
-                        f"avg_mastery={avg_mastery} -> overall={overall}"
-                    )
-            else:
-                # Fallback: Convert readiness string to numeric if no mastery
-                overall = readiness_raw.get("overall_readiness")
-                if isinstance(overall, str):
-                    # Map readiness strings to numeric scores (fallback only)
-                    readiness_map = {
-                        "ready": 1.0,
-                        "almost_ready": 0.75,
-                        "needs_reinforcement": 0.5,
-                        "review_prerequisites": 0.25,
-                        "unknown": 0.0
-                    }
-                    overall = readiness_map.get(overall, 0.0)
-                    if ENABLE_DEBUG:
-                        print(
-                            f"[DEBUG] Readiness from string mapping: "
-                            f"'{readiness_raw.get('overall_readiness')}' -> "
-                            f"{overall}"
-                        )
-                elif overall is None:
-                    overall = 0.0
-                else:
-                    overall = (
-                        float(overall) if overall is not None else 0.0
-                    )
-
-            readiness_normalized = {
-                "overall_readiness": float(overall),
-                "overall": float(overall),  # Frontend expects 'overall' field
-                "average_mastery": (
-                    float(avg_mastery) if avg_mastery is not None else 0.0
-                ),
-                "min_mastery": (
-                    float(min_mastery) if min_mastery is not None else 0.0
-                ),
-                "concept_readiness": readiness_raw.get("concept_readiness", {})
-            }
-            # Convert concept_readiness list to dict if needed
-            if isinstance(readiness_normalized["concept_readiness"], list):
-                concept_dict = {}
-                for item in readiness_normalized["concept_readiness"]:
-                    if isinstance(item, dict) and "concept_id" in item:
-                        concept_dict[item["concept_id"]] = item
-                readiness_normalized["concept_readiness"] = concept_dict
-        else:
-            # Return structure with null values if missing
-            readiness_normalized = {
-                "overall_readiness": 0.0,
-                "average_mastery": 0.0,
-                "min_mastery": 0.0,
-                "concept_readiness": {}
-            }
-
-        # Normalize learning_path structure to exact format
-        learning_path_raw = result.get("learning_path")
-        learning_path_normalized = None
-        if learning_path_raw:
-            learning_path_normalized = {
-                "decision": str(learning_path_raw.get("decision", "unknown")),
-                "recommended_concept": (
-                    str(learning_path_raw.get("recommended_concept"))
-                    if learning_path_raw.get("recommended_concept") is not None
-                    else None
-                ),
-                "recommended_concept_name": (
-                    str(learning_path_raw.get("recommended_concept_name"))
-                    if learning_path_raw.get(
-                        "recommended_concept_name"
-                    ) is not None
-                    else None
-                ),
-                "details": str(learning_path_raw.get("details", ""))
-            }
-        else:
-            # Return structure with null values if missing
-            learning_path_normalized = {
-                "decision": "unknown",
-                "recommended_concept": None,
-                "recommended_concept_name": None,
-                "details": ""
-            }
+        # Normalize readiness and learning_path structures to exact format
+        readiness_normalized = _normalize_readiness(result.get("readiness"))
+        learning_path_normalized = _normalize_learning_path(
+            result.get("learning_path")
+        )
 
         # Ensure suggestions is always a list
         suggestions_list = result.get("suggestions", [])
@@ -713,7 +845,8 @@ async def chat_with_tutor(request: TutorRequest):
                 readiness=readiness_normalized,
                 learning_path=learning_path_normalized,
                 token_usage=result.get("token_usage"),
-                lesson_chunks=result.get("lesson_chunks", [])
+                lesson_chunks=result.get("lesson_chunks", []),
+                degraded=result.get("degraded") or []
             )
         except Exception as validation_error:
             if ENABLE_DEBUG:
@@ -746,17 +879,111 @@ async def chat_with_tutor(request: TutorRequest):
         )
 
 
+def _sse_event(event: str, data: Dict) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _stream_final_payload(result: Dict) -> Dict:
+    """Shape the streamed final event like the /tutor/chat response"""
+    return {
+        "response": result.get("response", ""),
+        "suggestions": result.get("suggestions") or [],
+        "related_concepts": result.get("related_concepts") or [],
+        "related_concept_ids": [
+            str(cid) for cid in result.get("concept_ids") or []
+            if cid is not None and str(cid)
+        ],
+        "reasoning_label": result.get("reasoning_label", "neutral"),
+        "mastery_updates": result.get("mastery_updates") or [],
+        "readiness": _normalize_readiness(result.get("readiness")),
+        "learning_path": _normalize_learning_path(
+            result.get("learning_path")
+        ),
+        "token_usage": result.get("token_usage"),
+        "conversation_id": result.get("conversation_id"),
+        "degraded": result.get("degraded") or [],
+    }
+
+
+@app.post("/tutor/chat/stream")
+async def chat_with_tutor_stream(request: TutorRequest):
+    """
+    Chat with the AI tutor, streaming the reply as server-sent events.
+
+    Events:
+        token: {"text": str} for each chunk of the reply
+        final: /tutor/chat response fields (concepts, readiness,
+            learning_path, ...) after the last token
+        error: {"detail": str} if the pipeline fails mid-stream
+    """
+    if not AI_TUTOR_AVAILABLE:
+        raise HTTPException(
+            status_code=503, detail="AI Tutor not available"
+        )
+
+    if not request.user_id:
+        raise HTTPException(
+            status_code=400, detail="user_id is required"
+        )
+
+    conversation_id = (
+        request.conversation_id or f"{request.user_id}_{request.topic}"
+    )
+
+    # A sync generator: Starlette advances it in the thread pool, so the
+    # graph and the LLM stream never block the event loop
+    def events():
+        try:
+            for event in stream_tutor_graph(
+                user_id=request.user_id,
+                topic=str(request.topic),
+                message=request.message,
+                conversation_id=conversation_id,
+                explanation_style=request.explanation_style or "default",
+                subject_id=101,
+                conversation_history=request.conversation_history,
+                deadline=(
+                    Deadline(TUTOR_DEADLINE_SECONDS) if DEADLINE_AVAILABLE
+                    else None
+                )
+            ):
+                data = event["data"]
+                if event["event"] == "final":
+                    data = _stream_final_payload(data)
+                yield _sse_event(event["event"], data)
+        except Exception as e:
+            print(f"[ERROR] Error in tutor chat stream: {e}")
+            yield _sse_event(
+                "error", {"detail": f"AI Tutor processing error: {e}"}
+            )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
 @app.post("/tutor/lesson", response_model=LessonResponse)
 async def create_lesson(request: LessonRequest):
     """Create a structured lesson using LLMService"""
-    if not AI_TUTOR_AVAILABLE or not ai_tutor_agent:
+    # Built off the event loop if the startup warm-up has not finished
+    agent = None
+    if AI_TUTOR_AVAILABLE:
+        agent = await asyncio.to_thread(container.get, "tutor_agent")
+    if not agent:
         raise HTTPException(
             status_code=503, detail="AI Tutor not available"
         )
 
     try:
         # Get LLM service from agent
-        services = ai_tutor_agent.build_services()
+        services = await asyncio.to_thread(container.get, "services")
         llm_service = services["llm"]
 
         # Generate lesson using LLMService
@@ -795,8 +1022,22 @@ async def tutor_health():
 # ===== GRADING API ENDPOINTS =====
 
 @app.post("/grade-answer", response_model=GradingResponse)
-async def grade_answer(request: GradingRequest):
-    """Grade a student answer against the model answer"""
+async def grade_answer(
+    request: GradingRequest, idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Grade a student answer against the model answer.
+
+    Duplicate submissions share one grading run (see _idempotent).
+    """
+    return await _idempotent(
+        "grade_answer", request.user_id, request.model_dump(),
+        idempotency_key, lambda: _grade_answer(request)
+    )
+
+
+async def _grade_answer(request: GradingRequest):
+    """/grade-answer body, run once per distinct request."""
 
     if not GRADING_AVAILABLE:
         raise HTTPException(
@@ -804,7 +1045,7 @@ async def grade_answer(request: GradingRequest):
             detail="Grading service not available"
         )
 
-    if not grading_agent:
+    if not await asyncio.to_thread(container.get, "grading_agent"):
         raise HTTPException(
             status_code=500,
             detail=(
@@ -889,10 +1130,30 @@ async def grade_answer(request: GradingRequest):
 
 
 @app.post("/grade-mock-exam", response_model=MockExamGradingResponse)
-async def grade_mock_exam(request: MockExamGradingRequest):
-    """Grade a complete mock exam with all attempted questions"""
+async def grade_mock_exam(
+    request: MockExamGradingRequest,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Grade a complete mock exam with all attempted questions.
 
-    if not GRADING_AVAILABLE or not mock_exam_grading_agent:
+    Duplicate submissions share one grading run (see _idempotent).
+    """
+    return await _idempotent(
+        "grade_mock_exam", request.user_id, request.model_dump(),
+        idempotency_key, lambda: _grade_mock_exam(request)
+    )
+
+
+async def _grade_mock_exam(request: MockExamGradingRequest):
+    """/grade-mock-exam body, run once per distinct request."""
+
+    agent = None
+    if GRADING_AVAILABLE:
+        agent = await asyncio.to_thread(
+            container.get, "mock_exam_grading_agent"
+        )
+    if not agent:
         raise HTTPException(
             status_code=503,
             detail="Mock exam grading service not available"
@@ -936,8 +1197,9 @@ async def grade_mock_exam(request: MockExamGradingRequest):
         #    exam_question_results, student_mastery, student_weaknesses,
         #    student_readiness)
         try:
+            from mock_exam_grading_agent import run_mock_exam_graph
             report = await run_mock_exam_graph(
-                agent=mock_exam_grading_agent,
+                agent=agent,
                 user_id=user_id,
                 attempted_questions=request.attempted_questions,
                 request_id=request_id,
@@ -1003,8 +1265,8 @@ async def grading_health():
     """Health check for grading service"""
     return {
         "status": "healthy" if GRADING_AVAILABLE else "unavailable",
-        "grading_agent_ready": grading_agent is not None,
-        "mock_exam_grading_agent_ready": mock_exam_grading_agent is not None,
+        "grading_agent_ready": _ready("grading_agent"),
+        "mock_exam_grading_agent_ready": _ready("mock_exam_grading_agent"),
         "service": "Answer Grading API"
     }
 
@@ -1271,11 +1533,65 @@ async def root():
     }
 
 
+@app.get("/cache/stats")
+async def cache_stats(reset: bool = False):
+    """
+    Per-key-prefix cache hit/miss/bytes counters and Redis latency
+    histograms for this worker, plus the semantic answer cache,
+    pre-router (tutor messages answered from templates, per category),
+    idempotency (duplicate requests served without recomputing),
+    reasoning classifier (local vs LLM labels, agreement) and deadline
+    (skipped steps, late requests, dependency latencies) counters.
+    Pass ?reset=true to clear the counters after reading them.
+    """
+    if not CACHE_STATS_AVAILABLE:
+        raise HTTPException(
+            status_code=503, detail="Cache stats not available"
+        )
+    snapshot = get_cache_stats()
+    if AI_TUTOR_AVAILABLE:
+        snapshot["semantic_answers"] = semantic_cache.stats()
+        snapshot["pre_router"] = pre_router.stats()
+    if IDEMPOTENCY_AVAILABLE:
+        snapshot["idempotency"] = idempotency_store.stats()
+    if REASONING_CLASSIFIER_AVAILABLE:
+        snapshot["reasoning_classifier"] = reasoning_classifier.stats()
+    if DEADLINE_AVAILABLE:
+        snapshot["deadline"] = deadline_stats()
+    if reset:
+        reset_cache_stats()
+        if AI_TUTOR_AVAILABLE:
+            semantic_cache.reset_stats()
+            pre_router.reset_stats()
+        if IDEMPOTENCY_AVAILABLE:
+            idempotency_store.reset_stats()
+        if REASONING_CLASSIFIER_AVAILABLE:
+            reasoning_classifier.reset_stats()
+        if DEADLINE_AVAILABLE:
+            reset_deadline_stats()
+    snapshot["pid"] = os.getpid()
+    snapshot["timestamp"] = datetime.now(timezone.utc).isoformat()
+    return snapshot
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Latency histograms and counters for this worker in the Prometheus
+    text format: tutor nodes, grading stages, LLM, Supabase and cache.
+    """
+    if not METRICS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Metrics not available")
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.get("/health")
 async def unified_health():
     """Unified health check for all services"""
+    breakers = breaker_states()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
     return {
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "services": {
             "ai_tutor": {
                 "status": "healthy",
@@ -1284,12 +1600,15 @@ async def unified_health():
             },
             "grading": {
                 "status": (
-                    "healthy" if GRADING_AVAILABLE and grading_agent
+                    "healthy" if GRADING_AVAILABLE and _ready("grading_agent")
                     else "unavailable"
                 ),
-                "agent_ready": grading_agent is not None
+                "agent_ready": _ready("grading_agent")
             }
         },
+        # closed = healthy, open = failing fast to fallbacks,
+        # half_open = probing for recovery
+        "circuit_breakers": breakers,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 